@@ -1 +1,9 @@
-from agents.booking_agent import BookingAgent
+def __getattr__(name):
+    # Imported on first use: the agent pulls in LangGraph and the OpenAI client
+    if name == 'BookingAgent':
+        from agents.booking_agent import BookingAgent
+        return BookingAgent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ['BookingAgent']
@@ -1,2 +1,13 @@
-from .booking_agent import BookingAgent
-from .database.create_sqlite_db import create_bookings_db
+def __getattr__(name):
+    # Imported on first use, so that the light submodules (database, metrics, ...) can be
+    # imported without LangGraph and the OpenAI client
+    if name == 'BookingAgent':
+        from .booking_agent import BookingAgent
+        return BookingAgent
+    if name == 'create_bookings_db':
+        from .database.create_sqlite_db import create_bookings_db
+        return create_bookings_db
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = ['BookingAgent', 'create_bookings_db']
@@ -1,69 +1,176 @@
-from typing_extensions import TypedDict
+from typing_extensions import NotRequired, TypedDict
 from typing import Annotated
-import datetime
-import pytz
 
 from langgraph.graph import StateGraph, START, END
+from langchain_core.language_models import BaseChatModel
 from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.prebuilt import tools_condition
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.memory import MemorySaver
-from langchain_openai import ChatOpenAI
 
 from agents.booking_agent.tools import (
     convert_relative_to_absolute_datetime,
     check_availability,
+    find_available_slots,
     book_appointment,
     retrieve_active_bookings_user,
     reschedule_appointment,
-    cancel_appointment
+    cancel_appointment,
+    list_stylists_and_services,
+    answer_faq
 )
-from agents.booking_agent.prompts import AGENT_SYSTEM_MESSAGE_PROMPT
+from agents.booking_agent.prompt_builder import PromptBuilder
+from agents.booking_agent.tenancy import DEFAULT_TENANT, current_tenant
+from agents.booking_agent.tool_node import ParallelToolNode
+from agents.booking_agent.history import HistoryConfig, history_updates, prompt_history
+from agents.booking_agent.llm_limiter import LLMCallLimiter
+from agents.booking_agent.router import FastPathRouter, fast_path_condition
+from agents.booking_agent.metrics import MetricsCallbackHandler
 
 
 class AgentState(TypedDict):
     messages: Annotated[list[BaseMessage], add_messages]
+    # Rolling summary of the turns removed from `messages`
+    summary: NotRequired[str]
 
 
 available_tools = [
     convert_relative_to_absolute_datetime,
     check_availability,
+    find_available_slots,
     book_appointment,
     retrieve_active_bookings_user,
     reschedule_appointment,
-    cancel_appointment
+    cancel_appointment,
+    list_stylists_and_services,
+    answer_faq
 ]
-tool_node = ToolNode(tools=available_tools)
-_llm_with_tools = ChatOpenAI(model='gpt-4o').bind_tools(tools=available_tools)
-system_message = {
-    'role': 'developer', 
-    'content': AGENT_SYSTEM_MESSAGE_PROMPT.format(
-        current_dt_iso=datetime.datetime.now(tz=pytz.timezone('America/Toronto')))
-}
+tool_node = ParallelToolNode(tools=available_tools)
 
 
-def llm_call(state: AgentState):
-    response = _llm_with_tools.invoke([system_message] + state['messages'])
-    return {'messages': [response]}
+class _LimitedLLM:
+    """The model as called to summarize the history, within the limits of the LLM calls."""
+
+    def __init__(self, llm: BaseChatModel, llm_limiter: LLMCallLimiter):
+        self._llm = llm
+        self._llm_limiter = llm_limiter
+
+    def invoke(self, *args, **kwargs):
+        return self._llm_limiter.call(self._llm.invoke, *args, **kwargs)
 
 
 class BookingAgent:
-    def __init__(self):
-        self.agent_checkpointer = MemorySaver()
+    def __init__(
+            self,
+            llm: BaseChatModel = None,
+            checkpointer: BaseCheckpointSaver = None,
+            history_config: HistoryConfig = HistoryConfig(),
+            fast_path: bool = False,
+            llm_limiter: LLMCallLimiter = None,
+            log_turns: bool = False):
+        """
+        Args:
+            llm (BaseChatModel): Chat model driving the agent, `gpt-4o` by default.
+            checkpointer (BaseCheckpointSaver): Store of the conversation threads, in memory by default
+                (see `agents.booking_agent.checkpointer.create_checkpointer` for bounded and persistent ones).
+            history_config (HistoryConfig): How the conversation history sent to the LLM is bounded.
+            fast_path (bool): Answer the simple structured requests (cancel by booking ID, list bookings by phone
+                number, check a date and time) without an LLM call, see `FastPathRouter`.
+            llm_limiter (LLMCallLimiter): Bounds the concurrency of the LLM calls, with per-call timeouts and
+                retries; unbounded, with the retries of the client, by default.
+            log_turns (bool): Log the breakdown of each turn (durations, LLM calls and tokens), see
+                `MetricsCallbackHandler`.
+        """
+        if llm is None:
+            # Imported only for the default model, as it takes most of the import time of the agent
+            from langchain_openai import ChatOpenAI
+            if llm_limiter is None:
+                llm = ChatOpenAI(model='gpt-4o')
+            else:
+                # Retried by the limiter, which does not hold a slot of the concurrency limit while backing off
+                llm = ChatOpenAI(model='gpt-4o', timeout=llm_limiter.timeout_secs, max_retries=0)
+        self._llm = llm
+        self.llm_limiter = llm_limiter
+        # Static prompt prefix (tool schemas and system message), built once and identical on every call
+        self.prompt_builder = PromptBuilder(available_tools)
+        # Those of the other salons (see `agents.booking_agent.tenancy`), built on their first call
+        self._tenant_prompt_builders: dict[str, PromptBuilder] = {}
+        self._llm_with_tools = self._llm.bind_tools(tools=self.prompt_builder.tool_schemas)
+        self.agent_checkpointer = checkpointer if checkpointer is not None else MemorySaver()
+        self.history_config = history_config
+        self.fast_path_router = FastPathRouter(available_tools) if fast_path else None
+        self.metrics_handler = MetricsCallbackHandler(log_turns=log_turns)
         self.graph = self._build_graph()
 
+    def manage_history(self, state: AgentState):
+        llm = self._llm if self.llm_limiter is None else _LimitedLLM(self._llm, self.llm_limiter)
+        return history_updates(llm, self.history_config, state['messages'], state.get('summary'))
+
+    def _prompt_builder(self) -> PromptBuilder:
+        tenant = current_tenant.get()
+        if tenant is DEFAULT_TENANT:
+            return self.prompt_builder
+        prompt_builder = self._tenant_prompt_builders.get(tenant.id)
+        if prompt_builder is None:
+            prompt_builder = self._tenant_prompt_builders[tenant.id] = PromptBuilder(
+                available_tools, timezone=tenant.timezone, prompt_variables=tenant.prompt_variables)
+        return prompt_builder
+
+    def _prompt(self, state: AgentState) -> list:
+        return self._prompt_builder().build(
+            prompt_history(self.history_config, state['messages'], state.get('summary')))
+
+    def llm_call(self, state: AgentState):
+        if self.llm_limiter is None:
+            response = self._llm_with_tools.invoke(self._prompt(state))
+        else:
+            response = self.llm_limiter.call(self._llm_with_tools.invoke, self._prompt(state))
+        return {'messages': [response]}
+
+    async def allm_call(self, state: AgentState):
+        if self.llm_limiter is None:
+            response = await self._llm_with_tools.ainvoke(self._prompt(state))
+        else:
+            response = await self.llm_limiter.acall(self._llm_with_tools.ainvoke, self._prompt(state))
+        return {'messages': [response]}
+
     def _build_graph(self):
         graph_builder = StateGraph(AgentState)
-        graph_builder.add_node("llm_call", llm_call)
+        # Bounds the stored history once per turn, before the first LLM call
+        graph_builder.add_node("manage_history", self.manage_history)
+        # Sync and async implementations, picked by graph.invoke / graph.ainvoke.
+        # The tool calls of a turn run concurrently, in the default executor under ainvoke (see ParallelToolNode).
+        graph_builder.add_node("llm_call", RunnableLambda(self.llm_call, afunc=self.allm_call))
         graph_builder.add_node("tool_node", tool_node)
-        graph_builder.add_edge(START, 'llm_call')
+        graph_builder.add_edge(START, 'manage_history')
+        if self.fast_path_router is not None:
+            graph_builder.add_node(
+                "fast_path", RunnableLambda(self.fast_path_router.invoke, afunc=self.fast_path_router.ainvoke))
+            graph_builder.add_edge('manage_history', 'fast_path')
+            graph_builder.add_conditional_edges(
+                'fast_path',
+                fast_path_condition,
+                {'llm_call': 'llm_call', END: END}
+            )
+        else:
+            graph_builder.add_edge('manage_history', 'llm_call')
         graph_builder.add_conditional_edges(
             'llm_call', 
             tools_condition, 
             {'tools': 'tool_node', END: END}
         )
         graph_builder.add_edge('tool_node', 'llm_call')
-        return graph_builder.compile(checkpointer=self.agent_checkpointer)
+        # Node, tool and LLM metrics are recorded from the callbacks of every run
+        return graph_builder.compile(checkpointer=self.agent_checkpointer).with_config(
+            callbacks=[self.metrics_handler])
 
     def invoke(self, *args, **kwargs):
         return self.graph.invoke(*args, **kwargs)
+
+    async def ainvoke(self, *args, **kwargs):
+        return await self.graph.ainvoke(*args, **kwargs)
+
+    def astream(self, *args, **kwargs):
+        return self.graph.astream(*args, **kwargs)
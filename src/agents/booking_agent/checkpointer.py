@@ -0,0 +1,182 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+
+CHECKPOINT_DB_PATH = './checkpoints.sqlite'
+EVICTION_INTERVAL_SECS = 60
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    In-memory checkpointer that bounds the number of conversation threads it keeps.
+
+    Threads idle for longer than `thread_ttl_secs` are evicted, as are the least recently
+    used ones once there are more than `max_threads`. Without limits, it behaves like `MemorySaver`.
+    """
+
+    def __init__(self, max_threads: int = None, thread_ttl_secs: float = None):
+        super().__init__()
+        self.max_threads = max_threads
+        self.thread_ttl_secs = thread_ttl_secs
+        # Thread ID -> last access (monotonic), least recently used first
+        self._last_access = OrderedDict()
+        # Thread ID -> keys of its entries in `self.blobs`, to evict them without a full scan
+        self._blob_keys = defaultdict(set)
+        self._lock = threading.RLock()
+
+    def _touch(self, thread_id: str):
+        with self._lock:
+            self._last_access[thread_id] = time.monotonic()
+            self._last_access.move_to_end(thread_id)
+            self._evict()
+
+    def _evict(self):
+        if self.thread_ttl_secs is not None:
+            expiry = time.monotonic() - self.thread_ttl_secs
+            while self._last_access and next(iter(self._last_access.values())) < expiry:
+                self.delete_thread(next(iter(self._last_access)))
+        if self.max_threads is not None:
+            while len(self._last_access) > self.max_threads:
+                self.delete_thread(next(iter(self._last_access)))
+
+    def delete_thread(self, thread_id: str):
+        """Removes all the checkpoints and writes of a thread."""
+        with self._lock:
+            self._last_access.pop(thread_id, None)
+            # Writes are keyed by (thread ID, namespace, checkpoint ID)
+            for checkpoint_ns, checkpoints in self.storage.pop(thread_id, {}).items():
+                for checkpoint_id in checkpoints:
+                    self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            for key in self._blob_keys.pop(thread_id, ()):
+                self.blobs.pop(key, None)
+
+    def get_tuple(self, config):
+        with self._lock:
+            thread_id = config['configurable']['thread_id']
+            checkpoint_tuple = super().get_tuple(config)
+            if checkpoint_tuple is not None:
+                self._touch(thread_id)
+            elif thread_id not in self._last_access:
+                # Drop the empty entry created by the lookup of an unknown thread
+                self.storage.pop(thread_id, None)
+            return checkpoint_tuple
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        with self._lock:
+            thread_id = config['configurable']['thread_id']
+            checkpoint_ns = config['configurable']['checkpoint_ns']
+            self._blob_keys[thread_id].update(
+                (thread_id, checkpoint_ns, channel, version) for channel, version in new_versions.items())
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            self._touch(thread_id)
+            return next_config
+
+    def put_writes(self, config, writes, task_id, task_path=''):
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+            self._touch(config['configurable']['thread_id'])
+
+
+def _import_sqlite_saver():
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError as e:
+        raise ImportError(
+            "The SQLite checkpointer requires the `langgraph-checkpoint-sqlite` package: "
+            "pip install langgraph-checkpoint-sqlite"
+        ) from e
+    return SqliteSaver
+
+
+def create_sqlite_saver(db_path: str = CHECKPOINT_DB_PATH, thread_ttl_secs: float = None) -> BaseCheckpointSaver:
+    """
+    Creates a checkpointer persisting the conversation threads in the SQLite file `db_path`.
+
+    State survives restarts and can be shared by several worker processes (WAL mode).
+    Threads idle for longer than `thread_ttl_secs` are deleted, checked at most every minute.
+    """
+    SqliteSaver = _import_sqlite_saver()
+
+    class TTLSqliteSaver(SqliteSaver):
+        def setup(self):
+            if self.is_setup:
+                return
+            super().setup()
+            self.conn.executescript("""
+                PRAGMA synchronous = NORMAL;
+                CREATE TABLE IF NOT EXISTS thread_activity (
+                    thread_id TEXT PRIMARY KEY,
+                    last_active REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_thread_activity_last_active
+                ON thread_activity (last_active);
+            """)
+            self._last_eviction = time.monotonic()
+
+        def put(self, config, checkpoint, metadata, new_versions):
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            with self.cursor() as cur:
+                cur.execute(
+                    "INSERT OR REPLACE INTO thread_activity (thread_id, last_active) VALUES (?, ?)",
+                    (str(config['configurable']['thread_id']), time.time())
+                )
+            if thread_ttl_secs is not None and time.monotonic() - self._last_eviction > EVICTION_INTERVAL_SECS:
+                self.evict_idle_threads(thread_ttl_secs)
+            return next_config
+
+        def evict_idle_threads(self, ttl_secs: float) -> int:
+            """Deletes the threads idle for more than `ttl_secs` and returns how many were deleted."""
+            self._last_eviction = time.monotonic()
+            with self.cursor() as cur:
+                cur.execute("SELECT thread_id FROM thread_activity WHERE last_active < ?", (time.time() - ttl_secs,))
+                thread_ids = [(thread_id,) for (thread_id,) in cur.fetchall()]
+                for table in ('checkpoints', 'writes', 'thread_activity'):
+                    cur.executemany(f"DELETE FROM {table} WHERE thread_id = ?", thread_ids)
+            return len(thread_ids)
+
+        # SqliteSaver is sync only: run its methods on the default executor under graph.ainvoke / astream
+        async def aget_tuple(self, config):
+            return await asyncio.get_running_loop().run_in_executor(None, self.get_tuple, config)
+
+        async def alist(self, config, *, filter=None, before=None, limit=None):
+            checkpoint_tuples = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+            for checkpoint_tuple in checkpoint_tuples:
+                yield checkpoint_tuple
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.put, config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes, task_id, task_path=''):
+            return await asyncio.get_running_loop().run_in_executor(
+                None, self.put_writes, config, writes, task_id, task_path)
+
+    conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+    return TTLSqliteSaver(conn)
+
+
+def create_checkpointer(
+        kind: str = 'memory',
+        db_path: str = CHECKPOINT_DB_PATH,
+        max_threads: int = None,
+        thread_ttl_secs: float = None) -> BaseCheckpointSaver:
+    """
+    Creates the checkpointer storing the conversation threads of the agent.
+
+    Args:
+        kind (str): 'memory' (in-process, bounded by `max_threads`) or 'sqlite' (persisted in `db_path`).
+        db_path (str): SQLite file of the 'sqlite' checkpointer.
+        max_threads (int): Maximum number of threads kept by the 'memory' checkpointer.
+        thread_ttl_secs (float): Idle time after which a thread is evicted.
+    """
+    if kind == 'memory':
+        return BoundedMemorySaver(max_threads=max_threads, thread_ttl_secs=thread_ttl_secs)
+    if kind == 'sqlite':
+        return create_sqlite_saver(db_path, thread_ttl_secs=thread_ttl_secs)
+    raise ValueError(f"Unknown checkpointer '{kind}', expected 'memory' or 'sqlite'")
@@ -0,0 +1,103 @@
+import datetime
+import logging
+from dataclasses import dataclass
+
+import pytz
+
+from agents.booking_agent import metrics
+from agents.booking_agent.database.connection import get_connection_pool
+from agents.booking_agent.database.interval_index import get_interval_index
+from agents.booking_agent.database.models import Booking
+from agents.booking_agent.database.read_cache import get_read_cache
+from agents.booking_agent.database.utils import DB_PATH, to_timestamp
+
+logger = logging.getLogger(__name__)
+# Past bookings stay in `Bookings` (listed as the customer's, and kept in the overlap indexes) this long after
+# their end; the cancelled ones are archived at the first run
+ARCHIVE_AFTER_DAYS = 30
+# Bookings moved per transaction: the bookings of the salon wait for at most one batch
+DEFAULT_BATCH_SIZE = 5000
+# Cancelled bookings and those ended before `:ended_before`, from the rowid following the previous batch:
+# the table is scanned once over all the batches
+ARCHIVE_CANDIDATES_QUERY = """
+    SELECT rowid, id, status FROM Bookings
+    WHERE rowid > :after AND (status != 'scheduled' OR end_ts <= :ended_before)
+    ORDER BY rowid
+    LIMIT :batch_size
+"""
+ARCHIVE_BATCH_QUERY = f"""
+    INSERT INTO BookingsArchive ({Booking.COLUMNS}, archived_at)
+    SELECT {Booking.COLUMNS}, :archived_at FROM Bookings
+    WHERE rowid BETWEEN :first AND :last AND (status != 'scheduled' OR end_ts <= :ended_before)
+"""
+DELETE_ARCHIVED_BATCH_QUERY = """
+    DELETE FROM Bookings
+    WHERE rowid BETWEEN :first AND :last AND (status != 'scheduled' OR end_ts <= :ended_before)
+"""
+metrics.register_sql_statements(globals())
+
+
+@dataclass
+class ArchiveResult:
+    """Outcome of `archive_bookings`."""
+
+    cancelled: int = 0
+    past: int = 0
+    batches: int = 0
+
+    @property
+    def archived(self) -> int:
+        return self.cancelled + self.past
+
+
+def archive_bookings(
+        ended_before: datetime.datetime | None = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        db_path: str = DB_PATH) -> ArchiveResult:
+    """
+    Moves the cancelled bookings, and those ended before `ended_before`, from `Bookings` to `BookingsArchive`,
+    so that the hot table and its indexes only hold the upcoming and recent bookings.
+
+    Each batch of `batch_size` bookings is copied and deleted in its own transaction, the same rowid range
+    and condition selecting the rows of both statements. Bookings made meanwhile are not affected.
+
+    Parameters:
+        ended_before (datetime.datetime | None): Archive the bookings ended before this (aware) datetime,
+            `ARCHIVE_AFTER_DAYS` ago by default.
+        batch_size (int): Bookings moved per transaction.
+
+    Returns:
+        ArchiveResult: Cancelled and past bookings archived, and the number of transactions
+    """
+    now = datetime.datetime.now(pytz.utc)
+    if ended_before is None:
+        ended_before = now - datetime.timedelta(days=ARCHIVE_AFTER_DAYS)
+    params = {'ended_before': to_timestamp(ended_before), 'archived_at': now.isoformat(), 'batch_size': batch_size}
+    pool = get_connection_pool(db_path)
+    interval_index = get_interval_index(db_path)
+    result, after = ArchiveResult(), 0
+    while True:
+        with pool.transaction() as conn:
+            rows = conn.execute(ARCHIVE_CANDIDATES_QUERY, {**params, 'after': after}).fetchall()
+            if not rows:
+                break
+            batch = {**params, 'first': rows[0][0], 'last': rows[-1][0]}
+            conn.execute(ARCHIVE_BATCH_QUERY, batch)
+            conn.execute(DELETE_ARCHIVED_BATCH_QUERY, batch)
+        after = rows[-1][0]
+        result.batches += 1
+        for _, booking_id, status in rows:
+            if status == 'scheduled':
+                result.past += 1
+                if interval_index is not None:
+                    interval_index.remove(booking_id)
+            else:
+                result.cancelled += 1
+    read_cache = get_read_cache(db_path)
+    if read_cache is not None and result.past:
+        # The past bookings were listed among those of their customers
+        read_cache.clear()
+    if result.archived:
+        logger.info('Archived %d cancelled and %d past bookings in %d batches',
+                    result.cancelled, result.past, result.batches)
+    return result
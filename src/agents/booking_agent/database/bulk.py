@@ -0,0 +1,397 @@
+import bisect
+import csv
+import datetime
+import io
+import json
+import logging
+import uuid
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+
+import pytz
+
+from agents.booking_agent import metrics
+from agents.booking_agent.database.connection import get_connection_pool
+from agents.booking_agent.database.interval_index import enable_interval_index, get_interval_index
+from agents.booking_agent.database.read_cache import get_read_cache
+from agents.booking_agent.database.utils import (
+    ADD_CUSTOMER_QUERY,
+    BOOKED_INTERVALS_IN_RANGE_QUERY,
+    DB_PATH,
+    DEFAULT_SERVICE_ID,
+    MAX_SERVICE_DURATION_MINS
+)
+
+logger = logging.getLogger(__name__)
+# Columns of the imported and exported files, an export being importable as is
+BULK_COLUMNS = (
+    'id', 'start_datetime', 'end_datetime', 'customer_name', 'phone_number', 'email',
+    'stylist', 'service', 'booking_reason', 'status', 'created_at'
+)
+FILE_FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+BOOKING_STATUSES = ('scheduled', 'cancelled')
+# Bookings inserted per transaction: the write lock is released between chunks for the live bookings
+DEFAULT_CHUNK_SIZE = 10000
+# Parameters per `IN (...)` lookup, well below the SQLite limit of bound parameters
+LOOKUP_BATCH_SIZE = 500
+# Rejected rows detailed in the `ImportResult`, the others are only counted
+MAX_REPORTED_ERRORS = 100
+
+IMPORT_STYLISTS_QUERY = "SELECT id, name FROM Stylist"
+IMPORT_SERVICES_QUERY = "SELECT id, duration_mins FROM Service"
+BULK_ADD_BOOKING_QUERY = """
+    INSERT INTO Bookings (
+        id, customer, stylist, service, start_ts, end_ts, booking_reason, status, created_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
+"""
+# Keyset pagination on the rowid: each page is a short query, on the connection of the thread fetching it
+EXPORT_BOOKINGS_QUERY = """
+    SELECT b.rowid, b.id,
+           strftime('%Y-%m-%dT%H:%M:%S+00:00', b.start_ts, 'unixepoch'),
+           strftime('%Y-%m-%dT%H:%M:%S+00:00', b.end_ts, 'unixepoch'),
+           c.name, c.phone_number, c.email, b.stylist, b.service, b.booking_reason, b.status, b.created_at
+    FROM Bookings b
+    JOIN Customer c ON c.id = b.customer
+    WHERE b.rowid > :after
+      AND (:status IS NULL OR b.status = :status)
+    ORDER BY b.rowid
+    LIMIT :limit
+"""
+# Formatted with the placeholders of each batch by `_lookup_query`
+EXISTING_CUSTOMERS_QUERY = "SELECT phone_number, id FROM Customer WHERE phone_number IN ({})"
+EXISTING_BOOKING_IDS_QUERY = """
+    SELECT id FROM Bookings WHERE id IN ({0})
+    UNION ALL
+    SELECT id FROM BookingsArchive WHERE id IN ({0})
+"""
+metrics.register_sql_statements(globals())
+
+
+def _lookup_query(template: str, count: int) -> str:
+    return template.format(', '.join('?' * count))
+
+
+@dataclass
+class ImportResult:
+    """Outcome of `import_bookings`."""
+    rows: int = 0
+    imported: int = 0
+    customers_created: int = 0
+    # Invalid rows, overlapping an existing or an earlier imported booking, or already imported (same id)
+    rejected: int = 0
+    # (row number, reason) of the first `MAX_REPORTED_ERRORS` rejected rows, rows being numbered from 1
+    errors: list[tuple[int, str]] = field(default_factory=list)
+
+    def reject(self, row_number: int, reason: str):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, reason))
+
+
+class MalformedRow(ValueError):
+    """A line of a file that could not be decoded, yielded by `read_rows` in place of its row to be rejected."""
+
+
+def file_format(path: str) -> str:
+    """'csv' or 'jsonl', from the extension of the file. Raises ValueError for other extensions."""
+    for extension, fmt in FILE_FORMATS.items():
+        if path.lower().endswith(extension):
+            return fmt
+    raise ValueError(f"Unknown file format of '{path}', expected one of {', '.join(FILE_FORMATS)}")
+
+
+def read_rows(file: Iterable[str], fmt: str) -> Iterator[dict]:
+    """
+    Yields the bookings of a CSV (with a header of `BULK_COLUMNS`) or JSONL text file, empty values as None,
+    and a `MalformedRow` for each line that is not valid JSON.
+    """
+    if fmt == 'csv':
+        for row in csv.DictReader(file):
+            yield {key: value or None for key, value in row.items()}
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(file, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield MalformedRow(f'Invalid JSON on line {line_number}: {e.msg}')
+    else:
+        raise ValueError(f"Unknown file format '{fmt}'")
+
+
+def format_rows(rows: Iterable[dict], fmt: str, batch_size: int = 1000) -> Iterator[str]:
+    """Yields the bookings as CSV (header included) or JSONL text, `batch_size` rows per string."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, BULK_COLUMNS, lineterminator='\n') if fmt == 'csv' else None
+    if writer is not None:
+        writer.writeheader()
+    elif fmt != 'jsonl':
+        raise ValueError(f"Unknown file format '{fmt}'")
+    for idx, row in enumerate(rows, 1):
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row) + '\n')
+        if idx % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _to_timestamp(value: str) -> int:
+    dt = datetime.datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        raise ValueError(f"'{value}' has no timezone")
+    return int(dt.timestamp())
+
+
+def _stylist_id(stylist: str, stylist_ids: dict[str, str], stylist_names: dict[str, list[str]]) -> str:
+    """
+    The id of the stylist given by its id, or else by its name (case insensitive). Raises ValueError if it is
+    unknown, or a name shared by several stylists.
+    """
+    key = stylist.lower()
+    if key in stylist_ids:
+        return stylist_ids[key]
+    named = stylist_names.get(key, [])
+    if len(named) > 1:
+        raise ValueError(f"Ambiguous stylist '{stylist}', use one of the ids {', '.join(sorted(named))}")
+    if not named:
+        raise ValueError(f"Unknown stylist '{stylist}'")
+    return named[0]
+
+
+def _parse_rows(rows: Iterable[dict], stylist_ids: dict[str, str], stylist_names: dict[str, list[str]],
+                durations: dict, result: ImportResult, created_at: str) -> list[tuple]:
+    """
+    Validates the rows on their own (the overlaps are checked afterwards) and returns them as
+    (row number, id, phone number, customer name, email, stylist, service, start_ts, end_ts,
+    booking reason, status, created at) tuples. The stylists are looked up by lowercase id
+    (`stylist_ids`), then by lowercase name (`stylist_names`, the ids of each).
+    """
+    default_stylist = next(iter(stylist_ids.values())) if len(stylist_ids) == 1 else None
+    parsed = []
+    for row_number, row in enumerate(rows, 1):
+        result.rows += 1
+        try:
+            if isinstance(row, MalformedRow):
+                raise row
+            # A JSONL line may hold any JSON value
+            if not isinstance(row, dict):
+                raise ValueError('The row is not an object')
+            not_text = [column for column in BULK_COLUMNS if not isinstance(row.get(column), (str, type(None)))]
+            if not_text:
+                raise ValueError(f"Expected text for {', '.join(not_text)}")
+            phone_number, name = row.get('phone_number'), row.get('customer_name')
+            if not phone_number or not name:
+                raise ValueError('The customer_name and phone_number are required')
+            stylist = row.get('stylist')
+            stylist_id = _stylist_id(stylist, stylist_ids, stylist_names) if stylist else default_stylist
+            if stylist_id is None:
+                raise ValueError('The stylist is required')
+            service_id = row.get('service') or DEFAULT_SERVICE_ID
+            if service_id not in durations:
+                raise ValueError(f"Unknown service '{service_id}'")
+            status = row.get('status') or 'scheduled'
+            if status not in BOOKING_STATUSES:
+                raise ValueError(f"Unknown status '{status}'")
+            start_ts = _to_timestamp(row['start_datetime'])
+            end_ts = _to_timestamp(row['end_datetime']) if row.get('end_datetime') \
+                else start_ts + durations[service_id] * 60
+            if not 0 < end_ts - start_ts <= MAX_SERVICE_DURATION_MINS * 60:
+                raise ValueError(f'The duration must be between 1 and {MAX_SERVICE_DURATION_MINS} minutes')
+        except (KeyError, TypeError, ValueError) as e:
+            result.reject(row_number, f'Missing {e}' if isinstance(e, KeyError) else str(e))
+            continue
+        parsed.append((
+            row_number, row.get('id') or str(uuid.uuid4()), phone_number, name, row.get('email'), stylist_id,
+            service_id, start_ts, end_ts, row.get('booking_reason'), status, row.get('created_at') or created_at
+        ))
+    return parsed
+
+
+def _batches(items: list, size: int) -> Iterator[list]:
+    for idx in range(0, len(items), size):
+        yield items[idx:idx + size]
+
+
+def _drop_duplicate_ids(conn, parsed: list[tuple], result: ImportResult) -> list[tuple]:
+    """
+    Drops the rows whose booking id is already in the database (archived included) or on an earlier row
+    (e.g. a re-import).
+    """
+    existing = set()
+    for batch in _batches(list({row[1] for row in parsed}), LOOKUP_BATCH_SIZE):
+        existing.update(booking_id for (booking_id,) in conn.execute(
+            _lookup_query(EXISTING_BOOKING_IDS_QUERY, len(batch)), batch * 2))
+    kept = []
+    for row in parsed:
+        if row[1] in existing:
+            result.reject(row[0], f"Booking '{row[1]}' already exists")
+        else:
+            existing.add(row[1])
+            kept.append(row)
+    return kept
+
+
+def _overlaps(busy: dict[str, tuple[list, list]], stylist: str, start_ts: int, end_ts: int) -> bool:
+    """Whether [start_ts, end_ts) overlaps one of the disjoint intervals of the stylist (sorted starts and ends)."""
+    if stylist not in busy:
+        return False
+    starts, ends = busy[stylist]
+    idx = bisect.bisect_left(starts, end_ts)
+    return idx > 0 and ends[idx - 1] > start_ts
+
+
+def _busy_intervals(intervals: Iterable[tuple]) -> dict[str, tuple[list, list]]:
+    """(starts, ends) of the (stylist, start_ts, end_ts) intervals per stylist, disjoint and sorted by start."""
+    busy = {}
+    for stylist, start_ts, end_ts in sorted(intervals):
+        starts, ends = busy.setdefault(stylist, ([], []))
+        if starts and start_ts < ends[-1]:
+            ends[-1] = max(ends[-1], end_ts)
+        else:
+            starts.append(start_ts)
+            ends.append(end_ts)
+    return busy
+
+
+def _drop_overlaps(conn, parsed: list[tuple], result: ImportResult) -> list[tuple]:
+    """
+    Drops the scheduled rows overlapping an active booking of the database or an earlier imported one
+    (by start, then row number), sorting the intervals in memory rather than probing the database per row.
+    """
+    scheduled = [row for row in parsed if row[10] == 'scheduled']
+    if not scheduled:
+        return parsed
+    existing = _busy_intervals(conn.execute(BOOKED_INTERVALS_IN_RANGE_QUERY, {
+        'end': max(row[8] for row in scheduled),
+        'earliest_start': min(row[7] for row in scheduled) - MAX_SERVICE_DURATION_MINS * 60,
+        'stylist': None,
+    }))
+
+    rejected = set()
+    last_end = {}
+    for row in sorted(scheduled, key=lambda row: (row[5], row[7], row[0])):
+        row_number, _, _, _, _, stylist, _, start_ts, end_ts = row[:9]
+        if _overlaps(existing, stylist, start_ts, end_ts):
+            result.reject(row_number, 'Overlaps an existing booking of the stylist')
+        elif start_ts < last_end.get(stylist, start_ts):
+            result.reject(row_number, 'Overlaps an earlier imported booking of the stylist')
+        else:
+            last_end[stylist] = end_ts
+            continue
+        rejected.add(row_number)
+    return [row for row in parsed if row[0] not in rejected]
+
+
+def _existing_customers(conn, phone_numbers: list[str]) -> dict[str, str]:
+    customer_ids = {}
+    for batch in _batches(phone_numbers, LOOKUP_BATCH_SIZE):
+        for phone_number, customer_id in conn.execute(_lookup_query(EXISTING_CUSTOMERS_QUERY, len(batch)), batch):
+            customer_ids.setdefault(phone_number, customer_id)
+    return customer_ids
+
+
+def import_bookings(
+        rows: Iterable[dict],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        dry_run: bool = False,
+        db_path: str = DB_PATH) -> ImportResult:
+    """
+    Import bookings in bulk, e.g. the calendar of a salon being onboarded.
+
+    The rows (dicts of `BULK_COLUMNS`) are validated in memory before anything is written:
+    the stylist (id or name, defaulting to the only stylist of the salon) and the service
+    must exist, the start and end (the service duration by default) must be ISO 8601 with
+    a timezone, and the scheduled bookings must not overlap those of the database nor each
+    other, checked on the intervals sorted per stylist. The working hours are not checked:
+    past calendars may not follow them. The customers are deduplicated by phone number,
+    looking up the existing ones in batches, then the bookings are inserted by start, with
+    `executemany`, in transactions of `chunk_size` rows. Each chunk is checked again against
+    the active bookings of its time range in its transaction: a booking made or rescheduled
+    concurrently (after the validation) causes the overlapping rows of the chunk to be rejected.
+
+    Parameters:
+        rows (Iterable[dict]): Bookings, e.g. from `read_rows`
+        chunk_size (int): Bookings inserted per transaction
+        dry_run (bool): Validate only, without writing
+
+    Returns:
+        ImportResult: The numbers of imported and rejected rows and of created customers
+    """
+    result = ImportResult()
+    started_at = datetime.datetime.now(pytz.utc).isoformat()
+    pool = get_connection_pool(db_path)
+    conn = pool.connection()
+    stylist_ids, stylist_names = {}, {}
+    for stylist_id, name in conn.execute(IMPORT_STYLISTS_QUERY):
+        stylist_ids[stylist_id.lower()] = stylist_id
+        stylist_names.setdefault(name.lower(), []).append(stylist_id)
+    durations = dict(conn.execute(IMPORT_SERVICES_QUERY).fetchall())
+
+    parsed = _parse_rows(rows, stylist_ids, stylist_names, durations, result, started_at)
+    parsed = _drop_duplicate_ids(conn, parsed, result)
+    parsed = _drop_overlaps(conn, parsed, result)
+    customer_ids = _existing_customers(conn, list({row[2] for row in parsed}))
+    if dry_run:
+        result.imported = len(parsed)
+        result.customers_created = len({row[2] for row in parsed} - customer_ids.keys())
+        result.errors.sort()
+        return result
+
+    # By start: the chunks cover short time ranges, for the concurrent bookings check and the index locality
+    parsed.sort(key=lambda row: row[7])
+    for chunk in _batches(parsed, chunk_size):
+        with pool.transaction() as conn:
+            # All of them: a booking rescheduled in place keeps its creation time
+            concurrent = _busy_intervals(conn.execute(BOOKED_INTERVALS_IN_RANGE_QUERY, {
+                'end': max(row[8] for row in chunk),
+                'earliest_start': chunk[0][7] - MAX_SERVICE_DURATION_MINS * 60,
+                'stylist': None,
+            }))
+            new_customers, bookings = [], []
+            for row_number, booking_id, phone_number, name, email, stylist, service, start_ts, end_ts, reason, \
+                    status, created_at in chunk:
+                if concurrent and status == 'scheduled' and _overlaps(concurrent, stylist, start_ts, end_ts):
+                    result.reject(row_number, 'Overlaps a booking made or moved during the import')
+                    continue
+                if phone_number not in customer_ids:
+                    customer_ids[phone_number] = str(uuid.uuid4())
+                    new_customers.append((customer_ids[phone_number], name, phone_number, email, started_at))
+                bookings.append((booking_id, customer_ids[phone_number], stylist, service, start_ts, end_ts, reason,
+                                 status, created_at))
+            conn.executemany(ADD_CUSTOMER_QUERY, new_customers)
+            conn.executemany(BULK_ADD_BOOKING_QUERY, bookings)
+        result.imported += len(bookings)
+        result.customers_created += len(new_customers)
+    result.errors.sort()
+    logger.info('Imported %d of %d bookings (%d rejected, %d new customers)',
+                result.imported, result.rows, result.rejected, result.customers_created)
+
+    if result.imported:
+        if get_interval_index(db_path) is not None:
+            enable_interval_index(db_path)
+        read_cache = get_read_cache(db_path)
+        if read_cache is not None:
+            read_cache.clear()
+    return result
+
+
+def export_bookings(status: str | None = None, page_size: int = 5000, db_path: str = DB_PATH) -> Iterator[dict]:
+    """
+    Yields the bookings (dicts of `BULK_COLUMNS`, start and end in UTC), optionally only those with
+    the given status, in insertion order. Fetched page by page, so the export is streamed in constant
+    memory and can be consumed from any thread.
+    """
+    after = 0
+    while True:
+        page = get_connection_pool(db_path).connection().execute(
+            EXPORT_BOOKINGS_QUERY, {'after': after, 'status': status, 'limit': page_size}).fetchall()
+        for row in page:
+            yield dict(zip(BULK_COLUMNS, row[1:]))
+        if len(page) < page_size:
+            return
+        after = page[-1][0]
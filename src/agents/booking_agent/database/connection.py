@@ -0,0 +1,175 @@
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from agents.booking_agent import metrics
+
+# Pragmas applied once when a pooled connection is opened (instead of on every call)
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'foreign_keys': 'ON',
+    'busy_timeout': 5000,
+    'cache_size': -16000,  # ~16MB page cache per connection
+    'mmap_size': 134217728,  # 128MB
+    'temp_store': 'MEMORY',
+}
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor recording the duration of each statement in the SQL metrics (fetches not included)."""
+
+    def execute(self, sql, parameters=()):
+        if not metrics.metrics_enabled():
+            return super().execute(sql, parameters)
+        t0 = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.SQL_DURATION.observe(time.perf_counter() - t0, metrics.sql_statement_name(sql))
+
+    def executemany(self, sql, seq_of_parameters):
+        if not metrics.metrics_enabled():
+            return super().executemany(sql, seq_of_parameters)
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.SQL_DURATION.observe(time.perf_counter() - t0, metrics.sql_statement_name(sql))
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors, those of `execute` and `executemany` included, are `InstrumentedCursor`s."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # The built-in shortcuts do not go through `cursor()`
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        if not metrics.metrics_enabled():
+            return super().commit()
+        t0 = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            metrics.SQL_DURATION.observe(time.perf_counter() - t0, 'commit')
+
+
+class _ThreadConnection:
+    # Held only by the thread-local storage of its thread, so it is released when the thread exits
+    __slots__ = ('conn', '__weakref__')
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+class ConnectionPool:
+    """
+    Long-lived SQLite connections shared by the database helpers.
+
+    Each thread gets its own connection (SQLite connections must not be used
+    concurrently from several threads), opened lazily on first use and reused
+    for every subsequent call from that thread. WAL mode lets the readers of
+    the different threads proceed while a writer holds the lock. A connection
+    is closed when its thread exits (e.g. the short-lived executor threads
+    running the tools under a sync `graph.invoke`).
+    """
+
+    def __init__(self, db_path: str, pragmas: dict = None):
+        self.db_path = db_path
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = set()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit mode: transactions are started explicitly in `transaction`
+        conn = sqlite3.connect(
+            self.db_path, isolation_level=None, check_same_thread=False, factory=InstrumentedConnection)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value};")
+        with self._lock:
+            self._connections.add(conn)
+        return conn
+
+    def _release(self, conn: sqlite3.Connection):
+        with self._lock:
+            self._connections.discard(conn)
+        conn.close()
+
+    def connection(self) -> sqlite3.Connection:
+        """Returns the calling thread's connection, opening it if needed."""
+        thread_connection = getattr(self._local, 'connection', None)
+        if thread_connection is None:
+            thread_connection = self._local.connection = _ThreadConnection(self._connect())
+            weakref.finalize(thread_connection, self._release, thread_connection.conn)
+        return thread_connection.conn
+
+    @contextmanager
+    def transaction(self):
+        """
+        Runs the enclosed statements in a single write transaction on the thread's connection.
+
+        The write lock is taken up-front (`BEGIN IMMEDIATE`): a deferred transaction that
+        reads before writing cannot be upgraded once another connection has committed in
+        WAL mode, and fails with "database is locked" without honouring `busy_timeout`.
+        """
+        conn = self.connection()
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+    def close_all(self):
+        """Closes every connection opened by the pool."""
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(db_path: str) -> ConnectionPool:
+    """Returns the process-wide connection pool for `db_path`, creating it on first use."""
+    key = os.path.abspath(db_path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(key)
+    return pool
+
+
+def close_connection_pool(db_path: str):
+    """Closes the pooled connections of one database (e.g. before moving its file)."""
+    with _pools_lock:
+        pool = _pools.pop(os.path.abspath(db_path), None)
+    if pool is not None:
+        pool.close_all()
+
+
+def close_connection_pools():
+    """Closes all the pooled connections (e.g. on service shutdown or before deleting a DB file)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
@@ -1,15 +1,256 @@
-import sqlite3
+import argparse
 import datetime
+import logging
+import os
+import sqlite3
 import uuid
 import pytz
 
+from agents.booking_agent.database.connection import get_connection_pool
+from agents.booking_agent.database.utils import (
+    BOOKING_SLOT_DURATION_HRS,
+    DEFAULT_SERVICE_ID,
+    SALON_OPENING_HOURS
+)
+
+logger = logging.getLogger(__name__)
 DB_NAME = "bookings.sqlite"
+# The existing bookings (single chair) are assigned to a stylist working the salon opening hours
+DEFAULT_STYLIST_ID = 'default'
+DEFAULT_STYLIST_NAME = 'Salon stylist'
+DEFAULT_SERVICE_NAME = 'Haircut'
+
+
+def _migrate_to_stylists(cursor):
+    """
+    Version 1: stylists with their working hours, services with their durations, and the stylist
+    and service of each booking. Drops `UNIQUE (start_datetime, end_datetime)` (several stylists can
+    take the same slot), which requires rebuilding the `Bookings` table.
+    """
+    current_dt = datetime.datetime.now(pytz.utc).isoformat()
+    cursor.execute("""
+        CREATE TABLE Stylist (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            active INTEGER NOT NULL DEFAULT 1,
+            created_at DATETIME NOT NULL
+        );
+    """)
+    cursor.execute("""
+        CREATE TABLE StylistHours (
+            stylist TEXT NOT NULL,
+            weekday INTEGER NOT NULL,
+            open_minute INTEGER NOT NULL,
+            close_minute INTEGER NOT NULL,
+            PRIMARY KEY (stylist, weekday),
+            FOREIGN KEY (stylist) REFERENCES Stylist(id)
+        );
+    """)
+    # Stylists working on a weekday
+    cursor.execute("""
+        CREATE INDEX idx_stylist_hours_weekday
+        ON StylistHours (weekday, open_minute, close_minute);
+    """)
+    cursor.execute("""
+        CREATE TABLE Service (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            duration_mins INTEGER NOT NULL
+        );
+    """)
+    cursor.execute(
+        "INSERT INTO Stylist (id, name, created_at) VALUES (?, ?, ?)",
+        (DEFAULT_STYLIST_ID, DEFAULT_STYLIST_NAME, current_dt)
+    )
+    cursor.executemany(
+        "INSERT INTO StylistHours (stylist, weekday, open_minute, close_minute) VALUES (?, ?, ?, ?)",
+        [(DEFAULT_STYLIST_ID, weekday, open_hr * 60, close_hr * 60)
+         for weekday, (open_hr, close_hr) in SALON_OPENING_HOURS.items()]
+    )
+    cursor.execute(
+        "INSERT INTO Service (id, name, duration_mins) VALUES (?, ?, ?)",
+        (DEFAULT_SERVICE_ID, DEFAULT_SERVICE_NAME, BOOKING_SLOT_DURATION_HRS * 60)
+    )
+
+    cursor.execute("""
+        CREATE TABLE Bookings_v1 (
+            id TEXT PRIMARY KEY,
+            customer TEXT NOT NULL,
+            start_datetime DATETIME NOT NULL,
+            end_datetime DATETIME NOT NULL,
+            booking_reason TEXT,
+            status TEXT DEFAULT 'scheduled',
+            created_at DATETIME NOT NULL,
+            stylist TEXT NOT NULL,
+            service TEXT NOT NULL,
+            FOREIGN KEY (customer) REFERENCES Customer(id),
+            FOREIGN KEY (stylist) REFERENCES Stylist(id),
+            FOREIGN KEY (service) REFERENCES Service(id)
+        );
+    """)
+    cursor.execute("""
+        INSERT INTO Bookings_v1
+        SELECT id, customer, start_datetime, end_datetime, booking_reason, status, created_at, ?, ?
+        FROM Bookings
+    """, (DEFAULT_STYLIST_ID, DEFAULT_SERVICE_ID))
+    cursor.execute("DROP TABLE Bookings;")
+    cursor.execute("ALTER TABLE Bookings_v1 RENAME TO Bookings;")
+    cursor.execute("""
+        CREATE INDEX idx_booking_time
+        ON Bookings (start_datetime, end_datetime, status);
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_booking_customer
+        ON Bookings (customer, status);
+    """)
+    # Overlap probes of one stylist
+    cursor.execute("""
+        CREATE INDEX idx_booking_stylist_time
+        ON Bookings (stylist, start_datetime, end_datetime, status);
+    """)
+
+
+def _migrate_to_epoch_times(cursor):
+    """
+    Version 2: the start and end of each booking as integer UTC epoch seconds (`start_ts`, `end_ts`)
+    instead of ISO 8601 text, so that overlap checks compare integers rather than strings (which only
+    order correctly if all have the same UTC offset), and partial indexes on the active bookings.
+    """
+    cursor.execute("""
+        CREATE TABLE Bookings_v2 (
+            id TEXT PRIMARY KEY,
+            customer TEXT NOT NULL,
+            start_ts INTEGER NOT NULL,
+            end_ts INTEGER NOT NULL,
+            booking_reason TEXT,
+            status TEXT DEFAULT 'scheduled',
+            created_at DATETIME NOT NULL,
+            stylist TEXT NOT NULL,
+            service TEXT NOT NULL,
+            FOREIGN KEY (customer) REFERENCES Customer(id),
+            FOREIGN KEY (stylist) REFERENCES Stylist(id),
+            FOREIGN KEY (service) REFERENCES Service(id)
+        );
+    """)
+    # strftime('%s') converts the ISO text (with any UTC offset) to epoch seconds, NULL if it cannot be parsed.
+    # A booking that cannot be placed in time is kept as cancelled, at the epoch, instead of failing the migration
+    invalid_ids = [booking_id for booking_id, in cursor.execute("""
+        SELECT id FROM Bookings
+        WHERE strftime('%s', start_datetime) IS NULL OR strftime('%s', end_datetime) IS NULL
+    """)]
+    if invalid_ids:
+        logger.warning("Bookings with an invalid start or end datetime, cancelled by the migration: %s",
+                       ', '.join(invalid_ids))
+    cursor.execute("""
+        INSERT INTO Bookings_v2
+        SELECT id, customer, CASE WHEN invalid THEN 0 ELSE start_ts END, CASE WHEN invalid THEN 0 ELSE end_ts END,
+               booking_reason, CASE WHEN invalid THEN 'cancelled' ELSE status END, created_at, stylist, service
+        FROM (
+            SELECT *, start_ts IS NULL OR end_ts IS NULL AS invalid
+            FROM (
+                SELECT *, CAST(strftime('%s', start_datetime) AS INTEGER) AS start_ts,
+                       CAST(strftime('%s', end_datetime) AS INTEGER) AS end_ts
+                FROM Bookings
+            )
+        )
+    """)
+    cursor.execute("DROP TABLE Bookings;")
+    cursor.execute("ALTER TABLE Bookings_v2 RENAME TO Bookings;")
+    cursor.execute("""
+        CREATE INDEX idx_booking_customer
+        ON Bookings (customer, status);
+    """)
+    # Overlap probes only ever look at the active bookings: the cancelled ones are left out of the indexes.
+    # The range scans of the slot search are covered by the index.
+    cursor.execute("""
+        CREATE INDEX idx_booking_active_time
+        ON Bookings (start_ts, end_ts, stylist)
+        WHERE status = 'scheduled';
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_booking_active_stylist_time
+        ON Bookings (stylist, start_ts, end_ts)
+        WHERE status = 'scheduled';
+    """)
+
+
+def _migrate_to_booking_history(cursor):
+    """
+    Version 3: rescheduling updates the booking in place, its previous slot being recorded in
+    `BookingHistory` (as are the cancellations), instead of cancelling it and inserting a new one.
+    The compaction job (`database.archive`) moves the cancelled and past bookings out of `Bookings`
+    into `BookingsArchive`, which is only read by id or customer.
+    """
+    cursor.execute("""
+        CREATE TABLE BookingHistory (
+            booking TEXT NOT NULL,
+            change TEXT NOT NULL,
+            stylist TEXT NOT NULL,
+            start_ts INTEGER NOT NULL,
+            end_ts INTEGER NOT NULL,
+            changed_at DATETIME NOT NULL
+        );
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_booking_history_booking
+        ON BookingHistory (booking);
+    """)
+    cursor.execute("""
+        CREATE TABLE BookingsArchive (
+            id TEXT PRIMARY KEY,
+            customer TEXT NOT NULL,
+            start_ts INTEGER NOT NULL,
+            end_ts INTEGER NOT NULL,
+            booking_reason TEXT,
+            status TEXT NOT NULL,
+            created_at DATETIME NOT NULL,
+            stylist TEXT NOT NULL,
+            service TEXT NOT NULL,
+            archived_at DATETIME NOT NULL
+        );
+    """)
+    cursor.execute("""
+        CREATE INDEX idx_booking_archive_customer
+        ON BookingsArchive (customer);
+    """)
+
+
+# Schema migrations, in order: the database is at version `PRAGMA user_version` (0 = initial schema)
+MIGRATIONS = [
+    _migrate_to_stylists,
+    _migrate_to_epoch_times,
+    _migrate_to_booking_history,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
 
 
-def create_bookings_db(db_name=DB_NAME):
-    """Creates and initializes the SQLite bookings database."""
-    with sqlite3.connect(db_name) as conn:
-        conn.execute("PRAGMA foreign_keys = ON;")
+def schema_version(db_name=DB_NAME) -> int:
+    (version,) = get_connection_pool(db_name).connection().execute("PRAGMA user_version;").fetchone()
+    return version
+
+
+def migrate_bookings_db(db_name=DB_NAME, target_version: int = SCHEMA_VERSION) -> int:
+    """
+    Brings the bookings database up to `target_version` (default: the latest), applying each pending
+    migration in its own transaction. Returns the number of migrations applied.
+    """
+    pool = get_connection_pool(db_name)
+    applied = 0
+    while True:
+        with pool.transaction() as conn:
+            (version,) = conn.execute("PRAGMA user_version;").fetchone()
+            if version >= target_version:
+                return applied
+            # Foreign keys cannot be toggled within a transaction: the table rebuilds keep the referenced ids
+            conn.execute("PRAGMA defer_foreign_keys = ON;")
+            MIGRATIONS[version](conn.cursor())
+            conn.execute(f"PRAGMA user_version = {version + 1};")
+        applied += 1
+
+
+def create_bookings_db(db_name=DB_NAME, target_version: int = SCHEMA_VERSION):
+    """Creates and initializes the SQLite bookings database, or migrates an existing one to the latest schema."""
+    with get_connection_pool(db_name).transaction() as conn:
         cursor = conn.cursor()
 
         # Create Customer table
@@ -23,7 +264,7 @@ def create_bookings_db(db_name=DB_NAME):
             );
         """)
 
-        # Create Bookings table
+        # Create Bookings table (initial schema, brought up to date by the migrations)
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS Bookings (
                 id TEXT PRIMARY KEY,
@@ -38,15 +279,46 @@ def create_bookings_db(db_name=DB_NAME):
             );
         """)
 
-        # Indexes for efficient slot searching
-        cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_booking_time 
-        ON Bookings (start_datetime, end_datetime, status);
-        """)
         cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_customer_phone 
+        CREATE INDEX IF NOT EXISTS idx_customer_phone
         ON Customer (phone_number);
         """)
 
-        conn.commit()
-        print(f"Database '{db_name}' created with all tables and indexes.")
+    migrate_bookings_db(db_name, target_version)
+    logger.info("Database '%s' created with all tables and indexes.", db_name)
+
+
+def main():
+    """
+    Migrates an existing bookings database to the latest schema (or creates it), e.g. from `src/`:
+        python -m agents.booking_agent.database.create_sqlite_db --db bookings.sqlite --backup bookings.bak.sqlite
+    """
+    parser = argparse.ArgumentParser(description='Create or migrate the SQLite bookings database.')
+    parser.add_argument('--db', default=DB_NAME, help='Path of the bookings database')
+    parser.add_argument('--backup', help='Copy the database to this path before migrating it')
+    parser.add_argument('--check', action='store_true', help='Only report the schema version')
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.db):
+        if args.check:
+            raise SystemExit(f"Database '{args.db}' does not exist")
+        create_bookings_db(args.db)
+        print(f"Database '{args.db}' created with all tables and indexes.")
+        return
+
+    version = schema_version(args.db)
+    print(f"Database '{args.db}' is at schema version {version} (latest: {SCHEMA_VERSION})")
+    if args.check or version >= SCHEMA_VERSION:
+        return
+    if args.backup:
+        source, backup = sqlite3.connect(args.db), sqlite3.connect(args.backup)
+        source.backup(backup)
+        source.close()
+        backup.close()
+        print(f"Backed up to '{args.backup}'")
+    applied = migrate_bookings_db(args.db)
+    print(f"Applied {applied} migration(s), now at schema version {schema_version(args.db)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import bisect
+import os
+import threading
+
+from agents.booking_agent.database.connection import get_connection_pool
+
+LOAD_ACTIVE_BOOKINGS_QUERY = """
+    SELECT id, stylist, start_ts, end_ts FROM Bookings
+    WHERE status = 'scheduled'
+    ORDER BY start_ts
+"""
+LOAD_STYLIST_HOURS_QUERY = """
+    SELECT h.stylist, h.weekday, h.open_minute, h.close_minute
+    FROM StylistHours h JOIN Stylist s ON s.id = h.stylist
+    WHERE s.active = 1
+"""
+
+
+class _Intervals:
+    """The bookings of one stylist, as arrays sorted by start."""
+    __slots__ = ('starts', 'ends', 'ids')
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.ids = []
+
+
+class BookingIntervalIndex:
+    """
+    In-memory index of the active bookings of each stylist, kept as arrays sorted by start
+    (UTC epoch seconds), and of the stylists' working hours.
+
+    SQLite remains the source of truth: the index is loaded from `Bookings` and `StylistHours`
+    and the database helpers write through to it after each committed change. An overlap
+    check bisects the starts of a stylist within (start - longest booking, end), so it costs
+    O(log n) regardless of the number of bookings.
+    """
+
+    def __init__(self):
+        self._intervals: dict[str, _Intervals] = {}
+        self._hours: dict[str, dict[int, tuple[int, int]]] = {}
+        self._booking_by_id = {}
+        self._max_duration = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, db_path: str) -> 'BookingIntervalIndex':
+        index = cls()
+        conn = get_connection_pool(db_path).connection()
+        for stylist, weekday, open_minute, close_minute in conn.execute(LOAD_STYLIST_HOURS_QUERY):
+            index._hours.setdefault(stylist, {})[weekday] = (open_minute, close_minute)
+        for booking_id, stylist, start_ts, end_ts in conn.execute(LOAD_ACTIVE_BOOKINGS_QUERY):
+            index.add(booking_id, stylist, start_ts, end_ts)
+        return index
+
+    def __len__(self):
+        return len(self._booking_by_id)
+
+    def set_stylist_hours(self, stylist: str, hours: dict[int, tuple[int, int]]):
+        """Sets the working hours of a stylist: (open, close) minutes of the local day per weekday."""
+        with self._lock:
+            self._hours[stylist] = dict(hours)
+
+    def add(self, booking_id: str, stylist: str, start_ts: int, end_ts: int):
+        with self._lock:
+            intervals = self._intervals.setdefault(stylist, _Intervals())
+            pos = bisect.bisect_right(intervals.starts, start_ts)
+            intervals.starts.insert(pos, start_ts)
+            intervals.ends.insert(pos, end_ts)
+            intervals.ids.insert(pos, booking_id)
+            self._booking_by_id[booking_id] = (stylist, start_ts)
+            self._max_duration = max(self._max_duration, end_ts - start_ts)
+
+    def remove(self, booking_id: str) -> bool:
+        with self._lock:
+            booking = self._booking_by_id.pop(booking_id, None)
+            if booking is None:
+                return False
+            stylist, start_ts = booking
+            intervals = self._intervals[stylist]
+            pos = bisect.bisect_left(intervals.starts, start_ts)
+            while intervals.ids[pos] != booking_id:
+                pos += 1
+            del intervals.starts[pos], intervals.ends[pos], intervals.ids[pos]
+            return True
+
+    def _is_free(self, stylist: str, start_ts: int, end_ts: int) -> bool:
+        intervals = self._intervals.get(stylist)
+        if intervals is None:
+            return True
+        lo = bisect.bisect_right(intervals.starts, start_ts - self._max_duration)
+        hi = bisect.bisect_left(intervals.starts, end_ts)
+        return all(intervals.ends[i] <= start_ts for i in range(lo, hi))
+
+    def is_free(self, stylist: str, start_ts: int, end_ts: int) -> bool:
+        """Returns True if no indexed booking of the stylist overlaps [start_ts, end_ts)."""
+        with self._lock:
+            return self._is_free(stylist, start_ts, end_ts)
+
+    def free_stylist(
+            self,
+            start_ts: int,
+            end_ts: int,
+            weekday: int,
+            start_minute: int,
+            end_minute: int,
+            stylist: str | None = None,
+            preferred_stylist: str | None = None) -> str | None:
+        """
+        Returns a stylist working the whole slot (local `weekday`, `start_minute` to `end_minute`)
+        and free during [start_ts, end_ts), or None. Only `stylist` is considered if given,
+        otherwise `preferred_stylist` is tried first, then the stylists in id order.
+        """
+        with self._lock:
+            candidates = [stylist] if stylist is not None else sorted(
+                self._hours, key=lambda stylist_id: (stylist_id != preferred_stylist, stylist_id))
+            for candidate in candidates:
+                hours = self._hours.get(candidate, {}).get(weekday)
+                if hours is not None and hours[0] <= start_minute and end_minute <= hours[1] \
+                        and self._is_free(candidate, start_ts, end_ts):
+                    return candidate
+            return None
+
+
+_indexes: dict[str, BookingIntervalIndex] = {}
+
+
+def enable_interval_index(db_path: str) -> BookingIntervalIndex:
+    """Loads the interval index of `db_path`; availability checks on it are served from memory from then on."""
+    index = _indexes[os.path.abspath(db_path)] = BookingIntervalIndex.load(db_path)
+    return index
+
+
+def disable_interval_index(db_path: str):
+    _indexes.pop(os.path.abspath(db_path), None)
+
+
+def get_interval_index(db_path: str) -> BookingIntervalIndex | None:
+    """Returns the interval index of `db_path`, or None if it is not enabled."""
+    return _indexes.get(os.path.abspath(db_path)) if _indexes else None
@@ -0,0 +1,70 @@
+from dataclasses import dataclass, asdict
+
+
+@dataclass(slots=True)
+class Customer:
+    id: str
+    name: str
+    phone_number: str
+    email: str | None
+    created_at: str
+
+    COLUMNS = 'id, name, phone_number, email, created_at'
+
+    @classmethod
+    def row_factory(cls, cursor, row) -> 'Customer':
+        """sqlite3 `row_factory` for queries selecting `Customer.COLUMNS`."""
+        return cls(*row)
+
+
+@dataclass(slots=True)
+class Booking:
+    id: str
+    customer: str
+    # UTC epoch seconds
+    start_ts: int
+    end_ts: int
+    booking_reason: str | None
+    status: str
+    created_at: str
+    stylist: str
+    service: str
+
+    COLUMNS = 'id, customer, start_ts, end_ts, booking_reason, status, created_at, stylist, service'
+
+    @classmethod
+    def row_factory(cls, cursor, row) -> 'Booking':
+        """sqlite3 `row_factory` for queries selecting `Booking.COLUMNS`."""
+        return cls(*row)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class Stylist:
+    id: str
+    name: str
+    active: int
+    created_at: str
+
+    COLUMNS = 'id, name, active, created_at'
+
+    @classmethod
+    def row_factory(cls, cursor, row) -> 'Stylist':
+        """sqlite3 `row_factory` for queries selecting `Stylist.COLUMNS`."""
+        return cls(*row)
+
+
+@dataclass(slots=True)
+class Service:
+    id: str
+    name: str
+    duration_mins: int
+
+    COLUMNS = 'id, name, duration_mins'
+
+    @classmethod
+    def row_factory(cls, cursor, row) -> 'Service':
+        """sqlite3 `row_factory` for queries selecting `Service.COLUMNS`."""
+        return cls(*row)
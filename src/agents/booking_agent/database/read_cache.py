@@ -0,0 +1,182 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from agents.booking_agent import metrics
+
+# Availability answers are grouped by hour of their start, to find those overlapping a changed booking
+_BUCKET_SECS = 3600
+
+
+def _count_lookup(cache: str, entry):
+    if metrics.metrics_enabled():
+        metrics.READ_CACHE.inc(cache, 'miss' if entry is None else 'hit')
+
+
+def _count_invalidation(cache: str):
+    if metrics.metrics_enabled():
+        metrics.READ_CACHE_INVALIDATIONS.inc(cache)
+
+
+class ReadCache:
+    """
+    In-memory cache of the answers of the read helpers, `is_slot_available` (keyed by slot
+    start, service and stylist) and `get_active_bookings_user` (keyed by phone number), so
+    that repeated lookups within and across conversations are served from memory.
+
+    The database helpers invalidate the affected entries after each committed change: the
+    availability answers overlapping the booked or freed slot, for its stylist or any
+    stylist, and the bookings of its customer. Entries also expire after `ttl_secs`, which
+    bounds the staleness after changes made by other processes, and the least recently
+    used ones are evicted beyond `max_entries` of each kind.
+    """
+
+    def __init__(self, ttl_secs: float = 30, max_entries: int = 1024):
+        self.ttl_secs = ttl_secs
+        self.max_entries = max_entries
+        # (start_ts, service_id, stylist_id) -> (available, end_ts, expiry)
+        self._availability = OrderedDict()
+        # Hour of the start -> keys of `_availability`
+        self._buckets: dict[int, set] = {}
+        self._max_duration = 0
+        # Phone number -> (customer_id, booking rows, expiry)
+        self._bookings = OrderedDict()
+        self._phone_by_customer = {}
+        # Incremented by every invalidation: an answer read from the database before one is not cached
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def generation(self) -> int:
+        """To be read before reading from the database, and passed to the `put_*` method of the answer."""
+        return self._generation
+
+    def get_availability(self, start_ts: int, service_id: str, stylist_id: str | None) -> bool | None:
+        """The cached availability of the slot, or None if not cached."""
+        key = (start_ts, service_id, stylist_id)
+        with self._lock:
+            entry = self._availability.get(key)
+            if entry is not None and entry[2] < time.monotonic():
+                self._remove_availability(key)
+                entry = None
+            if entry is not None:
+                self._availability.move_to_end(key)
+        _count_lookup('availability', entry)
+        return entry[0] if entry is not None else None
+
+    def put_availability(
+            self,
+            start_ts: int,
+            end_ts: int,
+            service_id: str,
+            stylist_id: str | None,
+            available: bool,
+            generation: int):
+        key = (start_ts, service_id, stylist_id)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._availability[key] = (available, end_ts, time.monotonic() + self.ttl_secs)
+            self._availability.move_to_end(key)
+            self._buckets.setdefault(start_ts // _BUCKET_SECS, set()).add(key)
+            self._max_duration = max(self._max_duration, end_ts - start_ts)
+            while len(self._availability) > self.max_entries:
+                self._remove_availability(next(iter(self._availability)))
+
+    def _remove_availability(self, key: tuple):
+        del self._availability[key]
+        bucket = self._buckets[key[0] // _BUCKET_SECS]
+        bucket.discard(key)
+        if not bucket:
+            del self._buckets[key[0] // _BUCKET_SECS]
+
+    def get_bookings(self, phone_number: str) -> tuple[str | None, list] | None:
+        """The cached (customer ID, active booking rows) of the phone number, or None if not cached."""
+        with self._lock:
+            entry = self._bookings.get(phone_number)
+            if entry is not None and entry[2] < time.monotonic():
+                self._remove_bookings(phone_number)
+                entry = None
+            if entry is not None:
+                self._bookings.move_to_end(phone_number)
+        _count_lookup('bookings', entry)
+        return entry[:2] if entry is not None else None
+
+    def put_bookings(self, phone_number: str, customer_id: str | None, rows: list, generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._bookings[phone_number] = (customer_id, tuple(rows), time.monotonic() + self.ttl_secs)
+            self._bookings.move_to_end(phone_number)
+            if customer_id is not None:
+                self._phone_by_customer[customer_id] = phone_number
+            while len(self._bookings) > self.max_entries:
+                self._remove_bookings(next(iter(self._bookings)))
+
+    def _remove_bookings(self, phone_number: str):
+        customer_id = self._bookings.pop(phone_number)[0]
+        self._phone_by_customer.pop(customer_id, None)
+
+    def invalidate_slot(self, stylist_id: str, start_ts: int, end_ts: int):
+        """Removes the availability answers for the stylist or any stylist overlapping [start_ts, end_ts)."""
+        with self._lock:
+            self._generation += 1
+            # Overlapping answers start within (start_ts - longest answered slot, end_ts)
+            first_bucket, last_bucket = (start_ts - self._max_duration) // _BUCKET_SECS, (end_ts - 1) // _BUCKET_SECS
+            for bucket_idx in range(first_bucket, last_bucket + 1):
+                for key in list(self._buckets.get(bucket_idx, ())):
+                    key_start_ts, _, key_stylist_id = key
+                    if key_stylist_id in (None, stylist_id) and key_start_ts < end_ts \
+                            and self._availability[key][1] > start_ts:
+                        self._remove_availability(key)
+        _count_invalidation('availability')
+
+    def invalidate_customer(self, customer_id: str | None, phone_number: str | None = None):
+        """Removes the bookings of the customer (and of the phone number, which may be a new customer's)."""
+        with self._lock:
+            self._generation += 1
+            for phone in {self._phone_by_customer.get(customer_id), phone_number} - {None}:
+                if phone in self._bookings:
+                    self._remove_bookings(phone)
+        _count_invalidation('bookings')
+
+    def clear_availability(self):
+        """Removes all the availability answers, after a change of the stylists or services."""
+        with self._lock:
+            self._generation += 1
+            self._availability.clear()
+            self._buckets.clear()
+        _count_invalidation('availability')
+
+    def clear(self):
+        """Removes all the answers, e.g. after a bulk import."""
+        with self._lock:
+            self._generation += 1
+            self._availability.clear()
+            self._buckets.clear()
+            self._bookings.clear()
+            self._phone_by_customer.clear()
+        _count_invalidation('availability')
+        _count_invalidation('bookings')
+
+
+_caches: dict[str, ReadCache] = {}
+
+
+def enable_read_cache(db_path: str, ttl_secs: float = 30, max_entries: int = 1024) -> ReadCache:
+    """
+    Enables the read cache of `db_path`. Only the changes made through the database helpers of this
+    process invalidate it: with several processes writing to the database, answers can be stale for
+    up to `ttl_secs`.
+    """
+    cache = _caches[os.path.abspath(db_path)] = ReadCache(ttl_secs=ttl_secs, max_entries=max_entries)
+    return cache
+
+
+def disable_read_cache(db_path: str):
+    _caches.pop(os.path.abspath(db_path), None)
+
+
+def get_read_cache(db_path: str) -> ReadCache | None:
+    """Returns the read cache of `db_path`, or None if it is not enabled."""
+    return _caches.get(os.path.abspath(db_path)) if _caches else None
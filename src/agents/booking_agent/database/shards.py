@@ -0,0 +1,129 @@
+import contextlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from typing import Callable
+
+from agents.booking_agent import metrics
+from agents.booking_agent.database.connection import close_connection_pool, get_connection_pool
+from agents.booking_agent.database.create_sqlite_db import DEFAULT_STYLIST_ID, create_bookings_db, migrate_bookings_db
+from agents.booking_agent.database.utils import ADD_STYLIST_HOURS_QUERY, SALON_TIMEZONE, set_salon_timezone
+
+logger = logging.getLogger(__name__)
+# Shard ids are used as file names
+SHARD_ID_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$')
+DELETE_STYLIST_HOURS_QUERY = "DELETE FROM StylistHours WHERE stylist = ?"
+metrics.register_sql_statements(globals())
+
+
+class ShardRouter:
+    """
+    Maps each shard (a salon) to its own bookings database, `<data_dir>/<shard_id>.sqlite`.
+
+    The databases are independent SQLite files, each with its own pooled connections
+    (`get_connection_pool` is per path) and its own write lock: the bookings of one salon
+    never wait for a write transaction of another. A database is created, or migrated
+    to the latest schema, the first time its shard is opened in the process.
+    """
+
+    def __init__(self, data_dir: str, on_open: Callable[[str], None] | None = None):
+        """
+        Args:
+            data_dir (str): Directory of the databases, created if needed.
+            on_open (Callable, optional): Called with the path of each database once it is opened
+                (e.g. to enable its interval index or read cache).
+        """
+        self.data_dir = data_dir
+        self._on_open = on_open
+        self._opened: set[str] = set()
+        self._locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def db_path(self, shard_id: str) -> str:
+        """
+        The path of the bookings database of a shard.
+
+        Raises:
+            ValueError: If the shard id is not 1 to 64 letters, digits, '-' or '_'
+        """
+        if not SHARD_ID_PATTERN.match(shard_id):
+            raise ValueError(f"Invalid shard id '{shard_id}'")
+        return os.path.join(self.data_dir, f'{shard_id}.sqlite')
+
+    def is_open(self, shard_id: str) -> bool:
+        return self.db_path(shard_id) in self._opened
+
+    def open(
+            self,
+            shard_id: str,
+            timezone: str = SALON_TIMEZONE,
+            opening_hours: dict[int, tuple[int, int]] | None = None) -> str:
+        """
+        Opens the bookings database of a shard, creating it if needed, and returns its path.
+
+        Args:
+            shard_id (str): Id of the shard.
+            timezone (str): Timezone of the salon, in which the working hours of its stylists are given.
+            opening_hours (dict, optional): Opening hours (local time, 24h) per weekday of a new database,
+                like `SALON_OPENING_HOURS`, worked by its default stylist (`SALON_OPENING_HOURS` if None).
+
+        Raises:
+            ValueError: If the shard id is invalid
+        """
+        db_path = self.db_path(shard_id)
+        if db_path in self._opened:
+            return db_path
+        with self._lock:
+            lock = self._locks.setdefault(db_path, threading.Lock())
+        # Only the first requests of the same shard wait for its creation
+        with lock:
+            if db_path in self._opened:
+                return db_path
+            os.makedirs(self.data_dir, exist_ok=True)
+            if not os.path.isfile(db_path) and _create_db(db_path, opening_hours):
+                logger.info("Created the bookings database of shard '%s'", shard_id)
+            else:
+                migrate_bookings_db(db_path)
+            set_salon_timezone(db_path, timezone)
+            if self._on_open is not None:
+                self._on_open(db_path)
+            self._opened.add(db_path)
+        return db_path
+
+
+def _create_db(db_path: str, opening_hours: dict[int, tuple[int, int]] | None) -> bool:
+    """
+    Creates a bookings database at a temporary path, linked to `db_path` once complete: an existing file
+    always has the opening hours of its salon, which are not set again when it is next opened. Returns
+    False if another process created the database first.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(db_path), prefix=os.path.basename(db_path) + '.')
+    os.close(fd)
+    try:
+        create_bookings_db(tmp_path)
+        if opening_hours is not None:
+            _set_default_stylist_hours(tmp_path, opening_hours)
+        # The last connection closed checkpoints the WAL into the database file
+        close_connection_pool(tmp_path)
+        # Unlike a rename, does not replace a database created (and possibly written) meanwhile
+        os.link(tmp_path, db_path)
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        close_connection_pool(tmp_path)
+        for path in (tmp_path, f'{tmp_path}-wal', f'{tmp_path}-shm'):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+
+def _set_default_stylist_hours(db_path: str, opening_hours: dict[int, tuple[int, int]]):
+    with get_connection_pool(db_path).transaction() as conn:
+        conn.execute(DELETE_STYLIST_HOURS_QUERY, (DEFAULT_STYLIST_ID,))
+        conn.executemany(
+            ADD_STYLIST_HOURS_QUERY,
+            [(DEFAULT_STYLIST_ID, weekday, open_hr * 60, close_hr * 60)
+             for weekday, (open_hr, close_hr) in opening_hours.items()]
+        )
@@ -1,17 +1,113 @@
-import sqlite3
 import datetime
+import heapq
+import logging
+import math
+import os
 import uuid
 import pytz
 
-import pandas as pd
+from agents.booking_agent import metrics
+from agents.booking_agent.database.connection import get_connection_pool
+from agents.booking_agent.database.interval_index import get_interval_index
+from agents.booking_agent.database.read_cache import get_read_cache
+from agents.booking_agent.database.models import Booking, Customer, Service, Stylist
 
 DB_PATH = './bookings.sqlite'
 BOOKING_SLOT_DURATION_HRS = 1
-SLOT_AVAILABLE_QUERY = """
-    SELECT * FROM Bookings
-    WHERE start_datetime < ?
-      AND end_datetime > ?
-      AND status != 'cancelled'
+SALON_TIMEZONE = 'America/Toronto'
+logger = logging.getLogger(__name__)
+# Opening hours (local time, 24h) per weekday, Monday being 0. The salon is closed on missing days.
+# The stylists work within their own hours (`StylistHours`), seeded from these.
+SALON_OPENING_HOURS = {
+    0: (9, 18),
+    1: (9, 18),
+    2: (9, 18),
+    3: (9, 20),
+    4: (9, 20),
+    5: (10, 16),
+}
+# Timezone of the salon of each bookings database other than the default one (`SALON_TIMEZONE`), by
+# absolute path: the salons hosted together each have their own database (see `database.shards`)
+_salon_timezones: dict[str, datetime.tzinfo] = {}
+# Service booked when none is specified
+DEFAULT_SERVICE_ID = 'haircut'
+# Longest service: an overlapping booking must start within (slot start - this, slot end),
+# the lower bound keeps the index range scans tight
+MAX_SERVICE_DURATION_MINS = 240
+# Slots offered by `find_available_slots` start on this grid of the local time
+SLOT_GRID_MINS = 60
+# An active stylist working the whole slot (local weekday and minutes of the day) without an
+# overlapping booking, `:stylist` restricting the search to one stylist. Unordered, so that the
+# search stops at the first free stylist.
+FREE_STYLIST_QUERY = """
+    SELECT s.id FROM Stylist s
+    JOIN StylistHours h ON h.stylist = s.id AND h.weekday = :weekday
+    WHERE s.active = 1
+      AND h.open_minute <= :start_minute
+      AND h.close_minute >= :end_minute
+      AND (:stylist IS NULL OR s.id = :stylist)
+      AND NOT EXISTS (
+        SELECT 1 FROM Bookings b
+        WHERE b.stylist = s.id
+          AND b.start_ts < :end
+          AND b.start_ts > :earliest_start
+          AND b.end_ts > :start
+          AND b.status = 'scheduled'
+      )
+    LIMIT 1
+"""
+# Indexes of the slots (rows of the `slot` table) with a free stylist, as `FREE_STYLIST_QUERY` for each slot.
+# Formatted with a `(?, ?, ?, ?, ?, ?, ?, ?)` row per slot by `_slots_query`.
+AVAILABLE_SLOTS_QUERY = """
+    WITH slot (idx, weekday, start_minute, end_minute, start_ts, end_ts, earliest_start, stylist) AS (VALUES {})
+    SELECT slot.idx FROM slot
+    WHERE EXISTS (
+        SELECT 1 FROM Stylist s
+        JOIN StylistHours h ON h.stylist = s.id AND h.weekday = slot.weekday
+        WHERE s.active = 1
+          AND h.open_minute <= slot.start_minute
+          AND h.close_minute >= slot.end_minute
+          AND (slot.stylist IS NULL OR s.id = slot.stylist)
+          AND NOT EXISTS (
+            SELECT 1 FROM Bookings b
+            WHERE b.stylist = s.id
+              AND b.start_ts < slot.end_ts
+              AND b.start_ts > slot.earliest_start
+              AND b.end_ts > slot.start_ts
+              AND b.status = 'scheduled'
+          )
+    )
+"""
+BOOKED_INTERVALS_IN_RANGE_QUERY = """
+    SELECT stylist, start_ts, end_ts FROM Bookings
+    WHERE start_ts < :end
+      AND start_ts > :earliest_start
+      AND status = 'scheduled'
+      AND (:stylist IS NULL OR stylist = :stylist)
+    ORDER BY stylist, start_ts
+"""
+STYLIST_HOURS_QUERY = """
+    SELECT h.stylist, h.weekday, h.open_minute, h.close_minute
+    FROM StylistHours h JOIN Stylist s ON s.id = h.stylist
+    WHERE s.active = 1
+      AND (:stylist IS NULL OR s.id = :stylist)
+"""
+SERVICE_DURATION_QUERY = "SELECT duration_mins FROM Service WHERE id = ?"
+GET_STYLISTS_QUERY = f"SELECT {Stylist.COLUMNS} FROM Stylist WHERE active = 1 ORDER BY name"
+GET_STYLIST_QUERY = f"""
+    SELECT {Stylist.COLUMNS} FROM Stylist
+    WHERE active = 1 AND (id = ? OR name = ? COLLATE NOCASE)
+    LIMIT 1
+"""
+GET_SERVICES_QUERY = f"SELECT {Service.COLUMNS} FROM Service ORDER BY name"
+ADD_STYLIST_QUERY = """
+    INSERT INTO Stylist (id, name, created_at) VALUES (?, ?, ?)
+"""
+ADD_STYLIST_HOURS_QUERY = """
+    INSERT INTO StylistHours (stylist, weekday, open_minute, close_minute) VALUES (?, ?, ?, ?)
+"""
+ADD_SERVICE_QUERY = """
+    INSERT OR REPLACE INTO Service (id, name, duration_mins) VALUES (?, ?, ?)
 """
 ADD_CUSTOMER_QUERY = """
 INSERT INTO Customer (id, name, phone_number, email, created_at)
@@ -19,27 +115,61 @@ VALUES (?, ?, ?, ?, ?);
 """
 ADD_BOOKING_QUERY = """
     INSERT INTO Bookings (
-        id, customer, start_datetime, end_datetime, booking_reason, created_at
-    ) VALUES (?, ?, ?, ?, ?, ?);
+        id, customer, stylist, service, start_ts, end_ts, booking_reason, created_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?);
 """
-GET_USER_QUERY = """
-    SELECT * FROM Customer
+GET_CUSTOMER_ID_QUERY = "SELECT id FROM Customer WHERE phone_number = ?"
+GET_USER_QUERY = f"""
+    SELECT {Customer.COLUMNS} FROM Customer
     WHERE phone_number = ?
+    LIMIT 1
+"""
+# Bookings with the names of their stylist and service, and their start and end as UTC ISO 8601 text
+BOOKING_DETAILS_QUERY = """
+    SELECT b.id,
+           strftime('%Y-%m-%dT%H:%M:%S+00:00', b.start_ts, 'unixepoch'),
+           strftime('%Y-%m-%dT%H:%M:%S+00:00', b.end_ts, 'unixepoch'),
+           st.name, sv.name
+    FROM Bookings b
+    JOIN Stylist st ON st.id = b.stylist
+    JOIN Service sv ON sv.id = b.service
+"""
+GET_ACTIVE_BOOKINGS_USER_QUERY = BOOKING_DETAILS_QUERY + """
+    WHERE b.customer = ? AND b.status = 'scheduled'
+    ORDER BY b.start_ts
 """
-GET_ACTIVE_BOOKINGS_USER_QUERY = """
-    SELECT * FROM Bookings
-    WHERE customer = ? AND status = 'scheduled'
+GET_BOOKING_DETAILS_QUERY = BOOKING_DETAILS_QUERY + """
+    WHERE b.id = ?
 """
-GET_ACTIVE_BOOKING_BY_ID_QUERY = """
-    SELECT * FROM Bookings
+GET_ACTIVE_BOOKING_BY_ID_QUERY = f"""
+    SELECT {Booking.COLUMNS} FROM Bookings
     WHERE id = ?
     AND status = 'scheduled'
 """
 CANCEL_BOOKING_QUERY = """
     UPDATE Bookings
     SET status = 'cancelled'
+    WHERE id = ? AND status = 'scheduled'
+"""
+CANCEL_BOOKING_RETURNING_QUERY = CANCEL_BOOKING_QUERY + """
+    RETURNING customer, stylist, start_ts, end_ts
+"""
+# The booking being rescheduled, read as its previous slot is released
+RELEASE_BOOKING_RETURNING_QUERY = CANCEL_BOOKING_QUERY + """
+    RETURNING customer, stylist, service, start_ts, end_ts
+"""
+# The new slot of a booking being rescheduled, in the transaction that released its previous one
+RESCHEDULE_BOOKING_QUERY = """
+    UPDATE Bookings
+    SET stylist = ?, start_ts = ?, end_ts = ?, status = 'scheduled'
     WHERE id = ?
 """
+# The slot of a booking before it was rescheduled or cancelled
+ADD_BOOKING_HISTORY_QUERY = """
+    INSERT INTO BookingHistory (booking, change, stylist, start_ts, end_ts, changed_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+metrics.register_sql_statements(globals())
 
 
 def is_valid_timeslot(appointment_start_dt: str) -> tuple[bool, str | None]:
@@ -59,25 +189,299 @@ def is_valid_timeslot(appointment_start_dt: str) -> tuple[bool, str | None]:
     return True, None
 
 
-def is_slot_available(start_iso: str, DB_PATH=DB_PATH) -> bool:
+class SlotUnavailableError(Exception):
+    """Raised when a booking would overlap an existing active booking."""
+
+
+def to_timestamp(dt: datetime.datetime) -> int:
+    """UTC epoch seconds of an aware datetime, as stored in `Bookings.start_ts` / `end_ts`."""
+    return int(dt.timestamp())
+
+
+def from_timestamp(ts: int) -> datetime.datetime:
+    # datetime.timezone.utc rather than pytz.utc: converted in C, and what fromisoformat returns for '+00:00'
+    return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc)
+
+
+def _service_duration(conn, service_id: str | None) -> datetime.timedelta:
+    """Duration of a service (the default service if None). Raises ValueError for an unknown service."""
+    service_id = service_id or DEFAULT_SERVICE_ID
+    result = conn.execute(SERVICE_DURATION_QUERY, (service_id,)).fetchone()
+    if result is None:
+        raise ValueError(f"Unknown service '{service_id}'")
+    return datetime.timedelta(minutes=result[0])
+
+
+def set_salon_timezone(db_path: str, timezone: str):
+    """Sets the timezone of the salon of a bookings database, in which its working hours are given."""
+    _salon_timezones[os.path.abspath(db_path)] = pytz.timezone(timezone)
+
+
+def salon_timezone(db_path: str = DB_PATH) -> datetime.tzinfo:
+    """The timezone of the salon of a bookings database, `SALON_TIMEZONE` unless set by `set_salon_timezone`."""
+    tz = _salon_timezones.get(os.path.abspath(db_path)) if _salon_timezones else None
+    return tz if tz is not None else pytz.timezone(SALON_TIMEZONE)
+
+
+def _local_slot(
+        start_dt_utc: datetime.datetime,
+        duration: datetime.timedelta,
+        tz: datetime.tzinfo) -> tuple[int, int, int]:
+    """The local weekday and the (start, end) minutes of the local day of a slot, in the salon timezone `tz`."""
+    local_dt = start_dt_utc.astimezone(tz)
+    start_minute = local_dt.hour * 60 + local_dt.minute
+    return local_dt.weekday(), start_minute, start_minute + int(duration.total_seconds()) // 60
+
+
+def _find_free_stylist(
+        conn,
+        start_dt_utc: datetime.datetime,
+        end_dt_utc: datetime.datetime,
+        stylist_id: str | None = None,
+        preferred_stylist_id: str | None = None,
+        db_path: str = DB_PATH) -> str | None:
+    """
+    Find a stylist working the whole slot without an overlapping active booking.
+
+    Served from the interval index when it is enabled (and `conn` is not in a write
+    transaction, which must see its own changes), otherwise in one indexed query.
+
+    Returns:
+        str | None: The id of the stylist (`stylist_id` if given, `preferred_stylist_id` if free), or None
     """
-    Check if a slot is available by ensuring there are no overlapping appointments.
+    weekday, start_minute, end_minute = _local_slot(start_dt_utc, end_dt_utc - start_dt_utc, salon_timezone(db_path))
+    interval_index = get_interval_index(db_path) if not conn.in_transaction else None
+    if interval_index is not None:
+        return interval_index.free_stylist(
+            to_timestamp(start_dt_utc), to_timestamp(end_dt_utc), weekday, start_minute, end_minute,
+            stylist=stylist_id, preferred_stylist=preferred_stylist_id)
+
+    params = {
+        'weekday': weekday,
+        'start_minute': start_minute,
+        'end_minute': end_minute,
+        'start': to_timestamp(start_dt_utc),
+        'end': to_timestamp(end_dt_utc),
+        'earliest_start': to_timestamp(start_dt_utc - datetime.timedelta(minutes=MAX_SERVICE_DURATION_MINS)),
+    }
+    if stylist_id is None and preferred_stylist_id is not None:
+        result = conn.execute(FREE_STYLIST_QUERY, {**params, 'stylist': preferred_stylist_id}).fetchone()
+        if result is not None:
+            return result[0]
+    result = conn.execute(FREE_STYLIST_QUERY, {**params, 'stylist': stylist_id}).fetchone()
+    return result[0] if result is not None else None
+
+
+def is_slot_available(
+        start_iso: str,
+        service_id: str | None = None,
+        stylist_id: str | None = None,
+        db_path: str = DB_PATH) -> bool:
+    """
+    Check if a slot is available: a stylist (or the given one) works the whole slot and
+    has no overlapping appointment.
     
     Parameters:
         start_iso (str): Start datetime in ISO 8601 format (e.g., '2025-04-22 14:00:00')
+        service_id (str | None): Service booked, which sets the duration of the slot (default: `DEFAULT_SERVICE_ID`)
+        stylist_id (str | None): Stylist to book, or None for any stylist
     
     Returns:
         bool: True if the slot is available, False otherwise
+
+    Raises:
+        ValueError: If the service does not exist
     """
+    conn = get_connection_pool(db_path).connection()
     start_dt_utc = datetime.datetime.fromisoformat(start_iso).astimezone(pytz.utc)
-    end_dt_utc = (start_dt_utc + datetime.timedelta(hours=BOOKING_SLOT_DURATION_HRS))
+    service_id = service_id or DEFAULT_SERVICE_ID
+    read_cache = get_read_cache(db_path)
+    if read_cache is not None:
+        available = read_cache.get_availability(to_timestamp(start_dt_utc), service_id, stylist_id)
+        if available is not None:
+            return available
+        generation = read_cache.generation()
+
+    end_dt_utc = start_dt_utc + _service_duration(conn, service_id)
+    available = _find_free_stylist(conn, start_dt_utc, end_dt_utc, stylist_id=stylist_id, db_path=db_path) is not None
+    if read_cache is not None:
+        read_cache.put_availability(
+            to_timestamp(start_dt_utc), to_timestamp(end_dt_utc), service_id, stylist_id, available, generation)
+    return available
+
+
+def _slots_query(count: int) -> str:
+    return AVAILABLE_SLOTS_QUERY.format(', '.join(['(?, ?, ?, ?, ?, ?, ?, ?)'] * count))
+
+
+def are_slots_available(
+        slots: list[tuple[str, str | None, str | None]],
+        db_path: str = DB_PATH) -> list[bool]:
+    """
+    Check the availability of several slots at once, e.g. the candidate times of one LLM turn: as
+    `is_slot_available` for each slot, the slots not served by the read cache or the interval index
+    being checked in a single query.
+
+    Parameters:
+        slots (list[tuple]): (start_iso, service_id, stylist_id) of each slot, as taken by `is_slot_available`
+
+    Returns:
+        list[bool]: Whether each slot is available, in order
+
+    Raises:
+        ValueError: If a service does not exist
+    """
+    conn = get_connection_pool(db_path).connection()
+    read_cache = get_read_cache(db_path)
+    interval_index = get_interval_index(db_path)
+    generation = read_cache.generation() if read_cache is not None else None
+    tz = salon_timezone(db_path)
+    durations = {}
+    available, checked, pending = [None] * len(slots), [], []
+    for idx, (start_iso, service_id, stylist_id) in enumerate(slots):
+        service_id = service_id or DEFAULT_SERVICE_ID
+        if service_id not in durations:
+            durations[service_id] = _service_duration(conn, service_id)
+        start_dt_utc = datetime.datetime.fromisoformat(start_iso).astimezone(pytz.utc)
+        start_ts, end_ts = to_timestamp(start_dt_utc), to_timestamp(start_dt_utc + durations[service_id])
+        if read_cache is not None:
+            available[idx] = read_cache.get_availability(start_ts, service_id, stylist_id)
+            if available[idx] is not None:
+                continue
+        checked.append((idx, start_ts, end_ts, service_id, stylist_id))
+        weekday, start_minute, end_minute = _local_slot(start_dt_utc, durations[service_id], tz)
+        if interval_index is not None:
+            available[idx] = interval_index.free_stylist(
+                start_ts, end_ts, weekday, start_minute, end_minute, stylist=stylist_id) is not None
+        else:
+            earliest_start = start_ts - MAX_SERVICE_DURATION_MINS * 60
+            pending.append((idx, weekday, start_minute, end_minute, start_ts, end_ts, earliest_start, stylist_id))
 
-    with sqlite3.connect(DB_PATH) as conn:
-        available_slots_df = pd.read_sql_query(
-            sql=SLOT_AVAILABLE_QUERY,
-            con=conn,
-            params=(end_dt_utc.isoformat(), start_dt_utc.isoformat()))
-        return available_slots_df.empty
+    if pending:
+        free = {idx for (idx,) in conn.execute(
+            _slots_query(len(pending)), [value for slot in pending for value in slot])}
+        for idx, *_ in checked:
+            available[idx] = idx in free
+    if read_cache is not None:
+        for idx, start_ts, end_ts, service_id, stylist_id in checked:
+            read_cache.put_availability(start_ts, end_ts, service_id, stylist_id, available[idx], generation)
+    return available
+
+
+def _ceil_to_grid(ts: int, utc_offset: int) -> int:
+    """Rounds UTC epoch seconds up to the next `SLOT_GRID_MINS` boundary of the local time (`utc_offset` seconds)."""
+    return ts + -(ts + utc_offset) % (SLOT_GRID_MINS * 60)
+
+
+def _working_intervals(working_hours, range_start_dt, range_end_dt, tz, local_times):
+    """
+    Yields the (start, end) working intervals within the range, in UTC epoch seconds, with the UTC offset
+    (seconds) of their day, of (open, close) minutes per weekday. `local_times` caches the (epoch, offset)
+    of each (day, minute), shared by the stylists working the same hours.
+    """
+    def local_time(day, minute):
+        if (day, minute) not in local_times:
+            local_dt = tz.localize(datetime.datetime.combine(day, datetime.time()) + datetime.timedelta(minutes=minute))
+            local_times[day, minute] = to_timestamp(local_dt), int(local_dt.utcoffset().total_seconds())
+        return local_times[day, minute]
+
+    range_start_ts, range_end_ts = math.ceil(range_start_dt.timestamp()), to_timestamp(range_end_dt)
+    day = range_start_dt.astimezone(tz).date()
+    while day <= range_end_dt.astimezone(tz).date():
+        if day.weekday() in working_hours:
+            open_minute, close_minute = working_hours[day.weekday()]
+            (open_ts, utc_offset), (close_ts, _) = local_time(day, open_minute), local_time(day, close_minute)
+            start, end = max(open_ts, range_start_ts), min(close_ts, range_end_ts)
+            if start < end:
+                yield start, end, utc_offset
+        day += datetime.timedelta(days=1)
+
+
+def _free_slots(working_hours, busy_blocks, range_start_dt, range_end_dt, slot_duration, tz, local_times):
+    """Yields the starts (UTC epoch seconds) of the free slots of one stylist, in order."""
+    duration, grid = int(slot_duration.total_seconds()), SLOT_GRID_MINS * 60
+    block_idx = 0
+    for open_ts, close_ts, utc_offset in _working_intervals(
+            working_hours, range_start_dt, range_end_dt, tz, local_times):
+        slot_ts = _ceil_to_grid(open_ts, utc_offset)
+        while slot_ts + duration <= close_ts:
+            while block_idx < len(busy_blocks) and busy_blocks[block_idx][1] <= slot_ts:
+                block_idx += 1
+            if block_idx < len(busy_blocks) and busy_blocks[block_idx][0] < slot_ts + duration:
+                slot_ts = _ceil_to_grid(busy_blocks[block_idx][1], utc_offset)
+                continue
+
+            yield slot_ts
+            slot_ts += grid
+
+
+def find_available_slots(
+        range_start_iso: str,
+        range_end_iso: str,
+        limit: int = 5,
+        service_id: str | None = None,
+        stylist_id: str | None = None,
+        db_path: str = DB_PATH) -> list[str]:
+    """
+    Find the earliest slots within a datetime range at which a stylist (or the given one) is free.
+
+    The booked intervals of the range are fetched in one indexed range scan, the free
+    slots of each stylist are computed (in epoch seconds, as stored) from the gaps between
+    their bookings within their working hours, and the stylists' slots are merged in order.
+
+    Parameters:
+        range_start_iso (str): Start of the search range in ISO 8601 format with timezone.
+        range_end_iso (str): End of the search range in ISO 8601 format with timezone.
+        limit (int): Maximum number of slots to return.
+        service_id (str | None): Service booked, which sets the duration of the slots (default: `DEFAULT_SERVICE_ID`)
+        stylist_id (str | None): Stylist to book, or None for any stylist
+
+    Returns:
+        list[str]: Start datetimes (ISO 8601, salon timezone) of the available slots, in order
+
+    Raises:
+        ValueError: If the service does not exist
+    """
+    tz = salon_timezone(db_path)
+    now_utc = datetime.datetime.now(pytz.utc)
+    range_start_dt = max(datetime.datetime.fromisoformat(range_start_iso).astimezone(pytz.utc), now_utc)
+    range_end_dt = datetime.datetime.fromisoformat(range_end_iso).astimezone(pytz.utc)
+    conn = get_connection_pool(db_path).connection()
+    slot_duration = _service_duration(conn, service_id)
+    if range_start_dt >= range_end_dt or limit < 1:
+        return []
+
+    working_hours = {}
+    for stylist, weekday, open_minute, close_minute in conn.execute(STYLIST_HOURS_QUERY, {'stylist': stylist_id}):
+        working_hours.setdefault(stylist, {})[weekday] = (open_minute, close_minute)
+
+    # Merge the booked intervals of each stylist (sorted by start) into disjoint busy blocks
+    busy_blocks = {}
+    for stylist, start_ts, end_ts in conn.execute(
+            BOOKED_INTERVALS_IN_RANGE_QUERY,
+            {
+                'end': to_timestamp(range_end_dt),
+                'earliest_start': to_timestamp(range_start_dt - datetime.timedelta(minutes=MAX_SERVICE_DURATION_MINS)),
+                'stylist': stylist_id,
+            }):
+        blocks = busy_blocks.setdefault(stylist, [])
+        if blocks and start_ts <= blocks[-1][1]:
+            blocks[-1][1] = max(blocks[-1][1], end_ts)
+        else:
+            blocks.append([start_ts, end_ts])
+
+    available_slots, local_times = [], {}
+    for slot_ts in heapq.merge(*(
+            _free_slots(hours, busy_blocks.get(stylist, []), range_start_dt, range_end_dt, slot_duration, tz,
+                        local_times)
+            for stylist, hours in working_hours.items())):
+        # Slots free for several stylists are offered once
+        if available_slots and available_slots[-1] == slot_ts:
+            continue
+        available_slots.append(slot_ts)
+        if len(available_slots) >= limit:
+            break
+    return [from_timestamp(slot_ts).astimezone(tz).isoformat() for slot_ts in available_slots]
 
 
 def add_customer( 
@@ -100,8 +504,8 @@ def add_customer(
             )
         )
         return customer_id
-    except Exception as e:
-        print(f"Unexpected error while adding customer: {e}")
+    except Exception:
+        logger.exception("Unexpected error while adding customer")
         raise
 
 
@@ -110,19 +514,35 @@ def add_booking(
         user_name: str,
         user_phone_number: str,
         user_email: str = None,
-        booking_reason: str = None) -> str:
+        booking_reason: str = None,
+        service_id: str | None = None,
+        stylist_id: str | None = None,
+        db_path: str = DB_PATH) -> str:
+    """
+    Reserve the slot with a free stylist (or the given one) and create the booking atomically.
+
+    The overlap check and the insert run in the same `BEGIN IMMEDIATE` transaction,
+    so concurrent bookings of the same or overlapping slots are serialised and only
+    the first one succeeds.
+
+    Raises:
+        SlotUnavailableError: If no stylist (or not the given one) is free for the whole slot.
+        ValueError: If the service does not exist.
+    """
     booking_id = str(uuid.uuid4())
+    service_id = service_id or DEFAULT_SERVICE_ID
     start_dt_utc = datetime.datetime.fromisoformat(start_dt_str).astimezone(pytz.utc)
-    end_dt_utc = start_dt_utc + datetime.timedelta(hours=BOOKING_SLOT_DURATION_HRS)
     current_dt = datetime.datetime.now(pytz.utc)
 
-    with sqlite3.connect(DB_PATH) as conn:
-        try:
-            conn.execute("PRAGMA foreign_keys = ON;")
-            conn.execute("BEGIN transaction;")
-            cursor = conn.cursor()
+    try:
+        with get_connection_pool(db_path).transaction() as conn:
+            end_dt_utc = start_dt_utc + _service_duration(conn, service_id)
+            stylist_id = _find_free_stylist(conn, start_dt_utc, end_dt_utc, stylist_id=stylist_id, db_path=db_path)
+            if stylist_id is None:
+                raise SlotUnavailableError(f"The slot starting at {start_dt_str} is not available")
 
-            cursor.execute("SELECT id FROM Customer WHERE phone_number = ?", (user_phone_number,))
+            cursor = conn.cursor()
+            cursor.execute(GET_CUSTOMER_ID_QUERY, (user_phone_number,))
             result = cursor.fetchone()
             customer_id = result[0] if result is not None else add_customer(cursor, user_name, user_phone_number)
 
@@ -131,89 +551,229 @@ def add_booking(
                 (
                     booking_id,
                     customer_id,
-                    start_dt_utc.isoformat(),
-                    end_dt_utc.isoformat(),
+                    stylist_id,
+                    service_id,
+                    to_timestamp(start_dt_utc),
+                    to_timestamp(end_dt_utc),
                     booking_reason,
                     current_dt.isoformat()
                 )
             )
-            conn.commit()
-            return booking_id
-        except Exception as e:
-            conn.rollback()
-            print(f"Unexpected error while adding customer: {e}")
+        interval_index = get_interval_index(db_path)
+        if interval_index is not None:
+            interval_index.add(booking_id, stylist_id, to_timestamp(start_dt_utc), to_timestamp(end_dt_utc))
+        read_cache = get_read_cache(db_path)
+        if read_cache is not None:
+            read_cache.invalidate_slot(stylist_id, to_timestamp(start_dt_utc), to_timestamp(end_dt_utc))
+            read_cache.invalidate_customer(customer_id, phone_number=user_phone_number)
+        return booking_id
+    except (SlotUnavailableError, ValueError):
+        raise
+    except Exception:
+        logger.exception("Unexpected error while adding booking")
 
 
-def get_active_bookings_user(user_phone_number: str) -> []:
-    with sqlite3.connect(DB_PATH) as conn:
-        customer_df = pd.read_sql_query(GET_USER_QUERY, conn, params=(user_phone_number,))
-        if customer_df.empty:
-            print('There is no customer with the provided phone number and consequently, no appointments')
-            return []
+def get_customer_by_phone(user_phone_number: str, db_path: str = DB_PATH) -> Customer | None:
+    cursor = get_connection_pool(db_path).connection().cursor()
+    cursor.row_factory = Customer.row_factory
+    return cursor.execute(GET_USER_QUERY, (user_phone_number,)).fetchone()
 
-        bookings_df = pd.read_sql_query(GET_ACTIVE_BOOKINGS_USER_QUERY, conn, params=(customer_df.loc[0, 'id'],))
-        if bookings_df.empty:
-            print('There are no active bookings for the customer')
-            return []
-        return bookings_df[['id', 'start_datetime', 'end_datetime']].to_dict(orient='records')
 
+def get_active_booking_by_id(booking_id: str, db_path: str = DB_PATH) -> Booking | None:
+    cursor = get_connection_pool(db_path).connection().cursor()
+    cursor.row_factory = Booking.row_factory
+    return cursor.execute(GET_ACTIVE_BOOKING_BY_ID_QUERY, (booking_id,)).fetchone()
 
-def reschedule_booking(booking_id, updated_start_dt_str, user_phone_number):
+
+def _booking_details(row) -> dict:
+    booking_id, start_datetime, end_datetime, stylist, service = row
+    return {'id': booking_id, 'start_datetime': start_datetime, 'end_datetime': end_datetime,
+            'stylist': stylist, 'service': service}
+
+
+def get_booking_details(booking_id: str, db_path: str = DB_PATH) -> dict | None:
+    """The booking with the names of its stylist and service, or None if it does not exist."""
+    row = get_connection_pool(db_path).connection().execute(GET_BOOKING_DETAILS_QUERY, (booking_id,)).fetchone()
+    return _booking_details(row) if row is not None else None
+
+
+def get_active_bookings_user(user_phone_number: str, db_path: str = DB_PATH) -> []:
+    read_cache = get_read_cache(db_path)
+    if read_cache is not None:
+        cached = read_cache.get_bookings(user_phone_number)
+        if cached is not None:
+            return [_booking_details(row) for row in cached[1]]
+        generation = read_cache.generation()
+
+    customer = get_customer_by_phone(user_phone_number, db_path=db_path)
+    if customer is None:
+        logger.info('There is no customer with the provided phone number and consequently, no appointments')
+        rows = []
+    else:
+        rows = get_connection_pool(db_path).connection().execute(
+            GET_ACTIVE_BOOKINGS_USER_QUERY, (customer.id,)).fetchall()
+        if not rows:
+            logger.info('There are no active bookings for the customer')
+    if read_cache is not None:
+        read_cache.put_bookings(user_phone_number, customer.id if customer else None, rows, generation)
+    return [_booking_details(row) for row in rows]
+
+
+def reschedule_booking(
+        booking_id,
+        updated_start_dt_str,
+        user_phone_number,
+        stylist_id: str | None = None,
+        db_path: str = DB_PATH):
+    """
+    Move an active booking to a new start datetime in place, atomically checking the new slot.
+
+    The booking keeps its id and service, its previous slot is recorded in `BookingHistory`. It
+    stays with its stylist if they are free at the new time, otherwise it moves to another free
+    stylist (unless `stylist_id` is given).
+
+    Returns:
+        str | None: The id of the booking, or None if there is no such active booking
+
+    Raises:
+        SlotUnavailableError: If no stylist (or not the given one) is free for the new slot.
+    """
     start_dt_utc = datetime.datetime.fromisoformat(updated_start_dt_str).astimezone(pytz.utc)
-    end_dt_utc = start_dt_utc + datetime.timedelta(hours=BOOKING_SLOT_DURATION_HRS)
     current_dt = datetime.datetime.now(pytz.utc)
-    new_booking_id = str(uuid.uuid4())
-
-    with sqlite3.connect(DB_PATH) as conn:
-        try:
-            booking_df = pd.read_sql_query(GET_ACTIVE_BOOKING_BY_ID_QUERY, conn, params=(booking_id,))
-            if booking_df.empty:
-                print('Booking not found')
-                return
 
-            conn.row_factory = sqlite3.Row
-            conn.execute("PRAGMA foreign_keys = ON;")
-            conn.execute("BEGIN transaction;")
+    pool = get_connection_pool(db_path)
+    try:
+        with pool.transaction() as conn:
             cursor = conn.cursor()
-
-            result = cursor.execute(CANCEL_BOOKING_QUERY, (booking_id,))
-            if result.rowcount < 1:
-                print('The booking with the provided ID was not found and hence, not cancelled')
+            # Released first, so the booking does not conflict with itself, and restored on rollback. Read in
+            # the transaction: the previous slot recorded is the one released, even if it was just moved
+            booking = cursor.execute(RELEASE_BOOKING_RETURNING_QUERY, (booking_id,)).fetchone()
+            if booking is None:
+                logger.info('No active booking found with that ID. Nothing was rescheduled.')
                 return
+            customer_id, previous_stylist_id, service_id, previous_start_ts, previous_end_ts = booking
+            end_dt_utc = start_dt_utc + _service_duration(conn, service_id)
+
+            new_stylist_id = _find_free_stylist(
+                conn, start_dt_utc, end_dt_utc, stylist_id=stylist_id, preferred_stylist_id=previous_stylist_id,
+                db_path=db_path)
+            if new_stylist_id is None:
+                raise SlotUnavailableError(f"The slot starting at {updated_start_dt_str} is not available")
 
             cursor.execute(
-                ADD_BOOKING_QUERY, 
-                (
-                    new_booking_id, 
-                    booking_df.loc[0, 'customer'],
-                    start_dt_utc.isoformat(),
-                    end_dt_utc.isoformat(),
-                    booking_df.loc[0, 'booking_reason'], 
-                    current_dt.isoformat()
-                )
+                RESCHEDULE_BOOKING_QUERY,
+                (new_stylist_id, to_timestamp(start_dt_utc), to_timestamp(end_dt_utc), booking_id)
             )
-            conn.commit()
-            return new_booking_id
-        except Exception as e:
-            conn.rollback()
-            print(f"Unexpected error while adding customer: {e}")
-
+            cursor.execute(
+                ADD_BOOKING_HISTORY_QUERY,
+                (booking_id, 'rescheduled', previous_stylist_id, previous_start_ts, previous_end_ts,
+                 current_dt.isoformat())
+            )
+        interval_index = get_interval_index(db_path)
+        if interval_index is not None:
+            interval_index.remove(booking_id)
+            interval_index.add(booking_id, new_stylist_id, to_timestamp(start_dt_utc), to_timestamp(end_dt_utc))
+        read_cache = get_read_cache(db_path)
+        if read_cache is not None:
+            read_cache.invalidate_slot(previous_stylist_id, previous_start_ts, previous_end_ts)
+            read_cache.invalidate_slot(new_stylist_id, to_timestamp(start_dt_utc), to_timestamp(end_dt_utc))
+            read_cache.invalidate_customer(customer_id)
+        return booking_id
+    except SlotUnavailableError:
+        raise
+    except Exception:
+        logger.exception("Unexpected error while rescheduling booking")
 
-def cancel_booking(booking_id: str) -> bool:
-    with sqlite3.connect(DB_PATH) as conn:
-        try:
-            cursor = conn.cursor()
 
-            result = cursor.execute(CANCEL_BOOKING_QUERY, (booking_id,))
-            if result.rowcount < 1:
-                print("No booking found with that ID. Nothing was deleted.")
+def cancel_booking(booking_id: str, db_path: str = DB_PATH) -> bool:
+    """Cancels an active booking, recording it in `BookingHistory`. Returns False if there is no such booking."""
+    try:
+        with get_connection_pool(db_path).transaction() as conn:
+            booking = conn.execute(CANCEL_BOOKING_RETURNING_QUERY, (booking_id,)).fetchone()
+            if booking is None:
+                logger.info("No active booking found with that ID. Nothing was cancelled.")
                 return False
-            conn.commit()
-            return True
-        except Exception as e:
-            conn.rollback()
-            print('Unexpected error', e)
-            return False
+            customer_id, stylist_id, start_ts, end_ts = booking
+            conn.execute(
+                ADD_BOOKING_HISTORY_QUERY,
+                (booking_id, 'cancelled', stylist_id, start_ts, end_ts, datetime.datetime.now(pytz.utc).isoformat())
+            )
+        interval_index = get_interval_index(db_path)
+        if interval_index is not None:
+            interval_index.remove(booking_id)
+        read_cache = get_read_cache(db_path)
+        if read_cache is not None:
+            read_cache.invalidate_slot(stylist_id, start_ts, end_ts)
+            read_cache.invalidate_customer(customer_id)
+        return True
+    except Exception:
+        logger.exception('Unexpected error while cancelling booking')
+        return False
+
+
+def get_stylists(db_path: str = DB_PATH) -> list[Stylist]:
+    cursor = get_connection_pool(db_path).connection().cursor()
+    cursor.row_factory = Stylist.row_factory
+    return cursor.execute(GET_STYLISTS_QUERY).fetchall()
+
+
+def get_stylist(stylist_id_or_name: str, db_path: str = DB_PATH) -> Stylist | None:
+    """The active stylist with the given id or name (case insensitive), or None."""
+    cursor = get_connection_pool(db_path).connection().cursor()
+    cursor.row_factory = Stylist.row_factory
+    return cursor.execute(GET_STYLIST_QUERY, (stylist_id_or_name, stylist_id_or_name)).fetchone()
+
+
+def get_services(db_path: str = DB_PATH) -> list[Service]:
+    cursor = get_connection_pool(db_path).connection().cursor()
+    cursor.row_factory = Service.row_factory
+    return cursor.execute(GET_SERVICES_QUERY).fetchall()
+
+
+def add_stylist(
+        name: str,
+        working_hours: dict[int, tuple[float, float]],
+        stylist_id: str | None = None,
+        db_path: str = DB_PATH) -> str:
+    """
+    Add a stylist with their working hours.
+
+    Parameters:
+        name (str): Name of the stylist
+        working_hours (dict): (start, end) local hours (24h, e.g. 9.5 for 9:30) per weekday, Monday being 0,
+            like `SALON_OPENING_HOURS`. The stylist does not work on missing days.
+        stylist_id (str | None): Id of the stylist (default: a new UUID)
+
+    Returns:
+        str: The id of the stylist
+    """
+    stylist_id = stylist_id or str(uuid.uuid4())
+    hours = {weekday: (round(open_hr * 60), round(close_hr * 60))
+             for weekday, (open_hr, close_hr) in working_hours.items()}
+    with get_connection_pool(db_path).transaction() as conn:
+        conn.execute(ADD_STYLIST_QUERY, (stylist_id, name, datetime.datetime.now(pytz.utc).isoformat()))
+        conn.executemany(
+            ADD_STYLIST_HOURS_QUERY,
+            [(stylist_id, weekday, open_minute, close_minute) for weekday, (open_minute, close_minute) in hours.items()]
+        )
+    interval_index = get_interval_index(db_path)
+    if interval_index is not None:
+        interval_index.set_stylist_hours(stylist_id, hours)
+    read_cache = get_read_cache(db_path)
+    if read_cache is not None:
+        read_cache.clear_availability()
+    return stylist_id
+
+
+def add_service(service_id: str, name: str, duration_mins: int, db_path: str = DB_PATH):
+    """Add (or update) a service. Its duration must not exceed `MAX_SERVICE_DURATION_MINS`."""
+    if not 0 < duration_mins <= MAX_SERVICE_DURATION_MINS:
+        raise ValueError(f"The duration of a service must be between 1 and {MAX_SERVICE_DURATION_MINS} minutes")
+    with get_connection_pool(db_path).transaction() as conn:
+        conn.execute(ADD_SERVICE_QUERY, (service_id, name, duration_mins))
+    read_cache = get_read_cache(db_path)
+    if read_cache is not None:
+        read_cache.clear_availability()
 
 
 # if __name__ == '__main__':
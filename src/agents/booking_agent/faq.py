@@ -0,0 +1,203 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+
+from agents.booking_agent.database.utils import SALON_OPENING_HOURS
+
+logger = logging.getLogger(__name__)
+# Knowledge file of the default salon: `{"faqs": [{"question": ..., "answer": ..., "alternatives": [...]}, ...]}`
+FAQ_PATH = os.path.join(os.path.dirname(__file__), 'salon_faq.json')
+# Replaced in the answers of a knowledge file by the opening hours of the salon (see `format_opening_hours`)
+OPENING_HOURS_PLACEHOLDER = '{opening_hours}'
+WEEKDAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+# BM25 parameters: term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+# The questions (and their alternative phrasings) weigh this many times the words of the answer
+QUESTION_WEIGHT = 3
+# A match is answered without the LLM if it covers this share of the (idf-weighted) words of the
+# query, and scores this many times the next entry
+MIN_CONFIDENCE = 0.7
+MIN_MARGIN = 1.3
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset("""
+    a about am an and any are as at be can could do does for from have how i if in is it its me my of on or
+    our please should so than that the their them there these they this to us was we what when where which
+    who will with would you your yours hi hello hey thanks thank
+""".split())
+
+
+def _stem(token: str) -> str:
+    # Light suffix stripping, enough to match the plurals and the usual verb forms (close, closes, closed)
+    for suffix in ('ing', 'ed', 'es', 's'):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3 and not token.endswith('ss'):
+            token = token[:-len(suffix)]
+            break
+    return token[:-1] if token.endswith('e') and len(token) > 3 else token
+
+
+def tokenize(text: str) -> list[str]:
+    return [_stem(token) for token in TOKEN_PATTERN.findall(text.lower())
+            if len(token) > 1 and token not in STOPWORDS]
+
+
+def _format_hour(hour: float) -> str:
+    hours, minutes = divmod(round(hour * 60), 60)
+    suffix = 'am' if hours % 24 < 12 else 'pm'
+    return f"{(hours - 1) % 12 + 1}{f':{minutes:02d}' if minutes else ''}{suffix}"
+
+
+def _join(items: list[str]) -> str:
+    return items[0] if len(items) == 1 else f"{', '.join(items[:-1])}{',' if len(items) > 2 else ''} and {items[-1]}"
+
+
+def format_opening_hours(opening_hours: dict[int, tuple[float, float]]) -> str:
+    """
+    The opening hours (local time, 24h) per weekday, Monday being 0, like `SALON_OPENING_HOURS`, as sentences:
+    "We're open Monday to Wednesday from 9am to 6pm, and Saturday from 10am to 4pm. We're closed on Sundays."
+    """
+    # Consecutive days with the same hours: [first day, last day, hours]
+    runs = []
+    for weekday in sorted(opening_hours):
+        hours = tuple(opening_hours[weekday])
+        if runs and runs[-1][1] == weekday - 1 and runs[-1][2] == hours:
+            runs[-1][1] = weekday
+        else:
+            runs.append([weekday, weekday, hours])
+    parts = []
+    for first, last, (open_hr, close_hr) in runs:
+        days = WEEKDAY_NAMES[first] if first == last else \
+            f"{WEEKDAY_NAMES[first]} {'and' if last == first + 1 else 'to'} {WEEKDAY_NAMES[last]}"
+        parts.append(f'{days} from {_format_hour(open_hr)} to {_format_hour(close_hr)}')
+    closed = [f'{name}s' for weekday, name in enumerate(WEEKDAY_NAMES) if weekday not in opening_hours]
+    if not parts:
+        return "We're currently closed."
+    return f"We're open {_join(parts)}." + (f" We're closed on {_join(closed)}." if closed else '')
+
+
+@dataclass(frozen=True)
+class FAQEntry:
+    question: str
+    answer: str
+    # Other phrasings of the question, indexed with it
+    alternatives: tuple[str, ...] = ()
+
+
+@dataclass(frozen=True)
+class FAQMatch:
+    entry: FAQEntry
+    # BM25 score of the entry for the query
+    score: float
+    # Share of the words of the query (weighted by their idf) found in the entry, from 0 to 1
+    confidence: float
+
+
+@dataclass
+class FAQIndex:
+    """
+    In-memory BM25 index of the entries of a salon knowledge file, built once: the postings of each term hold
+    the precomputed BM25 weight of the term in each entry, so that a lookup only sums the postings of the
+    words of the query. No network call or embedding service is involved.
+    """
+
+    entries: list[FAQEntry]
+    # Term -> [(entry index, BM25 weight)]
+    _postings: dict[str, list[tuple[int, float]]] = field(default_factory=dict, repr=False)
+    # Term -> inverse document frequency; the words of a query missing from the index count as the rarest
+    _idf: dict[str, float] = field(default_factory=dict, repr=False)
+    _max_idf: float = 0.0
+
+    def __post_init__(self):
+        documents = []
+        for entry in self.entries:
+            questions = ' '.join((entry.question, *entry.alternatives))
+            terms = tokenize(questions) * QUESTION_WEIGHT + tokenize(entry.answer)
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            documents.append((counts, len(terms)))
+        avg_length = sum(length for _, length in documents) / len(documents) if documents else 0
+        document_frequencies = {}
+        for counts, _ in documents:
+            for term in counts:
+                document_frequencies[term] = document_frequencies.get(term, 0) + 1
+        n_entries = len(documents)
+        self._idf = {term: math.log(1 + (n_entries - df + 0.5) / (df + 0.5))
+                     for term, df in document_frequencies.items()}
+        self._max_idf = math.log(1 + (n_entries + 0.5) / 0.5)
+        for entry_idx, (counts, length) in enumerate(documents):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+            for term, tf in counts.items():
+                weight = self._idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+                self._postings.setdefault(term, []).append((entry_idx, weight))
+
+    @classmethod
+    def load(cls, path: str = FAQ_PATH,
+             opening_hours: dict[int, tuple[float, float]] = SALON_OPENING_HOURS) -> 'FAQIndex':
+        """Reads and indexes a knowledge file, its answers given the `opening_hours` of the salon."""
+        with open(path, encoding='utf-8') as f:
+            faqs = json.load(f)['faqs']
+        hours = format_opening_hours(opening_hours)
+        return cls([FAQEntry(faq['question'], faq['answer'].replace(OPENING_HOURS_PLACEHOLDER, hours),
+                             tuple(faq.get('alternatives', ()))) for faq in faqs])
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def search(self, query: str, limit: int = 3) -> list[FAQMatch]:
+        """The entries best matching `query`, best first."""
+        terms = set(tokenize(query))
+        scores: dict[int, float] = {}
+        matched_idf: dict[int, float] = {}
+        for term in terms:
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for entry_idx, weight in self._postings[term]:
+                scores[entry_idx] = scores.get(entry_idx, 0) + weight
+                matched_idf[entry_idx] = matched_idf.get(entry_idx, 0) + idf
+        query_idf = sum(self._idf.get(term, self._max_idf) for term in terms)
+        best = sorted(scores, key=scores.__getitem__, reverse=True)[:limit]
+        return [FAQMatch(self.entries[entry_idx], scores[entry_idx], matched_idf[entry_idx] / query_idf)
+                for entry_idx in best]
+
+    def confident_match(self, query: str) -> FAQMatch | None:
+        """The entry answering `query` with high confidence, or None."""
+        matches = self.search(query, limit=2)
+        return matches[0] if is_confident(matches) else None
+
+
+def is_confident(matches: list[FAQMatch]) -> bool:
+    """Whether the first of the `matches` of a query (best first) answers it, see `MIN_CONFIDENCE` and `MIN_MARGIN`."""
+    if not matches or matches[0].confidence < MIN_CONFIDENCE:
+        return False
+    return len(matches) == 1 or matches[0].score >= MIN_MARGIN * matches[1].score
+
+
+# Index of each knowledge file, by absolute path and opening hours
+_indexes: dict[tuple, FAQIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_faq_index(path: str = FAQ_PATH,
+                  opening_hours: dict[int, tuple[float, float]] = SALON_OPENING_HOURS) -> FAQIndex:
+    """
+    The index of the knowledge file at `path` for a salon open `opening_hours`, built on first use (the
+    service builds them at startup).
+    """
+    key = (os.path.abspath(path), tuple(sorted((weekday, tuple(hours)) for weekday, hours in opening_hours.items())))
+    index = _indexes.get(key)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(key)
+            if index is None:
+                t0 = time.perf_counter()
+                index = _indexes[key] = FAQIndex.load(path, opening_hours)
+                logger.info('Indexed %d FAQ entries of %s in %.1f ms', len(index), path,
+                            (time.perf_counter() - t0) * 1e3)
+    return index
@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from langchain_core.messages import (
+    BaseMessage,
+    HumanMessage,
+    RemoveMessage,
+    ToolMessage,
+    trim_messages
+)
+from langchain_core.messages.utils import count_tokens_approximately
+
+if TYPE_CHECKING:
+    # Only for the annotations: importing the chat models pulls in LangSmith, slow to import
+    from langchain_core.language_models import BaseChatModel
+
+STALE_TOOL_RESULT_CONTENT = '[Result omitted: outdated tool output from an earlier turn]'
+SUMMARY_PROMPT = """Summarize the conversation below between a hair salon booking assistant and a customer, for the assistant to continue it.
+Keep every detail still relevant: the customer's name and phone number, booking IDs, dates and times, and what was requested, booked, rescheduled or cancelled. Be concise.
+
+{previous_summary}Conversation:
+{conversation}"""
+SUMMARY_MESSAGE = 'Summary of the earlier conversation with the customer:\n{summary}'
+
+
+@dataclass(frozen=True)
+class HistoryConfig:
+    """
+    How the conversation history is bounded before it is sent to the LLM. `None` disables a step.
+    """
+
+    # Token budget of the conversation history in each LLM call; the oldest turns beyond it are not sent
+    max_prompt_tokens: int | None = 6000
+    # Tool results older than this many user turns are replaced by a short placeholder
+    tool_results_max_age_turns: int | None = 2
+    # Summarize the older turns into a rolling summary once the history exceeds this many tokens
+    summarize_above_tokens: int | None = None
+    # Number of recent user turns kept verbatim when summarizing
+    summarize_keep_turns: int = 4
+
+
+def _turn_starts(messages: list[BaseMessage]) -> list[int]:
+    return [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+
+
+def drop_stale_tool_results(messages: list[BaseMessage], max_age_turns: int) -> list[BaseMessage]:
+    """Returns the updated copies of the tool messages older than `max_age_turns` user turns."""
+    turn_starts = _turn_starts(messages)
+    if len(turn_starts) <= max_age_turns:
+        return []
+    cutoff = turn_starts[-max_age_turns] if max_age_turns > 0 else len(messages)
+    return [
+        message.model_copy(update={'content': STALE_TOOL_RESULT_CONTENT})
+        for message in messages[:cutoff]
+        if isinstance(message, ToolMessage) and message.content != STALE_TOOL_RESULT_CONTENT
+    ]
+
+
+def summarize_old_turns(
+        llm: 'BaseChatModel',
+        messages: list[BaseMessage],
+        previous_summary: str | None,
+        keep_turns: int) -> tuple[str, list[BaseMessage]] | None:
+    """
+    Summarizes the messages before the last `keep_turns` user turns, cutting on a turn boundary
+    so that tool calls stay with their results.
+
+    Returns:
+        The new summary and the summarized messages, or None if there is nothing to summarize.
+    """
+    turn_starts = _turn_starts(messages)
+    if len(turn_starts) <= keep_turns:
+        return None
+    old_messages = messages[:turn_starts[-keep_turns]]
+    conversation = '\n'.join(f'{message.type}: {message.text()}' for message in old_messages)
+    response = llm.invoke(SUMMARY_PROMPT.format(
+        previous_summary=f'Summary so far:\n{previous_summary}\n\n' if previous_summary else '',
+        conversation=conversation
+    ))
+    return response.text(), old_messages
+
+
+def history_updates(
+        llm: 'BaseChatModel',
+        config: HistoryConfig,
+        messages: list[BaseMessage],
+        previous_summary: str | None) -> dict:
+    """Graph state updates bounding the stored history: placeholders for stale tool results and rolling summary."""
+    updates = {}
+    if config.tool_results_max_age_turns is not None:
+        stale_results = drop_stale_tool_results(messages, config.tool_results_max_age_turns)
+        if stale_results:
+            updates['messages'] = stale_results
+            stale_by_id = {message.id: message for message in stale_results}
+            messages = [stale_by_id.get(message.id, message) for message in messages]
+
+    if config.summarize_above_tokens is not None and \
+            count_tokens_approximately(messages) > config.summarize_above_tokens:
+        summarized = summarize_old_turns(llm, messages, previous_summary, config.summarize_keep_turns)
+        if summarized is not None:
+            summary, old_messages = summarized
+            old_ids = {message.id for message in old_messages}
+            updates['summary'] = summary
+            updates['messages'] = [
+                message for message in updates.get('messages', []) if message.id not in old_ids
+            ] + [RemoveMessage(id=message_id) for message_id in old_ids]
+    return updates
+
+
+def prompt_history(config: HistoryConfig, messages: list[BaseMessage], summary: str | None) -> list:
+    """The conversation history sent to the LLM: the rolling summary, then the latest turns within the token budget."""
+    if config.max_prompt_tokens is not None:
+        trimmed_messages = trim_messages(
+            messages,
+            max_tokens=config.max_prompt_tokens,
+            token_counter=count_tokens_approximately,
+            strategy='last',
+            start_on='human',
+            allow_partial=False
+        )
+        # The current turn is always sent, even if it exceeds the budget on its own
+        turn_starts = _turn_starts(messages)
+        messages = trimmed_messages or (messages[turn_starts[-1]:] if turn_starts else messages)
+    if summary:
+        return [{'role': 'developer', 'content': SUMMARY_MESSAGE.format(summary=summary)}] + messages
+    return messages
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from agents.booking_agent import metrics
+
+logger = logging.getLogger(__name__)
+# Provider errors worth retrying: rate limited, overloaded or failing, the request timing out or the connection failing
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})
+RETRYABLE_ERROR_NAMES = frozenset({'APIConnectionError', 'APITimeoutError'})
+# Raised by `asyncio.wait_for`, distinct from the builtin `TimeoutError` before Python 3.11
+TIMEOUT_ERRORS = (TimeoutError, asyncio.TimeoutError)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether a failed LLM call may succeed if retried (matched without importing the OpenAI client)."""
+    if isinstance(error, TIMEOUT_ERRORS):
+        return True
+    if type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    return getattr(error, 'status_code', None) in RETRYABLE_STATUS_CODES
+
+
+class _Waiter:
+    """A caller waiting for a slot: an event (sync caller) or a future of its event loop (async caller)."""
+
+    __slots__ = ('event', 'future', 'loop', 'granted')
+
+    def __init__(self, loop: asyncio.AbstractEventLoop | None = None):
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+        self.granted = False
+
+    def grant(self):
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_set_result, self.future)
+
+
+def _observe_slot_wait(secs: float):
+    if metrics.metrics_enabled():
+        metrics.LLM_SLOT_WAIT.observe(secs)
+
+
+def _set_result(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _Slots:
+    """
+    Counting semaphore shared by the sync callers (threads) and the async ones (of any event loop),
+    handing the freed slots over in arrival order.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._used = 0
+        self._waiters: deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, waiter: _Waiter) -> bool:
+        with self._lock:
+            if self._used < self.size and not self._waiters:
+                self._used += 1
+                return True
+            self._waiters.append(waiter)
+            return False
+
+    def acquire(self):
+        waiter = _Waiter()
+        if not self._try_acquire(waiter):
+            waiter.event.wait()
+
+    async def aacquire(self):
+        waiter = _Waiter(asyncio.get_running_loop())
+        if self._try_acquire(waiter):
+            return
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                if not waiter.granted:
+                    self._waiters.remove(waiter)
+                    raise
+            # Handed a slot while being cancelled
+            self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # The slot goes to the next waiter: the count of used slots is unchanged
+                self._waiters.popleft().grant()
+            else:
+                self._used -= 1
+
+
+@dataclass
+class LLMCallLimiter:
+    """
+    Bounds the LLM calls of the process: at most `max_concurrency` run at once (the others wait for a slot,
+    in arrival order), each is abandoned after `timeout_secs`, and those failing with a retryable error
+    (rate limited, overloaded, timed out, see `is_retryable`) are retried `max_retries` times, after an
+    exponential backoff with jitter during which they do not hold a slot.
+    """
+
+    # None: unbounded
+    max_concurrency: int | None = 16
+    # Of each attempt, queueing for a slot excluded (None: no timeout)
+    timeout_secs: float | None = 30
+    max_retries: int = 2
+    backoff_secs: float = 0.5
+    max_backoff_secs: float = 8
+
+    def __post_init__(self):
+        self._slots = _Slots(self.max_concurrency) if self.max_concurrency is not None else None
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self.max_backoff_secs, self.backoff_secs * 2 ** attempt) * random.uniform(0.5, 1)
+
+    def _retry(self, attempt: int, error: BaseException) -> float | None:
+        """The backoff before the next attempt, or None if the error is final."""
+        if attempt >= self.max_retries or not is_retryable(error):
+            return None
+        reason = 'timeout' if isinstance(error, TIMEOUT_ERRORS) else 'error'
+        if metrics.metrics_enabled():
+            metrics.LLM_RETRIES.inc(reason)
+        backoff = self._backoff(attempt)
+        logger.warning('LLM call failed (%s), retrying in %.2fs: %r', reason, backoff, error)
+        return backoff
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Runs the blocking LLM call `fn(*args, **kwargs)` within the limits. The timeout is left to the client
+        (set by `BookingAgent` on the default model), as a blocking call cannot be abandoned.
+        """
+        for attempt in range(self.max_retries + 1):
+            if self._slots is not None:
+                t0 = time.perf_counter()
+                self._slots.acquire()
+                _observe_slot_wait(time.perf_counter() - t0)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                backoff = self._retry(attempt, e)
+                if backoff is None:
+                    raise
+            finally:
+                if self._slots is not None:
+                    self._slots.release()
+            time.sleep(backoff)
+
+    async def acall(self, fn, *args, **kwargs):
+        """Awaits the LLM call `fn(*args, **kwargs)` within the limits."""
+        for attempt in range(self.max_retries + 1):
+            if self._slots is not None:
+                t0 = time.perf_counter()
+                await self._slots.aacquire()
+                _observe_slot_wait(time.perf_counter() - t0)
+            try:
+                return await asyncio.wait_for(fn(*args, **kwargs), self.timeout_secs)
+            except Exception as e:
+                backoff = self._retry(attempt, e)
+                if backoff is None:
+                    raise
+            finally:
+                if self._slots is not None:
+                    self._slots.release()
+            await asyncio.sleep(backoff)
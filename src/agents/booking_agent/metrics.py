@@ -0,0 +1,354 @@
+import bisect
+import logging
+import threading
+import time
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets (seconds), from sub-millisecond SQL statements to multi-second LLM calls
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+ITERATION_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13)
+
+_enabled = True
+
+
+def set_metrics_enabled(enabled: bool):
+    """Turns the collection of all the metrics on or off (on by default)."""
+    global _enabled
+    _enabled = enabled
+
+
+def metrics_enabled() -> bool:
+    return _enabled
+
+
+def _format_labels(labelnames: tuple, labelvalues: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if not isinstance(value, int) else str(value)
+
+
+class Counter:
+    """Monotonic counter, one series per combination of label values."""
+
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for labelvalues, value in values:
+            yield f'{self.name}_total{_format_labels(self.labelnames, labelvalues)} {_format_value(value)}'
+
+
+class Histogram:
+    """Cumulative histogram of observations, one series per combination of label values."""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # Label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues):
+        bucket_idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0, 0]
+            series[0][bucket_idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labelvalues) -> int:
+        series = self._series.get(labelvalues)
+        return series[2] if series else 0
+
+    def sum(self, *labelvalues) -> float:
+        series = self._series.get(labelvalues)
+        return series[1] if series else 0
+
+    def total_count(self) -> int:
+        """Number of observations across all the label values."""
+        with self._lock:
+            return sum(count for _, _, count in self._series.values())
+
+    def samples(self):
+        with self._lock:
+            series = [(labelvalues, list(counts), total, count)
+                      for labelvalues, (counts, total, count) in self._series.items()]
+        for labelvalues, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                le_label = f'le="{le}"'
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le_label)} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, labelvalues)} {_format_value(total)}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, labelvalues)} {count}'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """All the metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+TURN_DURATION = REGISTRY.histogram(
+    'booking_agent_turn_duration_seconds', 'Duration of an agent turn (one graph run).')
+NODE_DURATION = REGISTRY.histogram(
+    'booking_agent_node_duration_seconds', 'Duration of the graph nodes.', ('node',))
+TOOL_DURATION = REGISTRY.histogram(
+    'booking_agent_tool_duration_seconds', 'Duration of the tool calls.', ('tool', 'status'))
+LLM_DURATION = REGISTRY.histogram(
+    'booking_agent_llm_duration_seconds', 'Duration of the LLM calls, by calling node.', ('node',))
+LLM_TOKENS = REGISTRY.counter(
+    'booking_agent_llm_tokens',
+    'LLM tokens, by calling node and type (input, cached_input: input read from the provider prompt cache, or output).',
+    ('node', 'type'))
+LLM_PROMPT_TOKENS = REGISTRY.histogram(
+    'booking_agent_llm_prompt_tokens', 'Input tokens of the LLM calls, by calling node.', ('node',),
+    buckets=TOKEN_BUCKETS)
+LLM_PROMPT_CACHE = REGISTRY.counter(
+    'booking_agent_llm_prompt_cache',
+    'LLM calls by calling node and provider prompt cache result (hit: part of the prompt was read from the cache).',
+    ('node', 'result'))
+TURN_TOKENS = REGISTRY.histogram(
+    'booking_agent_turn_tokens', 'LLM tokens (input and output) used by an agent turn.', buckets=TOKEN_BUCKETS)
+TURN_ITERATIONS = REGISTRY.histogram(
+    'booking_agent_turn_llm_calls', 'Agent loop iterations (LLM calls) in an agent turn.', buckets=ITERATION_BUCKETS)
+SQL_DURATION = REGISTRY.histogram(
+    'booking_agent_sql_duration_seconds', 'Duration of the SQLite statements.', ('statement',))
+READ_CACHE = REGISTRY.counter(
+    'booking_agent_read_cache_lookups', 'Lookups of the read cache, by cache and result (hit or miss).',
+    ('cache', 'result'))
+READ_CACHE_INVALIDATIONS = REGISTRY.counter(
+    'booking_agent_read_cache_invalidations', 'Invalidations of the read cache after a change, by cache.', ('cache',))
+LLM_SLOT_WAIT = REGISTRY.histogram(
+    'booking_agent_llm_slot_wait_seconds', 'Time the LLM calls waited for a slot of the concurrency limit.')
+LLM_RETRIES = REGISTRY.counter(
+    'booking_agent_llm_retries', 'LLM calls retried, by reason (timeout or error).', ('reason',))
+TURN_QUEUE_WAIT = REGISTRY.histogram(
+    'booking_agent_turn_queue_wait_seconds', 'Time the admitted chat turns waited before running.')
+TURNS_REJECTED = REGISTRY.counter(
+    'booking_agent_turns_rejected', 'Chat turns rejected by the admission control, by reason (queue_full or '
+    'queue_timeout).', ('reason',))
+ERRORS = REGISTRY.counter(
+    'booking_agent_errors', 'Errors, by component.', ('component',))
+
+_statement_names = {}
+
+
+def register_sql_statements(statements: dict):
+    """
+    Names the SQL statements in the `statement` label of the SQL metrics, e.g. with the module
+    globals: every `<NAME>_QUERY` string is reported as `<name>`. Other statements are
+    reported by their first keyword (e.g. `begin`, `pragma`).
+    """
+    for name, value in statements.items():
+        if name.endswith('_QUERY') and isinstance(value, str):
+            _statement_names[value] = name[:-len('_QUERY')].lower()
+
+
+def sql_statement_name(sql: str) -> str:
+    name = _statement_names.get(sql)
+    if name is None:
+        keyword = sql.split(None, 1)
+        name = keyword[0].rstrip(';').lower() if keyword else 'empty'
+    return name
+
+
+def _is_graph_node(name: str, tags: list | None, metadata: dict | None) -> bool:
+    # Node runs are tagged with their step; the runnables inside a node share its metadata
+    return bool(metadata) and metadata.get('langgraph_node') == name and \
+        any(tag.startswith('graph:step:') for tag in tags or ())
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Records the duration of the agent turns, graph nodes, tool calls and LLM calls, and the
+    LLM token usage (with the input tokens read from the provider prompt cache) and
+    iterations of each turn, from the callbacks of a graph run.
+
+    With `log_turns`, each completed turn is also logged with its breakdown (logger
+    `agents.booking_agent.metrics`, level INFO, fields in the record `extra`), for structured logs.
+    """
+
+    # Only bookkeeping in memory: called inline rather than on an executor under async runs
+    run_inline = True
+
+    def __init__(self, log_turns: bool = False):
+        self.log_turns = log_turns
+        # Run ID -> (kind, label, start time, root run ID)
+        self._runs = {}
+        # Root run ID -> per-turn totals
+        self._turns = {}
+
+    def _start(self, run_id: UUID, parent_run_id: UUID | None, kind: str, label):
+        root_id = run_id if parent_run_id is None else self._root(parent_run_id)
+        self._runs[run_id] = (kind, label, time.perf_counter(), root_id)
+
+    def _root(self, run_id: UUID) -> UUID:
+        run = self._runs.get(run_id)
+        return run[3] if run is not None else run_id
+
+    def _end(self, run_id: UUID):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return None, None, 0, None
+        kind, label, t0, root_id = run
+        return kind, label, time.perf_counter() - t0, root_id
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        if not _enabled:
+            return
+        name = kwargs.get('name')
+        if parent_run_id is None:
+            self._start(run_id, None, 'turn', name)
+            self._turns[run_id] = {
+                'llm_calls': 0, 'input_tokens': 0, 'cached_input_tokens': 0, 'output_tokens': 0, 'nodes': {}}
+        elif _is_graph_node(name, tags, metadata):
+            self._start(run_id, parent_run_id, 'node', name)
+        else:
+            # Tracked only to attribute the nested runs to their turn
+            self._start(run_id, parent_run_id, 'chain', name)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        kind, label, duration, root_id = self._end(run_id)
+        if kind == 'node':
+            NODE_DURATION.observe(duration, label)
+            turn = self._turns.get(root_id)
+            if turn is not None:
+                turn['nodes'][label] = turn['nodes'].get(label, 0) + duration
+        elif kind == 'turn':
+            self._end_turn(run_id, duration, error=None)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        kind, label, duration, root_id = self._end(run_id)
+        if kind == 'node':
+            NODE_DURATION.observe(duration, label)
+        elif kind == 'turn':
+            ERRORS.inc('agent')
+            self._end_turn(run_id, duration, error=error)
+
+    def _end_turn(self, run_id: UUID, duration: float, error: BaseException | None):
+        turn = self._turns.pop(run_id, None)
+        if turn is None:
+            return
+        TURN_DURATION.observe(duration)
+        TURN_ITERATIONS.observe(turn['llm_calls'])
+        TURN_TOKENS.observe(turn['input_tokens'] + turn['output_tokens'])
+        if self.log_turns:
+            logger.info('Agent turn completed', extra={
+                'event': 'turn',
+                'duration_secs': round(duration, 6),
+                'error': repr(error) if error is not None else None,
+                'llm_calls': turn['llm_calls'],
+                'input_tokens': turn['input_tokens'],
+                'cached_input_tokens': turn['cached_input_tokens'],
+                'output_tokens': turn['output_tokens'],
+                'node_duration_secs': {node: round(secs, 6) for node, secs in turn['nodes'].items()},
+            })
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        if _enabled:
+            self._start(run_id, parent_run_id, 'tool', serialized.get('name'))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        kind, label, duration, _ = self._end(run_id)
+        if kind == 'tool':
+            TOOL_DURATION.observe(duration, label, 'success')
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        kind, label, duration, _ = self._end(run_id)
+        if kind == 'tool':
+            TOOL_DURATION.observe(duration, label, 'error')
+            ERRORS.inc('tool')
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        if _enabled:
+            self._start(run_id, parent_run_id, 'llm', (metadata or {}).get('langgraph_node', 'none'))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        kind, node, duration, root_id = self._end(run_id)
+        if kind != 'llm':
+            return
+        LLM_DURATION.observe(duration, node)
+        usage = {}
+        message = getattr(response.generations[0][0], 'message', None) if response.generations else None
+        if message is not None and getattr(message, 'usage_metadata', None):
+            usage = message.usage_metadata
+        cached_tokens = usage.get('input_token_details', {}).get('cache_read', 0)
+        LLM_TOKENS.inc(node, 'input', amount=usage.get('input_tokens', 0))
+        LLM_TOKENS.inc(node, 'cached_input', amount=cached_tokens)
+        LLM_TOKENS.inc(node, 'output', amount=usage.get('output_tokens', 0))
+        if 'input_tokens' in usage:
+            LLM_PROMPT_TOKENS.observe(usage['input_tokens'], node)
+            LLM_PROMPT_CACHE.inc(node, 'hit' if cached_tokens else 'miss')
+
+        turn = self._turns.get(root_id)
+        if turn is not None:
+            turn['llm_calls'] += node == 'llm_call'
+            turn['input_tokens'] += usage.get('input_tokens', 0)
+            turn['cached_input_tokens'] += cached_tokens
+            turn['output_tokens'] += usage.get('output_tokens', 0)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        kind, node, duration, _ = self._end(run_id)
+        if kind == 'llm':
+            LLM_DURATION.observe(duration, node)
+            ERRORS.inc('llm')
@@ -0,0 +1,64 @@
+import datetime
+import hashlib
+import json
+from typing import Callable
+
+from langchain_core.messages import SystemMessage
+from langchain_core.tools import BaseTool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+import pytz
+
+from agents.booking_agent.database.utils import SALON_TIMEZONE
+from agents.booking_agent.prompts import AGENT_SYSTEM_MESSAGE_PROMPT, CURRENT_DATETIME_PROMPT, DEFAULT_PROMPT_VARIABLES
+
+
+def _developer_message(content: str) -> SystemMessage:
+    # Same message as the {'role': 'developer', ...} dict once converted by the chat model
+    return SystemMessage(content=content, additional_kwargs={'__openai_role__': 'developer'})
+
+
+class PromptBuilder:
+    """
+    Assembles the messages of each LLM call of the agent.
+
+    The providers cache the longest prefix of a prompt already seen (the tool definitions,
+    then the messages), so everything that does not change between calls is built once
+    and kept byte-identical: the tool JSON schemas and the system message. The current
+    date and time, which changes on every call, is appended as a small developer message
+    after the conversation history instead of being formatted into the system message.
+    """
+
+    def __init__(
+            self,
+            tools: list[BaseTool],
+            timezone: str = SALON_TIMEZONE,
+            clock: Callable[[datetime.tzinfo], datetime.datetime] = datetime.datetime.now,
+            prompt_variables: dict[str, str] | None = None):
+        """
+        Args:
+            tools (list[BaseTool]): Tools bound to the chat model, converted once to their JSON schemas.
+            timezone (str): Timezone of the current date and time given to the model.
+            clock (Callable): Returns the current datetime in the given timezone (`datetime.now` by default).
+            prompt_variables (dict, optional): Overrides of `DEFAULT_PROMPT_VARIABLES` in the system message
+                (e.g. the name of the salon).
+        """
+        self.tool_schemas = [convert_to_openai_tool(tool) for tool in tools]
+        self.system_message = _developer_message(
+            AGENT_SYSTEM_MESSAGE_PROMPT.format(**{**DEFAULT_PROMPT_VARIABLES, **(prompt_variables or {})}))
+        self._tz = pytz.timezone(timezone)
+        self._clock = clock
+        self.prefix_fingerprint = hashlib.sha256(self.static_prefix()).hexdigest()[:16]
+
+    def static_prefix(self) -> bytes:
+        """The part of every prompt that never changes (tool schemas and system message), serialized."""
+        return json.dumps(
+            {'tools': self.tool_schemas, 'system': self.system_message.content},
+            sort_keys=True, separators=(',', ':')).encode()
+
+    def current_datetime_message(self) -> SystemMessage:
+        now = self._clock(self._tz).replace(microsecond=0)
+        return _developer_message(CURRENT_DATETIME_PROMPT.format(current_dt_iso=now.isoformat()))
+
+    def build(self, history: list) -> list:
+        """Returns the messages of an LLM call: system message, conversation history, then the current datetime."""
+        return [self.system_message, *history, self.current_datetime_message()]
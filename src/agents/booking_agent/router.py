@@ -0,0 +1,193 @@
+import datetime
+import re
+import uuid
+import pytz
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import BaseTool
+from langgraph.graph import END
+from langgraph.prebuilt.tool_node import msg_content_output
+
+from agents.booking_agent.faq import get_faq_index
+from agents.booking_agent.tenancy import current_tenant
+from agents.booking_agent.utils import find_datetime_in_text
+
+BOOKING_ID_PATTERN = re.compile(r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b', re.IGNORECASE)
+PHONE_NUMBER_PATTERN = re.compile(r'\+?\d[\d\s().-]{7,}\d')
+CANCEL_PATTERN = re.compile(r'\bcancel\b', re.IGNORECASE)
+LIST_BOOKINGS_PATTERN = re.compile(
+    r'\b(what|which|show|list|see|check|view|do i have)\b.*\b(bookings|appointments)\b', re.IGNORECASE)
+AVAILABILITY_PATTERN = re.compile(r'\b(free|available|open)\b', re.IGNORECASE)
+# Negations and other requests in the same message are left to the LLM
+AMBIGUOUS_PATTERN = re.compile(
+    r"\b(not|don't|dont|never|instead|but|book|reschedule|move|change|and)\b", re.IGNORECASE)
+# A plain confirmation of the previous question, alone in the message
+AFFIRMATIVE_PATTERN = re.compile(
+    r"^\W*(yes|yeah|yep|sure|ok|okay|correct|confirm|confirmed|go ahead|please do)"
+    r"(\W+(please|go ahead|cancel it|do it|thanks|thank you))*\W*$", re.IGNORECASE)
+# Tools changing a booking: the fast path asks the user to confirm the call before making it
+CONFIRM_FIRST_TOOLS = frozenset({'cancel_appointment'})
+# Key of the `additional_kwargs` of a confirmation question holding the tool call it is about
+PENDING_TOOL_CALL_KEY = 'fast_path_pending_tool_call'
+
+FAST_PATH_REPLIES = {
+    'confirm_cancel': "Just to confirm, would you like me to cancel your appointment with booking ID {booking_id}? "
+                      "Please reply yes to go ahead.",
+    'cancelled': "Done! Your appointment (booking ID {booking_id}) has been cancelled. "
+                 "Is there anything else I can help you with?",
+    'not_cancelled': "I couldn't find an active booking with the ID {booking_id}. Could you double-check it, "
+                     "or share your phone number so I can look up your appointments?",
+    'bookings': "Here are your upcoming appointments:\n{bookings}\n\nWould you like to make any changes?",
+    'no_bookings': "I couldn't find any upcoming appointments for {phone_number}. Would you like to book one?",
+    'available': "Good news, {appointment_dt} is available! Would you like to go ahead with it?",
+    'faq': "{answer}\n\nIs there anything else I can help you with?",
+}
+
+
+def _human_readable(iso_dt_str: str) -> str:
+    dt = datetime.datetime.fromisoformat(iso_dt_str)
+    return f"{dt:%A, %B} {dt.day} at {dt:%I:%M %p}".replace(' at 0', ' at ')
+
+
+class FastPathRouter:
+    """
+    Answers the high-confidence structured requests of a turn by calling the matching tool directly,
+    without an LLM call. Supported requests (alone in the message):
+        - cancel a booking by ID: "cancel booking 3f2b...", in two turns: the router first asks the user
+          to confirm, and only cancels if the next message is a plain "yes" (anything else goes to the LLM,
+          which sees the question in the conversation).
+        - list the active bookings of a phone number: "what are my bookings? 647-555-0101".
+        - check a date and time: "is tomorrow 3pm free?".
+        - a question about the salon answered by an entry of its knowledge file with high confidence:
+          "what time do you close on fridays?" (see `agents.booking_agent.faq`).
+
+    The tool call and its result are added to the conversation as if the LLM had made them, followed by
+    a templated reply. Anything else, or a result needing more than a templated reply (e.g. an unavailable
+    slot, for which alternatives are offered), falls back to the LLM.
+    """
+
+    def __init__(self, tools: list[BaseTool]):
+        self._tools_by_name = {tool.name: tool for tool in tools}
+
+    def match(self, text: str) -> dict | None:
+        """Returns the tool call answering the user message `text`, or None if it is not a fast-path request."""
+        if AMBIGUOUS_PATTERN.search(text):
+            return None
+
+        booking_ids = BOOKING_ID_PATTERN.findall(text)
+        phone_numbers = PHONE_NUMBER_PATTERN.findall(BOOKING_ID_PATTERN.sub('', text))
+        if CANCEL_PATTERN.search(text):
+            if len(booking_ids) != 1 or phone_numbers:
+                return None
+            return self._tool_call('cancel_appointment', booking_id_to_cancel=booking_ids[0].lower())
+
+        if booking_ids:
+            return None
+        if LIST_BOOKINGS_PATTERN.search(text):
+            if len(phone_numbers) != 1:
+                return None
+            return self._tool_call('retrieve_active_bookings_user', user_phone_number=phone_numbers[0].strip())
+
+        # Before the availability checks: "are you open on sundays?" is not about a slot. A date or time
+        # in the message makes the FAQ match uncertain.
+        tenant = current_tenant.get()
+        if 'answer_faq' in self._tools_by_name and not phone_numbers and \
+                get_faq_index(tenant.faq_file, tenant.opening_hours).confident_match(text) is not None:
+            return self._tool_call('answer_faq', question=text)
+
+        if AVAILABILITY_PATTERN.search(text) and not phone_numbers:
+            # In the timezone of the salon being served
+            now = datetime.datetime.now(tz=pytz.timezone(tenant.timezone))
+            appointment_dt = find_datetime_in_text(text, now)
+            if appointment_dt is None:
+                return None
+            return self._tool_call('check_availability', appointment_start_dt=appointment_dt.isoformat())
+        return None
+
+    def _tool_call(self, name: str, **args) -> dict | None:
+        if name not in self._tools_by_name:
+            return None
+        return {'name': name, 'args': args, 'id': f'call_{uuid.uuid4().hex[:24]}', 'type': 'tool_call'}
+
+    @staticmethod
+    def reply(tool_call: dict, result) -> str | None:
+        """Templated reply to the result of a fast-path tool call, or None to let the LLM reply."""
+        args = tool_call['args']
+        if tool_call['name'] == 'cancel_appointment':
+            key = 'cancelled' if result is True else 'not_cancelled'
+            return FAST_PATH_REPLIES[key].format(booking_id=args['booking_id_to_cancel'])
+
+        if tool_call['name'] == 'retrieve_active_bookings_user':
+            if not result:
+                return FAST_PATH_REPLIES['no_bookings'].format(phone_number=args['user_phone_number'])
+            bookings = '\n'.join(
+                f"- {_human_readable(booking['start_datetime'])}: {booking['service']} with {booking['stylist']} "
+                f"(booking ID {booking['id']})" for booking in result)
+            return FAST_PATH_REPLIES['bookings'].format(bookings=bookings)
+
+        if tool_call['name'] == 'answer_faq' and result['confident']:
+            return FAST_PATH_REPLIES['faq'].format(answer=result['faqs'][0]['answer'])
+
+        if tool_call['name'] == 'check_availability' and result.get('status') == 'available':
+            return FAST_PATH_REPLIES['available'].format(
+                appointment_dt=_human_readable(args['appointment_start_dt']))
+        return None
+
+    def _messages(self, tool_call: dict, result) -> dict:
+        # Same tool message as `tool_node` would add
+        tool_message = ToolMessage(
+            content=msg_content_output(result), name=tool_call['name'], tool_call_id=tool_call['id'])
+        reply = self.reply(tool_call, result)
+        messages = [AIMessage(content='', tool_calls=[tool_call]), tool_message]
+        if reply is not None:
+            messages.append(AIMessage(content=reply))
+        return {'messages': messages}
+
+    @staticmethod
+    def _confirmation(tool_call: dict) -> dict:
+        """Asks the user to confirm `tool_call`, kept in the question for the next turn."""
+        reply = FAST_PATH_REPLIES['confirm_cancel'].format(booking_id=tool_call['args']['booking_id_to_cancel'])
+        return {'messages': [AIMessage(
+            content=reply,
+            additional_kwargs={PENDING_TOOL_CALL_KEY: {'name': tool_call['name'], 'args': tool_call['args']}})]}
+
+    def _confirmed_tool_call(self, messages: list) -> dict | None:
+        """The tool call the previous reply asked to confirm, if the last user message confirms it."""
+        if len(messages) < 2 or not isinstance(messages[-2], AIMessage):
+            return None
+        pending = messages[-2].additional_kwargs.get(PENDING_TOOL_CALL_KEY)
+        if pending is None or not AFFIRMATIVE_PATTERN.match(messages[-1].text()):
+            return None
+        return self._tool_call(pending['name'], **pending['args'])
+
+    def _pending_tool_call(self, state) -> tuple[dict | None, bool]:
+        """The tool call answering the last user message, and whether the user confirmed it."""
+        message = state['messages'][-1]
+        if not isinstance(message, HumanMessage):
+            return None, False
+        tool_call = self._confirmed_tool_call(state['messages'])
+        if tool_call is not None:
+            return tool_call, True
+        return self.match(message.text()), False
+
+    def invoke(self, state) -> dict:
+        tool_call, confirmed = self._pending_tool_call(state)
+        if tool_call is None:
+            return {}
+        if tool_call['name'] in CONFIRM_FIRST_TOOLS and not confirmed:
+            return self._confirmation(tool_call)
+        return self._messages(tool_call, self._tools_by_name[tool_call['name']].invoke(tool_call['args']))
+
+    async def ainvoke(self, state) -> dict:
+        tool_call, confirmed = self._pending_tool_call(state)
+        if tool_call is None:
+            return {}
+        if tool_call['name'] in CONFIRM_FIRST_TOOLS and not confirmed:
+            return self._confirmation(tool_call)
+        return self._messages(tool_call, await self._tools_by_name[tool_call['name']].ainvoke(tool_call['args']))
+
+
+def fast_path_condition(state) -> str:
+    """Ends the turn if the fast path replied, otherwise hands it (with any fast-path tool result) to the LLM."""
+    message = state['messages'][-1]
+    return END if isinstance(message, AIMessage) and not message.tool_calls else 'llm_call'
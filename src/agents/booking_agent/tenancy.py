@@ -0,0 +1,124 @@
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable
+
+import pytz
+
+from agents.booking_agent.database.shards import ShardRouter
+from agents.booking_agent.faq import FAQ_PATH
+from agents.booking_agent.database.utils import DB_PATH, SALON_OPENING_HOURS, SALON_TIMEZONE
+
+DEFAULT_TENANT_ID = 'default'
+
+
+class UnknownTenantError(KeyError):
+    """Raised when a tenant id is not in the registry."""
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """A salon hosted by the service, with its own bookings database."""
+
+    id: str
+    # Bookings database of the salon, see `ShardRouter`
+    db_path: str = DB_PATH
+    # Timezone of the salon: of its opening hours and of the current datetime given to the model
+    timezone: str = SALON_TIMEZONE
+    # Opening hours (local time, 24h) per weekday, worked by the default stylist of a new database
+    opening_hours: dict[int, tuple[int, int]] = field(default_factory=lambda: dict(SALON_OPENING_HOURS))
+    # Overrides of the variables of the system message (see `prompts.DEFAULT_PROMPT_VARIABLES`)
+    prompt_variables: dict[str, str] = field(default_factory=dict)
+    # Knowledge file answering the questions about the salon (see `agents.booking_agent.faq`)
+    faq_file: str = FAQ_PATH
+
+
+# The single salon served without a tenant registry, on the default bookings database
+DEFAULT_TENANT = Tenant(id=DEFAULT_TENANT_ID)
+# Salon of the request being served: read by the tools, the prompt and the fast-path router. Set around
+# a graph run, it is seen by its nodes and tool calls (which run in copies of the current context).
+current_tenant: ContextVar[Tenant] = ContextVar('current_tenant', default=DEFAULT_TENANT)
+
+
+@contextmanager
+def use_tenant(tenant: Tenant):
+    """Serves the enclosed agent runs for `tenant`."""
+    token = current_tenant.set(tenant)
+    try:
+        yield tenant
+    finally:
+        current_tenant.reset(token)
+
+
+class TenantRegistry:
+    """
+    The salons hosted by the service, each routed to its own bookings database in `data_dir`
+    (see `ShardRouter`), opened on first use.
+    """
+
+    def __init__(self, tenants: list[dict], data_dir: str, on_open: Callable[[str], None] | None = None):
+        """
+        Args:
+            tenants (list[dict]): Settings of each salon: `id`, and optionally `timezone`, `opening_hours`
+                (`{weekday: [open_hr, close_hr]}`, Monday being 0), `prompt_variables` and `faq_file`.
+            data_dir (str): Directory of the bookings databases.
+            on_open (Callable, optional): Called with the path of each database once it is opened.
+
+        Raises:
+            ValueError: If a tenant id is invalid or duplicated, or a timezone unknown
+        """
+        self.router = ShardRouter(data_dir, on_open=on_open)
+        self._tenants: dict[str, Tenant] = {}
+        for settings in tenants:
+            tenant_id = settings['id']
+            if tenant_id in self._tenants:
+                raise ValueError(f"Duplicate tenant '{tenant_id}'")
+            timezone, opening_hours = settings.get('timezone', SALON_TIMEZONE), settings.get('opening_hours')
+            if timezone not in pytz.all_timezones_set:
+                raise ValueError(f"Unknown timezone '{timezone}' of tenant '{tenant_id}'")
+            self._tenants[tenant_id] = Tenant(
+                id=tenant_id,
+                db_path=self.router.db_path(tenant_id),
+                timezone=timezone,
+                opening_hours=(SALON_OPENING_HOURS if opening_hours is None else
+                               {int(weekday): tuple(hours) for weekday, hours in opening_hours.items()}),
+                prompt_variables=settings.get('prompt_variables', {}),
+                faq_file=settings.get('faq_file', FAQ_PATH),
+            )
+
+    @classmethod
+    def load(cls, path: str, data_dir: str, on_open: Callable[[str], None] | None = None) -> 'TenantRegistry':
+        """Reads the registry from a JSON file: `{"tenants": [{"id": ..., "timezone": ..., ...}, ...]}`."""
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f)['tenants'], data_dir, on_open=on_open)
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def __iter__(self):
+        return iter(self._tenants.values())
+
+    def get(self, tenant_id: str) -> Tenant:
+        """
+        Raises:
+            UnknownTenantError: If there is no such tenant
+        """
+        tenant = self._tenants.get(tenant_id)
+        if tenant is None:
+            raise UnknownTenantError(tenant_id)
+        return tenant
+
+    def is_open(self, tenant_id: str) -> bool:
+        return self.router.is_open(self.get(tenant_id).id)
+
+    def open(self, tenant_id: str) -> Tenant:
+        """
+        Returns the tenant once its bookings database is ready, creating it on first use.
+
+        Raises:
+            UnknownTenantError: If there is no such tenant
+        """
+        tenant = self.get(tenant_id)
+        self.router.open(tenant.id, timezone=tenant.timezone, opening_hours=tenant.opening_hours)
+        return tenant
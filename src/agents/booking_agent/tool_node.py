@@ -0,0 +1,75 @@
+"""
+`ToolNode` running the tool calls of an LLM turn concurrently, see `ParallelToolNode`.
+
+`ParallelToolNode` overrides private methods of the langgraph-prebuilt `ToolNode` (`_func`, `_afunc`)
+and calls others (`_parse_input`, `_run_one`, `_arun_one`, `_combine_tool_outputs`), whose signatures
+change between releases. Going through the public `invoke` once per tool call instead would lose what
+the node is for: the stock sync `_func` starts a new thread pool at each run, so each call would open
+its own SQLite connection, and the availability of the slots of a turn could not be checked in one
+query. langgraph-prebuilt is therefore pinned to the exact version these overrides are written against
+(`PREBUILT_VERSION`, as in `backend_service_requirements.txt`, checked by `tests/test_tool_node.py`):
+upgrading it means checking these signatures first.
+"""
+import asyncio
+from typing import Any
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import ContextThreadPoolExecutor, get_config_list
+from langgraph.prebuilt import ToolNode
+
+from agents.booking_agent.tools import check_availability, prefetch_availability, prefetched_availability
+
+# Tool calls of one LLM turn run concurrently
+DEFAULT_MAX_WORKERS = 8
+# Version of langgraph-prebuilt whose private `ToolNode` methods are overridden
+PREBUILT_VERSION = '0.1.8'
+
+
+class ParallelToolNode(ToolNode):
+    """
+    `ToolNode` running the tool calls of an LLM turn concurrently on a bounded pool of long-lived
+    threads, and checking the slots of several `check_availability` calls in one query.
+
+    The stock node starts a new thread pool at each sync run, so every tool call opens its own
+    SQLite connection (the pooled connections are per thread). The threads of this node are kept
+    across turns with their connections. Under `ainvoke`, the (sync) tools run in the default
+    executor of the event loop, whose threads are also reused, `max_workers` at a time.
+    """
+
+    def __init__(self, tools: list, max_workers: int = DEFAULT_MAX_WORKERS, **kwargs):
+        super().__init__(tools, **kwargs)
+        self.max_workers = max_workers
+        self._executor = ContextThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='booking-tools')
+
+    def _func(self, input, config: RunnableConfig, *, store=None) -> Any:
+        tool_calls, input_type = self._parse_input(input, store)
+        # Set before the calls are submitted: each call runs in a copy of the current context
+        token = prefetched_availability.set(prefetch_availability(tool_calls))
+        try:
+            if len(tool_calls) == 1:
+                outputs = [self._run_one(tool_calls[0], input_type, config)]
+            else:
+                outputs = [*self._executor.map(self._run_one, tool_calls, [input_type] * len(tool_calls),
+                                               get_config_list(config, len(tool_calls)))]
+        finally:
+            prefetched_availability.reset(token)
+        return self._combine_tool_outputs(outputs, input_type)
+
+    async def _afunc(self, input, config: RunnableConfig, *, store=None) -> Any:
+        tool_calls, input_type = self._parse_input(input, store)
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def run_one(call):
+            async with semaphore:
+                return await self._arun_one(call, input_type, config)
+
+        prefetched = None
+        if sum(call['name'] == check_availability.name for call in tool_calls) > 1:
+            prefetched = await asyncio.get_running_loop().run_in_executor(
+                self._executor, prefetch_availability, tool_calls)
+        token = prefetched_availability.set(prefetched)
+        try:
+            outputs = await asyncio.gather(*(run_one(call) for call in tool_calls))
+        finally:
+            prefetched_availability.reset(token)
+        return self._combine_tool_outputs(outputs, input_type)
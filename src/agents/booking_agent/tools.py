@@ -1,28 +1,39 @@
 import datetime
-import pytz
+from contextvars import ContextVar
 
 from langchain_core.tools import tool
-import parsedatetime
 
 from agents.booking_agent.database.utils import (
     add_booking,
+    are_slots_available,
+    find_available_slots as find_available_slots_db,
     is_slot_available,
     is_valid_timeslot,
     get_active_bookings_user,
     reschedule_booking,
-    cancel_booking
+    cancel_booking,
+    get_services,
+    get_stylist,
+    get_stylists,
+    SlotUnavailableError
 )
-from agents.booking_agent.utils import change_timezone_iso_dt
+from agents.booking_agent.faq import get_faq_index, is_confident
+from agents.booking_agent.tenancy import current_tenant
+from agents.booking_agent.utils import change_timezone_iso_dt, datetime_resolver
+
+# Availability of the slots of the `check_availability` calls being run, keyed by their
+# (appointment_start_dt, stylist, service_id) arguments, see `prefetch_availability`
+prefetched_availability: ContextVar[dict | None] = ContextVar('prefetched_availability', default=None)
 
 
 @tool
-def convert_relative_to_absolute_datetime(text: str, current_datetime: datetime) -> str | None:
+def convert_relative_to_absolute_datetime(text: str, current_datetime: str) -> str | None:
     """
     Converts a natural language date and time string into an absolute ISO 8601 datetime string.
 
     Args:
         text (str): A natural language expression with date and time (e.g., "next Wednesday at 4pm").
-        current_datetime (datetime): A timezone-aware datetime object to use as the reference point.
+        current_datetime (str): The current datetime, ISO 8601 with timezone, to use as the reference point.
 
     Returns:
         str | None: An ISO 8601 formatted datetime string if successful, otherwise None.
@@ -31,35 +42,83 @@ def convert_relative_to_absolute_datetime(text: str, current_datetime: datetime)
     if current_datetime.tzinfo is None:
         raise ValueError("current_datetime must be timezone-aware")
 
-    cal = parsedatetime.Calendar()
-    time_struct, parse_status = cal.parse(text, current_datetime.timetuple())
-
-    if parse_status == 0:
+    parsed_dt = datetime_resolver.resolve(text, current_datetime)
+    if parsed_dt is None:
         return
 
-    naive_dt = datetime.datetime(*time_struct[:6])
-    tz = current_datetime.tzinfo
+    return parsed_dt.isoformat()
 
-    # Localize if not timezone-aware
-    if naive_dt.tzinfo is None:
-        aware_dt = tz.localize(naive_dt) if hasattr(tz, 'localize') else naive_dt.replace(tzinfo=tz)
-    else:
-        aware_dt = naive_dt.astimezone(tz)
 
-    return aware_dt.isoformat()
+def _resolve_stylist(stylist: str | None, db_path: str) -> tuple[str | None, str | None]:
+    """Returns the id of the stylist given by id or name (None for any stylist), and the error if not found."""
+    if not stylist:
+        return None, None
+    found = get_stylist(stylist, db_path=db_path)
+    if found is None:
+        return None, f"There is no stylist '{stylist}'. Use `list_stylists_and_services` to get the stylists."
+    return found.id, None
+
+
+@tool
+def list_stylists_and_services() -> dict:
+    """
+    Lists the salon's stylists and services (with their duration in minutes).
+    Use it when the customer asks for a specific stylist or a service other than a haircut.
+
+    Returns:
+        dict: {
+            'stylists': list[dict] (id, name),
+            'services': list[dict] (id, name, duration_mins)
+        }
+    """
+    db_path = current_tenant.get().db_path
+    return {
+        'stylists': [{'id': stylist.id, 'name': stylist.name} for stylist in get_stylists(db_path=db_path)],
+        'services': [{'id': service.id, 'name': service.name, 'duration_mins': service.duration_mins}
+                     for service in get_services(db_path=db_path)],
+    }
 
 
 @tool
-def check_availability(appointment_start_dt: str) -> dict:
+def answer_faq(question: str) -> dict:
     """
-    Checks whether the given appointment start datetime is available for booking.
+    Looks up the salon's answers to frequently asked questions (opening hours, prices, policies, payment, ...).
+    Use it for any question about the salon that is not about the customer's own appointments.
+
+    Args:
+        question (str): The customer's question, in their words.
+
+    Returns:
+        dict: {
+            'status': 'found' or 'not_found',
+            'faqs': list[dict] (question, answer) of the best matching entries, best first,
+            'confident': bool, whether the first entry answers the question
+        }
+    """
+    tenant = current_tenant.get()
+    matches = get_faq_index(tenant.faq_file, tenant.opening_hours).search(question)
+    if not matches:
+        return {'status': 'not_found', 'faqs': [], 'confident': False}
+    return {
+        'status': 'found',
+        'faqs': [{'question': match.entry.question, 'answer': match.entry.answer} for match in matches],
+        'confident': is_confident(matches),
+    }
+
+
+@tool
+def check_availability(appointment_start_dt: str, stylist: str | None = None, service_id: str | None = None) -> dict:
+    """
+    Checks whether the given appointment start datetime is available for booking, with any stylist or a specific one.
 
     Args:
         appointment_start_dt (str): ISO 8601 datetime string with timezone.
+        stylist (str, optional): Id or name of the stylist requested by the customer. Omit for any stylist.
+        service_id (str, optional): Id of the service (default: haircut), which sets the appointment duration.
 
     Returns:
         dict: {
-            'status': 'available' | 'unavailable',
+            'status': 'available' | 'unavailable' | 'error',
             'reason': str (optional if unavailable)
         }
     """
@@ -67,22 +126,115 @@ def check_availability(appointment_start_dt: str) -> dict:
     if not is_valid:
         return {'status': 'error', 'reason': reason}
 
-    if not is_slot_available(appointment_start_dt):
-        return {'status': 'unavailable', 'reason': 'The requested timeslot is not available'}
+    db_path = current_tenant.get().db_path
+    stylist_id, reason = _resolve_stylist(stylist, db_path)
+    if reason is not None:
+        return {'status': 'error', 'reason': reason}
+
+    prefetched = prefetched_availability.get()
+    available = prefetched.get((appointment_start_dt, stylist, service_id)) if prefetched is not None else None
+    try:
+        if available is None:
+            available = is_slot_available(
+                appointment_start_dt, service_id=service_id, stylist_id=stylist_id, db_path=db_path)
+        if not available:
+            return {'status': 'unavailable', 'reason': 'The requested timeslot is not available'}
+    except ValueError as e:
+        return {'status': 'error', 'reason': str(e)}
 
     return {'status': 'available'}
 
 
+def prefetch_availability(tool_calls: list[dict]) -> dict | None:
+    """
+    Checks the slots of the `check_availability` calls of an LLM turn in one query (`are_slots_available`),
+    for the calls to be answered from the returned dict once set in `prefetched_availability`. Returns None
+    if there are less than two valid calls, or an unknown service: the calls then check their slot themselves.
+    """
+    args = {(call['args'].get('appointment_start_dt'), call['args'].get('stylist'), call['args'].get('service_id'))
+            for call in tool_calls if call['name'] == check_availability.name}
+    if len(args) < 2:
+        return None
+    db_path = current_tenant.get().db_path
+    slots, keys = [], []
+    for key in args:
+        appointment_start_dt, stylist, service_id = key
+        stylist_id, reason = _resolve_stylist(stylist, db_path)
+        if not isinstance(appointment_start_dt, str) or reason is not None \
+                or not is_valid_timeslot(appointment_start_dt)[0]:
+            continue
+        slots.append((appointment_start_dt, service_id, stylist_id))
+        keys.append(key)
+    if len(slots) < 2:
+        return None
+    try:
+        return dict(zip(keys, are_slots_available(slots, db_path=db_path)))
+    except ValueError:
+        return None
+
+
 @tool
-def book_appointment(appointment_start_dt: str, user_name: str, user_phone_number: str) -> dict:
+def find_available_slots(
+        range_start_dt: str,
+        range_end_dt: str,
+        limit: int = 5,
+        stylist: str | None = None,
+        service_id: str | None = None) -> dict:
     """
-    Books an appointment for a user at the specified date and time.
+    Finds the earliest available appointment slots within a datetime range (e.g., a whole day or week).
+    Use it when the customer is flexible or the requested timeslot is unavailable, instead of checking times one by one.
+
+    Args:
+        range_start_dt (str): Start of the search range, ISO 8601 datetime string with timezone.
+        range_end_dt (str): End of the search range, ISO 8601 datetime string with timezone.
+        limit (int): Maximum number of slots to return (default 5).
+        stylist (str, optional): Id or name of the stylist requested by the customer. Omit for any stylist.
+        service_id (str, optional): Id of the service (default: haircut), which sets the appointment duration.
+
+    Returns:
+        dict: {
+            'status': 'success' | 'error',
+            'available_slots': list[str] (ISO 8601 start datetimes, earliest first),
+            'reason': str (optional if error)
+        }
+    """
+    for dt_str in (range_start_dt, range_end_dt):
+        try:
+            if datetime.datetime.fromisoformat(dt_str).tzinfo is None:
+                return {'status': 'error', 'reason': 'The range datetimes must include timezone info.'}
+        except ValueError:
+            return {'status': 'error', 'reason': 'Invalid datetime format. Must be ISO 8601 with timezone.'}
+
+    db_path = current_tenant.get().db_path
+    stylist_id, reason = _resolve_stylist(stylist, db_path)
+    if reason is not None:
+        return {'status': 'error', 'reason': reason}
+
+    try:
+        available_slots = find_available_slots_db(
+            range_start_dt, range_end_dt, limit, service_id=service_id, stylist_id=stylist_id, db_path=db_path)
+    except ValueError as e:
+        return {'status': 'error', 'reason': str(e)}
+    return {'status': 'success', 'available_slots': available_slots}
+
+
+@tool
+def book_appointment(
+        appointment_start_dt: str,
+        user_name: str,
+        user_phone_number: str,
+        stylist: str | None = None,
+        service_id: str | None = None) -> dict:
+    """
+    Books an appointment for a user at the specified date and time, with any free stylist or a specific one.
 
     Args:
         appointment_start_dt (str): The appointment start datetime in ISO 8601 format WITH TIMEZONE (same timezone as current datetime)
             (e.g., '2025-04-23T16:00:00-04:00').
         user_name (str): The name of the user booking the appointment.
         user_phone_number (str): The user's phone number for contact or confirmation.
+        stylist (str, optional): Id or name of the stylist requested by the customer. Omit for any stylist.
+        service_id (str, optional): Id of the service (default: haircut).
 
         dict: A dictionary containing:
             - 'status' (str): 'success' if booking was successful, 'failure' otherwise.
@@ -94,18 +246,29 @@ def book_appointment(appointment_start_dt: str, user_name: str, user_phone_numbe
     """
 
     valid_dt, failure_reason = is_valid_timeslot(appointment_start_dt)
-    if valid_dt:
-        if is_slot_available(appointment_start_dt):
-            booking_id = add_booking(appointment_start_dt, user_name, user_phone_number)
-            if booking_id:
-                return {'status': 'success', 'booking_id': booking_id}
-            else:
-                return {'status': 'failure', 'reason': 'Internal error'}
-        else:
-            return {'status': 'failure', 'reason': 'The requested timeslot is no longer available'}
-    else:
+    if not valid_dt:
         return {'status': 'failure', 'reason': failure_reason}
 
+    db_path = current_tenant.get().db_path
+    stylist_id, failure_reason = _resolve_stylist(stylist, db_path)
+    if failure_reason is not None:
+        return {'status': 'failure', 'reason': failure_reason}
+
+    # The availability check is done atomically with the booking
+    try:
+        booking_id = add_booking(
+            appointment_start_dt, user_name, user_phone_number, service_id=service_id, stylist_id=stylist_id,
+            db_path=db_path)
+    except SlotUnavailableError:
+        return {'status': 'failure', 'reason': 'The requested timeslot is no longer available'}
+    except ValueError as e:
+        return {'status': 'failure', 'reason': str(e)}
+
+    if booking_id:
+        return {'status': 'success', 'booking_id': booking_id}
+    else:
+        return {'status': 'failure', 'reason': 'Internal error'}
+
 
 @tool
 def retrieve_active_bookings_user(user_phone_number: str) -> list:
@@ -116,12 +279,13 @@ def retrieve_active_bookings_user(user_phone_number: str) -> list:
         user_phone_number (str): The phone number of the customer whose active bookings are to be retrieved.
 
     Returns:
-        list: A list of active bookings (in dict format)
+        list: A list of active bookings (in dict format, with the stylist and service names)
     """
-    active_bookings = get_active_bookings_user(user_phone_number)
+    tenant = current_tenant.get()
+    active_bookings = get_active_bookings_user(user_phone_number, db_path=tenant.db_path)
     for booking in active_bookings:
-        booking['start_datetime'] = change_timezone_iso_dt(booking['start_datetime'], target_timezone='America/Toronto')
-        booking['end_datetime'] = change_timezone_iso_dt(booking['end_datetime'], target_timezone='America/Toronto')
+        booking['start_datetime'] = change_timezone_iso_dt(booking['start_datetime'], target_timezone=tenant.timezone)
+        booking['end_datetime'] = change_timezone_iso_dt(booking['end_datetime'], target_timezone=tenant.timezone)
     return active_bookings
 
 
@@ -129,24 +293,49 @@ def retrieve_active_bookings_user(user_phone_number: str) -> list:
 def reschedule_appointment(
         booking_id_to_reschedule: str,
         updated_appointment_start_dt: str,
-        user_phone_number: str
-        ) -> str | None:
+        user_phone_number: str,
+        stylist: str | None = None
+        ) -> dict:
     """
-    Reschedule an existing appointment to a new start datetime.
+    Reschedule an existing appointment to a new start datetime. The appointment stays with its stylist
+    if they are free at the new time, otherwise it moves to another free stylist.
 
     Args:
         booking_id_to_reschedule (str): The ID of the old booking to be rescheduled.
         updated_appointment_start_dt (str): The new appointment start datetime in ISO 8601 format.
         user_phone_number (str): The phone number of the customer requesting the reschedule.
+        stylist (str, optional): Id or name of the stylist requested by the customer for the new time.
 
     Returns:
-        str: The new booking ID created after rescheduling.
+        dict: A dictionary containing:
+            - 'status' (str): 'success' if the booking was rescheduled, 'failure' otherwise.
+            - 'booking_id' (str, optional): The ID of the rescheduled booking (unchanged).
+            - 'reason' (str, optional): The reason for the failure.
     """
-    return reschedule_booking(
-        booking_id_to_reschedule,
-        updated_appointment_start_dt,
-        user_phone_number
-    )
+    valid_dt, failure_reason = is_valid_timeslot(updated_appointment_start_dt)
+    if not valid_dt:
+        return {'status': 'failure', 'reason': failure_reason}
+
+    db_path = current_tenant.get().db_path
+    stylist_id, failure_reason = _resolve_stylist(stylist, db_path)
+    if failure_reason is not None:
+        return {'status': 'failure', 'reason': failure_reason}
+
+    try:
+        rescheduled_booking_id = reschedule_booking(
+            booking_id_to_reschedule,
+            updated_appointment_start_dt,
+            user_phone_number,
+            stylist_id=stylist_id,
+            db_path=db_path
+        )
+    except SlotUnavailableError:
+        return {'status': 'failure', 'reason': 'The requested timeslot is not available'}
+
+    if rescheduled_booking_id:
+        return {'status': 'success', 'booking_id': rescheduled_booking_id}
+    else:
+        return {'status': 'failure', 'reason': 'No active booking found with the provided ID'}
 
 
 @tool
@@ -160,4 +349,4 @@ def cancel_appointment(booking_id_to_cancel: str) -> bool:
     Returns:
         bool: True if the booking was successfully cancelled, False otherwise.
     """
-    return cancel_booking(booking_id_to_cancel)
+    return cancel_booking(booking_id_to_cancel, db_path=current_tenant.get().db_path)
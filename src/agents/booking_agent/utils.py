@@ -1,8 +1,134 @@
 import datetime
+import threading
+from collections import OrderedDict
 import pytz
 
+import parsedatetime
+
+# parsedatetime flag of an expression with both a date and a time
+PARSED_DATE_AND_TIME = 3
+_calendars = threading.local()
+
 
 def change_timezone_iso_dt(
 		iso_dt_str: str,
 		target_timezone: str) -> str:
 	return datetime.datetime.fromisoformat(iso_dt_str).astimezone(pytz.timezone(target_timezone)).isoformat()
+
+
+def _localize(naive_dt: datetime.datetime, tz: datetime.tzinfo) -> datetime.datetime:
+	return tz.localize(naive_dt) if hasattr(tz, 'localize') else naive_dt.replace(tzinfo=tz)
+
+
+def _calendar() -> parsedatetime.Calendar:
+	"""The calendar of the calling thread: constructing one (its locale constants) costs more than a parse."""
+	calendar = getattr(_calendars, 'calendar', None)
+	if calendar is None:
+		calendar = _calendars.calendar = parsedatetime.Calendar()
+	return calendar
+
+
+def _parse_naive(text: str, reference: datetime.datetime) -> datetime.datetime | None:
+	time_struct, parse_status = _calendar().parse(text, reference.timetuple())
+	if parse_status == 0:
+		return None
+	return datetime.datetime(*time_struct[:6])
+
+
+def parse_datetime(text: str, current_datetime: datetime.datetime) -> datetime.datetime | None:
+	"""
+	Parses a natural language date and/or time expression relative to `current_datetime` (timezone-aware).
+
+	Returns:
+		datetime | None: The datetime in the timezone of `current_datetime`, or None if nothing could be parsed.
+	"""
+	naive_dt = _parse_naive(text, current_datetime)
+	return _localize(naive_dt, current_datetime.tzinfo) if naive_dt is not None else None
+
+
+class DatetimeResolver:
+	"""
+	Resolves natural language date and time expressions as `parse_datetime`, memoizing the results in an LRU.
+
+	The same phrases ("tomorrow at 3pm", "next friday 10am") come up in most conversations. A result is
+	keyed by the normalised phrase, the date of the reference datetime and its timezone if the phrase
+	resolves to the same datetime at the start and at the end of that day, i.e. whatever the time of the
+	reference. Otherwise (e.g. "in 2 hours", "friday", which keeps the time of the reference) it is keyed
+	by the whole reference datetime.
+	"""
+
+	def __init__(self, max_entries: int = 4096):
+		self.max_entries = max_entries
+		self.hits = 0
+		self.misses = 0
+		self._entries = OrderedDict()
+		self._lock = threading.Lock()
+
+	def __len__(self):
+		return len(self._entries)
+
+	def _get(self, key: tuple):
+		with self._lock:
+			if key not in self._entries:
+				return False, None
+			self._entries.move_to_end(key)
+			return True, self._entries[key]
+
+	def _put(self, key: tuple, resolved_dt: datetime.datetime | None):
+		with self._lock:
+			self._entries[key] = resolved_dt
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+
+	def resolve(self, text: str, current_datetime: datetime.datetime) -> datetime.datetime | None:
+		"""
+		Returns:
+			datetime | None: The datetime in the timezone of `current_datetime` (timezone-aware), or None if
+				nothing could be parsed.
+		"""
+		phrase = ' '.join(text.lower().split())
+		reference = current_datetime.replace(tzinfo=None)
+		date_key = (phrase, reference.date(), current_datetime.tzinfo)
+		reference_key = (phrase, reference, current_datetime.tzinfo)
+		found, resolved_dt = self._get(date_key)
+		if not found:
+			found, resolved_dt = self._get(reference_key)
+		if found:
+			self.hits += 1
+			return resolved_dt
+
+		self.misses += 1
+		naive_dt = _parse_naive(phrase, reference)
+		day_start = datetime.datetime.combine(reference.date(), datetime.time())
+		day_end = day_start + datetime.timedelta(days=1, seconds=-1)
+		time_independent = all(_parse_naive(phrase, probe) == naive_dt for probe in (day_start, day_end))
+		resolved_dt = _localize(naive_dt, current_datetime.tzinfo) if naive_dt is not None else None
+		self._put(date_key if time_independent else reference_key, resolved_dt)
+		return resolved_dt
+
+	def resolve_many(self, texts: list[str], current_datetime: datetime.datetime) -> list[datetime.datetime | None]:
+		"""Resolves several expressions relative to the same datetime, each distinct expression once."""
+		resolved = {}
+		for text in texts:
+			if text not in resolved:
+				resolved[text] = self.resolve(text, current_datetime)
+		return [resolved[text] for text in texts]
+
+
+# Shared by the tools
+datetime_resolver = DatetimeResolver()
+
+
+def find_datetime_in_text(text: str, current_datetime: datetime.datetime) -> datetime.datetime | None:
+	"""
+	Finds the datetime mentioned in a free-form message (e.g. "is tomorrow 3pm free?") relative to
+	`current_datetime` (timezone-aware).
+
+	Returns:
+		datetime | None: The datetime if the message contains exactly one expression with both a date
+			and a time, otherwise None.
+	"""
+	matches = _calendar().nlp(text, current_datetime.timetuple())
+	if not matches or len(matches) != 1 or matches[0][1] != PARSED_DATE_AND_TIME:
+		return None
+	return _localize(matches[0][0], current_datetime.tzinfo)
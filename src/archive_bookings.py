@@ -0,0 +1,27 @@
+import argparse
+import datetime
+
+from agents.booking_agent.database.archive import ARCHIVE_AFTER_DAYS, DEFAULT_BATCH_SIZE, archive_bookings
+from agents.booking_agent.database.utils import DB_PATH
+
+
+def main():
+    """
+    Moves the cancelled and past bookings out of the bookings table into the archive, e.g.:
+        python archive_bookings.py --after-days 30
+    """
+    parser = argparse.ArgumentParser(description='Archive the cancelled and past bookings.')
+    parser.add_argument('--db', default=DB_PATH, help='Path of the bookings database')
+    parser.add_argument('--after-days', type=float, default=ARCHIVE_AFTER_DAYS,
+                        help='Archive the bookings ended this many days ago')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Bookings moved per transaction')
+    args = parser.parse_args()
+
+    ended_before = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=args.after_days)
+    result = archive_bookings(ended_before, batch_size=args.batch_size, db_path=args.db)
+    print(f"Archived {result.archived} bookings ({result.cancelled} cancelled, {result.past} past) "
+          f"in {result.batches} transactions")
+
+
+if __name__ == "__main__":
+    main()
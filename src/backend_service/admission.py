@@ -0,0 +1,182 @@
+import asyncio
+import math
+import time
+from collections import deque
+
+from agents.booking_agent import metrics
+
+# Weight of the last turn in the moving average of the turn durations
+TURN_SECS_SMOOTHING = 0.1
+
+
+class TurnRejectedError(Exception):
+    """Raised when a chat turn is not admitted: the wait queue is full, or the turn waited too long in it."""
+
+    def __init__(self, reason: str, queued: int, retry_after_secs: int):
+        super().__init__(reason)
+        self.reason = reason
+        # Turns waiting when the turn was rejected
+        self.queued = queued
+        self.retry_after_secs = retry_after_secs
+
+
+class _ThreadLock:
+    """Serializes the turns of a conversation thread; dropped once no turn of the thread is admitted."""
+
+    __slots__ = ('lock', 'turns')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.turns = 0
+
+
+class TurnTicket:
+    """
+    An admitted chat turn, run within `async with ticket:` once the previous turns of its thread are done
+    and a slot is free. Returned by `TurnScheduler.admit`.
+    """
+
+    def __init__(self, scheduler: 'TurnScheduler', thread_id: str | None, position: int):
+        self._scheduler = scheduler
+        self._thread_id = thread_id
+        # Turns waiting ahead of this one when it was admitted, 0 if it could start at once
+        self.position = position
+        self._state = 'queued'
+        self._started_at = None
+
+    async def __aenter__(self) -> 'TurnTicket':
+        try:
+            await self._scheduler._start(self._thread_id)
+        except BaseException:
+            self.close()
+            raise
+        self._state = 'running'
+        self._started_at = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """Releases the turn: its slot once run, its place in the queue otherwise. Idempotent."""
+        if self._state == 'queued':
+            self._scheduler._leave_queue(self._thread_id)
+        elif self._state == 'running':
+            self._scheduler._finish(self._thread_id, time.perf_counter() - self._started_at)
+        self._state = 'closed'
+
+
+class TurnScheduler:
+    """
+    Admission control of the chat turns of the service (in its event loop): at most `max_concurrent_turns`
+    run at once, the turns of a conversation thread one after the other (two rapid messages would otherwise
+    race on its checkpoint), and at most `max_queued_turns` wait. Beyond that, `admit` rejects the turn at
+    once, as does a turn waiting over `max_queue_wait_secs`, with a retry delay estimated from the recent
+    turn durations.
+    """
+
+    def __init__(self, max_concurrent_turns: int, max_queued_turns: int = 100,
+                 max_queue_wait_secs: float | None = 30):
+        self.max_concurrent_turns = max_concurrent_turns
+        self.max_queued_turns = max_queued_turns
+        self.max_queue_wait_secs = max_queue_wait_secs
+        self.running = 0
+        self.queued = 0
+        # Turns waiting for a slot, handed over in arrival order
+        self._slot_waiters: deque[asyncio.Future] = deque()
+        self._threads: dict[str, _ThreadLock] = {}
+        # Moving average of the turn durations, for the retry delays
+        self._turn_secs = 1.0
+
+    def retry_after_secs(self) -> int:
+        """Estimated time until the queue drains."""
+        return max(1, math.ceil(self._turn_secs * (self.queued + 1) / self.max_concurrent_turns))
+
+    def _reject(self, reason: str) -> TurnRejectedError:
+        if metrics.metrics_enabled():
+            metrics.TURNS_REJECTED.inc(reason)
+        return TurnRejectedError(reason, self.queued, self.retry_after_secs())
+
+    def admit(self, thread_id: str | None) -> TurnTicket:
+        """
+        Admits a turn of `thread_id`, to be run within `async with`, or rejects it at once.
+
+        Raises:
+            TurnRejectedError: If `max_queued_turns` turns are already waiting
+        """
+        thread = self._threads.get(thread_id) if thread_id is not None else None
+        can_start = self.running < self.max_concurrent_turns and not self.queued and thread is None
+        if not can_start and self.queued >= self.max_queued_turns:
+            raise self._reject('queue_full')
+        if thread_id is not None:
+            if thread is None:
+                thread = self._threads[thread_id] = _ThreadLock()
+            thread.turns += 1
+        position = 0 if can_start else self.queued + 1
+        self.queued += 1
+        return TurnTicket(self, thread_id, position)
+
+    async def _start(self, thread_id: str | None):
+        t0 = time.perf_counter()
+        try:
+            # Not `asyncio.timeout`, which requires Python 3.11
+            await asyncio.wait_for(self._wait_turn(thread_id), self.max_queue_wait_secs)
+        except asyncio.TimeoutError:
+            raise self._reject('queue_timeout')
+        self.queued -= 1
+        if metrics.metrics_enabled():
+            metrics.TURN_QUEUE_WAIT.observe(time.perf_counter() - t0)
+
+    async def _wait_turn(self, thread_id: str | None):
+        if thread_id is not None:
+            await self._threads[thread_id].lock.acquire()
+        try:
+            await self._acquire_slot()
+        except BaseException:
+            if thread_id is not None:
+                self._threads[thread_id].lock.release()
+            raise
+
+    async def _acquire_slot(self):
+        if self.running < self.max_concurrent_turns and not self._slot_waiters:
+            self.running += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._slot_waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Handed the slot while being cancelled
+                self._release_slot()
+            elif waiter in self._slot_waiters:
+                self._slot_waiters.remove(waiter)
+            raise
+
+    def _release_slot(self):
+        while self._slot_waiters:
+            waiter = self._slot_waiters.popleft()
+            if not waiter.done():
+                # The slot goes to the next turn: the count of running turns is unchanged
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+    def _release_thread(self, thread_id: str | None, locked: bool):
+        if thread_id is None:
+            return
+        thread = self._threads[thread_id]
+        if locked:
+            thread.lock.release()
+        thread.turns -= 1
+        if not thread.turns:
+            del self._threads[thread_id]
+
+    def _leave_queue(self, thread_id: str | None):
+        self.queued -= 1
+        self._release_thread(thread_id, locked=False)
+
+    def _finish(self, thread_id: str | None, turn_secs: float):
+        self._turn_secs += TURN_SECS_SMOOTHING * (turn_secs - self._turn_secs)
+        self._release_slot()
+        self._release_thread(thread_id, locked=True)
@@ -0,0 +1,141 @@
+import os
+from dataclasses import dataclass
+
+from agents.booking_agent.checkpointer import CHECKPOINT_DB_PATH
+from agents.booking_agent.database.archive import ARCHIVE_AFTER_DAYS
+from agents.booking_agent.history import HistoryConfig
+from agents.booking_agent.llm_limiter import LLMCallLimiter
+
+ENV_PREFIX = 'BOOKING_AGENT_'
+
+
+def _env(name: str, cast=str, default=None):
+    value = os.getenv(ENV_PREFIX + name)
+    return default if value in (None, '') else cast(value)
+
+
+def _to_bool(value: str) -> bool:
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def _to_optional_int(value: str) -> int | None:
+    return None if value.lower() == 'none' else int(value)
+
+
+def _to_optional_float(value: str) -> float | None:
+    return None if value.lower() == 'none' else float(value)
+
+
+@dataclass(frozen=True)
+class ServiceConfig:
+    """Backend service settings, read from the `BOOKING_AGENT_*` environment variables."""
+
+    # Number of worker processes serving the app; with more than one, the conversation threads must be
+    # kept in a store shared by the processes and the in-process caches are not used
+    workers: int = 1
+    # Serve availability checks from an in-memory index of the bookings (single process only)
+    interval_index: bool = False
+    # Time the answers of the read tools (availability, bookings of a phone number) are cached in memory,
+    # invalidated by the changes made by the process ('none' disables, single process only)
+    read_cache_ttl_secs: float | None = 30
+    # Interval of the compaction job moving the cancelled bookings, and those ended `archive_after_days`
+    # ago, out of the bookings table ('none' disables)
+    archive_interval_secs: float | None = None
+    archive_after_days: float = ARCHIVE_AFTER_DAYS
+    # Conversation threads store: 'memory' or 'sqlite' (default with several workers)
+    checkpointer: str = 'memory'
+    checkpoint_db_path: str = CHECKPOINT_DB_PATH
+    # Maximum number of threads kept by the 'memory' checkpointer
+    max_threads: int | None = None
+    # Idle time after which a conversation thread is evicted
+    thread_ttl_secs: float | None = None
+    # Bounds of the conversation history sent to the LLM ('none' disables)
+    max_prompt_tokens: int | None = HistoryConfig.max_prompt_tokens
+    tool_results_max_age_turns: int | None = HistoryConfig.tool_results_max_age_turns
+    summarize_above_tokens: int | None = HistoryConfig.summarize_above_tokens
+    # Answer the simple structured requests without an LLM call
+    fast_path: bool = False
+    # LLM calls running at once in a worker, the others waiting for a slot ('none': unbounded)
+    max_concurrent_llm_calls: int | None = None
+    # Timeout of each LLM call, and retries of those timed out or failing with a retryable error
+    # (rate limited, overloaded) after an exponential backoff
+    llm_timeout_secs: float | None = None
+    llm_max_retries: int = LLMCallLimiter.max_retries
+    # Chat turns running at once in a worker ('none': unbounded), and those waiting (at most
+    # `max_queued_turns`, for at most `max_queue_wait_secs`); the others are rejected with a 429
+    max_concurrent_turns: int | None = None
+    max_queued_turns: int = 100
+    max_queue_wait_secs: float | None = 30
+    # JSON registry of the salons hosted by the service (see `agents.booking_agent.tenancy.TenantRegistry`),
+    # each with its own bookings database in `tenants_dir`; requests must then give a `tenant_id`
+    tenants_file: str | None = None
+    tenants_dir: str = 'tenants'
+    # Token expected in the `X-Admin-Token` header of the /admin endpoints, which are disabled without one
+    admin_token: str | None = None
+    # Collect the metrics served on /metrics
+    metrics: bool = True
+    # Log as JSON lines, with the breakdown of each agent turn
+    json_logs: bool = False
+    log_level: str = 'INFO'
+
+    def __post_init__(self):
+        if self.workers > 1 and self.checkpointer == 'memory':
+            raise ValueError(
+                f"The 'memory' checkpointer keeps the conversation threads in one process, "
+                f"set {ENV_PREFIX}CHECKPOINTER=sqlite to run {self.workers} workers")
+
+    @property
+    def single_process(self) -> bool:
+        return self.workers == 1
+
+    @property
+    def history_config(self) -> HistoryConfig:
+        return HistoryConfig(
+            max_prompt_tokens=self.max_prompt_tokens,
+            tool_results_max_age_turns=self.tool_results_max_age_turns,
+            summarize_above_tokens=self.summarize_above_tokens,
+        )
+
+    @property
+    def llm_limiter(self) -> LLMCallLimiter | None:
+        if self.max_concurrent_llm_calls is None and self.llm_timeout_secs is None:
+            return None
+        return LLMCallLimiter(
+            max_concurrency=self.max_concurrent_llm_calls,
+            timeout_secs=self.llm_timeout_secs,
+            max_retries=self.llm_max_retries,
+        )
+
+    @classmethod
+    def from_env(cls) -> 'ServiceConfig':
+        # Same default as the `--workers` option of uvicorn
+        workers = _env('WORKERS', int, int(os.getenv('WEB_CONCURRENCY') or cls.workers))
+        return cls(
+            workers=workers,
+            interval_index=_env('INTERVAL_INDEX', _to_bool, cls.interval_index),
+            read_cache_ttl_secs=_env('READ_CACHE_TTL_SECS', _to_optional_float, cls.read_cache_ttl_secs),
+            archive_interval_secs=_env('ARCHIVE_INTERVAL_SECS', _to_optional_float, cls.archive_interval_secs),
+            archive_after_days=_env('ARCHIVE_AFTER_DAYS', float, cls.archive_after_days),
+            checkpointer=_env('CHECKPOINTER', str, cls.checkpointer if workers == 1 else 'sqlite'),
+            checkpoint_db_path=_env('CHECKPOINT_DB', str, cls.checkpoint_db_path),
+            max_threads=_env('MAX_THREADS', int, cls.max_threads),
+            thread_ttl_secs=_env('THREAD_TTL_SECS', float, cls.thread_ttl_secs),
+            max_prompt_tokens=_env('MAX_PROMPT_TOKENS', _to_optional_int, cls.max_prompt_tokens),
+            tool_results_max_age_turns=_env(
+                'TOOL_RESULTS_MAX_AGE_TURNS', _to_optional_int, cls.tool_results_max_age_turns),
+            summarize_above_tokens=_env('SUMMARIZE_ABOVE_TOKENS', _to_optional_int, cls.summarize_above_tokens),
+            fast_path=_env('FAST_PATH', _to_bool, cls.fast_path),
+            max_concurrent_llm_calls=_env(
+                'MAX_CONCURRENT_LLM_CALLS', _to_optional_int, cls.max_concurrent_llm_calls),
+            llm_timeout_secs=_env('LLM_TIMEOUT_SECS', _to_optional_float, cls.llm_timeout_secs),
+            llm_max_retries=_env('LLM_MAX_RETRIES', int, cls.llm_max_retries),
+            max_concurrent_turns=_env('MAX_CONCURRENT_TURNS', _to_optional_int, cls.max_concurrent_turns),
+            max_queued_turns=_env('MAX_QUEUED_TURNS', int, cls.max_queued_turns),
+            max_queue_wait_secs=_env('MAX_QUEUE_WAIT_SECS', _to_optional_float, cls.max_queue_wait_secs),
+            tenants_file=_env('TENANTS_FILE', str, cls.tenants_file),
+            tenants_dir=_env('TENANTS_DIR', str, cls.tenants_dir),
+            admin_token=_env('ADMIN_TOKEN', str, cls.admin_token),
+            metrics=_env('METRICS', _to_bool, cls.metrics),
+            json_logs=_env('JSON_LOGS', _to_bool, cls.json_logs),
+            log_level=_env('LOG_LEVEL', str, cls.log_level),
+        )
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import BaseModel, Field
 
 
@@ -11,6 +13,11 @@ class QueryRequest(BaseModel):
         default=None,
         examples=["847c6285-8fc9-4560-a83f-4e6285809254"],
     )
+    tenant_id: str | None = Field(
+        description="Salon served, required when the service hosts several salons.",
+        default=None,
+        examples=["shine-and-style"],
+    )
 
 
 class ChatResponse(BaseModel):
@@ -18,3 +25,48 @@ class ChatResponse(BaseModel):
         description="Response of the agent for the user query.",
         examples=["Hello, world!"],
     )
+
+
+class StreamEvent(BaseModel):
+    type: Literal['queued', 'token', 'tool_call', 'tool_result', 'end', 'error'] = Field(
+        description="Kind of event: the turn waiting for a free slot, a response token, a tool being called or "
+                    "returning, the end of the turn or an error.",
+        examples=["token"],
+    )
+    content: str | None = Field(
+        description="Response token for `token` events, error detail for `error` events.",
+        default=None,
+        examples=["Hello"],
+    )
+    name: str | None = Field(
+        description="Tool name for `tool_call` and `tool_result` events.",
+        default=None,
+        examples=["check_availability"],
+    )
+    position: int | None = Field(
+        description="Position of the turn in the wait queue for `queued` events.",
+        default=None,
+        examples=[3],
+    )
+
+
+class RejectedRow(BaseModel):
+    row: int = Field(
+        description="Number of the rejected row, from 1.",
+        examples=[12],
+    )
+    reason: str = Field(
+        description="Why the row was rejected.",
+        examples=["Overlaps an existing booking of the stylist"],
+    )
+
+
+class ImportResponse(BaseModel):
+    rows: int = Field(description="Rows read.", examples=[1000])
+    imported: int = Field(description="Bookings imported (or valid, for a dry run).", examples=[998])
+    customers_created: int = Field(description="Customers created, deduplicated by phone number.", examples=[640])
+    rejected: int = Field(description="Rows rejected.", examples=[2])
+    errors: list[RejectedRow] = Field(
+        description="The first rejected rows with their reason.",
+        default=[],
+    )
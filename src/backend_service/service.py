@@ -1,12 +1,168 @@
-from typing import Dict
+import asyncio
+import datetime
+import io
+import logging
+import secrets
+from contextlib import asynccontextmanager, nullcontext
+from typing import TYPE_CHECKING, Dict, Literal
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 
-from agents import BookingAgent
-from backend_service.schema import QueryRequest, ChatResponse
+from agents.booking_agent import metrics
+from agents.booking_agent.database import bulk
+from agents.booking_agent.database.archive import archive_bookings
+from agents.booking_agent.database.interval_index import enable_interval_index
+from agents.booking_agent.database.read_cache import enable_read_cache
+from agents.booking_agent.database.utils import DB_PATH
+from agents.booking_agent.faq import get_faq_index
+from agents.booking_agent.tenancy import DEFAULT_TENANT, Tenant, TenantRegistry, UnknownTenantError, use_tenant
+from backend_service.admission import TurnRejectedError, TurnScheduler, TurnTicket
+from backend_service.config import ServiceConfig
+from backend_service.log_config import configure_logging
+from backend_service.schema import QueryRequest, ChatResponse, ImportResponse, RejectedRow, StreamEvent
 
-app = FastAPI(title="Booking Agent API")
-booking_agent = BookingAgent()
+if TYPE_CHECKING:
+    from agents import BookingAgent
+
+config = ServiceConfig.from_env()
+configure_logging(config.log_level, json_logs=config.json_logs)
+metrics.set_metrics_enabled(config.metrics)
+logger = logging.getLogger(__name__)
+# Built by the lifespan of the app (or on first use when it does not run), not at import:
+# importing the service stays fast and does not need the OpenAI API key
+booking_agent: 'BookingAgent | None' = None
+# Salons hosted by the service, loaded by the lifespan when `tenants_file` is set
+tenant_registry: TenantRegistry | None = None
+# Admission control of the chat turns, when `max_concurrent_turns` is set
+turn_scheduler: TurnScheduler | None = None if config.max_concurrent_turns is None else TurnScheduler(
+    config.max_concurrent_turns, max_queued_turns=config.max_queued_turns,
+    max_queue_wait_secs=config.max_queue_wait_secs)
+
+
+def _create_booking_agent() -> 'BookingAgent':
+    # LangGraph and the OpenAI client are only imported here
+    from agents import BookingAgent
+    from agents.booking_agent.checkpointer import create_checkpointer
+
+    return BookingAgent(
+        checkpointer=create_checkpointer(
+            config.checkpointer,
+            db_path=config.checkpoint_db_path,
+            max_threads=config.max_threads,
+            thread_ttl_secs=config.thread_ttl_secs
+        ),
+        history_config=config.history_config,
+        fast_path=config.fast_path,
+        llm_limiter=config.llm_limiter,
+        log_turns=config.json_logs
+    )
+
+
+def get_booking_agent() -> 'BookingAgent':
+    global booking_agent
+    if booking_agent is None:
+        booking_agent = _create_booking_agent()
+    return booking_agent
+
+
+def _enable_caches(db_path: str):
+    # Each worker would only see its own bookings in its index, and be invalidated by its own changes
+    if config.interval_index and config.single_process:
+        enable_interval_index(db_path)
+    if config.read_cache_ttl_secs is not None and config.single_process:
+        enable_read_cache(db_path, ttl_secs=config.read_cache_ttl_secs)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global tenant_registry
+    get_booking_agent()
+    if config.interval_index and not config.single_process:
+        logger.warning('The interval index is disabled with %d workers', config.workers)
+    if config.tenants_file is not None:
+        # The databases of the salons are opened, with their caches, on their first request
+        tenant_registry = TenantRegistry.load(config.tenants_file, config.tenants_dir, on_open=_enable_caches)
+        logger.info('Hosting %d salons from %s', len(tenant_registry), config.tenants_dir)
+    else:
+        _enable_caches(DB_PATH)
+    # Indexed at startup rather than on the first question
+    for tenant in (tenant_registry or [DEFAULT_TENANT]):
+        get_faq_index(tenant.faq_file, tenant.opening_hours)
+    archive_task = asyncio.create_task(_archive_periodically()) if config.archive_interval_secs is not None else None
+    yield
+    if archive_task is not None:
+        archive_task.cancel()
+
+
+def _open_databases() -> list[str]:
+    if tenant_registry is None:
+        return [DB_PATH]
+    return [tenant.db_path for tenant in tenant_registry if tenant_registry.is_open(tenant.id)]
+
+
+async def _archive_periodically():
+    """Compaction job: archives the cancelled and past bookings of each database every `archive_interval_secs`."""
+    while True:
+        await asyncio.sleep(config.archive_interval_secs)
+        ended_before = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=config.archive_after_days)
+        for db_path in _open_databases():
+            try:
+                await run_in_threadpool(archive_bookings, ended_before, db_path=db_path)
+            except Exception:
+                logger.exception('Archiving the bookings of %s failed', db_path)
+
+
+async def _request_tenant(tenant_id: str | None) -> Tenant:
+    """The salon of a request, its bookings database opened (the default one without a tenant registry)."""
+    if tenant_registry is None:
+        if tenant_id is not None:
+            raise HTTPException(status_code=400, detail='The service hosts a single salon, tenant_id is not expected')
+        return DEFAULT_TENANT
+    if tenant_id is None:
+        raise HTTPException(status_code=400, detail='tenant_id is required')
+    try:
+        if tenant_registry.is_open(tenant_id):
+            return tenant_registry.get(tenant_id)
+        # Creates the database on the first request of the salon
+        return await run_in_threadpool(tenant_registry.open, tenant_id)
+    except UnknownTenantError:
+        raise HTTPException(status_code=404, detail=f"Unknown tenant '{tenant_id}'")
+
+
+def _thread_id(tenant: Tenant, thread_id: str | None) -> str | None:
+    # The conversation threads of the salons are kept apart in the shared checkpointer
+    if tenant is DEFAULT_TENANT or thread_id is None:
+        return thread_id
+    return f'{tenant.id}/{thread_id}'
+
+
+def _busy(error: TurnRejectedError) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=f'The service is busy ({error.queued} turns waiting), retry in {error.retry_after_secs}s',
+        headers={'Retry-After': str(error.retry_after_secs)}
+    )
+
+
+def _admit_turn(thread_id: str | None) -> TurnTicket | nullcontext:
+    """
+    The turn of `thread_id` admitted by the scheduler, to be run within `async with`.
+
+    Raises:
+        HTTPException: 429 (with `Retry-After`) if too many turns are waiting
+    """
+    if turn_scheduler is None:
+        return nullcontext()
+    try:
+        return turn_scheduler.admit(thread_id)
+    except TurnRejectedError as e:
+        raise _busy(e)
+
+
+app = FastAPI(title="Booking Agent API", lifespan=lifespan)
 
 
 @app.get("/", tags=['Health'])
@@ -14,18 +170,135 @@ def health_check() -> Dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse, tags=['Health'])
+def get_metrics() -> PlainTextResponse:
+    """Latency, token and error metrics of the agent, in the Prometheus text format."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type='text/plain; version=0.0.4')
+
+
 @app.post("/chat", response_model=ChatResponse, tags=['Chat'])
-def query_langgraph(request: QueryRequest) -> ChatResponse:
+async def query_langgraph(request: QueryRequest) -> ChatResponse:
+    tenant = await _request_tenant(request.tenant_id)
+    thread_id = _thread_id(tenant, request.thread_id)
+    turn = _admit_turn(thread_id)
     try:
         input_state = {
             "messages": [{"role": "user", "content": request.user_input}]
         }
-        result = booking_agent.invoke(
-            input_state, 
-            config={"configurable": {"thread_id": request.thread_id}}
-        )
+        async with turn:
+            with use_tenant(tenant):
+                result = await get_booking_agent().ainvoke(
+                    input_state,
+                    config={"configurable": {"thread_id": thread_id}}
+                )
         bot_response = result['messages'][-1]
         return ChatResponse(response=bot_response.content)
+    except TurnRejectedError as e:
+        raise _busy(e)
     except Exception as e:
-        print(e)
+        logger.exception('Agent turn failed')
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _stream_events(request: QueryRequest, tenant: Tenant, turn: TurnTicket | nullcontext):
+    input_state = {
+        "messages": [{"role": "user", "content": request.user_input}]
+    }
+    try:
+        if getattr(turn, 'position', 0):
+            yield StreamEvent(type='queued', position=turn.position)
+        async with turn:
+            # Set in the task iterating the stream, and copied to the tasks of the graph run
+            with use_tenant(tenant):
+                async for mode, payload in get_booking_agent().astream(
+                        input_state,
+                        config={"configurable": {"thread_id": _thread_id(tenant, request.thread_id)}},
+                        stream_mode=['messages', 'updates']):
+                    if mode == 'messages':
+                        message_chunk, metadata = payload
+                        if metadata.get('langgraph_node') == 'llm_call' and message_chunk.content:
+                            yield StreamEvent(type='token', content=message_chunk.content)
+                    elif 'llm_call' in payload:
+                        for tool_call in payload['llm_call']['messages'][-1].tool_calls:
+                            yield StreamEvent(type='tool_call', name=tool_call['name'])
+                    elif 'tool_node' in payload:
+                        for tool_message in payload['tool_node']['messages']:
+                            yield StreamEvent(type='tool_result', name=tool_message.name)
+                    elif payload.get('fast_path'):
+                        # Answered without an LLM call: the tool call, its result and possibly the reply at once
+                        for message in payload['fast_path']['messages']:
+                            if message.type == 'tool':
+                                yield StreamEvent(type='tool_result', name=message.name)
+                            elif message.tool_calls:
+                                yield StreamEvent(type='tool_call', name=message.tool_calls[0]['name'])
+                            else:
+                                yield StreamEvent(type='token', content=message.content)
+        yield StreamEvent(type='end')
+    except TurnRejectedError as e:
+        yield StreamEvent(type='error', content=_busy(e).detail)
+    except Exception as e:
+        logger.exception('Streamed agent turn failed')
+        yield StreamEvent(type='error', content=str(e))
+
+
+@app.post("/chat/stream", tags=['Chat'])
+async def stream_langgraph(request: QueryRequest) -> StreamingResponse:
+    """Streams the agent turn as newline-delimited JSON `StreamEvent`s, tokens included, as they are produced."""
+    tenant = await _request_tenant(request.tenant_id)
+    # Rejected before the response starts, with its status code
+    turn = _admit_turn(_thread_id(tenant, request.thread_id))
+
+    async def ndjson_lines():
+        async for event in _stream_events(request, tenant, turn):
+            yield event.model_dump_json(exclude_none=True) + '\n'
+
+    # Also leaves the queue if the client went away before the stream started
+    background = BackgroundTask(turn.close) if isinstance(turn, TurnTicket) else None
+    return StreamingResponse(ndjson_lines(), media_type='application/x-ndjson', background=background)
+
+
+def check_admin_token(x_admin_token: str | None = Header(default=None)):
+    if config.admin_token is None:
+        raise HTTPException(status_code=403, detail='The admin endpoints are disabled')
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, config.admin_token):
+        raise HTTPException(status_code=403, detail='Invalid admin token')
+
+
+@app.post("/admin/bookings/import", response_model=ImportResponse, tags=['Admin'],
+          dependencies=[Depends(check_admin_token)])
+async def import_bookings(
+        request: Request,
+        format: Literal['csv', 'jsonl'] = 'jsonl',
+        dry_run: bool = False,
+        chunk_size: int = bulk.DEFAULT_CHUNK_SIZE,
+        tenant_id: str | None = None) -> ImportResponse:
+    """Imports the bookings of the CSV or JSONL request body (see `bulk.import_bookings`) into those of a salon."""
+    tenant = await _request_tenant(tenant_id)
+    body = await request.body()
+    try:
+        result = await run_in_threadpool(
+            bulk.import_bookings, bulk.read_rows(io.StringIO(body.decode('utf-8'), newline=''), format),
+            chunk_size=chunk_size, dry_run=dry_run, db_path=tenant.db_path)
+    except ValueError as e:
+        # Not UTF-8 (the malformed rows are rejected one by one)
+        raise HTTPException(status_code=400, detail=str(e))
+    return ImportResponse(
+        rows=result.rows,
+        imported=result.imported,
+        customers_created=result.customers_created,
+        rejected=result.rejected,
+        errors=[RejectedRow(row=row_number, reason=reason) for row_number, reason in result.errors]
+    )
+
+
+@app.get("/admin/bookings/export", tags=['Admin'], dependencies=[Depends(check_admin_token)])
+async def export_bookings(
+        format: Literal['csv', 'jsonl'] = 'jsonl',
+        status: Literal['scheduled', 'cancelled'] | None = None,
+        tenant_id: str | None = None) -> StreamingResponse:
+    """Streams the bookings of a salon as CSV or JSONL, in the format of the imports."""
+    tenant = await _request_tenant(tenant_id)
+    return StreamingResponse(
+        bulk.format_rows(bulk.export_bookings(status=status, db_path=tenant.db_path), format),
+        media_type='text/csv' if format == 'csv' else 'application/x-ndjson'
+    )
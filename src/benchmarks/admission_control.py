@@ -0,0 +1,180 @@
+"""
+Overload of the `/chat` endpoint with a stub provider (no OpenAI calls) which slows
+down above `--capacity` calls in flight, rejects the calls beyond twice that with a
+429 and lets a `--slow-call-rate` fraction of them hang for 10s. Each turn makes a
+tool call, hence two LLM calls. Turns arrive at a fixed rate (a multiple of the
+capacity of the provider, in turns/s) for `--duration` seconds, each on a new
+thread, with the service:
+
+- without admission control;
+- with the `TurnScheduler` (`--capacity` turns running, as many waiting)
+  and the `LLMCallLimiter` (`--capacity` calls in flight, timeout and retries).
+
+Reports the turns answered per second, the answered, rejected (429: queue full,
+or waited over `--max-queue-wait` seconds) and failed turns, the p50/p99 latency
+of the answered turns and the p50/p99 time to a 429.
+
+Then sends pairs of messages at once on `--pairs` threads, checking that both
+turns of each thread are kept in its history (serialized by the scheduler).
+
+Usage (from `src/`):
+    python -m benchmarks.admission_control --capacity 8 --llm-latency 0.5 --loads 0.5 1 2 4
+"""
+import argparse
+import asyncio
+import datetime
+import logging
+import random
+import time
+import uuid
+
+import httpx
+from langchain_core.messages import AIMessage, HumanMessage
+
+from agents import BookingAgent
+from agents.booking_agent import metrics
+from agents.booking_agent.llm_limiter import LLMCallLimiter
+from backend_service import service
+from backend_service.admission import TurnScheduler
+from benchmarks.stub_llm import CongestedChatModel, last_conversation_message
+
+LLM_TIMEOUT_SECS = 2
+
+
+def _respond(messages) -> AIMessage:
+    """Works out the date of the request, then replies."""
+    if isinstance(last_conversation_message(messages), HumanMessage):
+        return AIMessage(content='', tool_calls=[{
+            'name': 'convert_relative_to_absolute_datetime',
+            'args': {'text': 'tomorrow at 3pm', 'current_datetime': datetime.datetime.now().astimezone().isoformat()},
+            'id': f'call_{uuid.uuid4().hex}',
+        }])
+    return AIMessage(content='Tomorrow at 3pm is free, shall I book it?')
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))] if values else float('nan')
+
+
+def _counters() -> tuple[float, float, float]:
+    """Turns rejected with the queue full and after waiting too long, and LLM calls retried."""
+    return (metrics.TURNS_REJECTED.value('queue_full'), metrics.TURNS_REJECTED.value('queue_timeout'),
+            metrics.LLM_RETRIES.value('timeout') + metrics.LLM_RETRIES.value('error'))
+
+
+def _setup(args, admission_control: bool) -> CongestedChatModel:
+    llm = CongestedChatModel(respond=_respond, latency_secs=args.llm_latency, capacity=args.capacity,
+                             rate_limit=2 * args.capacity, slow_call_rate=args.slow_call_rate)
+    if admission_control:
+        service.booking_agent = BookingAgent(llm=llm, llm_limiter=LLMCallLimiter(
+            max_concurrency=args.capacity, timeout_secs=LLM_TIMEOUT_SECS, max_retries=2, backoff_secs=0.1))
+        service.turn_scheduler = TurnScheduler(args.capacity, max_queued_turns=args.capacity,
+                                               max_queue_wait_secs=args.max_queue_wait)
+    else:
+        service.booking_agent = BookingAgent(llm=llm)
+        service.turn_scheduler = None
+    return llm
+
+
+async def _overload(rate: float, duration: float) -> dict:
+    """Turns on new threads arriving every 1/`rate` seconds for `duration` seconds."""
+    results = []
+    transport = httpx.ASGITransport(app=service.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        async def turn():
+            t0 = time.perf_counter()
+            response = await client.post('/chat', json={'user_input': 'Is tomorrow at 3pm free?',
+                                                        'thread_id': str(uuid.uuid4())})
+            results.append((response.status_code, time.perf_counter() - t0))
+
+        tasks = []
+        t0 = time.perf_counter()
+        for idx in range(int(rate * duration)):
+            await asyncio.sleep(max(0.0, t0 + idx / rate - time.perf_counter()))
+            tasks.append(asyncio.create_task(turn()))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - t0
+
+    answered = [latency for status, latency in results if status == 200]
+    return {
+        'answered/s': len(answered) / elapsed,
+        'answered': len(answered),
+        'rejected': [latency for status, latency in results if status == 429],
+        'failed': sum(status not in (200, 429) for status, _ in results),
+        'latencies': answered,
+    }
+
+
+async def _message_pairs(pairs: int) -> tuple[int, int]:
+    """Sends two messages at once on each of `pairs` threads. Returns the failed turns, and the threads missing one."""
+    transport = httpx.ASGITransport(app=service.app)
+    thread_ids = [str(uuid.uuid4()) for _ in range(pairs)]
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        async def message(thread_id: str, user_input: str) -> int:
+            response = await client.post('/chat', json={'user_input': user_input, 'thread_id': thread_id})
+            return response.status_code
+
+        statuses = await asyncio.gather(*(message(thread_id, user_input) for thread_id in thread_ids
+                                          for user_input in ('Is tomorrow at 3pm free?', 'Or tomorrow at 4pm?')))
+
+    lost = 0
+    for thread_id in thread_ids:
+        state = await service.booking_agent.graph.aget_state({"configurable": {"thread_id": thread_id}})
+        lost += sum(isinstance(message, HumanMessage) for message in state.values['messages']) != 2
+    return sum(status != 200 for status in statuses), lost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--capacity', type=int, default=8, help='LLM calls served by the provider at nominal latency')
+    parser.add_argument('--llm-latency', type=float, default=0.5)
+    parser.add_argument('--slow-call-rate', type=float, default=0.01, help='Fraction of the LLM calls hanging 10s')
+    parser.add_argument('--loads', type=float, nargs='+', default=[0.5, 1, 2, 4],
+                        help='Turns/s offered, as multiples of the capacity of the provider')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of arrivals per load')
+    parser.add_argument('--max-queue-wait', type=float, default=3)
+    parser.add_argument('--pairs', type=int, default=50)
+    args = parser.parse_args()
+    random.seed(0)
+    # The failed turns are counted, not logged
+    logging.disable(logging.CRITICAL)
+
+    # Two LLM calls per turn
+    capacity_rate = args.capacity / (2 * args.llm_latency)
+    print(f"Provider: {args.capacity} calls in flight at {args.llm_latency}s ({capacity_rate:.1f} turns/s), "
+          f"429 above {2 * args.capacity}, {args.slow_call_rate:.0%} of the calls hanging 10s; "
+          f"{args.duration:.0f}s of arrivals per load")
+    print(f"\n{'admission control':<19}{'offered/s':>10}{'answered/s':>11}{'ok':>6}{'full':>6}{'waited':>7}"
+          f"{'failed':>7}{'p50 s':>7}{'p99 s':>7}{'429 p50 ms':>11}{'429 p99 ms':>11}{'peak calls':>11}"
+          f"{'provider 429':>13}{'retries':>8}")
+    for admission_control in (False, True):
+        for load in args.loads:
+            llm = _setup(args, admission_control)
+            before = _counters()
+            report = asyncio.run(_overload(load * capacity_rate, args.duration))
+            full, waited, retries = (after - value for after, value in zip(_counters(), before))
+            latencies, rejected = report['latencies'], report['rejected']
+            print(f"{'on' if admission_control else 'off':<19}{load * capacity_rate:>10.1f}"
+                  f"{report['answered/s']:>11.1f}{report['answered']:>6}{full:>6.0f}{waited:>7.0f}{report['failed']:>7}"
+                  f"{_percentile(latencies, 0.5):>7.2f}{_percentile(latencies, 0.99):>7.2f}"
+                  f"{_percentile(rejected, 0.5) * 1e3:>11.1f}{_percentile(rejected, 0.99) * 1e3:>11.1f}"
+                  f"{llm.in_flight_peak:>11}{llm.rejected:>13}{retries:>8.0f}")
+
+    print(f"\nPairs of messages sent at once on {args.pairs} threads:")
+    for admission_control in (False, True):
+        llm = _setup(args, admission_control)
+        # Within the capacity of the provider: the turns only fail if they race on their thread
+        llm.rate_limit, llm.slow_call_rate = 2 * args.pairs, 0
+        if admission_control:
+            # Every turn admitted: only their order is checked
+            service.turn_scheduler = TurnScheduler(args.capacity, max_queued_turns=2 * args.pairs,
+                                                   max_queue_wait_secs=None)
+        failed, lost = asyncio.run(_message_pairs(args.pairs))
+        print(f"  admission control {'on' if admission_control else 'off'}: {failed} failed turns, "
+              f"{lost} threads lost a turn")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+Latency of the availability checks (any or a specific stylist), of a week slot
+search and of the bookings lookup of a regular customer as the historical volume
+grows to `--history` bookings (past ones, and cancelled ones, as left behind by
+the cancellations and the previous cancel-and-insert reschedules), in `--steps`
+steps, on two databases holding the same upcoming bookings:
+
+- the history left in `Bookings`;
+- the history moved to `BookingsArchive` by the compaction job (`archive_bookings`)
+  after each step, whose throughput is reported.
+
+Every answer must be the same on both databases (the upcoming bookings for the
+lookups). Also reports the rows added to `Bookings` by in-place reschedules.
+
+Usage (from `src/`):
+    python -m benchmarks.booking_archive --history 2000000 --steps 4
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+import pytz
+
+from agents.booking_agent.database import utils as db_utils
+from agents.booking_agent.database.archive import archive_bookings
+from agents.booking_agent.database.connection import close_connection_pools, get_connection_pool
+from benchmarks.db_fixtures import booking_params, create_bench_db
+
+AROUND_THE_CLOCK = {weekday: (0, 24) for weekday in range(7)}
+UPCOMING_DAYS = 60
+HISTORY_DAYS = 3 * 365
+ADD_HISTORY_QUERY = """
+    INSERT INTO Bookings (
+        id, customer, stylist, service, start_ts, end_ts, booking_reason, created_at, status
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
+"""
+COUNT_QUERY = "SELECT COUNT(*) FROM {}"
+
+
+def _phone_number(customer_idx: int) -> str:
+    return f'647{customer_idx:07d}'
+
+
+def _create_db(db_path: str, stylists: int, customers: int) -> list[str]:
+    """The stylists working around the clock and the customers (same ids in every database). Returns their ids."""
+    create_bench_db(db_path)
+    for idx in range(stylists):
+        db_utils.add_stylist(f'Stylist {idx}', AROUND_THE_CLOCK, stylist_id=f'stylist-{idx}', db_path=db_path)
+    customer_ids = [f'customer-{idx}' for idx in range(customers)]
+    created_at = datetime.datetime.now(pytz.utc).isoformat()
+    with get_connection_pool(db_path).transaction() as conn:
+        conn.executemany(db_utils.ADD_CUSTOMER_QUERY, [
+            (customer_id, f'Customer {idx}', _phone_number(idx), None, created_at)
+            for idx, customer_id in enumerate(customer_ids)])
+    return customer_ids
+
+
+def _upcoming_bookings(first_slot: datetime.datetime, stylists: int, customer_ids: list[str],
+                       occupancy: float) -> list[tuple]:
+    created_dt = datetime.datetime.now(pytz.utc)
+    bookings = []
+    for hour in range(UPCOMING_DAYS * 24):
+        start_dt = first_slot + datetime.timedelta(hours=hour)
+        for idx in range(stylists):
+            if random.random() < occupancy:
+                bookings.append(booking_params(random.choice(customer_ids), start_dt,
+                                               start_dt + datetime.timedelta(hours=1), created_dt,
+                                               stylist_id=f'stylist-{idx}'))
+    return bookings
+
+
+def _history_bookings(count: int, now: datetime.datetime, stylists: int, customer_ids: list[str]) -> list[tuple]:
+    """Past bookings (ended over a month ago) and cancelled ones, past or upcoming."""
+    created_dt = now.isoformat()
+    rows = []
+    for _ in range(count):
+        if random.random() < 0.8:
+            start_ts = db_utils.to_timestamp(now) - random.randrange(31 * 24, HISTORY_DAYS * 24) * 3600
+            status = 'scheduled' if random.random() < 0.8 else 'cancelled'
+        else:
+            start_ts = db_utils.to_timestamp(now) + random.randrange(UPCOMING_DAYS * 24) * 3600
+            status = 'cancelled'
+        rows.append((str(uuid.uuid4()), random.choice(customer_ids), f'stylist-{random.randrange(stylists)}',
+                     db_utils.DEFAULT_SERVICE_ID, start_ts, start_ts + 3600, None, created_dt, status))
+    return rows
+
+
+def _probes(first_slot: datetime.datetime, stylists: int, customers: int, count: int) -> list[tuple]:
+    probes = []
+    for _ in range(count):
+        start_dt = first_slot + datetime.timedelta(hours=random.randrange(UPCOMING_DAYS * 24 - 7 * 24))
+        stylist_id = f'stylist-{random.randrange(stylists)}' if random.random() < 0.5 else None
+        probes.append((start_dt.isoformat(), stylist_id, _phone_number(random.randrange(customers))))
+    return probes
+
+
+def _measure(db_path: str, probes: list[tuple], now: datetime.datetime) -> tuple[dict, list]:
+    """Median µs per call of each lookup, and the answers."""
+    timings = {'availability': [], 'week slot search': [], 'customer bookings': []}
+    answers = []
+    for start_iso, stylist_id, phone_number in probes:
+        t0 = time.perf_counter()
+        available = db_utils.is_slot_available(start_iso, stylist_id=stylist_id, db_path=db_path)
+        t1 = time.perf_counter()
+        week_end = (datetime.datetime.fromisoformat(start_iso) + datetime.timedelta(days=7)).isoformat()
+        slots = db_utils.find_available_slots(start_iso, week_end, stylist_id=stylist_id, db_path=db_path)
+        t2 = time.perf_counter()
+        bookings = db_utils.get_active_bookings_user(phone_number, db_path=db_path)
+        t3 = time.perf_counter()
+        timings['availability'].append(t1 - t0)
+        timings['week slot search'].append(t2 - t1)
+        timings['customer bookings'].append(t3 - t2)
+        upcoming = [(booking['start_datetime'], booking['stylist']) for booking in bookings
+                    if datetime.datetime.fromisoformat(booking['start_datetime']) > now]
+        answers.append((available, slots, upcoming))
+    return {name: statistics.median(values) * 1e6 for name, values in timings.items()}, answers
+
+
+def _count(db_path: str, table: str) -> int:
+    (count,) = get_connection_pool(db_path).connection().execute(COUNT_QUERY.format(table)).fetchone()
+    return count
+
+
+def _reschedules(db_path: str, first_slot: datetime.datetime, count: int) -> tuple[int, int, float]:
+    """Reschedules `count` upcoming bookings: rows added to `Bookings` and `BookingHistory`, and ms per call."""
+    conn = get_connection_pool(db_path).connection()
+    booking_ids = [booking_id for (booking_id,) in conn.execute(
+        "SELECT id FROM Bookings WHERE status = 'scheduled' AND start_ts > ? LIMIT ?",
+        (db_utils.to_timestamp(first_slot), count))]
+    bookings_before, history_before = _count(db_path, 'Bookings'), _count(db_path, 'BookingHistory')
+    t0 = time.perf_counter()
+    for booking_id in booking_ids:
+        start_dt = first_slot + datetime.timedelta(hours=random.randrange(UPCOMING_DAYS * 24))
+        try:
+            db_utils.reschedule_booking(booking_id, start_dt.isoformat(), '', db_path=db_path)
+        except db_utils.SlotUnavailableError:
+            pass
+    elapsed = time.perf_counter() - t0
+    return (_count(db_path, 'Bookings') - bookings_before, _count(db_path, 'BookingHistory') - history_before,
+            elapsed / max(len(booking_ids), 1) * 1e3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--history', type=int, default=2000000, help='Historical bookings at the last step')
+    parser.add_argument('--steps', type=int, default=4)
+    parser.add_argument('--stylists', type=int, default=20)
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--occupancy', type=float, default=0.5, help='Of the upcoming slots')
+    parser.add_argument('--probes', type=int, default=1000, help='Lookups of each kind per step')
+    parser.add_argument('--reschedules', type=int, default=500)
+    args = parser.parse_args()
+    random.seed(0)
+
+    now = datetime.datetime.now(pytz.utc)
+    first_slot = now.replace(minute=0, second=0, microsecond=0) + datetime.timedelta(hours=2)
+    layouts = {'history in Bookings': 'hot.sqlite', 'history archived': 'archived.sqlite'}
+    rows, mismatches = [], 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_paths = {name: os.path.join(tmp_dir, file_name) for name, file_name in layouts.items()}
+        for db_path in db_paths.values():
+            customer_ids = _create_db(db_path, args.stylists, args.customers)
+        upcoming = _upcoming_bookings(first_slot, args.stylists, customer_ids, args.occupancy)
+        for db_path in db_paths.values():
+            with get_connection_pool(db_path).transaction() as conn:
+                conn.executemany(db_utils.ADD_BOOKING_QUERY, upcoming)
+        print(f"{len(upcoming)} upcoming bookings of {args.stylists} stylists over {UPCOMING_DAYS} days, "
+              f"{args.customers} customers, {args.probes} lookups of each kind per step (median µs per call)")
+
+        probes = _probes(first_slot, args.stylists, args.customers, args.probes)
+        history = 0
+        for step in range(args.steps + 1):
+            if step:
+                added = _history_bookings(args.history // args.steps, now, args.stylists, customer_ids)
+                history += len(added)
+                for db_path in db_paths.values():
+                    with get_connection_pool(db_path).transaction() as conn:
+                        conn.executemany(ADD_HISTORY_QUERY, added)
+            t0 = time.perf_counter()
+            result = archive_bookings(db_path=db_paths['history archived'])
+            archive_rate = result.archived / (time.perf_counter() - t0) if result.archived else None
+            timings = {}
+            answers = {}
+            for name, db_path in db_paths.items():
+                timings[name], answers[name] = _measure(db_path, probes, now)
+            mismatches += sum(a != b for a, b in zip(answers['history in Bookings'], answers['history archived']))
+            rows.append((history, timings, archive_rate,
+                         _count(db_paths['history in Bookings'], 'Bookings'),
+                         _count(db_paths['history archived'], 'Bookings')))
+
+        moved, history_rows, ms_per_reschedule = _reschedules(db_paths['history archived'], first_slot,
+                                                              args.reschedules)
+        archived_total = _count(db_paths['history archived'], 'BookingsArchive')
+        close_connection_pools()
+
+    kinds = {'availability': 'avail', 'week slot search': 'week', 'customer bookings': 'customer'}
+    print(f"\n{'history':>9}{'Bookings rows':>15}{'compacted':>11}" +
+          ''.join(f"{label + ' us':>13}{label + ' arch.':>15}" for label in kinds.values()) + f"{'archive rows/s':>16}")
+    for history, timings, archive_rate, hot_rows, archived_rows in rows:
+        print(f"{history:>9}{hot_rows:>15}{archived_rows:>11}" +
+              ''.join(f"{timings['history in Bookings'][kind]:>13.0f}{timings['history archived'][kind]:>15.0f}"
+                      for kind in kinds) +
+              (f"{archive_rate:>16.0f}" if archive_rate else f"{'-':>16}"))
+    print(f"\n{archived_total} bookings in the archive. {args.reschedules} in-place reschedules: "
+          f"{moved} rows added to Bookings, {history_rows} to BookingHistory, {ms_per_reschedule:.2f} ms each")
+    print(f"Lookups whose answers differ between the two databases: {mismatches}")
+    if mismatches or moved:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
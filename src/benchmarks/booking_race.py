@@ -0,0 +1,99 @@
+"""
+Concurrent booking stress test: many threads booking the same and overlapping
+(half-hour shifted) slots, with the previous check-then-insert sequence vs. the
+atomic `add_booking`. Reports the booking attempts/sec and the number of
+double-bookings (overlapping active bookings) left in the database.
+
+Usage (from `src/`):
+    python -m benchmarks.booking_race --threads 32 --attempts 4000
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytz
+
+from agents.booking_agent.database import utils as db_utils
+from agents.booking_agent.database.connection import close_connection_pools, get_connection_pool
+from benchmarks.db_fixtures import booking_params, create_bench_db
+
+PHONE_NUMBER = '6470000000'
+DOUBLE_BOOKINGS_QUERY = """
+    SELECT COUNT(*) FROM Bookings a JOIN Bookings b
+    ON a.id < b.id
+    AND a.stylist = b.stylist
+    AND a.start_ts < b.end_ts
+    AND b.start_ts < a.end_ts
+    WHERE a.status != 'cancelled' AND b.status != 'cancelled'
+"""
+
+
+def _check_then_insert(start_dt_str: str, db_path: str) -> bool:
+    # Previous sequence in book_appointment: availability check and insert in separate transactions
+    if not db_utils.is_slot_available(start_dt_str, db_path=db_path):
+        return False
+    start_dt_utc = datetime.datetime.fromisoformat(start_dt_str).astimezone(pytz.utc)
+    try:
+        with get_connection_pool(db_path).transaction() as conn:
+            customer_id = conn.execute(db_utils.GET_USER_QUERY, (PHONE_NUMBER,)).fetchone()[0]
+            conn.execute(
+                db_utils.ADD_BOOKING_QUERY,
+                booking_params(customer_id, start_dt_utc, start_dt_utc + datetime.timedelta(hours=1), start_dt_utc)
+            )
+        return True
+    except Exception:
+        return False
+
+
+def _atomic(start_dt_str: str, db_path: str) -> bool:
+    try:
+        return db_utils.add_booking(start_dt_str, 'Bench', PHONE_NUMBER, db_path=db_path) is not None
+    except db_utils.SlotUnavailableError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--attempts', type=int, default=4000)
+    parser.add_argument('--hours', type=int, default=200, help='Number of hours the attempted slots are spread over')
+    args = parser.parse_args()
+    random.seed(0)
+
+    base_dt = datetime.datetime.now(pytz.utc).replace(minute=0, second=0, microsecond=0) + datetime.timedelta(days=1)
+    # Slots on the hour and on the half hour, so half of the conflicts are partial overlaps
+    candidate_slots = [
+        (base_dt + datetime.timedelta(minutes=30 * i)).isoformat() for i in range(args.hours * 2)
+    ]
+    attempts = [random.choice(candidate_slots) for _ in range(args.attempts)]
+
+    print(f"{'mode':<20}{'attempts/s':>12}{'booked':>8}{'double-bookings':>17}")
+    for mode, book in (('check-then-insert', _check_then_insert), ('atomic', _atomic)):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, 'bookings.sqlite')
+            create_bench_db(db_path)
+            db_utils.add_booking(
+                (base_dt - datetime.timedelta(days=1)).isoformat(), 'Bench', PHONE_NUMBER, db_path=db_path)
+            barrier = threading.Barrier(args.threads)
+
+            def worker(worker_idx):
+                barrier.wait()
+                return sum(book(slot, db_path) for slot in attempts[worker_idx::args.threads])
+
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.threads) as executor:
+                booked = sum(executor.map(worker, range(args.threads)))
+            elapsed = time.perf_counter() - t0
+
+            (double_bookings,) = get_connection_pool(db_path).connection().execute(DOUBLE_BOOKINGS_QUERY).fetchone()
+            close_connection_pools()
+        print(f"{mode:<20}{args.attempts / elapsed:>12.0f}{booked:>8}{double_bookings:>17}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Throughput of the bulk import and export of bookings (`database.bulk`) vs. one
+`add_booking` call per row, on a calendar of `--rows` bookings spread over
+`--stylists` stylists and a quarter as many customers, with a fraction of
+duplicated rows that must be rejected as overlaps.
+
+Phases: the CSV import, the streaming JSONL export, a dry run of the export
+against the same database (every row already imported) and the import of the
+export into a new database, which must hold the same bookings.
+
+Usage (from `src/`):
+    python -m benchmarks.bulk_import --rows 1000000 --stylists 50
+"""
+import argparse
+import csv
+import datetime
+import os
+import random
+import resource
+import tempfile
+import time
+
+import pytz
+
+from agents.booking_agent.database import bulk
+from agents.booking_agent.database import utils as db_utils
+from agents.booking_agent.database.connection import close_connection_pools, get_connection_pool
+from benchmarks.db_fixtures import create_bench_db
+
+AROUND_THE_CLOCK = {weekday: (0, 24) for weekday in range(7)}
+
+
+def _create_db(db_path: str, stylists: int):
+    create_bench_db(db_path)
+    for idx in range(stylists):
+        db_utils.add_stylist(f'Stylist {idx}', AROUND_THE_CLOCK, stylist_id=f'stylist-{idx}', db_path=db_path)
+
+
+def _write_calendar(path: str, rows: int, stylists: int, duplicates: float) -> int:
+    """Writes the calendar CSV: consecutive hourly bookings per stylist, some rows duplicated. Returns the duplicates."""
+    tz = pytz.timezone(db_utils.SALON_TIMEZONE)
+    first_slot = tz.localize(datetime.datetime.combine(datetime.date.today(), datetime.time()))
+    customers = max(rows // 4, 1)
+    planted = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, bulk.BULK_COLUMNS)
+        writer.writeheader()
+        for idx in range(rows):
+            customer = random.randrange(customers)
+            row = {
+                'start_datetime': (first_slot + datetime.timedelta(hours=idx // stylists)).isoformat(),
+                'customer_name': f'Customer {customer}',
+                'phone_number': f'647{customer:07d}',
+                'stylist': f'Stylist {idx % stylists}',
+                'booking_reason': 'Imported',
+            }
+            writer.writerow(row)
+            if random.random() < duplicates:
+                writer.writerow(row)
+                planted += 1
+    return planted
+
+
+def _count_bookings(db_path: str) -> int:
+    (count,) = get_connection_pool(db_path).connection().execute("SELECT COUNT(*) FROM Bookings").fetchone()
+    return count
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--stylists', type=int, default=50)
+    parser.add_argument('--duplicates', type=float, default=0.01, help='Fraction of rows written twice')
+    parser.add_argument('--chunk-size', type=int, default=bulk.DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--baseline-rows', type=int, default=2000, help='Rows booked one by one with add_booking')
+    args = parser.parse_args()
+    random.seed(0)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path, jsonl_path = os.path.join(tmp_dir, 'calendar.csv'), os.path.join(tmp_dir, 'export.jsonl')
+        db_path, copy_db_path = os.path.join(tmp_dir, 'bookings.sqlite'), os.path.join(tmp_dir, 'copy.sqlite')
+        planted = _write_calendar(csv_path, args.rows, args.stylists, args.duplicates)
+        print(f"{args.rows + planted} rows ({planted} duplicated) over {args.stylists} stylists, "
+              f"CSV of {os.path.getsize(csv_path) / 2 ** 20:.0f} MB")
+        timings = {}
+
+        baseline_db_path = os.path.join(tmp_dir, 'baseline.sqlite')
+        _create_db(baseline_db_path, args.stylists)
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            rows = [row for row, _ in zip(bulk.read_rows(f, 'csv'), range(args.baseline_rows))]
+        stylist_ids = {stylist.name: stylist.id for stylist in db_utils.get_stylists(db_path=baseline_db_path)}
+        t0 = time.perf_counter()
+        for row in rows:
+            try:
+                db_utils.add_booking(row['start_datetime'], row['customer_name'], row['phone_number'],
+                                     booking_reason=row['booking_reason'],
+                                     stylist_id=stylist_ids[row['stylist']],
+                                     db_path=baseline_db_path)
+            except db_utils.SlotUnavailableError:
+                pass
+        timings['add_booking per row'] = (len(rows), time.perf_counter() - t0)
+
+        _create_db(db_path, args.stylists)
+        t0 = time.perf_counter()
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            result = bulk.import_bookings(bulk.read_rows(f, 'csv'), chunk_size=args.chunk_size, db_path=db_path)
+        timings['bulk import (CSV)'] = (result.rows, time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        with open(jsonl_path, 'w', encoding='utf-8') as f:
+            f.writelines(bulk.format_rows(bulk.export_bookings(db_path=db_path), 'jsonl'))
+        with open(jsonl_path, encoding='utf-8') as f:
+            exported = sum(1 for _ in f)
+        timings['export (JSONL)'] = (exported, time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        with open(jsonl_path, encoding='utf-8') as f:
+            dry_run = bulk.import_bookings(bulk.read_rows(f, 'jsonl'), dry_run=True, db_path=db_path)
+        timings['re-import dry run'] = (dry_run.rows, time.perf_counter() - t0)
+
+        _create_db(copy_db_path, args.stylists)
+        t0 = time.perf_counter()
+        with open(jsonl_path, encoding='utf-8') as f:
+            round_trip = bulk.import_bookings(bulk.read_rows(f, 'jsonl'), chunk_size=args.chunk_size,
+                                              db_path=copy_db_path)
+        timings['import of the export'] = (round_trip.rows, time.perf_counter() - t0)
+        copied = _count_bookings(copy_db_path)
+        close_connection_pools()
+
+    print(f"\n{'phase':<24}{'rows':>10}{'secs':>9}{'rows/s':>10}")
+    for phase, (rows, secs) in timings.items():
+        print(f"{phase:<24}{rows:>10}{secs:>9.2f}{rows / secs:>10.0f}")
+    baseline_rate = timings['add_booking per row'][0] / timings['add_booking per row'][1]
+    import_rate = timings['bulk import (CSV)'][0] / timings['bulk import (CSV)'][1]
+    print(f"\nBulk import {import_rate / baseline_rate:.0f}x the rows/s of add_booking; "
+          f"{result.customers_created} customers created; peak RSS {_peak_rss_mb():.0f} MB")
+
+    checks = {
+        'imported': (result.imported, args.rows),
+        'rejected duplicates': (result.rejected, planted),
+        'exported': (exported, args.rows),
+        'rejected by the dry run (already imported)': (dry_run.rejected, args.rows),
+        'bookings after the round trip': (copied, args.rows),
+    }
+    failed = False
+    for name, (value, expected) in checks.items():
+        print(f"{name}: {value} (expected {expected})")
+        failed = failed or value != expected
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
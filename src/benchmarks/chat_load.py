@@ -0,0 +1,78 @@
+"""
+Load test of the `/chat` endpoint with a local stub LLM: many concurrent
+conversations against a single process, for the async endpoint and for the
+previous sync endpoint (which holds a threadpool worker for the whole turn).
+
+Usage (from `src/`):
+    python -m benchmarks.chat_load --sessions 50 200 500 --turns 3 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+from fastapi import FastAPI
+
+from agents import BookingAgent
+from backend_service import service
+from backend_service.schema import ChatResponse, QueryRequest
+from benchmarks.stub_llm import StubChatModel
+
+
+def _sync_app(booking_agent: BookingAgent) -> FastAPI:
+    # Previous implementation of the endpoint, for comparison
+    sync_app = FastAPI()
+
+    @sync_app.post("/chat")
+    def query_langgraph(request: QueryRequest) -> ChatResponse:
+        result = booking_agent.invoke(
+            {"messages": [{"role": "user", "content": request.user_input}]},
+            config={"configurable": {"thread_id": request.thread_id}}
+        )
+        return ChatResponse(response=result['messages'][-1].content)
+
+    return sync_app
+
+
+async def _run_sessions(app: FastAPI, sessions: int, turns: int) -> tuple[list[float], float]:
+    latencies = []
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        async def conversation():
+            thread_id = str(uuid.uuid4())
+            for turn in range(turns):
+                t0 = time.perf_counter()
+                response = await client.post(
+                    '/chat', json={'user_input': f'Hi, turn {turn}', 'thread_id': thread_id})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(conversation() for _ in range(sessions)))
+        return latencies, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[50, 200, 500])
+    parser.add_argument('--turns', type=int, default=3)
+    parser.add_argument('--llm-latency', type=float, default=0.5)
+    args = parser.parse_args()
+
+    service.booking_agent = BookingAgent(llm=StubChatModel(latency_secs=args.llm_latency))
+    apps = {'async': service.app, 'sync': _sync_app(service.booking_agent)}
+
+    print(f"{'endpoint':<10}{'sessions':>10}{'turns/s':>10}{'p50 s':>8}{'p99 s':>8}")
+    for sessions in args.sessions:
+        for name, app in apps.items():
+            latencies, elapsed = asyncio.run(_run_sessions(app, sessions, args.turns))
+            latencies.sort()
+            print(f"{name:<10}{sessions:>10}{len(latencies) / elapsed:>10.1f}"
+                  f"{statistics.median(latencies):>8.2f}{latencies[int(len(latencies) * 0.99) - 1]:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Time to first token of the streaming `/chat/stream` endpoint vs. the full
+response time of `/chat`, with a local stub LLM streaming its reply token by
+token. The order and content of the streamed events are checked by
+`tests/test_chat_stream.py`.
+
+Usage (from `src/`):
+    python -m benchmarks.chat_stream --llm-latency 0.5 --token-latency 0.03
+"""
+import argparse
+import asyncio
+import json
+import socket
+import statistics
+import threading
+import time
+import uuid
+
+import httpx
+import uvicorn
+
+from agents import BookingAgent
+from backend_service import service
+from benchmarks.stub_llm import StubChatModel
+
+
+def _start_server() -> tuple[uvicorn.Server, str]:
+    # A real server: the in-process ASGI transport of httpx buffers streamed responses
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(service.app, host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f'http://127.0.0.1:{port}'
+
+
+async def _measure(base_url: str, requests: int) -> dict:
+    timings = {'chat': [], 'stream_first_token': [], 'stream_total': []}
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=None) as client:
+        for _ in range(requests):
+            payload = {'user_input': 'Hi', 'thread_id': str(uuid.uuid4())}
+
+            t0 = time.perf_counter()
+            await client.post('/chat', json=payload)
+            timings['chat'].append(time.perf_counter() - t0)
+
+            payload['thread_id'] = str(uuid.uuid4())
+            tokens = []
+            t0 = time.perf_counter()
+            async with client.stream('POST', '/chat/stream', json=payload) as response:
+                async for line in response.aiter_lines():
+                    event = json.loads(line)
+                    if event['type'] == 'token':
+                        if not tokens:
+                            timings['stream_first_token'].append(time.perf_counter() - t0)
+                        tokens.append(event['content'])
+                    elif event['type'] == 'error':
+                        raise RuntimeError(event['content'])
+            timings['stream_total'].append(time.perf_counter() - t0)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=10)
+    parser.add_argument('--llm-latency', type=float, default=0.5)
+    parser.add_argument('--token-latency', type=float, default=0.03)
+    args = parser.parse_args()
+
+    service.booking_agent = BookingAgent(
+        llm=StubChatModel(latency_secs=args.llm_latency, token_latency_secs=args.token_latency))
+    server, base_url = _start_server()
+    timings = asyncio.run(_measure(base_url, args.requests))
+    server.should_exit = True
+
+    print(f"/chat response time:           {statistics.median(timings['chat']):.3f} s")
+    print(f"/chat/stream time to 1st token: {statistics.median(timings['stream_first_token']):.3f} s")
+    print(f"/chat/stream total time:        {statistics.median(timings['stream_total']):.3f} s")
+
+
+if __name__ == '__main__':
+    main()
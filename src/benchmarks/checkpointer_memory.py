@@ -0,0 +1,75 @@
+"""
+Process memory (RSS) while simulating many conversation threads with the
+different checkpointers: unbounded `MemorySaver`, `BoundedMemorySaver` capped
+at `--max-threads`, and the SQLite-backed one. Each mode runs in its own
+process with a local stub LLM.
+
+Usage (from `src/`):
+    python -m benchmarks.checkpointer_memory --threads 10000 --max-threads 1000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from agents.booking_agent.booking_agent import BookingAgent
+from agents.booking_agent.checkpointer import create_checkpointer
+from benchmarks.stub_llm import StubChatModel
+
+MODES = ('unbounded', 'bounded', 'sqlite')
+USER_MESSAGE = 'Hi, I would like to book a haircut next week. ' * 10
+
+
+def _rss_mb() -> float:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2 ** 20
+
+
+def _run_mode(mode: str, threads: int, max_threads: int, report_every: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if mode == 'unbounded':
+            checkpointer = MemorySaver()
+        elif mode == 'bounded':
+            checkpointer = create_checkpointer('memory', max_threads=max_threads)
+        else:
+            checkpointer = create_checkpointer('sqlite', db_path=os.path.join(tmp_dir, 'checkpoints.sqlite'))
+        agent = BookingAgent(llm=StubChatModel(latency_secs=0), checkpointer=checkpointer)
+
+        t0 = time.perf_counter()
+        for i in range(1, threads + 1):
+            agent.invoke(
+                {"messages": [{"role": "user", "content": USER_MESSAGE}]},
+                config={"configurable": {"thread_id": f'thread-{i}'}}
+            )
+            if i % report_every == 0:
+                print(f"{mode:<12}{i:>10}{_rss_mb():>12.1f}{i / (time.perf_counter() - t0):>12.0f}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=10000)
+    parser.add_argument('--max-threads', type=int, default=1000)
+    parser.add_argument('--mode', choices=MODES, help='Run a single mode in this process')
+    args = parser.parse_args()
+    report_every = max(args.threads // 5, 1)
+
+    if args.mode:
+        _run_mode(args.mode, args.threads, args.max_threads, report_every)
+        return
+
+    print(f"{'mode':<12}{'threads':>10}{'RSS MB':>12}{'turns/s':>12}", flush=True)
+    for mode in MODES:
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.checkpointer_memory', '--mode', mode,
+             '--threads', str(args.threads), '--max-threads', str(args.max_threads)],
+            check=True
+        )
+
+
+if __name__ == '__main__':
+    main()
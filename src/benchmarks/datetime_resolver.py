@@ -0,0 +1,106 @@
+"""
+Resolution of natural language booking phrases ("tomorrow at 3pm", "next friday
+10am", ...) as by `convert_relative_to_absolute_datetime`, over a workload of
+`--lookups` phrases drawn (skewed, with varied case and spacing) from a corpus
+of common ones, at reference times spread over `--days` days:
+
+- a new `parsedatetime.Calendar` per call, as the tool previously did;
+- the calendar of the thread reused (`parse_datetime`);
+- the memoizing `DatetimeResolver`, one phrase per call and by batches (`resolve_many`).
+
+Every result must match the first one.
+
+Usage (from `src/`):
+    python -m benchmarks.datetime_resolver --lookups 20000 --days 3
+"""
+import argparse
+import datetime
+import random
+import time
+
+import parsedatetime
+import pytz
+
+from agents.booking_agent.database.utils import SALON_TIMEZONE
+from agents.booking_agent.utils import DatetimeResolver, parse_datetime
+
+PHRASES = [
+    'tomorrow at 3pm', 'tomorrow at 10am', 'tomorrow morning at 9', 'tomorrow at noon', 'today at 5pm',
+    'today at 4:30pm', 'next friday 10am', 'next friday at 2pm', 'next monday at 11am', 'next tuesday 3pm',
+    'this saturday at 10am', 'saturday at 1pm', 'sunday at 12pm', 'wednesday at 4pm', 'thursday 6pm',
+    'next week monday at 9am', 'monday at 9:30am', 'friday at 5:30pm', 'in 2 days at 3pm', 'in 3 days at 11am',
+    'the day after tomorrow at 2pm', 'next thursday at 7pm', 'this friday at noon', 'tuesday morning at 10',
+    'may 5 at 2pm', 'june 12 at 10am', 'december 1st at 3pm', 'in 2 hours', 'in 30 minutes', 'tonight at 7',
+    'friday', 'tomorrow', 'next week', '3pm', '10:30am',
+]
+
+
+def _variant(phrase: str) -> str:
+    """The phrase as typed by a customer: varied case and spacing."""
+    words = phrase.split()
+    if random.random() < 0.3:
+        words = [word.capitalize() for word in words]
+    return (' ' if random.random() < 0.8 else '  ').join(words)
+
+
+def _workload(lookups: int, days: int) -> list[tuple[str, datetime.datetime]]:
+    tz = pytz.timezone(SALON_TIMEZONE)
+    start = tz.localize(datetime.datetime.combine(datetime.date.today(), datetime.time(8)))
+    references = sorted(start + datetime.timedelta(seconds=random.randrange(days * 86400)) for _ in range(lookups))
+    # Conversations mostly use the same few phrases: skewed choices
+    return [(_variant(PHRASES[min(int(random.expovariate(1 / 6)), len(PHRASES) - 1)]), reference)
+            for reference in references]
+
+
+def _new_calendar_parse(text: str, current_datetime: datetime.datetime) -> datetime.datetime | None:
+    time_struct, parse_status = parsedatetime.Calendar().parse(text, current_datetime.timetuple())
+    if parse_status == 0:
+        return None
+    return current_datetime.tzinfo.localize(datetime.datetime(*time_struct[:6]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lookups', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=3, help='Span of the reference times')
+    parser.add_argument('--batch', type=int, default=3, help='Phrases per resolve_many call')
+    args = parser.parse_args()
+    random.seed(0)
+    workload = _workload(args.lookups, args.days)
+
+    resolver, batch_resolver = DatetimeResolver(), DatetimeResolver()
+    results, timings = {}, {}
+    for name, resolve in (('new Calendar per call', _new_calendar_parse), ('thread calendar', parse_datetime),
+                          ('DatetimeResolver', resolver.resolve)):
+        t0 = time.perf_counter()
+        results[name] = [resolve(text, reference) for text, reference in workload]
+        timings[name] = time.perf_counter() - t0
+
+    name = f'resolve_many ({args.batch} per call)'
+    t0 = time.perf_counter()
+    results[name] = []
+    for idx in range(0, len(workload), args.batch):
+        batch = workload[idx:idx + args.batch]
+        # The phrases of one turn share its reference time
+        results[name].extend(batch_resolver.resolve_many([text for text, _ in batch], batch[0][1]))
+    timings[name] = time.perf_counter() - t0
+    # Checked against the per-call parse at the same reference times
+    expected_batched = [_new_calendar_parse(text, workload[idx - idx % args.batch][1])
+                        for idx, (text, _) in enumerate(workload)]
+
+    baseline = results['new Calendar per call']
+    print(f"{len(workload)} lookups of {len(PHRASES)} phrases over {args.days} days")
+    print(f"\n{'mode':<28}{'us/lookup':>11}{'speedup':>9}{'mismatches':>12}")
+    for name, elapsed in timings.items():
+        expected = expected_batched if name.startswith('resolve_many') else baseline
+        mismatches = sum(a != b for a, b in zip(results[name], expected))
+        print(f"{name:<28}{elapsed / len(workload) * 1e6:>11.1f}{timings['new Calendar per call'] / elapsed:>8.1f}x"
+              f"{mismatches:>12}")
+        if mismatches:
+            raise SystemExit(f'{name} resolved {mismatches} phrases differently')
+    print(f"\nDatetimeResolver hit rate: {resolver.hits / (resolver.hits + resolver.misses):.0%}, "
+          f"{len(resolver)} entries")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Per-tool-call latency and throughput of the database layer: a fresh
+`sqlite3.connect` per call (previous behaviour) vs. the pooled connections.
+
+Each simulated tool call is an availability check followed by a booking, which
+is what a `book_appointment` turn does. Workers are threads, as FastAPI runs
+sync endpoints on a threadpool.
+
+Usage (from `src/`):
+    python -m benchmarks.db_connection_pool --workers 1 4 16 --calls 400
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytz
+
+from agents.booking_agent.database import utils as db_utils
+from agents.booking_agent.database.connection import close_connection_pools
+from benchmarks.db_fixtures import booking_params, create_bench_db
+
+LEGACY_SLOT_AVAILABLE_QUERY = """
+    SELECT * FROM Bookings
+    WHERE start_ts < ?
+      AND end_ts > ?
+      AND status != 'cancelled'
+"""
+
+
+def _per_call_connect_tool_call(db_path: str, start_dt: datetime.datetime):
+    # Mirrors the previous implementation: two connections, pragmas re-issued on each
+    with sqlite3.connect(db_path, timeout=5) as conn:
+        conn.execute(
+            LEGACY_SLOT_AVAILABLE_QUERY,
+            (
+                db_utils.to_timestamp(start_dt + datetime.timedelta(hours=1)),
+                db_utils.to_timestamp(start_dt)
+            )
+        ).fetchall()
+    with sqlite3.connect(db_path, timeout=5) as conn:
+        conn.execute("PRAGMA foreign_keys = ON;")
+        customer_id = conn.execute(
+            "SELECT id FROM Customer WHERE phone_number = ?", ('6470000000',)).fetchone()[0]
+        conn.execute(
+            db_utils.ADD_BOOKING_QUERY,
+            booking_params(customer_id, start_dt, start_dt + datetime.timedelta(hours=1), start_dt)
+        )
+
+
+def _pooled_tool_call(db_path: str, start_dt: datetime.datetime):
+    if db_utils.is_slot_available(start_dt.isoformat(), db_path=db_path):
+        db_utils.add_booking(start_dt.isoformat(), 'Bench', '6470000000', db_path=db_path)
+
+
+def _run(tool_call, db_path: str, workers: int, calls: int) -> dict:
+    base_dt = datetime.datetime.now(pytz.utc).replace(minute=0, second=0, microsecond=0)
+    latencies = []
+
+    def timed_call(i):
+        start_dt = base_dt + datetime.timedelta(hours=i + 1)
+        t0 = time.perf_counter()
+        tool_call(db_path, start_dt)
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(timed_call, range(calls)))
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        'throughput': calls / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--calls', type=int, default=400)
+    args = parser.parse_args()
+
+    print(f"{'mode':<12}{'workers':>8}{'calls/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for workers in args.workers:
+        for mode, tool_call in (('per-call', _per_call_connect_tool_call), ('pooled', _pooled_tool_call)):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                db_path = os.path.join(tmp_dir, 'bookings.sqlite')
+                create_bench_db(db_path)
+                db_utils.add_booking(
+                    datetime.datetime.now(pytz.utc).isoformat(), 'Bench', '6470000000', db_path=db_path)
+                result = _run(tool_call, db_path, workers, args.calls)
+                close_connection_pools()
+            print(f"{mode:<12}{workers:>8}{result['throughput']:>12.0f}"
+                  f"{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
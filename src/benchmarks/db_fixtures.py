@@ -0,0 +1,42 @@
+"""
+Database setup shared by the benchmarks: a bookings database whose default
+stylist works around the clock (so that any hourly slot can be booked), and the
+parameters of `ADD_BOOKING_QUERY` for bulk inserts.
+"""
+import datetime
+import uuid
+
+from agents.booking_agent.database import utils as db_utils
+from agents.booking_agent.database.connection import get_connection_pool
+from agents.booking_agent.database.create_sqlite_db import DEFAULT_STYLIST_ID, create_bookings_db
+
+
+def create_bench_db(db_path: str = db_utils.DB_PATH, around_the_clock: bool = True):
+    create_bookings_db(db_path)
+    if around_the_clock:
+        with get_connection_pool(db_path).transaction() as conn:
+            conn.execute("DELETE FROM StylistHours WHERE stylist = ?", (DEFAULT_STYLIST_ID,))
+            conn.executemany(
+                db_utils.ADD_STYLIST_HOURS_QUERY,
+                [(DEFAULT_STYLIST_ID, weekday, 0, 24 * 60) for weekday in range(7)]
+            )
+
+
+def booking_params(
+        customer_id: str,
+        start_dt: datetime.datetime,
+        end_dt: datetime.datetime,
+        created_dt: datetime.datetime,
+        stylist_id: str = DEFAULT_STYLIST_ID,
+        service_id: str = db_utils.DEFAULT_SERVICE_ID) -> tuple:
+    """Parameters of `ADD_BOOKING_QUERY` for a new booking."""
+    return (
+        str(uuid.uuid4()),
+        customer_id,
+        stylist_id,
+        service_id,
+        db_utils.to_timestamp(start_dt),
+        db_utils.to_timestamp(end_dt),
+        None,
+        created_dt.isoformat()
+    )
@@ -0,0 +1,106 @@
+"""
+Per-call cost of the read helpers: `pd.read_sql_query` DataFrames (previous
+behaviour) vs. the `EXISTS` probe and dataclass row layer.
+
+pandas is only needed to time the previous behaviour; it is skipped if not installed.
+
+Usage (from `src/`):
+    python -m benchmarks.db_row_layer --bookings 5000 --calls 2000
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+import pytz
+
+from agents.booking_agent.database import utils as db_utils
+from agents.booking_agent.database.connection import close_connection_pools, get_connection_pool
+from benchmarks.db_fixtures import booking_params, create_bench_db
+
+PHONE_NUMBER = '6470000000'
+LEGACY_SLOT_AVAILABLE_QUERY = """
+    SELECT * FROM Bookings
+    WHERE start_ts < ?
+      AND end_ts > ?
+      AND status != 'cancelled'
+"""
+
+
+def _populate(db_path: str, num_bookings: int) -> datetime.datetime:
+    base_dt = datetime.datetime.now(pytz.utc).replace(minute=0, second=0, microsecond=0)
+    db_utils.add_booking((base_dt + datetime.timedelta(hours=1)).isoformat(), 'Bench', PHONE_NUMBER, db_path=db_path)
+    customer_id = db_utils.get_customer_by_phone(PHONE_NUMBER, db_path=db_path).id
+    with get_connection_pool(db_path).transaction() as conn:
+        conn.executemany(
+            db_utils.ADD_BOOKING_QUERY,
+            (
+                booking_params(
+                    customer_id, base_dt + datetime.timedelta(hours=i), base_dt + datetime.timedelta(hours=i + 1),
+                    base_dt)
+                for i in range(2, num_bookings + 1)
+            )
+        )
+    return base_dt
+
+
+def _time_per_call(func, calls: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(calls):
+        func(i)
+    return (time.perf_counter() - t0) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=5000)
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+    pandas_import_ms = (time.perf_counter() - t0) * 1000
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bookings.sqlite')
+        create_bench_db(db_path)
+        base_dt = _populate(db_path, args.bookings)
+        conn = get_connection_pool(db_path).connection()
+
+        def slot(i):
+            return base_dt + datetime.timedelta(hours=i % (args.bookings + 24))
+
+        def legacy_is_slot_available(i):
+            start_dt = slot(i)
+            return pd.read_sql_query(
+                LEGACY_SLOT_AVAILABLE_QUERY, conn,
+                params=(db_utils.to_timestamp(start_dt + datetime.timedelta(hours=1)), db_utils.to_timestamp(start_dt))).empty
+
+        def legacy_get_active_bookings_user(i):
+            customer_df = pd.read_sql_query(db_utils.GET_USER_QUERY, conn, params=(PHONE_NUMBER,))
+            bookings_df = pd.read_sql_query(
+                db_utils.GET_ACTIVE_BOOKINGS_USER_QUERY, conn, params=(customer_df.loc[0, 'id'],))
+            return bookings_df.iloc[:, :3].to_dict(orient='records')
+
+        print(f"{'call':<28}{'pandas us/call':>16}{'rows us/call':>16}")
+        cases = (
+            ('is_slot_available', legacy_is_slot_available,
+             lambda i: db_utils.is_slot_available(slot(i).isoformat(), db_path=db_path), args.calls),
+            ('get_active_bookings_user', legacy_get_active_bookings_user,
+             lambda i: db_utils.get_active_bookings_user(PHONE_NUMBER, db_path=db_path), max(args.calls // 100, 5)),
+        )
+        for name, legacy_func, func, calls in cases:
+            legacy_us = _time_per_call(legacy_func, calls) if pd is not None else float('nan')
+            print(f"{name:<28}{legacy_us:>16.1f}{_time_per_call(func, calls):>16.1f}")
+        close_connection_pools()
+
+    if pd is not None:
+        print(f"pandas import time (avoided at service start): {pandas_import_ms:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
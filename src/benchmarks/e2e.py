@@ -0,0 +1,129 @@
+"""
+Offline end-to-end benchmark: scripted booking, reschedule and cancel conversations
+(see `benchmarks.scenarios`) driven through `BookingAgent.invoke` and through the
+`/chat` endpoint, with a local scripted model making the same tool calls as the real
+one. Nothing is sent to OpenAI.
+
+Reports turns/s, p50/p99 turn latency, LLM calls, tool calls, SQL statements and
+pooled connections opened per turn, and the process memory (RSS). Failed tool
+calls (e.g. a slot reported as unavailable) are counted: any is a regression.
+
+Usage (from `src/`):
+    python -m benchmarks.e2e --conversations 100 --concurrency 8 --llm-latency 0
+"""
+import argparse
+import asyncio
+import os
+import resource
+import statistics
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from agents import BookingAgent
+from agents.booking_agent import metrics
+from agents.booking_agent.database.connection import DEFAULT_PRAGMAS, close_connection_pools
+from agents.booking_agent.database.create_sqlite_db import create_bookings_db
+from backend_service import service
+from benchmarks.scenarios import ScriptedConversations
+from benchmarks.stub_llm import ScriptedChatModel
+
+
+def _rss_mb() -> float:
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2 ** 20
+
+
+def _db_counts() -> tuple[int, float]:
+    # SQL statements, and connections opened (each applies the pragmas)
+    pragmas = metrics.SQL_DURATION.count('pragma')
+    return metrics.SQL_DURATION.total_count() - pragmas, pragmas / len(DEFAULT_PRAGMAS)
+
+
+def _run_invoke(agent: BookingAgent, conversations: list[list[str]], concurrency: int) -> list[float]:
+    def conversation(user_inputs: list[str]) -> list[float]:
+        thread_config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        latencies = []
+        for user_input in user_inputs:
+            t0 = time.perf_counter()
+            agent.invoke({"messages": [{"role": "user", "content": user_input}]}, config=thread_config)
+            latencies.append(time.perf_counter() - t0)
+        return latencies
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return [latency for latencies in executor.map(conversation, conversations) for latency in latencies]
+
+
+async def _run_chat(conversations: list[list[str]], concurrency: int) -> list[float]:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=service.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        async def conversation(user_inputs: list[str]):
+            async with semaphore:
+                thread_id = str(uuid.uuid4())
+                for user_input in user_inputs:
+                    t0 = time.perf_counter()
+                    response = await client.post('/chat', json={'user_input': user_input, 'thread_id': thread_id})
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - t0)
+
+        await asyncio.gather(*(conversation(user_inputs) for user_inputs in conversations))
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversations', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--llm-latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The tools use the default database path, relative to the working directory
+        os.chdir(tmp_dir)
+        try:
+            create_bookings_db()
+            scenarios = ScriptedConversations()
+            llm = ScriptedChatModel(respond=scenarios.respond, latency_secs=args.llm_latency)
+            service.booking_agent = BookingAgent(llm=llm)
+            modes = {
+                'invoke': lambda conversations: _run_invoke(service.booking_agent, conversations, args.concurrency),
+                '/chat': lambda conversations: asyncio.run(_run_chat(conversations, args.concurrency)),
+            }
+
+            print(f"{'mode':<8}{'turns':>7}{'turns/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'LLM/turn':>10}"
+                  f"{'tools/turn':>12}{'SQL/turn':>10}{'conns/turn':>12}{'RSS MB':>8}{'failed':>8}")
+            for offset, (name, run) in enumerate(modes.items()):
+                conversations = [scenarios.conversation(offset * args.conversations + i)
+                                 for i in range(args.conversations)]
+                llm_calls, tool_calls = len(llm.prompts), metrics.TOOL_DURATION.total_count()
+                (sql_statements, connections), failures = _db_counts(), len(scenarios.failures)
+
+                t0 = time.perf_counter()
+                latencies = sorted(run(conversations))
+                elapsed = time.perf_counter() - t0
+
+                turns = len(latencies)
+                sql_statements_after, connections_after = _db_counts()
+                print(f"{name:<8}{turns:>7}{turns / elapsed:>9.1f}"
+                      f"{statistics.median(latencies) * 1e3:>9.1f}{latencies[int(turns * 0.99) - 1] * 1e3:>9.1f}"
+                      f"{(len(llm.prompts) - llm_calls) / turns:>10.2f}"
+                      f"{(metrics.TOOL_DURATION.total_count() - tool_calls) / turns:>12.2f}"
+                      f"{(sql_statements_after - sql_statements) / turns:>10.2f}"
+                      f"{(connections_after - connections) / turns:>12.2f}"
+                      f"{_rss_mb():>8.1f}{len(scenarios.failures) - failures:>8}")
+            for user_input, result in scenarios.failures[:5]:
+                print(f"Failed tool call in '{user_input}': {result}")
+        finally:
+            close_connection_pools()
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Overlap scans on a large `Bookings` table with the ISO 8601 text columns and
+full indexes (schema version 1) vs. the integer UTC epoch columns and partial
+indexes on the active bookings (version 2), on the same data: the free-stylist
+probe of `is_slot_available` and the one-day range scan of `find_available_slots`,
+with the parsing of the stored values (none is needed for epoch seconds). Also times the migration itself, which
+is what `python -m agents.booking_agent.database.create_sqlite_db` runs on an
+existing `bookings.sqlite`.
+
+Usage (from `src/`):
+    python -m benchmarks.epoch_overlap --bookings 1000000 --stylists 50 --probes 5000
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+import uuid
+
+import pytz
+
+from agents.booking_agent.database import utils as db_utils
+from agents.booking_agent.database.connection import close_connection_pools, get_connection_pool
+from agents.booking_agent.database.create_sqlite_db import create_bookings_db, migrate_bookings_db, schema_version
+
+V1_ADD_BOOKING_QUERY = """
+    INSERT INTO Bookings (
+        id, customer, stylist, service, start_datetime, end_datetime, booking_reason, status, created_at
+    ) VALUES (?, ?, ?, ?, ?, ?, NULL, ?, ?)
+"""
+V1_FREE_STYLIST_QUERY = db_utils.FREE_STYLIST_QUERY \
+    .replace('start_ts', 'start_datetime').replace('end_ts', 'end_datetime') \
+    .replace("b.status = 'scheduled'", "b.status != 'cancelled'")
+V1_BOOKED_INTERVALS_IN_RANGE_QUERY = db_utils.BOOKED_INTERVALS_IN_RANGE_QUERY \
+    .replace('start_ts', 'start_datetime').replace('end_ts', 'end_datetime') \
+    .replace("status = 'scheduled'", "status != 'cancelled'")
+
+
+def _populate(db_path: str, num_bookings: int, stylists: int, cancelled: float, base_dt: datetime.datetime):
+    with get_connection_pool(db_path).transaction() as conn:
+        customer_id = db_utils.add_customer(conn.cursor(), 'Bench', '6470000000')
+    stylist_ids = [
+        db_utils.add_stylist(f'Stylist {i}', {weekday: (0, 24) for weekday in range(7)}, stylist_id=f'stylist-{i:03d}',
+                             db_path=db_path)
+        for i in range(stylists)
+    ]
+    # Hourly bookings of each stylist over consecutive hours, a fraction of which are cancelled
+    hours = int(num_bookings / stylists / 0.8)
+
+    def bookings():
+        created_at = base_dt.isoformat()
+        for stylist_id in stylist_ids:
+            for hour in sorted(random.sample(range(hours), num_bookings // stylists)):
+                start_dt = base_dt + datetime.timedelta(hours=hour)
+                status = 'cancelled' if random.random() < cancelled else 'scheduled'
+                yield (str(uuid.uuid4()), customer_id, stylist_id, db_utils.DEFAULT_SERVICE_ID, start_dt.isoformat(),
+                       (start_dt + datetime.timedelta(hours=1)).isoformat(), status, created_at)
+
+    with get_connection_pool(db_path).transaction() as conn:
+        conn.executemany(V1_ADD_BOOKING_QUERY, bookings())
+    return stylist_ids, hours
+
+
+def _free_stylist_params(start_dt: datetime.datetime, stylist: str | None, to_param) -> dict:
+    weekday, start_minute, end_minute = db_utils._local_slot(start_dt, datetime.timedelta(hours=1))
+    return {
+        'weekday': weekday, 'start_minute': start_minute, 'end_minute': end_minute, 'stylist': stylist,
+        'start': to_param(start_dt), 'end': to_param(start_dt + datetime.timedelta(hours=1)),
+        'earliest_start': to_param(start_dt - datetime.timedelta(minutes=db_utils.MAX_SERVICE_DURATION_MINS)),
+    }
+
+
+def _run(conn, free_stylist_query, booked_intervals_query, to_param, from_value, probes, ranges) -> dict:
+    t0 = time.perf_counter()
+    free = [conn.execute(free_stylist_query, _free_stylist_params(start_dt, stylist, to_param)).fetchone()
+            for start_dt, stylist in probes]
+    probe_us = (time.perf_counter() - t0) / len(probes) * 1e6
+
+    sql_secs = convert_secs = 0
+    intervals = 0
+    for range_start_dt, range_end_dt in ranges:
+        t0 = time.perf_counter()
+        params = {'end': to_param(range_end_dt), 'stylist': None,
+                  'earliest_start': to_param(range_start_dt - datetime.timedelta(hours=4))}
+        rows = conn.execute(booked_intervals_query, params).fetchall()
+        t1 = time.perf_counter()
+        intervals += len([(from_value(start), from_value(end)) for _, start, end in rows] if from_value else rows)
+        sql_secs, convert_secs = sql_secs + t1 - t0, convert_secs + time.perf_counter() - t1
+    return {'probe_us': probe_us, 'range_sql_ms': sql_secs / len(ranges) * 1e3,
+            'range_convert_ms': convert_secs / len(ranges) * 1e3, 'free': [row is not None for row in free],
+            'intervals': intervals}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--stylists', type=int, default=50)
+    parser.add_argument('--cancelled', type=float, default=0.3, help='Fraction of cancelled bookings')
+    parser.add_argument('--probes', type=int, default=5000)
+    parser.add_argument('--ranges', type=int, default=50, help='Number of one-day range scans')
+    args = parser.parse_args()
+    random.seed(0)
+
+    base_dt = datetime.datetime.now(pytz.utc).replace(minute=0, second=0, microsecond=0) + datetime.timedelta(days=1)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bookings.sqlite')
+        create_bookings_db(db_path, target_version=1)
+        t0 = time.perf_counter()
+        stylist_ids, hours = _populate(db_path, args.bookings, args.stylists, args.cancelled, base_dt)
+        print(f"{args.bookings} bookings ({args.cancelled:.0%} cancelled) of {args.stylists} stylists "
+              f"inserted in {time.perf_counter() - t0:.1f} s, {os.path.getsize(db_path) / 2 ** 20:.0f} MB")
+
+        probes = [(base_dt + datetime.timedelta(minutes=30 * random.randrange(hours * 2)),
+                   random.choice((None, random.choice(stylist_ids)))) for _ in range(args.probes)]
+        ranges = []
+        for _ in range(args.ranges):
+            range_start_dt = base_dt + datetime.timedelta(hours=random.randrange(hours - 24))
+            ranges.append((range_start_dt, range_start_dt + datetime.timedelta(days=1)))
+
+        conn = get_connection_pool(db_path).connection()
+        results = {'v1 ISO text': _run(conn, V1_FREE_STYLIST_QUERY, V1_BOOKED_INTERVALS_IN_RANGE_QUERY,
+                                       datetime.datetime.isoformat, datetime.datetime.fromisoformat, probes, ranges)}
+
+        t0 = time.perf_counter()
+        migrate_bookings_db(db_path)
+        migration_s = time.perf_counter() - t0
+        print(f"Migrated to schema version {schema_version(db_path)} in {migration_s:.1f} s, "
+              f"{os.path.getsize(db_path) / 2 ** 20:.0f} MB")
+
+        results['v2 epoch'] = _run(conn, db_utils.FREE_STYLIST_QUERY, db_utils.BOOKED_INTERVALS_IN_RANGE_QUERY,
+                                   db_utils.to_timestamp, None, probes, ranges)
+        close_connection_pools()
+
+    print(f"\n{'schema':<14}{'free-stylist probe us':>23}{'range scan SQL ms':>19}{'+ parsing ms':>14}"
+          f"{'free':>7}{'intervals':>11}")
+    for name, result in results.items():
+        print(f"{name:<14}{result['probe_us']:>23.1f}{result['range_sql_ms']:>19.2f}{result['range_convert_ms']:>14.2f}"
+              f"{sum(result['free']) / len(probes):>7.0%}{result['intervals']:>11}")
+    v1, v2 = results.values()
+    if v1['free'] != v2['free'] or v1['intervals'] != v2['intervals']:
+        raise SystemExit('The schema versions disagree')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""
+FAQ answering: build time and lookup latency of the BM25 `FAQIndex` on `--entries`
+generated FAQ entries (services x topics x locations), vs. scoring every entry at
+each lookup. Each entry is looked up with a paraphrase of its question, and the
+booking requests of the workload below are looked up too: reports the top-1
+accuracy, the share of the paraphrases answered with high confidence (without the
+LLM) and how often that answer is wrong, and the booking requests answered as FAQs
+(must be none).
+
+Then runs FAQ and booking messages through the agent with a scripted LLM of
+`--llm-latency` seconds per call, with the fast path answering the confident
+matches of the salon knowledge file (`salon_faq.json`) vs. the LLM calling the
+`answer_faq` tool.
+
+Usage (from `src/`):
+    python -m benchmarks.faq_index --entries 5000 --llm-latency 0.8
+"""
+import argparse
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from agents.booking_agent.booking_agent import BookingAgent
+from agents.booking_agent.database.connection import close_connection_pools
+from agents.booking_agent.faq import BM25_B, BM25_K1, QUESTION_WEIGHT, FAQEntry, FAQIndex, is_confident, tokenize
+from benchmarks.db_fixtures import create_bench_db
+from benchmarks.stub_llm import ScriptedChatModel, last_conversation_message
+
+SERVICES = [
+    'haircut', 'beard trim', 'balayage', 'highlights', 'root touch-up', 'keratin treatment', 'perm', 'blowout',
+    'updo', 'bridal styling', 'scalp massage', 'deep conditioning', 'hair extensions', 'braids', 'cornrows',
+    'fringe trim', 'buzz cut', 'fade', 'ombre', 'toner', 'gloss', 'olaplex', 'henna', 'hot towel shave',
+    'eyebrow tint', 'lash lift', 'relaxer', 'silk press', 'dreadlocks', 'curl cut',
+]
+# (question, paraphrase used as the query, answer)
+TOPICS = [
+    ('How much does a {service} cost at {location}?', 'price of {service} {location}',
+     'A {service} at {location} starts at ${price}.'),
+    ('How long does a {service} take at {location}?', '{service} duration {location}',
+     'Plan for about {minutes} minutes for a {service} at {location}.'),
+    ('Can I book a {service} online at {location}?', 'online reservation {service} {location}',
+     'Yes, the {service} can be reserved online for {location}.'),
+    ('Is a {service} suitable for children at {location}?', '{service} kids {location}',
+     'Children are welcome for a {service} at {location} from age {age}.'),
+    ('How should I prepare for a {service} at {location}?', 'prepare before {service} {location}',
+     'Come with dry hair to your {service} at {location}.'),
+    ('What aftercare is needed after a {service} at {location}?', '{service} aftercare {location}',
+     'Avoid washing for {days} days after a {service}, say the stylists at {location}.'),
+    ('Which stylists offer {service} at {location}?', 'stylists doing {service} {location}',
+     '{count} stylists at {location} are trained in {service}.'),
+    ('Do you offer a {service} consultation at {location}?', '{service} consultation {location}',
+     'Free {service} consultations are held at {location}.'),
+]
+LOCATIONS = ['downtown', 'uptown', 'midtown', 'harbourfront', 'eastside', 'westend', 'northgate', 'southpark',
+             'riverside', 'lakeshore', 'oldtown', 'hillcrest', 'parkdale', 'junction', 'annex', 'beaches',
+             'leslieville', 'danforth', 'liberty', 'rosedale', 'yorkville']
+BOOKING_REQUESTS = [
+    'Can I book a haircut tomorrow at 3pm?',
+    'Is tomorrow 3pm free?',
+    'I need to reschedule my appointment to Friday',
+    'Please cancel my booking',
+    'What are my bookings? 647-555-0101',
+    'Could I come in sometime next week, ideally in the morning?',
+    'Book me with Anna on Saturday at 11',
+    'Do you have anything open on Thursday evening?',
+]
+# Questions about the salon of the default knowledge file, and booking requests, for the agent runs
+SALON_WORKLOAD = [
+    'What are your hours?',
+    'what time do you close on friday?',
+    'are you open sundays',
+    'how much is a haircut',
+    'do you take credit cards',
+    "I'm running late",
+    'Where can I park?',
+    'What is your cancellation policy?',
+    'Do you do kids haircuts?',
+    'Is tomorrow 3pm free?',
+    'Can I book a haircut tomorrow at 3pm?',
+    'Do you have anything open on Thursday evening?',
+]
+
+
+def _entries(count: int) -> tuple[list[FAQEntry], list[str]]:
+    """`count` entries and the paraphrase of the question of each."""
+    entries, queries = [], []
+    for idx in range(count):
+        question, paraphrase, answer = TOPICS[idx % len(TOPICS)]
+        service = SERVICES[idx // len(TOPICS) % len(SERVICES)]
+        location = LOCATIONS[idx // (len(TOPICS) * len(SERVICES)) % len(LOCATIONS)]
+        values = {'service': service, 'location': location, 'price': 20 + idx % 200, 'minutes': 30 + idx % 120,
+                  'age': 3 + idx % 10, 'days': 1 + idx % 3, 'count': 1 + idx % 6}
+        entries.append(FAQEntry(question.format(**values), answer.format(**values)))
+        queries.append(paraphrase.format(**values))
+    return entries, queries
+
+
+class _ScanIndex:
+    """The same BM25 scores, computed over every entry at each lookup (no inverted index)."""
+
+    def __init__(self, entries: list[FAQEntry]):
+        self.entries = entries
+        self._documents = []
+        for entry in entries:
+            questions = ' '.join((entry.question, *entry.alternatives))
+            terms = tokenize(questions) * QUESTION_WEIGHT + tokenize(entry.answer)
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            self._documents.append((counts, len(terms)))
+        self._avg_length = sum(length for _, length in self._documents) / len(self._documents)
+
+    def search(self, query: str, limit: int = 3) -> list[tuple[float, int]]:
+        terms = set(tokenize(query))
+        n_entries = len(self._documents)
+        idf = {}
+        for term in terms:
+            df = sum(term in counts for counts, _ in self._documents)
+            idf[term] = math.log(1 + (n_entries - df + 0.5) / (df + 0.5))
+        scores = []
+        for entry_idx, (counts, length) in enumerate(self._documents):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self._avg_length)
+            score = sum(idf[term] * counts[term] * (BM25_K1 + 1) / (counts[term] + norm)
+                        for term in terms if term in counts)
+            if score:
+                scores.append((score, entry_idx))
+        return sorted(scores, reverse=True)[:limit]
+
+
+def _timed(fn, queries: list[str]) -> tuple[list, list[float]]:
+    results, timings = [], []
+    for query in queries:
+        t0 = time.perf_counter()
+        results.append(fn(query))
+        timings.append(time.perf_counter() - t0)
+    return results, timings
+
+
+def _quantiles_us(timings: list[float]) -> tuple[float, float]:
+    timings = sorted(timings)
+    return statistics.median(timings) * 1e6, timings[int(len(timings) * 0.99)] * 1e6
+
+
+def _respond(messages) -> AIMessage:
+    """Calls `answer_faq` for the questions about the salon, then replies with its first answer."""
+    last_message = last_conversation_message(messages)
+    if isinstance(last_message, ToolMessage):
+        return AIMessage(content='Here is what I found. Anything else?')
+    if isinstance(last_message, HumanMessage) and not any(
+            word in last_message.text().lower() for word in ('book', 'free', 'open on', 'reschedule')):
+        return AIMessage(content='', tool_calls=[
+            {'name': 'answer_faq', 'args': {'question': last_message.text()}, 'id': f'call_{uuid.uuid4().hex}'}])
+    return AIMessage(content='Sure! Which date and time would work best for you?')
+
+
+def _run_agent(fast_path: bool, llm_latency: float) -> tuple[list[float], int, int]:
+    """Latency of each turn, LLM calls, and questions answered from the knowledge file without the LLM."""
+    llm = ScriptedChatModel(respond=_respond, latency_secs=llm_latency)
+    agent = BookingAgent(llm=llm, fast_path=fast_path)
+    latencies, direct = [], 0
+    for user_input in SALON_WORKLOAD:
+        llm_calls = len(llm.prompts)
+        t0 = time.perf_counter()
+        result = agent.invoke({"messages": [{"role": "user", "content": user_input}]},
+                              config={"configurable": {"thread_id": str(uuid.uuid4())}})
+        latencies.append(time.perf_counter() - t0)
+        direct += len(llm.prompts) == llm_calls and any(
+            isinstance(message, ToolMessage) and message.name == 'answer_faq' for message in result['messages'])
+    return latencies, len(llm.prompts), direct
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=5000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--llm-latency', type=float, default=0.8)
+    args = parser.parse_args()
+    random.seed(0)
+
+    entries, paraphrases = _entries(args.entries)
+    builds = []
+    for _ in range(3):
+        t0 = time.perf_counter()
+        index = FAQIndex(entries)
+        builds.append(time.perf_counter() - t0)
+    scan_index = _ScanIndex(entries)
+
+    sample = random.sample(range(len(entries)), min(args.lookups, len(entries)))
+    queries = [paraphrases[idx] for idx in sample]
+    matches, index_timings = _timed(index.search, queries)
+    _, booking_timings = _timed(index.search, BOOKING_REQUESTS)
+    scan_results, scan_timings = _timed(scan_index.search, queries[:200])
+
+    hits = sum(bool(found) and found[0].entry is entries[idx] for found, idx in zip(matches, sample))
+    confident = [(found, idx) for found, idx in zip(matches, sample) if is_confident(found)]
+    wrong = sum(found[0].entry is not entries[idx] for found, idx in confident)
+    # Same scores as computed from scratch (the ties may be ordered differently)
+    differing = sum(not math.isclose(found[0].score, scan[0][0]) for found, scan in zip(matches, scan_results))
+    booking_answered = [request for request in BOOKING_REQUESTS if index.confident_match(request) is not None]
+
+    print(f"{len(entries)} FAQ entries, {len(index._postings)} terms; {len(queries)} paraphrased lookups")
+    print(f"\n{'':<28}{'p50 us':>10}{'p99 us':>10}")
+    print(f"{'BM25 index':<28}{_quantiles_us(index_timings)[0]:>10.1f}{_quantiles_us(index_timings)[1]:>10.1f}")
+    print(f"{'BM25 index, booking asks':<28}{_quantiles_us(booking_timings)[0]:>10.1f}"
+          f"{_quantiles_us(booking_timings)[1]:>10.1f}")
+    print(f"{'scoring every entry':<28}{_quantiles_us(scan_timings)[0]:>10.1f}{_quantiles_us(scan_timings)[1]:>10.1f}")
+    print(f"\nIndex build: {statistics.median(builds) * 1e3:.1f} ms (median of 3)")
+    print(f"Top-1 accuracy: {hits / len(queries):.1%}; answered with high confidence: "
+          f"{len(confident) / len(queries):.1%}, of which wrong: {wrong}")
+    print(f"Top scores differing from scoring every entry: {differing} of {len(scan_results)}")
+    print(f"Booking requests answered as FAQs: {len(booking_answered)} {booking_answered or ''}")
+
+    print(f"\nAgent turns on the salon knowledge file ({len(SALON_WORKLOAD)} messages, "
+          f"LLM latency {args.llm_latency}s):")
+    print(f"{'mode':<12}{'LLM calls':>10}{'answered w/o LLM':>18}{'mean s':>8}")
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The availability checks use the default database path, relative to the working directory
+        os.chdir(tmp_dir)
+        try:
+            create_bench_db()
+            for fast_path in (False, True):
+                latencies, llm_calls, direct = _run_agent(fast_path, args.llm_latency)
+                print(f"{'fast path' if fast_path else 'LLM only':<12}{llm_calls:>10}{direct:>18}"
+                      f"{statistics.mean(latencies):>8.2f}")
+        finally:
+            close_connection_pools()
+            os.chdir(cwd)
+    failed = wrong or booking_answered or differing
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Fraction of a scripted workload answered by the fast-path router without an LLM
+call, and the latency saved per turn, with a local scripted LLM of `--llm-latency`
+seconds per call (the agent with and without the fast path).
+
+The workload mixes simple structured requests (cancel by booking ID once the user
+confirms, list the bookings of a phone number, check a date and time) with requests
+only the LLM handles. The scripted LLM makes the same tool calls as the router would,
+then replies.
+
+Usage (from `src/`):
+    python -m benchmarks.fast_path --conversations 20 --llm-latency 0.5
+"""
+import argparse
+import datetime
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+import pytz
+
+from agents.booking_agent.booking_agent import BookingAgent, available_tools
+from agents.booking_agent.database.connection import close_connection_pools
+from agents.booking_agent.database.utils import SALON_TIMEZONE, add_booking
+from agents.booking_agent.router import (
+    AFFIRMATIVE_PATTERN,
+    BOOKING_ID_PATTERN,
+    CONFIRM_FIRST_TOOLS,
+    FastPathRouter
+)
+from benchmarks.db_fixtures import create_bench_db
+from benchmarks.stub_llm import ScriptedChatModel, last_conversation_message
+
+
+def _workload(booking_id: str, phone_number: str) -> list[str]:
+    return [
+        'Hi! I would like to get a haircut this week.',
+        'is tomorrow 3pm free?',
+        'Is next Thursday at 11am available?',
+        'Could I come in sometime next week, ideally in the morning?',
+        f'what are my bookings? {phone_number}',
+        'is 3pm free',
+        f'cancel booking {booking_id}',
+        'yes',
+        'Please book tomorrow at 3pm for Alice, phone 6470000001',
+        'Do you also do hair colouring?',
+        'Thanks, that is all!',
+    ]
+
+
+def _respond(router: FastPathRouter):
+    def respond(messages) -> AIMessage:
+        last_message = last_conversation_message(messages)
+        if isinstance(last_message, ToolMessage):
+            return AIMessage(content='All done! Is there anything else I can help you with?')
+        tool_call = router.match(last_message.text()) if isinstance(last_message, HumanMessage) else None
+        if tool_call is not None and tool_call['name'] in CONFIRM_FIRST_TOOLS:
+            booking_id = tool_call['args']['booking_id_to_cancel']
+            return AIMessage(content=f"Just to confirm, cancel the booking {booking_id}?")
+        if tool_call is not None:
+            return AIMessage(content='', tool_calls=[tool_call])
+        question = next((message for message in reversed(messages) if isinstance(message, AIMessage)), None)
+        booking_id = BOOKING_ID_PATTERN.search(question.text()) if question is not None else None
+        if booking_id is not None and AFFIRMATIVE_PATTERN.match(last_message.text()):
+            # The cancellation confirmed: the booking ID is in the question
+            return AIMessage(content='', tool_calls=[{'name': 'cancel_appointment',
+                                                      'args': {'booking_id_to_cancel': booking_id.group()},
+                                                      'id': f'call_{uuid.uuid4().hex}'}])
+        return AIMessage(content='Sure! Which date and time would work best for you?')
+    return respond
+
+
+def _run(fast_path: bool, conversations: int, llm_latency: float, first_day: int) -> tuple[list[float], list[int]]:
+    tz = pytz.timezone(SALON_TIMEZONE)
+    llm = ScriptedChatModel(respond=_respond(FastPathRouter(available_tools)), latency_secs=llm_latency)
+    agent = BookingAgent(llm=llm, fast_path=fast_path)
+    latencies, llm_calls = [], []
+    for i in range(conversations):
+        # A booking of the customer, to look up and cancel
+        phone_number = f'647{i:07d}'
+        start_dt = (datetime.datetime.now(tz=tz) + datetime.timedelta(days=first_day + i)).replace(
+            hour=10, minute=0, second=0, microsecond=0)
+        booking_id = add_booking(start_dt.isoformat(), f'Customer {i}', phone_number)
+
+        thread_config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        for user_input in _workload(booking_id, phone_number):
+            calls_before = len(llm.prompts)
+            t0 = time.perf_counter()
+            agent.invoke({"messages": [{"role": "user", "content": user_input}]}, config=thread_config)
+            latencies.append(time.perf_counter() - t0)
+            llm_calls.append(len(llm.prompts) - calls_before)
+    return latencies, llm_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversations', type=int, default=20)
+    parser.add_argument('--llm-latency', type=float, default=0.5)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The tools use the default database path, relative to the working directory
+        os.chdir(tmp_dir)
+        try:
+            create_bench_db()
+            results = {
+                'llm only': _run(False, args.conversations, args.llm_latency, first_day=30),
+                'fast path': _run(True, args.conversations, args.llm_latency, first_day=30 + args.conversations),
+            }
+        finally:
+            close_connection_pools()
+            os.chdir(cwd)
+
+    baseline_latencies, _ = results['llm only']
+    print(f"{'mode':<12}{'turns':>8}{'no LLM':>9}{'LLM calls':>11}{'mean s':>9}{'p50 s':>8}")
+    for name, (latencies, llm_calls) in results.items():
+        no_llm = sum(1 for calls in llm_calls if calls == 0) / len(llm_calls)
+        print(f"{name:<12}{len(latencies):>8}{no_llm:>9.0%}{sum(llm_calls):>11}"
+              f"{statistics.mean(latencies):>9.3f}{statistics.median(latencies):>8.3f}")
+
+    latencies, llm_calls = results['fast path']
+    saved = [before - after for before, after, calls in zip(baseline_latencies, latencies, llm_calls) if calls == 0]
+    if saved:
+        print(f"\nLatency saved per fast-path turn: {statistics.mean(saved):.3f} s "
+              f"({len(saved)} turns, {sum(baseline_latencies) - sum(latencies):.1f} s over the workload)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Prompt tokens sent to the LLM per turn over a scripted 30-turn conversation, with
+the history unbounded (previous behaviour), trimmed to a token budget with stale
+tool results dropped (default), and additionally summarized into a rolling summary.
+
+Every third turn looks up the customer's bookings, whose (large) tool result is
+replayed in the following turns unless dropped. Tokens are approximated (4 chars per token).
+
+Usage (from `src/`):
+    python -m benchmarks.history_tokens --turns 30
+"""
+import argparse
+import datetime
+import os
+import tempfile
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+import pytz
+
+from agents.booking_agent.booking_agent import BookingAgent
+from agents.booking_agent.database.connection import close_connection_pools
+from agents.booking_agent.database.utils import add_booking
+from agents.booking_agent.history import HistoryConfig
+from benchmarks.db_fixtures import create_bench_db
+from benchmarks.stub_llm import ScriptedChatModel, last_conversation_message
+
+PHONE_NUMBER = '6470000000'
+CONFIGS = {
+    'unbounded': HistoryConfig(max_prompt_tokens=None, tool_results_max_age_turns=None),
+    'trimmed': HistoryConfig(max_prompt_tokens=2000),
+    'summarized': HistoryConfig(max_prompt_tokens=2000, summarize_above_tokens=1500),
+}
+
+
+def _respond(messages) -> AIMessage:
+    last_message = last_conversation_message(messages)
+    if isinstance(last_message, HumanMessage) and last_message.text().startswith('Summarize the conversation'):
+        return AIMessage(content='The customer (phone 6470000000) is reviewing their bookings and asking about times.')
+    if isinstance(last_message, ToolMessage):
+        return AIMessage(content='Here are your upcoming appointments. Would you like to change any of them?')
+    if 'my bookings' in last_message.text():
+        return AIMessage(content='', tool_calls=[{
+            'name': 'retrieve_active_bookings_user',
+            'args': {'user_phone_number': PHONE_NUMBER},
+            'id': f'call_{uuid.uuid4().hex}',
+        }])
+    return AIMessage(content='Sure! Could you tell me which date and time works best for you?')
+
+
+def _run(config: HistoryConfig, turns: int) -> list[int]:
+    llm = ScriptedChatModel(respond=_respond)
+    agent = BookingAgent(llm=llm, history_config=config)
+    thread_config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    tokens_per_turn = []
+    for turn in range(turns):
+        user_input = 'Can you show me my bookings again?' if turn % 3 == 0 else \
+            f'I am thinking about coming in around {9 + turn % 8} am, is that a good time for a haircut?'
+        calls_before = len(llm.prompts)
+        agent.invoke({"messages": [{"role": "user", "content": user_input}]}, config=thread_config)
+        tokens_per_turn.append(sum(
+            count_tokens_approximately(prompt) for prompt in llm.prompts[calls_before:]
+            if not prompt[-1].text().startswith('Summarize the conversation')
+        ))
+    return tokens_per_turn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=30)
+    parser.add_argument('--bookings', type=int, default=20)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The tools use the default database path, relative to the working directory
+        os.chdir(tmp_dir)
+        try:
+            create_bench_db()
+            start_dt = datetime.datetime.now(pytz.utc).replace(minute=0, second=0, microsecond=0)
+            for i in range(args.bookings):
+                add_booking((start_dt + datetime.timedelta(days=i + 1)).isoformat(), 'Bench', PHONE_NUMBER)
+            results = {name: _run(config, args.turns) for name, config in CONFIGS.items()}
+        finally:
+            close_connection_pools()
+            os.chdir(cwd)
+
+    print(f"{'turn':>6}" + ''.join(f'{name:>12}' for name in results))
+    for turn in range(args.turns):
+        if turn % 5 == 4 or turn == args.turns - 1:
+            print(f"{turn + 1:>6}" + ''.join(f'{tokens[turn]:>12}' for tokens in results.values()))
+    print(f"{'total':>6}" + ''.join(f'{sum(tokens):>12}' for tokens in results.values()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Availability checks served by the in-memory interval index vs. SQLite, at 100k+ bookings,
+and a consistency check of the index against the database after random
+add/reschedule/cancel operations.
+
+Usage (from `src/`):
+    python -m benchmarks.interval_index --bookings 100000 --operations 2000
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+import pytz
+
+from agents.booking_agent.database import utils as db_utils
+from agents.booking_agent.database.connection import close_connection_pools, get_connection_pool
+from agents.booking_agent.database.interval_index import (
+    disable_interval_index,
+    enable_interval_index,
+    get_interval_index
+)
+from benchmarks.db_fixtures import booking_params, create_bench_db
+
+PHONE_NUMBER = '6470000000'
+
+
+def _populate(db_path: str, base_dt: datetime.datetime, num_bookings: int, num_slots: int):
+    db_utils.add_booking(base_dt.isoformat(), 'Bench', PHONE_NUMBER, db_path=db_path)
+    customer_id = db_utils.get_customer_by_phone(PHONE_NUMBER, db_path=db_path).id
+    with get_connection_pool(db_path).transaction() as conn:
+        conn.executemany(
+            db_utils.ADD_BOOKING_QUERY,
+            (
+                booking_params(
+                    customer_id, base_dt + datetime.timedelta(hours=hour),
+                    base_dt + datetime.timedelta(hours=hour + 1), base_dt)
+                for hour in random.sample(range(1, num_slots), num_bookings - 1)
+            )
+        )
+
+
+def _random_operations(db_path: str, base_dt: datetime.datetime, num_slots: int, operations: int):
+    def random_slot():
+        return (base_dt + datetime.timedelta(hours=random.randrange(num_slots))).isoformat()
+
+    booking_ids = [
+        booking_id for (booking_id,) in get_connection_pool(db_path).connection().execute(
+            "SELECT id FROM Bookings WHERE status = 'scheduled' LIMIT ?", (operations,))
+    ]
+    for _ in range(operations):
+        operation = random.choice(('add', 'reschedule', 'cancel'))
+        if operation == 'add':
+            slot = random_slot()
+            booking_id = db_utils.is_slot_available(slot, db_path=db_path) and \
+                db_utils.add_booking(slot, 'Bench', PHONE_NUMBER, db_path=db_path)
+            if booking_id:
+                booking_ids.append(booking_id)
+        elif booking_ids:
+            booking_id = booking_ids.pop(random.randrange(len(booking_ids)))
+            if operation == 'cancel':
+                db_utils.cancel_booking(booking_id, db_path=db_path)
+            else:
+                slot = random_slot()
+                if db_utils.is_slot_available(slot, db_path=db_path):
+                    new_booking_id = db_utils.reschedule_booking(booking_id, slot, PHONE_NUMBER, db_path=db_path)
+                    booking_ids.append(new_booking_id or booking_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=100000)
+    parser.add_argument('--operations', type=int, default=2000)
+    parser.add_argument('--probes', type=int, default=20000)
+    args = parser.parse_args()
+    random.seed(0)
+
+    base_dt = datetime.datetime.now(pytz.utc).replace(minute=0, second=0, microsecond=0) + datetime.timedelta(hours=1)
+    num_slots = int(args.bookings * 1.5)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bookings.sqlite')
+        create_bench_db(db_path)
+        _populate(db_path, base_dt, args.bookings, num_slots)
+
+        t0 = time.perf_counter()
+        enable_interval_index(db_path)
+        print(f"Loaded {len(get_interval_index(db_path))} bookings into the index in "
+              f"{(time.perf_counter() - t0) * 1000:.0f} ms")
+
+        _random_operations(db_path, base_dt, num_slots, args.operations)
+
+        probes = [
+            (base_dt + datetime.timedelta(minutes=30 * random.randrange(num_slots * 2))).isoformat()
+            for _ in range(args.probes)
+        ]
+        timings = {}
+        results = {}
+        for mode in ('index', 'sqlite'):
+            if mode == 'sqlite':
+                disable_interval_index(db_path)
+            t0 = time.perf_counter()
+            results[mode] = [db_utils.is_slot_available(probe, db_path=db_path) for probe in probes]
+            timings[mode] = (time.perf_counter() - t0) / len(probes) * 1e6
+        close_connection_pools()
+
+    mismatches = sum(a != b for a, b in zip(results['index'], results['sqlite']))
+    print(f"Consistency after {args.operations} random operations: {mismatches} mismatches in {len(probes)} probes")
+    print(f"is_slot_available (index): {timings['index']:.1f} us/call")
+    print(f"is_slot_available (sqlite): {timings['sqlite']:.1f} us/call")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Cost of the metrics instrumentation: per availability check (one SQL statement)
+on a plain SQLite connection vs. the instrumented one with the metrics disabled
+and enabled, and per agent turn (with a tool call and two local LLM calls) without
+the metrics callback handler, with the metrics disabled and enabled.
+
+Usage (from `src/`):
+    python -m benchmarks.metrics_overhead --calls 20000 --turns 1000
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+import tempfile
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, ToolMessage
+import pytz
+
+from agents.booking_agent import metrics
+from agents.booking_agent.booking_agent import BookingAgent
+from agents.booking_agent.database.connection import close_connection_pools, get_connection_pool
+from agents.booking_agent.database.create_sqlite_db import create_bookings_db
+from agents.booking_agent.database.utils import FREE_STYLIST_QUERY, SALON_TIMEZONE, to_timestamp
+from benchmarks.stub_llm import ScriptedChatModel, last_conversation_message
+
+REPEATS = 5
+
+
+def _respond(messages) -> AIMessage:
+    if isinstance(last_conversation_message(messages), ToolMessage):
+        return AIMessage(content='Good news, that time is available! Could I get your name and phone number?')
+    start_dt = datetime.datetime.now(pytz.timezone(SALON_TIMEZONE)).replace(
+        hour=10, minute=0, second=0, microsecond=0) + datetime.timedelta(days=7)
+    return AIMessage(content='', tool_calls=[{
+        'name': 'check_availability',
+        'args': {'appointment_start_dt': start_dt.isoformat()},
+        'id': f'call_{uuid.uuid4().hex}',
+    }])
+
+
+def _sql_call_us(conn: sqlite3.Connection, calls: int) -> float:
+    start = datetime.datetime(2030, 1, 7, 15, tzinfo=datetime.timezone.utc)
+    params = {
+        'weekday': 0, 'start_minute': 600, 'end_minute': 660, 'stylist': None,
+        'start': to_timestamp(start), 'end': to_timestamp(start + datetime.timedelta(hours=1)),
+        'earliest_start': to_timestamp(start - datetime.timedelta(hours=4)),
+    }
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        conn.execute(FREE_STYLIST_QUERY, params).fetchone()
+    return (time.perf_counter() - t0) / calls * 1e6
+
+
+def _turn_us(agent: BookingAgent, turns: int) -> float:
+    thread_id = str(uuid.uuid4())
+    t0 = time.perf_counter()
+    for i in range(turns):
+        # A new thread every 10 turns keeps the history (and the turn cost) bounded
+        agent.invoke(
+            {"messages": [{"role": "user", "content": 'Is next week at 10am free?'}]},
+            config={"configurable": {"thread_id": f'{thread_id}-{i // 10}'}}
+        )
+    return (time.perf_counter() - t0) / turns * 1e6
+
+
+def _best(measure, enabled: bool) -> float:
+    metrics.set_metrics_enabled(enabled)
+    return min(measure() for _ in range(REPEATS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--turns', type=int, default=1000)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The tools use the default database path, relative to the working directory
+        os.chdir(tmp_dir)
+        try:
+            create_bookings_db()
+            plain_conn = sqlite3.connect('bookings.sqlite', isolation_level=None)
+            instrumented_conn = get_connection_pool('bookings.sqlite').connection()
+            sql_results = {
+                'plain connection': _best(lambda: _sql_call_us(plain_conn, args.calls), False),
+                'metrics disabled': _best(lambda: _sql_call_us(instrumented_conn, args.calls), False),
+                'metrics enabled': _best(lambda: _sql_call_us(instrumented_conn, args.calls), True),
+            }
+            plain_conn.close()
+
+            agent = BookingAgent(llm=ScriptedChatModel(respond=_respond))
+            unobserved_graph = agent.graph.copy(update={'config': None})
+            observed_graph = agent.graph
+            agent.graph = unobserved_graph
+            turn_results = {'no callback handler': _best(lambda: _turn_us(agent, args.turns), False)}
+            agent.graph = observed_graph
+            turn_results['metrics disabled'] = _best(lambda: _turn_us(agent, args.turns), False)
+            turn_results['metrics enabled'] = _best(lambda: _turn_us(agent, args.turns), True)
+        finally:
+            close_connection_pools()
+            os.chdir(cwd)
+
+    for title, results, baseline in (('availability check (SQL)', sql_results, 'plain connection'),
+                                     ('agent turn', turn_results, 'no callback handler')):
+        print(f"{title:<26}{'us/call':>10}{'overhead':>10}")
+        for name, us in results.items():
+            print(f"  {name:<24}{us:>10.1f}{(us / results[baseline] - 1):>10.1%}")
+
+    t0 = time.perf_counter()
+    rendered = metrics.REGISTRY.render()
+    render_ms = (time.perf_counter() - t0) * 1e3
+    print(f"\n/metrics rendering: {render_ms:.2f} ms ({len(rendered.splitlines())} lines)")
+    print(f"Mean recorded free_stylist statement: "
+          f"{metrics.SQL_DURATION.sum('free_stylist') / metrics.SQL_DURATION.count('free_stylist') * 1e6:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
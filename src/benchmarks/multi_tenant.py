@@ -0,0 +1,198 @@
+"""
+Many salons booking concurrently: `--tenants` salons (in timezones around the
+world) each book `--bookings` appointments through the `book_appointment` tool,
+from `--workers` threads, while one busy salon bulk imports its calendar
+(long write transactions), with:
+
+- the bookings of all the salons in one shared database (the single-salon layout);
+- each salon routed to its own database by the `TenantRegistry` (`ShardRouter`).
+
+Reports the bookings/s and the p50/p99/max booking latency of the other salons,
+and checks that every booking succeeded, in the database of its salon, at the
+local time requested (the opening hours are in the salon timezone).
+
+Usage (from `src/`):
+    python -m benchmarks.multi_tenant --tenants 200 --bookings 20 --workers 16
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytz
+
+from agents.booking_agent.database import bulk
+from agents.booking_agent.database import utils as db_utils
+from agents.booking_agent.database.connection import close_connection_pools, get_connection_pool
+from agents.booking_agent.tenancy import Tenant, TenantRegistry, use_tenant
+from agents.booking_agent.tools import book_appointment
+from benchmarks.db_fixtures import create_bench_db
+
+TIMEZONES = ['America/Toronto', 'America/Vancouver', 'America/Sao_Paulo', 'Europe/London', 'Europe/Paris',
+             'Africa/Nairobi', 'Asia/Kolkata', 'Asia/Tokyo', 'Australia/Sydney', 'Pacific/Auckland']
+OPENING_HOURS = {weekday: (9, 19) for weekday in range(7)}
+BUSY_TENANT_ID = 'salon-0'
+# The calendar imported by the busy salon, far after the bookings
+IMPORT_FIRST_DAY_OFFSET = 400
+
+
+def _tenant_settings(tenants: int) -> list[dict]:
+    return [{'id': f'salon-{idx}', 'timezone': TIMEZONES[idx % len(TIMEZONES)], 'opening_hours': OPENING_HOURS,
+             'prompt_variables': {'salon_name': f'Salon {idx}'}} for idx in range(tenants)]
+
+
+def _shared_tenants(db_path: str, tenants: int) -> list[Tenant]:
+    """All the salons in one database, each with its own stylist (in the default timezone)."""
+    create_bench_db(db_path, around_the_clock=False)
+    for settings in _tenant_settings(tenants):
+        db_utils.add_stylist(settings['id'], OPENING_HOURS, stylist_id=settings['id'], db_path=db_path)
+    return [Tenant(id=settings['id'], db_path=db_path, opening_hours=OPENING_HOURS)
+            for settings in _tenant_settings(tenants)]
+
+
+def _sharded_tenants(data_dir: str, tenants: int) -> list[Tenant]:
+    registry = TenantRegistry(_tenant_settings(tenants), data_dir)
+    opened = []
+    for tenant in registry:
+        registry.open(tenant.id)
+        db_utils.add_stylist(tenant.id, OPENING_HOURS, stylist_id=tenant.id, db_path=tenant.db_path)
+        opened.append(tenant)
+    return opened
+
+
+def _requests(tenants: list[Tenant], bookings: int) -> list[tuple[Tenant, str]]:
+    """(tenant, local start) of each booking: distinct hourly slots within the opening hours, interleaved."""
+    requests = []
+    for tenant in tenants:
+        if tenant.id == BUSY_TENANT_ID:
+            continue
+        tz = pytz.timezone(tenant.timezone)
+        first_day = datetime.datetime.now(tz).date() + datetime.timedelta(days=1)
+        open_hr, close_hr = OPENING_HOURS[0]
+        hours_per_day = close_hr - open_hr
+        for idx in range(bookings):
+            day = first_day + datetime.timedelta(days=idx // hours_per_day)
+            start_dt = tz.localize(datetime.datetime.combine(day, datetime.time(open_hr + idx % hours_per_day)))
+            requests.append((tenant, start_dt.isoformat()))
+    random.shuffle(requests)
+    return requests
+
+
+def _calendar_rows(tenant: Tenant, rows: int, first_day_offset: int) -> list[dict]:
+    tz = pytz.timezone(tenant.timezone)
+    first_slot = tz.localize(datetime.datetime.combine(
+        datetime.date.today() + datetime.timedelta(days=first_day_offset), datetime.time()))
+    return [{'start_datetime': (first_slot + datetime.timedelta(hours=idx)).isoformat(),
+             'customer_name': f'Imported {idx % 500}', 'phone_number': f'416{idx % 500:07d}',
+             'stylist': tenant.id} for idx in range(rows)]
+
+
+def _busy_salon(tenant: Tenant, rows: int, stop: threading.Event) -> int:
+    """Bulk imports calendars of `rows` bookings (one write transaction per chunk) until stopped."""
+    imported, offset = 0, IMPORT_FIRST_DAY_OFFSET
+    while not stop.is_set():
+        calendar = _calendar_rows(tenant, rows, offset)
+        imported += bulk.import_bookings(calendar, chunk_size=rows, db_path=tenant.db_path).imported
+        offset += rows // 24 + 1
+    return imported
+
+
+def _book(tenant: Tenant, start_iso: str) -> tuple[float, dict]:
+    t0 = time.perf_counter()
+    with use_tenant(tenant):
+        result = book_appointment.invoke({
+            'appointment_start_dt': start_iso,
+            'user_name': 'Customer',
+            'user_phone_number': f'647{random.randrange(10 ** 7):07d}',
+            'stylist': tenant.id,
+        })
+    return time.perf_counter() - t0, result
+
+
+def _run(tenants: list[Tenant], requests: list[tuple[Tenant, str]], workers: int, import_rows: int) -> dict:
+    busy_tenant = next(tenant for tenant in tenants if tenant.id == BUSY_TENANT_ID)
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=workers + 1) as executor:
+        busy = executor.submit(_busy_salon, busy_tenant, import_rows, stop) if import_rows else None
+        t0 = time.perf_counter()
+        results = list(executor.map(lambda request: _book(*request), requests))
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        imported = busy.result() if busy is not None else 0
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'elapsed': elapsed,
+        'latencies': latencies,
+        'failed': [result for _, result in results if result['status'] != 'success'],
+        'imported': imported,
+        'open_files': len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else 0,
+    }
+
+
+def _count_bookings(tenants: list[Tenant]) -> dict[str, int]:
+    counts = {}
+    for db_path in {tenant.db_path for tenant in tenants}:
+        for stylist, count in get_connection_pool(db_path).connection().execute(
+                "SELECT stylist, COUNT(*) FROM Bookings WHERE stylist != 'default' GROUP BY stylist"):
+            counts[db_path, stylist] = count
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tenants', type=int, default=200)
+    parser.add_argument('--bookings', type=int, default=20, help='Bookings per salon')
+    parser.add_argument('--workers', type=int, default=16, help='Threads booking concurrently')
+    parser.add_argument('--import-rows', type=int, default=20000,
+                        help='Bookings per transaction of the bulk imports of the busy salon (0 disables them)')
+    args = parser.parse_args()
+    random.seed(0)
+
+    reports, failed = {}, False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        layouts = {
+            'shared database': _shared_tenants(os.path.join(tmp_dir, 'shared.sqlite'), args.tenants),
+            'database per salon': _sharded_tenants(os.path.join(tmp_dir, 'tenants'), args.tenants),
+        }
+        for name, tenants in layouts.items():
+            requests = _requests(tenants, args.bookings)
+            reports[name] = report = _run(tenants, requests, args.workers, args.import_rows)
+            counts = _count_bookings(tenants)
+            misplaced = sum(count for (db_path, stylist), count in counts.items()
+                            if stylist != BUSY_TENANT_ID and db_path != next(
+                                tenant.db_path for tenant in tenants if tenant.id == stylist))
+            booked = sum(count for (_, stylist), count in counts.items() if stylist != BUSY_TENANT_ID)
+            report['checks'] = {
+                'failed bookings': (len(report['failed']), 0),
+                'bookings stored': (booked, len(requests)),
+                'bookings in the database of another salon': (misplaced, 0),
+            }
+        close_connection_pools()
+
+    print(f"{args.tenants} salons in {len(TIMEZONES)} timezones, {args.bookings} bookings each "
+          f"({args.bookings * (args.tenants - 1)} in all) from {args.workers} threads, "
+          f"'{BUSY_TENANT_ID}' bulk importing {args.import_rows} bookings per transaction")
+    print(f"\n{'layout':<20}{'bookings/s':>12}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'imported':>10}{'open files':>12}")
+    for name, report in reports.items():
+        latencies = report['latencies']
+        print(f"{name:<20}{len(latencies) / report['elapsed']:>12.0f}{statistics.median(latencies) * 1e3:>9.1f}"
+              f"{latencies[int(len(latencies) * 0.99)] * 1e3:>9.1f}{latencies[-1] * 1e3:>9.1f}"
+              f"{report['imported']:>10}{report['open_files']:>12}")
+    for name, report in reports.items():
+        print(f"\n{name}:")
+        for check, (value, expected) in report['checks'].items():
+            print(f"  {check}: {value} (expected {expected})")
+            failed = failed or value != expected
+        for result in report['failed'][:5]:
+            print(f"  failure: {result.get('reason')}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+Load test of the backend service run with `--workers` 1, 2, 4, ... uvicorn worker
+processes sharing the conversation threads (SQLite checkpointer) and the bookings
+database, with a local scripted LLM (no OpenAI calls).
+
+Each conversation books a unique slot on its first turn then continues for
+`--turns` turns, its requests being spread over the workers. Every reply reports
+the turns seen by the model, to check the continuity of the conversations across
+workers, and each slot must end up booked exactly once.
+
+Throughput can only scale up to the number of CPU cores.
+
+Usage (from `src/`):
+    python -m benchmarks.multi_worker --workers 1 2 4 --sessions 100 --turns 4
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+import pytz
+
+from agents.booking_agent.database.utils import SALON_TIMEZONE
+from benchmarks.db_fixtures import create_bench_db
+from benchmarks.stub_llm import ScriptedChatModel, last_conversation_message
+
+BOOK_PREFIX = 'Please book '
+
+
+def _respond(messages) -> AIMessage:
+    last_message = last_conversation_message(messages)
+    turns = sum(isinstance(message, HumanMessage) for message in messages)
+    if isinstance(last_message, ToolMessage):
+        return AIMessage(content=f'{last_message.content} | turns {turns} | worker {os.getpid()}')
+    if last_message.text().startswith(BOOK_PREFIX):
+        return AIMessage(content='', tool_calls=[{
+            'name': 'book_appointment',
+            'args': json.loads(last_message.text()[len(BOOK_PREFIX):]),
+            'id': f'call_{uuid.uuid4().hex}',
+        }])
+    return AIMessage(content=f'Sure! | turns {turns} | worker {os.getpid()}')
+
+
+def create_stub_app():
+    """App factory of the workers: the service with the scripted model in place of the OpenAI one."""
+    # Imported in the workers only: the service configures itself from the environment at import
+    from agents import BookingAgent
+    from agents.booking_agent.checkpointer import create_checkpointer
+    from backend_service import service
+
+    service.booking_agent = BookingAgent(
+        llm=ScriptedChatModel(respond=_respond, latency_secs=float(os.environ['BENCH_LLM_LATENCY'])),
+        checkpointer=create_checkpointer(service.config.checkpointer, db_path=service.config.checkpoint_db_path),
+        history_config=service.config.history_config
+    )
+    return service.app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(workers: int, port: int, tmp_dir: str, llm_latency: float) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        'PYTHONPATH': os.getcwd(),
+        'BENCH_LLM_LATENCY': str(llm_latency),
+        'BOOKING_AGENT_WORKERS': str(workers),
+        'BOOKING_AGENT_CHECKPOINTER': 'sqlite',
+        'BOOKING_AGENT_CHECKPOINT_DB': os.path.join(tmp_dir, f'checkpoints-{workers}.sqlite'),
+    }
+    server = subprocess.Popen(
+        [sys.executable, '-W', 'ignore', '-m', 'uvicorn', '--factory', 'benchmarks.multi_worker:create_stub_app',
+         '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+        cwd=tmp_dir, env=env)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f'http://127.0.0.1:{port}/').raise_for_status()
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f'The service did not start with {workers} workers')
+
+
+async def _run_sessions(port: int, slots: list[str], turns: int, concurrency: int) -> dict:
+    latencies, errors, workers_per_session = [], [], []
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+
+    # Without keep-alive, each request is a new connection, accepted by any of the workers
+    async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', timeout=None, limits=limits) as client:
+        async def conversation(session_idx: int, slot: str):
+            thread_id = str(uuid.uuid4())
+            workers = set()
+            for turn in range(turns):
+                user_input = BOOK_PREFIX + json.dumps({
+                    'appointment_start_dt': slot, 'user_name': f'Customer {session_idx}',
+                    'user_phone_number': f'647{session_idx:07d}'}) if turn == 0 else f'Thanks, turn {turn + 1}'
+                async with semaphore:
+                    t0 = time.perf_counter()
+                    response = await client.post('/chat', json={'user_input': user_input, 'thread_id': thread_id})
+                    latencies.append(time.perf_counter() - t0)
+                reply = response.json()['response'] if response.status_code == 200 else response.text
+                if f'| turns {turn + 1} |' not in reply or (turn == 0 and '"success"' not in reply):
+                    errors.append(reply)
+                workers.add(reply.rsplit('worker ', 1)[-1])
+            workers_per_session.append(len(workers))
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(conversation(i, slot) for i, slot in enumerate(slots)))
+        elapsed = time.perf_counter() - t0
+    return {'latencies': sorted(latencies), 'elapsed': elapsed, 'errors': errors,
+            'workers_per_session': statistics.mean(workers_per_session)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--turns', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight')
+    parser.add_argument('--llm-latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    tz = pytz.timezone(SALON_TIMEZONE)
+    base_dt = tz.localize(datetime.datetime.combine(datetime.date.today(), datetime.time()) + datetime.timedelta(days=2))
+
+    print(f"{os.cpu_count()} CPU cores, {args.sessions} conversations of {args.turns} turns, "
+          f"{args.concurrency} requests in flight")
+    print(f"{'workers':<9}{'turns/s':>9}{'speedup':>9}{'p50 ms':>9}{'p99 ms':>9}{'workers/conv':>14}"
+          f"{'broken turns':>14}{'bookings':>10}")
+    baseline = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            create_bench_db(os.path.join(tmp_dir, 'bookings.sqlite'))
+            slots = [(base_dt + datetime.timedelta(hours=i)).isoformat() for i in range(args.sessions)]
+            port = _free_port()
+            server = _start_server(workers, port, tmp_dir, args.llm_latency)
+            try:
+                result = asyncio.run(_run_sessions(port, slots, args.turns, args.concurrency))
+            finally:
+                server.terminate()
+                server.wait()
+            with sqlite3.connect(os.path.join(tmp_dir, 'bookings.sqlite')) as conn:
+                (bookings,) = conn.execute("SELECT COUNT(*) FROM Bookings WHERE status = 'scheduled'").fetchone()
+
+        latencies = result['latencies']
+        throughput = len(latencies) / result['elapsed']
+        baseline = baseline or throughput
+        print(f"{workers:<9}{throughput:>9.1f}{throughput / baseline:>8.2f}x"
+              f"{statistics.median(latencies) * 1e3:>9.1f}{latencies[int(len(latencies) * 0.99) - 1] * 1e3:>9.1f}"
+              f"{result['workers_per_session']:>14.2f}{len(result['errors']):>14}{bookings:>10}")
+        for error in result['errors'][:3]:
+            print(f"  {error[:200]}")
+        if result['errors'] or bookings != args.sessions:
+            raise SystemExit('Conversations broken across workers')
+
+
+if __name__ == '__main__':
+    main()
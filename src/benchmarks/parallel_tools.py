@@ -0,0 +1,167 @@
+"""
+Wall time of the tool node for LLM turns with 1 to `--max-calls` parallel
+`check_availability` calls (candidate times, some for a named stylist), with the
+stock `ToolNode` vs. `ParallelToolNode` (bounded pool of long-lived threads,
+availability of the slots checked in one query), run with `invoke` and `ainvoke`.
+
+Also reports the SQL statements and the SQLite connections opened per turn, and
+checks that both nodes give the same answers.
+
+Usage (from `src/`):
+    python -m benchmarks.parallel_tools --max-calls 10 --turns 50 --stylists 20
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+
+from langchain_core.messages import AIMessage
+from langgraph.graph import END, START, MessagesState, StateGraph
+from langgraph.prebuilt import ToolNode
+import pytz
+
+from agents.booking_agent import metrics
+from agents.booking_agent.booking_agent import available_tools
+from agents.booking_agent.database import utils as db_utils
+from agents.booking_agent.database.connection import DEFAULT_PRAGMAS, close_connection_pools, get_connection_pool
+from agents.booking_agent.tool_node import ParallelToolNode
+from benchmarks.db_fixtures import booking_params, create_bench_db
+
+DAYS = 60
+PHONE_NUMBER = '6470000000'
+
+
+def _populate(stylists: int, occupancy: float, first_day: datetime.date) -> list[datetime.datetime]:
+    """Books the stylists (salon opening hours) at `occupancy` over `DAYS` days. Returns the hourly slots."""
+    tz = pytz.timezone(db_utils.SALON_TIMEZONE)
+    create_bench_db(around_the_clock=False)
+    for idx in range(stylists):
+        db_utils.add_stylist(f'Stylist {idx}', db_utils.SALON_OPENING_HOURS, stylist_id=f'stylist-{idx}')
+    db_utils.add_booking(tz.localize(datetime.datetime.combine(first_day, datetime.time(10))).isoformat(),
+                         'Bench', PHONE_NUMBER)
+    customer_id = db_utils.get_customer_by_phone(PHONE_NUMBER).id
+
+    slots, bookings = [], []
+    created_dt = datetime.datetime.now(pytz.utc)
+    for day_offset in range(1, DAYS):
+        day = first_day + datetime.timedelta(days=day_offset)
+        hours = db_utils.SALON_OPENING_HOURS.get(day.weekday())
+        if hours is None:
+            continue
+        for hour in range(*hours):
+            start_dt = tz.localize(datetime.datetime.combine(day, datetime.time(hour)))
+            slots.append(start_dt)
+            for idx in range(stylists):
+                if random.random() < occupancy:
+                    bookings.append(booking_params(
+                        customer_id, start_dt, start_dt + datetime.timedelta(hours=1), created_dt,
+                        stylist_id=f'stylist-{idx}'))
+    with get_connection_pool(db_utils.DB_PATH).transaction() as conn:
+        conn.executemany(db_utils.ADD_BOOKING_QUERY, bookings)
+    return slots
+
+
+def _turn(slots: list[datetime.datetime], stylists: int, calls: int) -> dict:
+    tool_calls = []
+    for idx, start_dt in enumerate(random.sample(slots, calls)):
+        args = {'appointment_start_dt': start_dt.isoformat()}
+        if idx % 3 == 2:
+            args['stylist'] = f'Stylist {random.randrange(stylists)}'
+        tool_calls.append({'name': 'check_availability', 'args': args, 'id': f'call_{uuid.uuid4().hex}'})
+    return {'messages': [AIMessage(content='', tool_calls=tool_calls)]}
+
+
+def _tools_graph(node: ToolNode):
+    """The tool node alone in a graph, as it runs in the agent."""
+    graph_builder = StateGraph(MessagesState)
+    graph_builder.add_node('tool_node', node)
+    graph_builder.add_edge(START, 'tool_node')
+    graph_builder.add_edge('tool_node', END)
+    return graph_builder.compile()
+
+
+def _sql_counts() -> tuple[int, int]:
+    pragmas = metrics.SQL_DURATION.count('pragma')
+    return metrics.SQL_DURATION.total_count() - pragmas, pragmas // len(DEFAULT_PRAGMAS)
+
+
+def _run(graph, turns: list[dict], run_async: bool) -> tuple[list[float], list[list[str]], float, float]:
+    """
+    Runs the graph of a tool node on each turn (under one event loop for `ainvoke`, as in the service):
+    wall times, answers, SQL statements and connections opened per turn.
+    """
+    times, answers = [], []
+    statements, connections = _sql_counts()
+
+    async def arun_all():
+        for turn in turns:
+            t0 = time.perf_counter()
+            output = await graph.ainvoke(turn)
+            times.append(time.perf_counter() - t0)
+            answers.append([message.content for message in output['messages'][1:]])
+
+    if run_async:
+        asyncio.run(arun_all())
+    else:
+        for turn in turns:
+            t0 = time.perf_counter()
+            output = graph.invoke(turn)
+            times.append(time.perf_counter() - t0)
+            answers.append([message.content for message in output['messages'][1:]])
+    end_statements, end_connections = _sql_counts()
+    return times, answers, (end_statements - statements) / len(turns), (end_connections - connections) / len(turns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--max-calls', type=int, default=10)
+    parser.add_argument('--turns', type=int, default=50, help='Turns per number of calls')
+    parser.add_argument('--stylists', type=int, default=20)
+    parser.add_argument('--occupancy', type=float, default=0.8)
+    args = parser.parse_args()
+    random.seed(0)
+
+    nodes = {'ToolNode': _tools_graph(ToolNode(available_tools)),
+             'ParallelToolNode': _tools_graph(ParallelToolNode(available_tools))}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The tools use the default database path
+        os.chdir(tmp_dir)
+        try:
+            tz = pytz.timezone(db_utils.SALON_TIMEZONE)
+            first_day = datetime.datetime.now(tz).date() + datetime.timedelta(days=1)
+            slots = _populate(args.stylists, args.occupancy, first_day)
+            print(f"{args.stylists} stylists booked at {args.occupancy:.0%} over {DAYS} days, "
+                  f"{args.turns} turns per number of calls (median ms per turn)")
+            header = ''.join(f"{name + (' async' if run_async else '') + ' ms':>26}"
+                             for run_async in (False, True) for name in nodes)
+            print(f"\n{'calls':<7}{header}{'SQL/turn invoke':>20}{'conns/turn invoke':>20}")
+            mismatches = 0
+            for calls in range(1, args.max_calls + 1):
+                turns = [_turn(slots, args.stylists, calls) for _ in range(args.turns)]
+                medians, sql, conns, answers = [], {}, {}, {}
+                for run_async in (False, True):
+                    for name, node in nodes.items():
+                        times, answers[name, run_async], sql[name, run_async], conns[name, run_async] = \
+                            _run(node, turns, run_async)
+                        medians.append(statistics.median(times) * 1e3)
+                mismatches += sum(answers[key] != answers['ToolNode', False] for key in answers)
+                print(f"{calls:<7}" + ''.join(f"{median:>26.2f}" for median in medians) +
+                      f"{sql['ToolNode', False]:>9.1f} -> {sql['ParallelToolNode', False]:<6.1f}"
+                      f"{conns['ToolNode', False]:>9.1f} -> {conns['ParallelToolNode', False]:<6.1f}")
+        finally:
+            close_connection_pools()
+            os.chdir(cwd)
+
+    print(f"\nRuns whose answers differ from the stock ToolNode: {mismatches}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
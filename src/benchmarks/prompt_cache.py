@@ -0,0 +1,196 @@
+"""
+Checks the prompt layout of `PromptBuilder` over the scripted booking, reschedule
+and cancel conversations, and estimates the provider prompt cache hits it allows:
+
+- the static prefix (tool schemas and system message) is byte-identical across
+  agents, clocks and processes, and every LLM call starts with it;
+- each call ends with the current date and time, fresh at the time of the call.
+
+The cached input tokens are simulated like the OpenAI prompt cache (longest prefix
+already seen, from 1024 tokens in 128-token increments, shared by all the
+conversations), for this layout and for the datetime formatted into the system
+message on each call. Tokens are approximated (4 chars per token).
+
+Usage (from `src/`):
+    python -m benchmarks.prompt_cache --conversations 5
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from langchain_core.messages import SystemMessage, message_to_dict
+from langchain_core.messages.utils import count_tokens_approximately
+import pytz
+from pydantic import Field
+
+from agents.booking_agent.booking_agent import BookingAgent, available_tools
+from agents.booking_agent.database.connection import close_connection_pools
+from agents.booking_agent.database.utils import SALON_TIMEZONE
+from agents.booking_agent.metrics import LLM_PROMPT_CACHE, LLM_TOKENS
+from agents.booking_agent.prompt_builder import PromptBuilder
+from agents.booking_agent.prompts import CURRENT_DATETIME_PROMPT
+from benchmarks.db_fixtures import create_bench_db
+from benchmarks.scenarios import ScriptedConversations
+from benchmarks.stub_llm import ScriptedChatModel
+
+MIN_CACHED_TOKENS = 1024
+CACHE_INCREMENT_TOKENS = 128
+FINGERPRINT_SCRIPT = """
+from agents.booking_agent.booking_agent import available_tools
+from agents.booking_agent.prompt_builder import PromptBuilder
+print(PromptBuilder(available_tools).prefix_fingerprint)
+"""
+
+
+class SimulatedPromptCache:
+    """Provider prompt cache: the longest prefix of a prompt (at message boundaries) already seen."""
+
+    def __init__(self, tool_schemas: list[dict]):
+        tools_json = json.dumps(tool_schemas, sort_keys=True)
+        self._tools_key = hashlib.sha256(tools_json.encode()).digest()
+        self._tools_tokens = len(tools_json) // 4
+        self._seen = set()
+
+    def cached_tokens(self, messages: list) -> tuple[int, int]:
+        """Returns the input tokens of the prompt and those read from the cache, and caches its prefixes."""
+        key, tokens = self._tools_key, self._tools_tokens
+        cached = tokens if key in self._seen else 0
+        self._seen.add(key)
+        for message in messages:
+            key = hashlib.sha256(key + json.dumps(message_to_dict(message), sort_keys=True).encode()).digest()
+            # Only a contiguous prefix is read from the cache
+            extends_cached_prefix = cached == tokens
+            tokens += count_tokens_approximately([message])
+            if extends_cached_prefix and key in self._seen:
+                cached = tokens
+            self._seen.add(key)
+        if cached < MIN_CACHED_TOKENS:
+            return tokens, 0
+        return tokens, cached // CACHE_INCREMENT_TOKENS * CACHE_INCREMENT_TOKENS
+
+
+class CachingScriptedChatModel(ScriptedChatModel):
+    """`ScriptedChatModel` reporting the input tokens read from a simulated prompt cache, and the time of each call."""
+
+    prompt_cache: SimulatedPromptCache
+    call_times: list = Field(default_factory=list)
+
+    def _result(self, messages):
+        self.call_times.append(datetime.datetime.now(pytz.utc))
+        result = super()._result(messages)
+        message = result.generations[0].message
+        input_tokens, cached_tokens = self.prompt_cache.cached_tokens(messages)
+        message.usage_metadata = {
+            **message.usage_metadata, 'input_tokens': input_tokens,
+            'total_tokens': input_tokens + message.usage_metadata['output_tokens'],
+            'input_token_details': {'cache_read': cached_tokens},
+        }
+        return result
+
+
+def _check_static_prefix(agent: BookingAgent) -> list[str]:
+    errors = []
+    later = PromptBuilder(
+        available_tools, clock=lambda tz: datetime.datetime.now(tz) + datetime.timedelta(days=30))
+    later.build([])
+    if later.static_prefix() != agent.prompt_builder.static_prefix():
+        errors.append('The static prefix depends on the time it is built at')
+    fingerprint = subprocess.run(
+        [sys.executable, '-c', FINGERPRINT_SCRIPT], capture_output=True, text=True, check=True,
+        env={**os.environ, 'PYTHONHASHSEED': 'random'}).stdout.strip()
+    if fingerprint != agent.prompt_builder.prefix_fingerprint:
+        errors.append(f'The static prefix differs in another process ({fingerprint})')
+    return errors
+
+
+def _check_prompts(agent: BookingAgent, llm: CachingScriptedChatModel) -> list[str]:
+    errors = []
+    tz = pytz.timezone(SALON_TIMEZONE)
+    prefix, suffix = CURRENT_DATETIME_PROMPT.split('{current_dt_iso}')
+    for prompt, call_dt in zip(llm.prompts, llm.call_times):
+        if message_to_dict(prompt[0]) != message_to_dict(agent.prompt_builder.system_message):
+            errors.append('A prompt does not start with the static system message')
+        last_message = prompt[-1]
+        if not isinstance(last_message, SystemMessage) or not last_message.content.startswith(prefix) \
+                or not last_message.content.endswith(suffix):
+            errors.append('A prompt does not end with the current datetime')
+            continue
+        prompt_dt = datetime.datetime.fromisoformat(last_message.content[len(prefix):-len(suffix)])
+        if prompt_dt.utcoffset() != call_dt.astimezone(tz).utcoffset() or abs(prompt_dt - call_dt).total_seconds() > 2:
+            errors.append(f'Stale or mis-zoned current datetime {prompt_dt.isoformat()} at {call_dt.isoformat()}')
+    return errors
+
+
+def _datetime_in_system_message(prompt: list, call_dt: datetime.datetime) -> list:
+    # Previous layout, with `datetime.now()` formatted into the system message, on each call for a fresh datetime
+    system_message, *history, _ = prompt
+    current_dt_prompt = CURRENT_DATETIME_PROMPT.format(current_dt_iso=call_dt.astimezone(pytz.timezone(SALON_TIMEZONE)))
+    return [SystemMessage(content=system_message.content + '\n' + current_dt_prompt,
+                          additional_kwargs=system_message.additional_kwargs), *history]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversations', type=int, default=5)
+    parser.add_argument('--pause', type=float, default=1.1, help='Seconds between conversations')
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The tools use the default database path, relative to the working directory
+        os.chdir(tmp_dir)
+        try:
+            create_bench_db()
+            scenarios = ScriptedConversations()
+            prompt_cache = SimulatedPromptCache(PromptBuilder(available_tools).tool_schemas)
+            llm = CachingScriptedChatModel(respond=scenarios.respond, prompt_cache=prompt_cache)
+            agent = BookingAgent(llm=llm)
+            t0 = time.perf_counter()
+            for conversation_idx in range(args.conversations):
+                if conversation_idx:
+                    time.sleep(args.pause)
+                thread_config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+                for user_input in scenarios.conversation(conversation_idx):
+                    agent.invoke({"messages": [{"role": "user", "content": user_input}]}, config=thread_config)
+            elapsed = time.perf_counter() - t0
+        finally:
+            close_connection_pools()
+            os.chdir(cwd)
+
+    errors = _check_static_prefix(agent) + _check_prompts(agent, llm) + \
+        [f'Scripted tool call failed: {result}' for _, result in scenarios.failures]
+    timestamps = {prompt[-1].content for prompt in llm.prompts}
+
+    previous_cache = SimulatedPromptCache(agent.prompt_builder.tool_schemas)
+    previous = [previous_cache.cached_tokens(_datetime_in_system_message(prompt, call_dt))
+                for prompt, call_dt in zip(llm.prompts, llm.call_times)]
+    hits = LLM_PROMPT_CACHE.value('llm_call', 'hit')
+    calls = hits + LLM_PROMPT_CACHE.value('llm_call', 'miss')
+
+    print(f"{len(llm.prompts)} LLM calls over {args.conversations} conversations in {elapsed:.1f} s, "
+          f"static prefix {len(agent.prompt_builder.static_prefix()) // 4} tokens "
+          f"(fingerprint {agent.prompt_builder.prefix_fingerprint}), {len(timestamps)} distinct current datetimes")
+    print(f"\n{'layout':<34}{'input tokens':>14}{'cached':>10}{'cached %':>10}{'cache hits':>12}")
+    input_tokens, cached_tokens = LLM_TOKENS.value('llm_call', 'input'), LLM_TOKENS.value('llm_call', 'cached_input')
+    print(f"{'datetime after the history':<34}{input_tokens:>14}{cached_tokens:>10}"
+          f"{cached_tokens / input_tokens:>10.0%}{hits / calls:>12.0%}")
+    input_tokens, cached_tokens = sum(tokens for tokens, _ in previous), sum(cached for _, cached in previous)
+    print(f"{'datetime in the system message':<34}{input_tokens:>14}{cached_tokens:>10}"
+          f"{cached_tokens / input_tokens:>10.0%}{sum(cached > 0 for _, cached in previous) / len(previous):>12.0%}")
+
+    for error in errors[:5]:
+        print(f"  {error}")
+    print(f"\nStatic prefix stable and current datetime fresh: {'yes' if not errors else 'NO'}")
+    if errors or len(timestamps) < 2:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
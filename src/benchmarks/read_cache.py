@@ -0,0 +1,137 @@
+"""
+Repeated availability checks and bookings lookups, as made by the `check_availability`
+and `retrieve_active_bookings_user` tools within and across conversations, served
+from SQLite vs. the read cache. A fraction of the operations book, reschedule or
+cancel, and the answers of both runs must be identical (no stale cached answer).
+
+Usage (from `src/`):
+    python -m benchmarks.read_cache --customers 200 --operations 20000 --writes 0.05
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+import pytz
+
+from agents.booking_agent import metrics
+from agents.booking_agent.database import utils as db_utils
+from agents.booking_agent.database.connection import close_connection_pools
+from agents.booking_agent.database.read_cache import disable_read_cache, enable_read_cache
+from benchmarks.db_fixtures import create_bench_db
+
+DAYS = 14
+
+
+def _phone_number(customer_idx: int) -> str:
+    return f'647{customer_idx:07d}'
+
+
+def _operations(customers: int, operations: int, writes: float, slots: list[str]) -> list[tuple]:
+    # Conversations look up the same few customers and slots repeatedly: skewed choices
+    def skewed(population):
+        return population[min(int(random.expovariate(1 / 20)), len(population) - 1)]
+
+    customer_ids = list(range(customers))
+    random.shuffle(customer_ids)
+    ops = []
+    for _ in range(operations):
+        draw = random.random()
+        if draw < writes:
+            ops.append((random.choice(('book', 'reschedule', 'cancel')), skewed(customer_ids), random.choice(slots)))
+        elif draw < (1 + writes) / 2:
+            ops.append(('bookings', skewed(customer_ids), None))
+        else:
+            ops.append(('availability', None, skewed(slots)))
+    return ops
+
+
+def _run(db_path: str, ops: list[tuple]) -> tuple[dict, list]:
+    timings = {}
+    answers = []
+    for kind, customer_idx, slot in ops:
+        t0 = time.perf_counter()
+        if kind == 'availability':
+            answer = db_utils.is_slot_available(slot, db_path=db_path)
+        elif kind == 'bookings':
+            answer = [(booking['start_datetime'], booking['stylist'])
+                      for booking in db_utils.get_active_bookings_user(_phone_number(customer_idx), db_path=db_path)]
+        elif kind == 'book':
+            try:
+                answer = db_utils.add_booking(
+                    slot, f'Customer {customer_idx}', _phone_number(customer_idx), db_path=db_path) is not None
+            except db_utils.SlotUnavailableError:
+                answer = False
+        else:
+            bookings = db_utils.get_active_bookings_user(_phone_number(customer_idx), db_path=db_path)
+            if not bookings:
+                answer = None
+            elif kind == 'cancel':
+                answer = db_utils.cancel_booking(bookings[0]['id'], db_path=db_path)
+            else:
+                try:
+                    answer = db_utils.reschedule_booking(
+                        bookings[0]['id'], slot, _phone_number(customer_idx), db_path=db_path) is not None
+                except db_utils.SlotUnavailableError:
+                    answer = False
+        elapsed = time.perf_counter() - t0
+        total, count = timings.get(kind, (0, 0))
+        timings[kind] = (total + elapsed, count + 1)
+        answers.append(answer)
+    return timings, answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--customers', type=int, default=200)
+    parser.add_argument('--operations', type=int, default=20000)
+    parser.add_argument('--writes', type=float, default=0.05, help='Fraction of booking, reschedule and cancel')
+    args = parser.parse_args()
+
+    tz = pytz.timezone(db_utils.SALON_TIMEZONE)
+    first_day = datetime.date.today() + datetime.timedelta(days=1)
+    slots = [tz.localize(datetime.datetime.combine(first_day + datetime.timedelta(days=day), datetime.time(hour)))
+             .isoformat() for day in range(DAYS) for hour in range(24)]
+    random.seed(0)
+    initial_bookings = [(random.randrange(args.customers), slot) for slot in random.sample(slots, len(slots) // 2)]
+    ops = _operations(args.customers, args.operations, args.writes, slots)
+
+    results = {}
+    for mode in ('sqlite', 'read cache'):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, 'bookings.sqlite')
+            create_bench_db(db_path)
+            for customer_idx, slot in initial_bookings:
+                db_utils.add_booking(slot, f'Customer {customer_idx}', _phone_number(customer_idx), db_path=db_path)
+            if mode == 'read cache':
+                enable_read_cache(db_path)
+            results[mode] = _run(db_path, ops)
+            disable_read_cache(db_path)
+            close_connection_pools()
+
+    kinds = ('availability', 'bookings')
+    print(f"{len(ops)} operations ({args.writes:.0%} writes) over {args.customers} customers and {len(slots)} slots")
+    print(f"\n{'mode':<12}" + ''.join(f"{kind + ' us':>17}" for kind in kinds) + f"{'writes us':>11}")
+    for mode, (timings, _) in results.items():
+        write_total = sum(total for kind, (total, _) in timings.items() if kind not in kinds)
+        write_count = sum(count for kind, (_, count) in timings.items() if kind not in kinds)
+        print(f"{mode:<12}" + ''.join(f"{timings[kind][0] / timings[kind][1] * 1e6:>17.1f}" for kind in kinds) +
+              f"{write_total / max(write_count, 1) * 1e6:>11.1f}")
+    hit_rates = []
+    for kind in kinds:
+        hits, misses = metrics.READ_CACHE.value(kind, 'hit'), metrics.READ_CACHE.value(kind, 'miss')
+        hit_rates.append(f"{kind} {hits / max(hits + misses, 1):.0%}")
+    print(f"\nHit rate: {', '.join(hit_rates)}; "
+          f"invalidations: {metrics.READ_CACHE_INVALIDATIONS.value('availability'):.0f} availability, "
+          f"{metrics.READ_CACHE_INVALIDATIONS.value('bookings'):.0f} bookings")
+
+    stale = sum(a != b for a, b in zip(results['sqlite'][1], results['read cache'][1]))
+    print(f"Answers differing from SQLite: {stale}")
+    if stale:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Scripted booking, reschedule and cancel conversations, and the `respond` function
+driving a `ScriptedChatModel` through them with the tool calls the real model
+makes when following the system prompt (datetime conversion, availability check,
+bookings lookup, then the booking, reschedule or cancellation).
+"""
+import datetime
+import json
+import threading
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+import pytz
+
+from agents.booking_agent.database.utils import SALON_TIMEZONE
+
+# Weekday slots, one customer conversation uses two of them (booking and reschedule)
+SLOT_HOURS = range(10, 17)
+
+
+@dataclass
+class Turn:
+    user_input: str
+    # Each step returns the next tool call (name, args) from the results of the previous steps of the turn
+    steps: list[Callable[[list], tuple[str, dict]]] = field(default_factory=list)
+    reply: str = 'Sure! How can I help you with your appointment?'
+
+
+def _result(tool_message: ToolMessage):
+    try:
+        return json.loads(tool_message.content)
+    except (TypeError, ValueError):
+        return tool_message.content
+
+
+def _is_failure(result) -> bool:
+    return result is False or result is None or \
+        (isinstance(result, dict) and result.get('status') in ('failure', 'error', 'unavailable'))
+
+
+class ScriptedConversations:
+    """
+    Generates the scripted conversations and replies to their turns. Unique slots are
+    allocated to each conversation from `first_day` days ahead, so that conversations
+    do not conflict with each other.
+    """
+
+    def __init__(self, first_day: int = 2):
+        self._tz = pytz.timezone(SALON_TIMEZONE)
+        self._first_day = first_day
+        self._turns = {}
+        self._lock = threading.Lock()
+        # Tool results reporting a failure (e.g. an unavailable slot), which should not happen
+        self.failures = []
+
+    def _slot(self, slot_idx: int) -> datetime.datetime:
+        day = datetime.datetime.now(tz=self._tz).date() + datetime.timedelta(days=self._first_day)
+        business_days = slot_idx // len(SLOT_HOURS)
+        while True:
+            if day.weekday() < 5:
+                if business_days == 0:
+                    break
+                business_days -= 1
+            day += datetime.timedelta(days=1)
+        return self._tz.localize(datetime.datetime.combine(day, datetime.time(SLOT_HOURS[slot_idx % len(SLOT_HOURS)])))
+
+    def conversation(self, conversation_idx: int) -> list[str]:
+        """The user messages of the conversation `conversation_idx`: book, reschedule, then cancel."""
+        name, phone_number = f'Customer {conversation_idx}', f'647{conversation_idx:07d}'
+        booking_dt, rescheduled_dt = self._slot(2 * conversation_idx), self._slot(2 * conversation_idx + 1)
+        now_iso = datetime.datetime.now(tz=self._tz).isoformat()
+
+        def convert(dt: datetime.datetime):
+            phrase = f'{dt:%B} {dt.day} at {dt:%I%p}'.replace(' at 0', ' at ').lower()
+            return lambda results: ('convert_relative_to_absolute_datetime',
+                                    {'text': phrase, 'current_datetime': now_iso})
+
+        turns = [
+            Turn(f'Hi! Could I book a haircut on {booking_dt:%B} {booking_dt.day} at {booking_dt:%I%p}? ({name})',
+                 [convert(booking_dt),
+                  lambda results: ('check_availability', {'appointment_start_dt': results[-1]})],
+                 'Good news, that time is available! Could I get your name and phone number?'),
+            Turn(f'Sure, it is {name}, {phone_number}',
+                 reply=f'Thanks {name}! Just to confirm, shall I go ahead with the booking?'),
+            Turn(f'Yes please, book it for {name}',
+                 [convert(booking_dt),
+                  lambda results: ('book_appointment', {'appointment_start_dt': results[-1], 'user_name': name,
+                                                        'user_phone_number': phone_number})],
+                 'You are all set! See you then.'),
+            Turn(f'Actually, can I move my appointment to {rescheduled_dt:%B} {rescheduled_dt.day} at '
+                 f'{rescheduled_dt:%I%p}? My number is {phone_number}',
+                 [lambda results: ('retrieve_active_bookings_user', {'user_phone_number': phone_number}),
+                  convert(rescheduled_dt),
+                  lambda results: ('check_availability', {'appointment_start_dt': results[-1]})],
+                 'That new time is available. Shall I move your appointment?'),
+            Turn(f'Yes, please move it ({name})',
+                 [lambda results: ('retrieve_active_bookings_user', {'user_phone_number': phone_number}),
+                  convert(rescheduled_dt),
+                  lambda results: ('reschedule_appointment', {
+                      'booking_id_to_reschedule': results[0][0]['id'],
+                      'updated_appointment_start_dt': results[-1],
+                      'user_phone_number': phone_number})],
+                 'Done, your appointment has been moved!'),
+            Turn(f'Sorry, something came up. Please cancel my appointment, my number is {phone_number}',
+                 [lambda results: ('retrieve_active_bookings_user', {'user_phone_number': phone_number})],
+                 'I found your appointment. Are you sure you want to cancel it?'),
+            Turn(f'Yes, cancel it please ({name})',
+                 [lambda results: ('retrieve_active_bookings_user', {'user_phone_number': phone_number}),
+                  lambda results: ('cancel_appointment', {'booking_id_to_cancel': results[0][0]['id']})],
+                 'Your appointment has been cancelled. Hope to see you another time!'),
+        ]
+        with self._lock:
+            self._turns.update({turn.user_input: turn for turn in turns})
+        return [turn.user_input for turn in turns]
+
+    def respond(self, messages) -> AIMessage:
+        """Next message of the model: the next tool call of the current turn, or its reply."""
+        turn_start = max(i for i, message in enumerate(messages) if isinstance(message, HumanMessage))
+        turn = self._turns.get(messages[turn_start].text())
+        if turn is None:
+            return AIMessage(content=Turn('').reply)
+
+        results = [_result(message) for message in messages[turn_start:] if isinstance(message, ToolMessage)]
+        if results and _is_failure(results[-1]):
+            self.failures.append((turn.user_input, results[-1]))
+            return AIMessage(content='Sorry, something went wrong. Could we try another time?')
+        if len(results) < len(turn.steps):
+            name, args = turn.steps[len(results)](results)
+            return AIMessage(content='', tool_calls=[{'name': name, 'args': args, 'id': f'call_{uuid.uuid4().hex}'}])
+        return AIMessage(content=turn.reply)
@@ -0,0 +1,113 @@
+"""
+Finding free slots over a week: one `find_available_slots` call vs. hunting with
+repeated `is_slot_available` calls (what the LLM does one tool call at a time).
+
+The database holds `--bookings` hourly bookings within the opening hours of the
+coming year, densest in the searched week. Both approaches must return the same slots.
+
+Usage (from `src/`):
+    python -m benchmarks.slot_search --bookings 3000 --limit 5
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+import pytz
+
+from agents.booking_agent.database import utils as db_utils
+from agents.booking_agent.database.connection import close_connection_pools, get_connection_pool
+from agents.booking_agent.database.create_sqlite_db import create_bookings_db
+from benchmarks.db_fixtures import booking_params
+
+
+def _opening_hour_slots(start_dt: datetime.datetime, days: int) -> list[datetime.datetime]:
+    tz = pytz.timezone(db_utils.SALON_TIMEZONE)
+    slots = []
+    for day_offset in range(days):
+        day = (start_dt + datetime.timedelta(days=day_offset)).astimezone(tz).date()
+        if day.weekday() not in db_utils.SALON_OPENING_HOURS:
+            continue
+        open_hr, close_hr = db_utils.SALON_OPENING_HOURS[day.weekday()]
+        slots.extend(
+            tz.localize(datetime.datetime.combine(day, datetime.time(hour)))
+            for hour in range(open_hr, close_hr)
+        )
+    return [slot for slot in slots if slot > start_dt]
+
+
+def _populate(db_path: str, week_start: datetime.datetime, num_bookings: int, week_occupancy: float):
+    with get_connection_pool(db_path).transaction() as conn:
+        customer_id = db_utils.add_customer(conn.cursor(), 'Bench', '6470000000')
+
+    week_slots = _opening_hour_slots(week_start, 7)
+    booked = random.sample(week_slots, int(len(week_slots) * week_occupancy))
+    year_slots = _opening_hour_slots(week_start + datetime.timedelta(days=7), 358)
+    booked += random.sample(year_slots, min(len(year_slots), max(num_bookings - len(booked), 0)))
+
+    with get_connection_pool(db_path).transaction() as conn:
+        conn.executemany(
+            db_utils.ADD_BOOKING_QUERY,
+            (
+                booking_params(
+                    customer_id, slot.astimezone(pytz.utc), (slot + datetime.timedelta(hours=1)).astimezone(pytz.utc),
+                    week_start)
+                for slot in booked
+            )
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bookings', type=int, default=3000)
+    parser.add_argument('--limit', type=int, default=5)
+    parser.add_argument('--week-occupancy', type=float, default=0.95)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    random.seed(0)
+
+    tz = pytz.timezone(db_utils.SALON_TIMEZONE)
+    week_start = tz.localize(datetime.datetime.combine(
+        datetime.date.today() + datetime.timedelta(days=1), datetime.time(0)))
+    week_end = week_start + datetime.timedelta(days=7)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bookings.sqlite')
+        create_bookings_db(db_path)
+        _populate(db_path, week_start, args.bookings, args.week_occupancy)
+
+        def hunt():
+            found, probes = [], 0
+            for slot in _opening_hour_slots(week_start, 7):
+                probes += 1
+                if db_utils.is_slot_available(slot.isoformat(), db_path=db_path):
+                    found.append(slot.isoformat())
+                    if len(found) >= args.limit:
+                        break
+            return found, probes
+
+        def search():
+            return db_utils.find_available_slots(week_start.isoformat(), week_end.isoformat(), args.limit, db_path=db_path)
+
+        hunted, probes = hunt()
+        assert search() == hunted, 'find_available_slots disagrees with is_slot_available'
+
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            hunt()
+        hunt_ms = (time.perf_counter() - t0) / args.repeat * 1000
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            search()
+        search_ms = (time.perf_counter() - t0) / args.repeat * 1000
+        close_connection_pools()
+
+    print(f"Found {len(hunted)} free slots in a week at {args.week_occupancy:.0%} occupancy")
+    print(f"is_slot_available x{probes}: {hunt_ms:.2f} ms ({probes} tool calls / LLM round trips)")
+    print(f"find_available_slots x1: {search_ms:.2f} ms (1 tool call)")
+
+
+if __name__ == '__main__':
+    main()
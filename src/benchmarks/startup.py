@@ -0,0 +1,97 @@
+"""
+Cold start of the backend service, each measured in a fresh interpreter (median of
+`--runs`) without `OPENAI_API_KEY`:
+
+- import of `backend_service`, which defers the agent to the lifespan of the app;
+- startup, the import then the lifespan (the agent built, the graph compiled);
+- the import with the agent built at import, as the service previously did.
+
+Also lists the slowest imports of `backend_service` from `python -X importtime`.
+
+Usage (from `src/`):
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+IMPORT_SCRIPT = """
+import time
+t0 = time.perf_counter()
+import backend_service
+print(time.perf_counter() - t0)
+"""
+STARTUP_SCRIPT = """
+import asyncio
+import time
+t0 = time.perf_counter()
+from backend_service import service
+
+async def startup():
+    async with service.lifespan(service.app):
+        pass
+
+asyncio.run(startup())
+print(time.perf_counter() - t0)
+"""
+EAGER_IMPORT_SCRIPT = """
+import time
+t0 = time.perf_counter()
+import backend_service
+from backend_service import service
+service.get_booking_agent()
+print(time.perf_counter() - t0)
+"""
+
+
+def _run(script: str, env: dict) -> float:
+    output = subprocess.run([sys.executable, '-W', 'ignore', '-c', script], env=env, capture_output=True, text=True)
+    if output.returncode != 0:
+        raise RuntimeError(output.stderr.strip().splitlines()[-1])
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def _slowest_imports(env: dict, count: int) -> list[tuple[int, str]]:
+    output = subprocess.run([sys.executable, '-W', 'ignore', '-X', 'importtime', '-c', 'import backend_service'],
+                            env=env, capture_output=True, text=True, check=True)
+    imports = []
+    for line in output.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nested two spaces per level: the imports of backend_service and theirs, down to 3 levels
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if 1 <= depth <= 3:
+            imports.append((int(cumulative_us), '  ' * (depth - 1) + name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help='Number of slowest imports listed')
+    args = parser.parse_args()
+
+    env = {key: value for key, value in os.environ.items() if key != 'OPENAI_API_KEY'}
+    env['PYTHONPATH'] = os.getcwd()
+    # The OpenAI client is only created with a key, so the eager run is given a placeholder
+    eager_env = {**env, 'OPENAI_API_KEY': 'unused'}
+
+    results = {
+        'import backend_service': [_run(IMPORT_SCRIPT, env) for _ in range(args.runs)],
+        'import + lifespan startup': [_run(STARTUP_SCRIPT, eager_env) for _ in range(args.runs)],
+        'agent built at import': [_run(EAGER_IMPORT_SCRIPT, eager_env) for _ in range(args.runs)],
+    }
+    print(f"{'':<28}{'median ms':>11}{'min ms':>9}")
+    for name, times in results.items():
+        print(f"{name:<28}{statistics.median(times) * 1e3:>11.0f}{min(times) * 1e3:>9.0f}")
+
+    print("\nSlowest imports of backend_service (cumulative):")
+    for cumulative_us, name in _slowest_imports(env, args.top):
+        print(f"  {cumulative_us / 1e3:>8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
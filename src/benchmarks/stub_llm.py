@@ -0,0 +1,153 @@
+import asyncio
+import random
+import time
+from typing import Callable
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field
+
+
+def last_conversation_message(messages):
+    """The last user, AI or tool message of a prompt, before the trailing current datetime message."""
+    return next(message for message in reversed(messages) if not isinstance(message, SystemMessage))
+
+
+def _usage(messages, reply: AIMessage) -> dict:
+    # Approximate token usage, as reported by the provider
+    input_tokens, output_tokens = count_tokens_approximately(messages), count_tokens_approximately([reply])
+    return {'input_tokens': input_tokens, 'output_tokens': output_tokens, 'total_tokens': input_tokens + output_tokens}
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Local stand-in for the OpenAI chat model: replies with a fixed message after
+    `latency_secs`, simulating the provider round trip without any network call.
+    When streamed, the first token comes after `latency_secs` and each following
+    one after `token_latency_secs`.
+    """
+
+    latency_secs: float = 0.5
+    token_latency_secs: float = 0.0
+    reply: str = 'Sure, what date and time would you like to book?'
+
+    def _tokens(self) -> list[str]:
+        words = self.reply.split(' ')
+        return [word + ' ' for word in words[:-1]] + words[-1:]
+
+    @property
+    def _llm_type(self) -> str:
+        return 'stub-chat-model'
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency_secs + self.token_latency_secs * (len(self._tokens()) - 1))
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency_secs + self.token_latency_secs * (len(self._tokens()) - 1))
+        return self._result(messages)
+
+    def _result(self, messages) -> ChatResult:
+        message = AIMessage(content=self.reply)
+        message.usage_metadata = _usage(messages, message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for i, token in enumerate(self._tokens()):
+            time.sleep(self.latency_secs if i == 0 else self.token_latency_secs)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for i, token in enumerate(self._tokens()):
+            await asyncio.sleep(self.latency_secs if i == 0 else self.token_latency_secs)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Local stand-in for the OpenAI chat model whose replies, tool calls included, are
+    produced by `respond(messages)`. The messages of every call are kept in `prompts`.
+    """
+
+    respond: Callable[[list], AIMessage]
+    latency_secs: float = 0.0
+    prompts: list = Field(default_factory=list)
+
+    @property
+    def _llm_type(self) -> str:
+        return 'scripted-chat-model'
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency_secs)
+        self.prompts.append(messages)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency_secs)
+        self.prompts.append(messages)
+        return self._result(messages)
+
+    def _result(self, messages) -> ChatResult:
+        message = self.respond(messages)
+        message.usage_metadata = _usage(messages, message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+class StubRateLimitError(Exception):
+    """Rejection of a call by the stub provider, as the OpenAI client reports a 429."""
+
+    status_code = 429
+
+
+class CongestedChatModel(ScriptedChatModel):
+    """
+    Scripted model behind a stub provider under load: calls take `latency_secs` up to `capacity` calls
+    in flight, and proportionally longer above (the provider slows down), calls beyond `rate_limit` in
+    flight are rejected with a 429 after `reject_latency_secs`, and a `slow_call_rate` fraction of the
+    calls hang for `slow_call_secs`. `in_flight_peak` and `rejected` are counted for the report.
+    """
+
+    capacity: int = 8
+    rate_limit: int = 16
+    reject_latency_secs: float = 0.05
+    slow_call_rate: float = 0.0
+    slow_call_secs: float = 10.0
+    in_flight: int = 0
+    in_flight_peak: int = 0
+    rejected: int = 0
+
+    def _latency(self) -> float:
+        if random.random() < self.slow_call_rate:
+            return self.slow_call_secs
+        return self.latency_secs * max(1.0, self.in_flight / self.capacity)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        raise NotImplementedError('The congested stub provider is only called asynchronously')
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.in_flight >= self.rate_limit:
+            self.rejected += 1
+            await asyncio.sleep(self.reject_latency_secs)
+            raise StubRateLimitError('Rate limit reached')
+        self.in_flight += 1
+        self.in_flight_peak = max(self.in_flight_peak, self.in_flight)
+        try:
+            await asyncio.sleep(self._latency())
+        finally:
+            self.in_flight -= 1
+        self.prompts.append(messages)
+        return self._result(messages)
@@ -0,0 +1,141 @@
+"""
+Availability with many stylists: `is_slot_available` for any stylist and for a
+specific one, and `find_available_slots` over a week, with `--stylists` stylists
+each booked at `--occupancy` of their working hours over the coming year.
+Served by SQLite and by the interval index, whose answers must agree.
+
+Each stylist works the salon opening hours except one day off a week.
+
+Usage (from `src/`):
+    python -m benchmarks.stylist_availability --stylists 50 --occupancy 0.7 --probes 2000
+"""
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+import pytz
+
+from agents.booking_agent.database import utils as db_utils
+from agents.booking_agent.database.connection import close_connection_pools, get_connection_pool
+from agents.booking_agent.database.interval_index import disable_interval_index, enable_interval_index
+from benchmarks.db_fixtures import booking_params, create_bench_db
+
+PHONE_NUMBER = '6470000000'
+DAYS = 365
+
+
+def _populate(db_path: str, stylists: int, occupancy: float, first_day: datetime.date) -> tuple[list[str], int]:
+    tz = pytz.timezone(db_utils.SALON_TIMEZONE)
+    stylist_ids = []
+    for i in range(stylists):
+        day_off = i % len(db_utils.SALON_OPENING_HOURS)
+        working_hours = {weekday: hours for weekday, hours in db_utils.SALON_OPENING_HOURS.items() if weekday != day_off}
+        stylist_ids.append(db_utils.add_stylist(f'Stylist {i}', working_hours, stylist_id=f'stylist-{i:03d}',
+                                                db_path=db_path))
+
+    db_utils.add_booking(
+        tz.localize(datetime.datetime.combine(first_day, datetime.time(10))).isoformat(), 'Bench', PHONE_NUMBER,
+        db_path=db_path)
+    customer_id = db_utils.get_customer_by_phone(PHONE_NUMBER, db_path=db_path).id
+    created_dt = datetime.datetime.now(pytz.utc)
+
+    def bookings():
+        for day_offset in range(1, DAYS):
+            day = first_day + datetime.timedelta(days=day_offset)
+            for i, stylist_id in enumerate(stylist_ids):
+                hours = db_utils.SALON_OPENING_HOURS.get(day.weekday())
+                if hours is None or day.weekday() == i % len(db_utils.SALON_OPENING_HOURS):
+                    continue
+                for hour in range(*hours):
+                    if random.random() < occupancy:
+                        start_dt = tz.localize(datetime.datetime.combine(day, datetime.time(hour))).astimezone(pytz.utc)
+                        yield booking_params(customer_id, start_dt, start_dt + datetime.timedelta(hours=1), created_dt,
+                                             stylist_id=stylist_id)
+
+    with get_connection_pool(db_path).transaction() as conn:
+        conn.executemany(db_utils.ADD_BOOKING_QUERY, bookings())
+        (num_bookings,) = conn.execute("SELECT COUNT(*) FROM Bookings").fetchone()
+    return stylist_ids, num_bookings
+
+
+def _us_per_call(func, args_list) -> tuple[float, list]:
+    t0 = time.perf_counter()
+    results = [func(*args) for args in args_list]
+    return (time.perf_counter() - t0) / len(args_list) * 1e6, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stylists', type=int, default=50)
+    parser.add_argument('--occupancy', type=float, default=0.7)
+    parser.add_argument('--probes', type=int, default=2000)
+    parser.add_argument('--searches', type=int, default=200)
+    args = parser.parse_args()
+    random.seed(0)
+
+    tz = pytz.timezone(db_utils.SALON_TIMEZONE)
+    first_day = datetime.date.today() + datetime.timedelta(days=1)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bookings.sqlite')
+        create_bench_db(db_path, around_the_clock=False)
+        t0 = time.perf_counter()
+        stylist_ids, num_bookings = _populate(db_path, args.stylists, args.occupancy, first_day)
+        print(f"{len(stylist_ids)} stylists, {num_bookings} bookings over {DAYS} days, "
+              f"inserted in {time.perf_counter() - t0:.1f} s")
+
+        # Probes on the hour and on the half hour within the opening hours, any and specific stylist
+        probes = []
+        for _ in range(args.probes):
+            day = first_day + datetime.timedelta(days=random.randrange(1, DAYS))
+            hours = db_utils.SALON_OPENING_HOURS.get(day.weekday(), (9, 18))
+            start_dt = tz.localize(datetime.datetime.combine(day, datetime.time(random.randrange(*hours)))) + \
+                datetime.timedelta(minutes=random.choice((0, 30)))
+            probes.append(start_dt.isoformat())
+        any_probes = [(probe, None, None, db_path) for probe in probes]
+        specific_probes = [(probe, None, random.choice(stylist_ids), db_path) for probe in probes]
+        searches = []
+        for _ in range(args.searches):
+            week_start = tz.localize(datetime.datetime.combine(
+                first_day + datetime.timedelta(days=random.randrange(1, DAYS - 7)), datetime.time()))
+            searches.append((week_start.isoformat(), (week_start + datetime.timedelta(days=7)).isoformat(), 5))
+
+        timings, results = {}, {}
+        for mode in ('sqlite', 'index'):
+            if mode == 'index':
+                enable_interval_index(db_path)
+            timings[mode, 'any'], results[mode, 'any'] = _us_per_call(db_utils.is_slot_available, any_probes)
+            timings[mode, 'specific'], results[mode, 'specific'] = \
+                _us_per_call(db_utils.is_slot_available, specific_probes)
+        disable_interval_index(db_path)
+
+        search_us, _ = _us_per_call(
+            lambda *search: db_utils.find_available_slots(*search, db_path=db_path), searches)
+        specific_search_us, _ = _us_per_call(
+            lambda *search: db_utils.find_available_slots(*search, stylist_id=stylist_ids[0], db_path=db_path),
+            searches)
+        query_plan = ' / '.join(row[-1] for row in get_connection_pool(db_path).connection().execute(
+            "EXPLAIN QUERY PLAN " + db_utils.FREE_STYLIST_QUERY,
+            {'weekday': 0, 'start_minute': 0, 'end_minute': 0, 'stylist': None,
+             'start': 0, 'end': 0, 'earliest_start': 0}))
+        close_connection_pools()
+
+    mismatches = sum(results['sqlite', kind] != results['index', kind] for kind in ('any', 'specific'))
+    print(f"\n{'is_slot_available':<28}{'sqlite us':>10}{'index us':>10}{'available':>11}")
+    for kind in ('any', 'specific'):
+        available = sum(results['sqlite', kind]) / len(probes)
+        print(f"  {kind + ' stylist':<26}{timings['sqlite', kind]:>10.1f}{timings['index', kind]:>10.1f}"
+              f"{available:>11.0%}")
+    print(f"\nfind_available_slots (week, limit 5): any stylist {search_us / 1e3:.2f} ms, "
+          f"specific stylist {specific_search_us / 1e3:.2f} ms")
+    print(f"Free stylist query plan: {query_plan}")
+    print(f"SQLite vs. index: {'agree' if not mismatches else 'DISAGREE'}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
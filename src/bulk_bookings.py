@@ -0,0 +1,51 @@
+import argparse
+import sys
+
+from agents.booking_agent.database import bulk
+from agents.booking_agent.database.utils import DB_PATH
+
+
+def main():
+    """
+    Imports or exports the bookings in bulk, as CSV or JSONL (from the file extension or `--format`), e.g.:
+        python bulk_bookings.py import calendar.csv --dry-run
+        python bulk_bookings.py export bookings.jsonl --status scheduled
+    """
+    parser = argparse.ArgumentParser(description='Bulk import and export of the bookings.')
+    parser.add_argument('--db', default=DB_PATH, help='Path of the bookings database')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help='Import the bookings of a file')
+    import_parser.add_argument('path', help="File to import ('-' for the standard input)")
+    import_parser.add_argument('--format', choices=('csv', 'jsonl'))
+    import_parser.add_argument('--chunk-size', type=int, default=bulk.DEFAULT_CHUNK_SIZE,
+                               help='Bookings inserted per transaction')
+    import_parser.add_argument('--dry-run', action='store_true', help='Only validate the file')
+    export_parser = subparsers.add_parser('export', help='Export the bookings to a file')
+    export_parser.add_argument('path', help="File to write ('-' for the standard output)")
+    export_parser.add_argument('--format', choices=('csv', 'jsonl'))
+    export_parser.add_argument('--status', choices=bulk.BOOKING_STATUSES, help='Only export the bookings with it')
+    args = parser.parse_args()
+
+    try:
+        fmt = args.format or bulk.file_format(args.path)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.command == 'import':
+        file = sys.stdin if args.path == '-' else open(args.path, newline='', encoding='utf-8')
+        with file:
+            result = bulk.import_bookings(
+                bulk.read_rows(file, fmt), chunk_size=args.chunk_size, dry_run=args.dry_run, db_path=args.db)
+        print(f"{'Validated' if args.dry_run else 'Imported'} {result.imported} of {result.rows} bookings, "
+              f"{result.customers_created} new customers, {result.rejected} rejected")
+        for row_number, reason in result.errors:
+            print(f"  row {row_number}: {reason}")
+        if result.rejected > len(result.errors):
+            print(f"  ... and {result.rejected - len(result.errors)} more")
+    else:
+        file = sys.stdout if args.path == '-' else open(args.path, 'w', newline='', encoding='utf-8')
+        with file:
+            file.writelines(bulk.format_rows(bulk.export_bookings(status=args.status, db_path=args.db), fmt))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,29 @@
+import argparse
 import os
 
 import uvicorn
 
 from agents.booking_agent import create_bookings_db
+from agents.booking_agent.database.create_sqlite_db import migrate_bookings_db
+from backend_service.config import ENV_PREFIX, ServiceConfig
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Runs the booking agent backend service.')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=ServiceConfig.from_env().workers,
+                        help='Number of worker processes (the conversation threads are then kept in SQLite by default)')
+    args = parser.parse_args()
+
+    # Read by the configuration of the workers
+    os.environ[ENV_PREFIX + 'WORKERS'] = str(args.workers)
+    # Fails before starting the workers if they could not share their state
+    ServiceConfig.from_env()
+
+    # Once, before the workers start
     if not os.path.isfile('bookings.sqlite'):
         create_bookings_db()
-    uvicorn.run("backend_service:app", host='0.0.0.0', port=8000)
+    else:
+        migrate_bookings_db()
+    uvicorn.run("backend_service:app", host=args.host, port=args.port, workers=args.workers)
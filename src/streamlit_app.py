@@ -1,12 +1,55 @@
+import json
 import uuid
 
 import requests
 import streamlit as st
 
-AGENT_API_URL = "http://localhost:8000/chat"
+AGENT_API_URL = "http://localhost:8000/chat/stream"
 APP_TITLE = 'Appointment Booking Chatbot'
 APP_ICON = "🛠️"
 
+TOOL_PROGRESS_MESSAGES = {
+    'convert_relative_to_absolute_datetime': 'Working out the date...',
+    'check_availability': 'Checking availability...',
+    'find_available_slots': 'Looking for open slots...',
+    'book_appointment': 'Booking your appointment...',
+    'retrieve_active_bookings_user': 'Looking up your appointments...',
+    'reschedule_appointment': 'Rescheduling your appointment...',
+    'cancel_appointment': 'Cancelling your appointment...',
+    'list_stylists_and_services': 'Looking up our stylists...',
+    'answer_faq': 'Looking that up...',
+}
+
+
+def stream_agent_response(user_input: str, thread_id: str, progress):
+    """Yields the response tokens streamed by the backend, showing tool progress in `progress`."""
+    with requests.post(
+        AGENT_API_URL,
+        json={
+            "user_input": user_input,
+            "thread_id": thread_id
+        },
+        stream=True,
+        # The read timeout applies between streamed events, not to the whole turn
+        timeout=(5, 60)
+    ) as response:
+        if response.status_code == 429:
+            raise RuntimeError(response.json()['detail'])
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line:
+                continue
+            event = json.loads(line)
+            if event['type'] == 'token':
+                progress.empty()
+                yield event['content']
+            elif event['type'] == 'queued':
+                progress.caption('Michelle is busy with other customers, one moment...')
+            elif event['type'] == 'tool_call':
+                progress.caption(TOOL_PROGRESS_MESSAGES.get(event['name'], 'Working on it...'))
+            elif event['type'] == 'error':
+                raise RuntimeError(event['content'])
+
 
 if __name__ == '__main__':
     st.set_page_config(
@@ -49,21 +92,15 @@ if __name__ == '__main__':
         with st.chat_message("user"):
             st.markdown(user_input)
 
-        try:
-            response = requests.post(
-                AGENT_API_URL,
-                json={
-                    "user_input": user_input,
-                    "thread_id": st.session_state.thread_id
-                },
-                timeout=15
-            )
-            response.raise_for_status()
-            bot_response = response.json()["response"]
-        except Exception as e:
-            bot_response = "Something went wrong. Please try again later."
-            st.error(str(e))
+        with st.chat_message("assistant"):
+            progress = st.empty()
+            try:
+                bot_response = st.write_stream(
+                    stream_agent_response(user_input, st.session_state.thread_id, progress))
+            except Exception as e:
+                progress.empty()
+                bot_response = "Something went wrong. Please try again later."
+                st.markdown(bot_response)
+                st.error(str(e))
 
         st.session_state.chat_history.append({"role": "assistant", "content": bot_response})
-        with st.chat_message("assistant"):
-            st.markdown(bot_response)
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# The packages live in `src/`, from which the service and the benchmarks are run
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from agents.booking_agent.database.connection import close_connection_pools  # noqa: E402
+from agents.booking_agent.database.create_sqlite_db import create_bookings_db  # noqa: E402
+
+
+@pytest.fixture
+def db_path(tmp_path) -> str:
+    """A new bookings database, with the default stylist (working the salon opening hours) and service."""
+    path = str(tmp_path / 'bookings.sqlite')
+    create_bookings_db(path)
+    yield path
+    close_connection_pools()
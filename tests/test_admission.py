@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+
+from agents.booking_agent.llm_limiter import LLMCallLimiter
+from backend_service.admission import TurnRejectedError, TurnScheduler
+
+
+def test_turn_waiting_too_long_rejected():
+    async def run():
+        scheduler = TurnScheduler(max_concurrent_turns=1, max_queue_wait_secs=0.05)
+        async with scheduler.admit('thread-1'):
+            with pytest.raises(TurnRejectedError) as rejected:
+                async with scheduler.admit('thread-2'):
+                    pass
+        assert rejected.value.reason == 'queue_timeout'
+        # The rejected turn left the queue, and the next one starts at once
+        assert (scheduler.running, scheduler.queued) == (0, 0)
+        async with scheduler.admit('thread-2') as ticket:
+            assert ticket.position == 0
+
+    asyncio.run(run())
+
+
+def test_timed_out_llm_call_retried():
+    attempts = []
+
+    async def call():
+        attempts.append(None)
+        await asyncio.sleep(1 if len(attempts) == 1 else 0)
+        return 'reply'
+
+    limiter = LLMCallLimiter(timeout_secs=0.05, backoff_secs=0.01)
+    assert asyncio.run(limiter.acall(call)) == 'reply'
+    assert len(attempts) == 2
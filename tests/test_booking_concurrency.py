@@ -0,0 +1,72 @@
+import datetime
+import threading
+
+import pytest
+import pytz
+
+from agents.booking_agent.database import utils as db_utils
+from agents.booking_agent.database.connection import get_connection_pool
+
+THREADS = 16
+OVERLAPPING_ACTIVE_BOOKINGS_QUERY = """
+    SELECT COUNT(*) FROM Bookings a JOIN Bookings b
+    ON a.stylist = b.stylist AND a.id < b.id AND a.start_ts < b.end_ts AND b.start_ts < a.end_ts
+    WHERE a.status = 'scheduled' AND b.status = 'scheduled'
+"""
+
+
+def _next_monday(hour: int, minute: int = 0) -> datetime.datetime:
+    tz = pytz.timezone(db_utils.SALON_TIMEZONE)
+    today = datetime.datetime.now(tz).date()
+    monday = today + datetime.timedelta(days=7 - today.weekday())
+    return tz.localize(datetime.datetime.combine(monday, datetime.time(hour, minute)))
+
+
+def _book_concurrently(db_path: str, starts: list[str]) -> list:
+    """Books each start on its own thread, all released at once. Returns the booking id or the error of each."""
+    barrier = threading.Barrier(len(starts))
+    results = [None] * len(starts)
+
+    def book(idx: int):
+        barrier.wait()
+        try:
+            results[idx] = db_utils.add_booking(starts[idx], f'Customer {idx}', f'647555{idx:04d}', db_path=db_path)
+        except Exception as e:
+            results[idx] = e
+
+    threads = [threading.Thread(target=book, args=(idx,)) for idx in range(len(starts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _overlapping_active_bookings(db_path: str) -> int:
+    return get_connection_pool(db_path).connection().execute(OVERLAPPING_ACTIVE_BOOKINGS_QUERY).fetchone()[0]
+
+
+@pytest.mark.parametrize('offsets_mins', [
+    pytest.param([0] * THREADS, id='same-slot'),
+    # With the default one-hour service, each start overlaps its neighbours
+    pytest.param([15 * (idx % 4) for idx in range(THREADS)], id='overlapping-slots'),
+])
+def test_concurrent_bookings_of_one_slot(db_path, offsets_mins):
+    start_dt = _next_monday(10)
+    results = _book_concurrently(
+        db_path, [(start_dt + datetime.timedelta(minutes=offset)).isoformat() for offset in offsets_mins])
+
+    booked = [result for result in results if isinstance(result, str)]
+    assert len(booked) == 1
+    assert all(isinstance(result, db_utils.SlotUnavailableError) for result in results if result not in booked)
+    assert _overlapping_active_bookings(db_path) == 0
+
+
+def test_concurrent_bookings_of_distinct_slots(db_path):
+    # Serialized by the write lock, but all accepted
+    start_dt = _next_monday(9)
+    results = _book_concurrently(
+        db_path, [(start_dt + datetime.timedelta(hours=hour)).isoformat() for hour in range(8)])
+
+    assert all(isinstance(result, str) for result in results)
+    assert _overlapping_active_bookings(db_path) == 0
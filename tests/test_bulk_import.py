@@ -0,0 +1,80 @@
+import io
+import json
+
+from agents.booking_agent.database import bulk
+from agents.booking_agent.database import utils as db_utils
+from agents.booking_agent.database.connection import get_connection_pool
+
+START = '2030-01-07T10:00:00-05:00'
+
+
+def _jsonl(*rows) -> io.StringIO:
+    return io.StringIO(''.join(json.dumps(row) + '\n' for row in rows))
+
+
+def test_malformed_rows_rejected(db_path):
+    rows = [
+        {'start_datetime': START, 'customer_name': 'Alice', 'phone_number': '6475550101', 'stylist': 5},
+        ['2030-01-07T11:00:00-05:00', 'Bob', '6475550102'],
+        'Carol',
+        {'start_datetime': '2030-01-07T12:00:00-05:00', 'customer_name': 'Dan', 'phone_number': 6475550104},
+        {'start_datetime': '2030-01-07T13:00:00-05:00', 'customer_name': 'Eve', 'phone_number': '6475550105'},
+    ]
+
+    result = bulk.import_bookings(bulk.read_rows(_jsonl(*rows), 'jsonl'), db_path=db_path)
+
+    assert (result.rows, result.imported, result.rejected) == (5, 1, 4)
+    assert result.errors == [(1, 'Expected text for stylist'), (2, 'The row is not an object'),
+                             (3, 'The row is not an object'), (4, 'Expected text for phone_number')]
+
+
+def test_invalid_json_line_rejected(db_path):
+    lines = [
+        json.dumps({'start_datetime': START, 'customer_name': 'Alice', 'phone_number': '6475550101'}),
+        '{"start_datetime": "2030-01-07T11:00:00-05:00", "customer_name": "Bob",',
+        '',
+        json.dumps({'start_datetime': '2030-01-07T12:00:00-05:00', 'customer_name': 'Carol',
+                    'phone_number': '6475550103'}),
+    ]
+
+    result = bulk.import_bookings(bulk.read_rows(io.StringIO('\n'.join(lines) + '\n'), 'jsonl'), db_path=db_path)
+
+    assert (result.rows, result.imported, result.rejected) == (3, 2, 1)
+    assert result.errors == [(2, "Invalid JSON on line 2: Expecting property name enclosed in double quotes")]
+
+
+def test_stylists_looked_up_by_id_then_by_name(db_path):
+    # Named as the id of another stylist, and two stylists with the same name
+    hours = {weekday: (9, 18) for weekday in range(7)}
+    anna = db_utils.add_stylist('Anna', hours, stylist_id='anna-1', db_path=db_path)
+    db_utils.add_stylist('anna-1', hours, stylist_id='impostor', db_path=db_path)
+    db_utils.add_stylist('Kim', hours, stylist_id='kim-1', db_path=db_path)
+    db_utils.add_stylist('Kim', hours, stylist_id='kim-2', db_path=db_path)
+    rows = [
+        {'start_datetime': START, 'customer_name': 'Alice', 'phone_number': '6475550101', 'stylist': 'ANNA-1'},
+        {'start_datetime': START, 'customer_name': 'Bob', 'phone_number': '6475550102', 'stylist': 'kim'},
+    ]
+
+    result = bulk.import_bookings(bulk.read_rows(_jsonl(*rows), 'jsonl'), db_path=db_path)
+
+    assert result.errors == [(2, "Ambiguous stylist 'kim', use one of the ids kim-1, kim-2")]
+    assert get_connection_pool(db_path).connection().execute(
+        "SELECT stylist FROM Bookings WHERE status = 'scheduled'").fetchall() == [(anna,)]
+
+
+def test_booking_moved_during_the_import_not_double_booked(db_path, monkeypatch):
+    booking_id = db_utils.add_booking('2030-01-07T09:00:00-05:00', 'Alice', '6475550101', db_path=db_path)
+    existing_customers = bulk._existing_customers
+
+    def reschedule_then_look_up(conn, phone_numbers):
+        # After the validation of the rows: moved in place onto the imported slot, with its creation time
+        assert db_utils.reschedule_booking(booking_id, START, '6475550101', db_path=db_path) == booking_id
+        return existing_customers(conn, phone_numbers)
+
+    monkeypatch.setattr(bulk, '_existing_customers', reschedule_then_look_up)
+    row = {'start_datetime': START, 'customer_name': 'Bob', 'phone_number': '6475550102'}
+    result = bulk.import_bookings(bulk.read_rows(_jsonl(row), 'jsonl'), db_path=db_path)
+
+    assert (result.imported, result.errors) == (0, [(1, 'Overlaps a booking made or moved during the import')])
+    assert get_connection_pool(db_path).connection().execute(
+        "SELECT id FROM Bookings WHERE status = 'scheduled'").fetchall() == [(booking_id,)]
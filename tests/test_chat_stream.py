@@ -0,0 +1,40 @@
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from agents import BookingAgent
+from backend_service import service
+
+REPLY = 'Hello! Tomorrow at 3pm is free, shall I book it for you?'
+
+
+class FakeStreamingChatModel(GenericFakeChatModel):
+    """Streams its replies word by word, and ignores the tools bound to it."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+@pytest.fixture
+def client(monkeypatch) -> TestClient:
+    llm = FakeStreamingChatModel(messages=iter([AIMessage(content=REPLY)]))
+    monkeypatch.setattr(service, 'booking_agent', BookingAgent(llm=llm))
+    # Without the lifespan: the agent is set, and no database is opened
+    return TestClient(service.app)
+
+
+def test_stream_tokens_then_end(client):
+    with client.stream('POST', '/chat/stream', json={'user_input': 'Is tomorrow 3pm free?',
+                                                     'thread_id': str(uuid.uuid4())}) as response:
+        assert response.status_code == 200
+        assert response.headers['content-type'].startswith('application/x-ndjson')
+        events = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert [event['type'] for event in events] == ['token'] * (len(events) - 1) + ['end']
+    # Streamed as it is produced, not as one message
+    assert len(events) > 2
+    assert ''.join(event['content'] for event in events[:-1]) == REPLY
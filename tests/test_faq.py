@@ -0,0 +1,27 @@
+from agents.booking_agent.faq import format_opening_hours
+from agents.booking_agent.tenancy import DEFAULT_TENANT, Tenant, use_tenant
+from agents.booking_agent.tools import answer_faq
+
+# Open Monday, Wednesday and Friday only
+OPENING_HOURS = {0: (8, 16), 2: (12, 20), 4: (9.5, 21)}
+
+
+def test_opening_hours_formatted():
+    assert format_opening_hours(OPENING_HOURS) == (
+        "We're open Monday from 8am to 4pm, Wednesday from 12pm to 8pm, and Friday from 9:30am to 9pm. "
+        "We're closed on Tuesdays, Thursdays, Saturdays, and Sundays.")
+
+
+def test_hours_answered_with_those_of_the_salon():
+    tenant = Tenant(id='salon-1', opening_hours=OPENING_HOURS)
+    answers = {}
+    for salon in (DEFAULT_TENANT, tenant):
+        with use_tenant(salon):
+            result = answer_faq.invoke({'question': 'Are you open on Sundays?'})
+        assert result['confident']
+        answers[salon.id] = result['faqs'][0]['answer']
+
+    assert answers[tenant.id] == format_opening_hours(OPENING_HOURS)
+    assert answers[DEFAULT_TENANT.id] == (
+        "We're open Monday to Wednesday from 9am to 6pm, Thursday and Friday from 9am to 8pm, and Saturday "
+        "from 10am to 4pm. We're closed on Sundays.")
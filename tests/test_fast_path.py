@@ -0,0 +1,67 @@
+import datetime
+import uuid
+
+import pytest
+import pytz
+from langchain_core.language_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from agents.booking_agent.booking_agent import BookingAgent
+from agents.booking_agent.database import utils as db_utils
+
+LLM_REPLY = 'No problem, your appointment stays as it is. Anything else?'
+
+
+class CountingChatModel(GenericFakeChatModel):
+    """Replies `LLM_REPLY` and counts its calls, ignoring the tools bound to it."""
+
+    calls: int = 0
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, *args, **kwargs):
+        self.calls += 1
+        return super()._generate(*args, **kwargs)
+
+
+@pytest.fixture
+def booking_id(db_path, tmp_path, monkeypatch) -> str:
+    # The tools use the default database path, relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    tz = pytz.timezone(db_utils.SALON_TIMEZONE)
+    today = datetime.datetime.now(tz).date()
+    monday = today + datetime.timedelta(days=7 - today.weekday())
+    return db_utils.add_booking(tz.localize(datetime.datetime.combine(monday, datetime.time(10))).isoformat(),
+                                'Alice', '6475550101')
+
+
+@pytest.fixture
+def llm() -> CountingChatModel:
+    return CountingChatModel(messages=iter([AIMessage(content=LLM_REPLY)] * 10))
+
+
+def _turns(agent: BookingAgent, *user_inputs: str) -> list[str]:
+    config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+    return [agent.invoke({"messages": [{"role": "user", "content": user_input}]}, config=config)['messages'][-1].text()
+            for user_input in user_inputs]
+
+
+def test_cancel_asks_for_confirmation_first(booking_id, llm):
+    agent = BookingAgent(llm=llm, fast_path=True)
+    question, done = _turns(agent, f'cancel booking {booking_id}', 'yes please')
+
+    assert 'confirm' in question and booking_id in question
+    assert 'cancelled' in done
+    assert db_utils.get_active_booking_by_id(booking_id) is None
+    assert llm.calls == 0
+
+
+def test_cancel_not_confirmed_goes_to_the_llm(booking_id, llm):
+    agent = BookingAgent(llm=llm, fast_path=True)
+    question, reply = _turns(agent, f'cancel booking {booking_id}', 'hmm, actually I want to keep it')
+
+    assert booking_id in question
+    assert reply == LLM_REPLY
+    assert db_utils.get_active_booking_by_id(booking_id) is not None
+    assert llm.calls == 1
@@ -0,0 +1,100 @@
+import datetime
+import random
+
+import pytest
+import pytz
+
+from agents.booking_agent.database import utils as db_utils
+from agents.booking_agent.database.create_sqlite_db import DEFAULT_STYLIST_ID
+from agents.booking_agent.database.interval_index import disable_interval_index, enable_interval_index
+
+PHONE_NUMBER = '6470000000'
+OPERATIONS = 200
+PROBES_PER_OPERATION = 20
+STYLIST_ID = 'anna'
+# Stylists to check: any of them, or a given one
+STYLIST_CHOICES = [None, DEFAULT_STYLIST_ID, STYLIST_ID]
+SERVICE_CHOICES = [db_utils.DEFAULT_SERVICE_ID, 'colour']
+
+
+@pytest.fixture
+def indexed_db(db_path) -> str:
+    """A database with two stylists working different hours and a service longer than the slot grid, indexed."""
+    db_utils.add_stylist('Anna', {weekday: (12, 20) for weekday in range(6)}, stylist_id=STYLIST_ID, db_path=db_path)
+    db_utils.add_service('colour', 'Colour', 150, db_path=db_path)
+    enable_interval_index(db_path)
+    yield db_path
+    disable_interval_index(db_path)
+
+
+def _days() -> list[datetime.date]:
+    """Monday to Saturday of next week, in the salon timezone."""
+    today = datetime.datetime.now(pytz.timezone(db_utils.SALON_TIMEZONE)).date()
+    monday = today + datetime.timedelta(days=7 - today.weekday())
+    return [monday + datetime.timedelta(days=offset) for offset in range(6)]
+
+
+def _slot(day: datetime.date, minute: int) -> str:
+    tz = pytz.timezone(db_utils.SALON_TIMEZONE)
+    return tz.localize(datetime.datetime.combine(day, datetime.time()) + datetime.timedelta(minutes=minute)).isoformat()
+
+
+def _random_slot(days: list[datetime.date]) -> str:
+    # Half hours from 8:00 to 19:30, within and around the working hours
+    return _slot(random.choice(days), 30 * random.randrange(16, 40))
+
+
+def _sql_available(monkeypatch, start_iso: str, service_id: str, stylist_id: str | None, db_path: str) -> bool:
+    with monkeypatch.context() as m:
+        m.setattr(db_utils, 'get_interval_index', lambda db_path: None)
+        return db_utils.is_slot_available(start_iso, service_id=service_id, stylist_id=stylist_id, db_path=db_path)
+
+
+def _check_consistency(monkeypatch, db_path: str, days: list[datetime.date]):
+    for _ in range(PROBES_PER_OPERATION):
+        start_iso, service_id, stylist_id = \
+            _random_slot(days), random.choice(SERVICE_CHOICES), random.choice(STYLIST_CHOICES)
+        assert db_utils.is_slot_available(start_iso, service_id=service_id, stylist_id=stylist_id, db_path=db_path) \
+            == _sql_available(monkeypatch, start_iso, service_id, stylist_id, db_path), (start_iso, service_id,
+                                                                                        stylist_id)
+
+    # The slots found by the range scan are those of the hourly grid the index finds free
+    day, service_id, stylist_id = random.choice(days), random.choice(SERVICE_CHOICES), random.choice(STYLIST_CHOICES)
+    expected = [slot for slot in (_slot(day, 60 * hour) for hour in range(24))
+                if db_utils.is_slot_available(slot, service_id=service_id, stylist_id=stylist_id, db_path=db_path)]
+    assert db_utils.find_available_slots(
+        _slot(day, 0), _slot(day + datetime.timedelta(days=1), 0), limit=24, service_id=service_id,
+        stylist_id=stylist_id, db_path=db_path) == expected
+
+
+def test_index_matches_sql_after_random_operations(indexed_db, monkeypatch):
+    random.seed(0)
+    days = _days()
+    booking_ids = []
+    for _ in range(OPERATIONS):
+        operation = random.choice(('book', 'book', 'reschedule', 'cancel'))
+        if operation == 'book':
+            start_iso, service_id, stylist_id = \
+                _random_slot(days), random.choice(SERVICE_CHOICES), random.choice(STYLIST_CHOICES)
+            # The index answers as the booking transaction, which checks the slot in SQL
+            available = db_utils.is_slot_available(
+                start_iso, service_id=service_id, stylist_id=stylist_id, db_path=indexed_db)
+            try:
+                booking_ids.append(db_utils.add_booking(
+                    start_iso, 'Test', PHONE_NUMBER, service_id=service_id, stylist_id=stylist_id,
+                    db_path=indexed_db))
+            except db_utils.SlotUnavailableError:
+                assert not available
+            else:
+                assert available
+        elif booking_ids and operation == 'reschedule':
+            try:
+                db_utils.reschedule_booking(random.choice(booking_ids), _random_slot(days), PHONE_NUMBER,
+                                            stylist_id=random.choice(STYLIST_CHOICES), db_path=indexed_db)
+            except db_utils.SlotUnavailableError:
+                pass
+        elif booking_ids:
+            assert db_utils.cancel_booking(booking_ids.pop(random.randrange(len(booking_ids))), db_path=indexed_db)
+        _check_consistency(monkeypatch, indexed_db, days)
+
+    assert booking_ids
@@ -0,0 +1,55 @@
+import datetime
+import logging
+
+import pytest
+
+from agents.booking_agent.database.connection import close_connection_pools, get_connection_pool
+from agents.booking_agent.database.create_sqlite_db import (
+    DEFAULT_STYLIST_ID,
+    SCHEMA_VERSION,
+    create_bookings_db,
+    migrate_bookings_db,
+    schema_version
+)
+from agents.booking_agent.database.utils import DEFAULT_SERVICE_ID
+
+ADD_V1_BOOKING_QUERY = """
+    INSERT INTO Bookings (id, customer, start_datetime, end_datetime, status, created_at, stylist, service)
+    VALUES (?, 'customer', ?, ?, 'scheduled', '2025-01-01T00:00:00+00:00', ?, ?)
+"""
+
+
+def _epoch(iso: str) -> int:
+    return int(datetime.datetime.fromisoformat(iso).timestamp())
+
+
+@pytest.fixture
+def v1_db_path(tmp_path) -> str:
+    """A bookings database at schema version 1, whose bookings have ISO 8601 start and end datetimes."""
+    path = str(tmp_path / 'bookings.sqlite')
+    create_bookings_db(path, target_version=1)
+    yield path
+    close_connection_pools()
+
+
+def test_invalid_datetimes_cancelled_by_the_epoch_migration(v1_db_path, caplog):
+    with get_connection_pool(v1_db_path).transaction() as conn:
+        conn.execute("INSERT INTO Customer (id, name, phone_number, created_at) "
+                     "VALUES ('customer', 'Alice', '6475550101', '2025-01-01T00:00:00+00:00')")
+        conn.executemany(ADD_V1_BOOKING_QUERY, [
+            (booking_id, start, end, DEFAULT_STYLIST_ID, DEFAULT_SERVICE_ID) for booking_id, start, end in [
+                ('valid', '2030-01-07T10:00:00-05:00', '2030-01-07T11:00:00-05:00'),
+                ('invalid_start', 'next monday', '2030-01-07T12:00:00-05:00'),
+                ('invalid_end', '2030-01-07T13:00:00-05:00', '1pm'),
+            ]])
+
+    with caplog.at_level(logging.WARNING):
+        assert migrate_bookings_db(v1_db_path) == SCHEMA_VERSION - 1
+
+    assert schema_version(v1_db_path) == SCHEMA_VERSION
+    rows = get_connection_pool(v1_db_path).connection().execute(
+        "SELECT id, start_ts, end_ts, status FROM Bookings ORDER BY id").fetchall()
+    # Kept, but cancelled at the epoch: never in the way of a booking
+    assert rows == [('invalid_end', 0, 0, 'cancelled'), ('invalid_start', 0, 0, 'cancelled'),
+                    ('valid', _epoch('2030-01-07T10:00:00-05:00'), _epoch('2030-01-07T11:00:00-05:00'), 'scheduled')]
+    assert 'invalid_start' in caplog.text and 'invalid_end' in caplog.text
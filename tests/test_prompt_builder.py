@@ -0,0 +1,66 @@
+import datetime
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from agents.booking_agent.booking_agent import available_tools
+from agents.booking_agent.prompt_builder import PromptBuilder
+from agents.booking_agent.prompts import CURRENT_DATETIME_PROMPT
+
+START = datetime.datetime(2025, 4, 22, 9, 0, 0, 250000, tzinfo=datetime.timezone.utc)
+
+
+class FakeClock:
+    """Advances by `step` at each reading."""
+
+    def __init__(self, start: datetime.datetime, step: datetime.timedelta):
+        self.now = start
+        self.step = step
+
+    def __call__(self, tz: datetime.tzinfo) -> datetime.datetime:
+        now, self.now = self.now, self.now + self.step
+        return now.astimezone(tz)
+
+
+def _turns() -> list[list]:
+    """The growing history of a conversation, at each LLM call."""
+    messages = [
+        HumanMessage(content='Is tomorrow at 3pm free?'),
+        AIMessage(content='', tool_calls=[{'name': 'check_availability', 'id': 'call_1',
+                                           'args': {'appointment_start_dt': '2025-04-23T15:00:00-04:00'}}]),
+        ToolMessage(content='{"status": "available"}', name='check_availability', tool_call_id='call_1'),
+        AIMessage(content='Tomorrow at 3pm is free, shall I book it?'),
+        HumanMessage(content='Yes please, for Alice, 647-555-0101'),
+    ]
+    return [messages[:end] for end in (1, 3, 5)]
+
+
+def test_static_prefix_identical_and_datetime_fresh():
+    clock = FakeClock(START, datetime.timedelta(minutes=7))
+    builder = PromptBuilder(available_tools, timezone='America/Toronto', clock=clock)
+    prefix = builder.static_prefix()
+
+    prompts = [builder.build(history) for history in _turns()]
+
+    # Every call starts with the same system message and ends with the time of the call
+    for prompt, history in zip(prompts, _turns()):
+        assert prompt[0] is builder.system_message
+        assert prompt[1:-1] == history
+    # In the salon timezone, to the second
+    assert [prompt[-1].content for prompt in prompts] == [
+        CURRENT_DATETIME_PROMPT.format(current_dt_iso=f'2025-04-22T05:{minute:02d}:00-04:00') for minute in (0, 7, 14)]
+    assert builder.static_prefix() == prefix
+    assert '2025-04-22' not in prefix.decode()
+
+
+def test_static_prefix_independent_of_the_clock():
+    builders = [PromptBuilder(available_tools, clock=FakeClock(START + datetime.timedelta(days=days),
+                                                              datetime.timedelta(seconds=1)))
+                for days in (0, 1, 365)]
+    builders.append(PromptBuilder(available_tools))
+
+    prefixes = {builder.static_prefix() for builder in builders}
+    assert len(prefixes) == 1
+    assert len({builder.prefix_fingerprint for builder in builders}) == 1
+    # Byte-identical message and schemas, whatever the time of the calls
+    assert len({builder.build([])[0].content for builder in builders}) == 1
+    assert len({builder.build([])[-1].content for builder in builders}) == len(builders)
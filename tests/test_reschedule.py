@@ -0,0 +1,63 @@
+import datetime
+import threading
+
+import pytz
+
+from agents.booking_agent.database import utils as db_utils
+from agents.booking_agent.database.connection import get_connection_pool
+
+THREADS = 8
+# The race of the reschedules is run on as many weeks
+ROUNDS = 5
+HISTORY_QUERY = "SELECT start_ts FROM BookingHistory WHERE booking = ? AND change = 'rescheduled'"
+
+
+def _next_monday(hour: int, weeks: int = 0) -> datetime.datetime:
+    tz = pytz.timezone(db_utils.SALON_TIMEZONE)
+    today = datetime.datetime.now(tz).date()
+    monday = today + datetime.timedelta(days=7 * (weeks + 1) - today.weekday())
+    return tz.localize(datetime.datetime.combine(monday, datetime.time(hour)))
+
+
+def _start_ts(db_path: str, booking_id: str) -> int:
+    return db_utils.get_active_booking_by_id(booking_id, db_path=db_path).start_ts
+
+
+def _reschedule_concurrently(db_path: str, booking_id: str, starts: list[datetime.datetime]) -> list:
+    """Reschedules the booking to each start on its own thread, all released at once."""
+    barrier = threading.Barrier(len(starts))
+    results = [None] * len(starts)
+
+    def reschedule(idx: int):
+        barrier.wait()
+        results[idx] = db_utils.reschedule_booking(booking_id, starts[idx].isoformat(), '6475550101', db_path=db_path)
+
+    threads = [threading.Thread(target=reschedule, args=(idx,)) for idx in range(len(starts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_reschedules_record_each_previous_slot(db_path):
+    for weeks in range(ROUNDS):
+        booking_id = db_utils.add_booking(_next_monday(9, weeks).isoformat(), 'Alice', '6475550101', db_path=db_path)
+        original_ts = _start_ts(db_path, booking_id)
+        starts = [_next_monday(10 + idx, weeks) for idx in range(THREADS)]
+
+        assert _reschedule_concurrently(db_path, booking_id, starts) == [booking_id] * THREADS
+        history = [start_ts for start_ts, in get_connection_pool(db_path).connection().execute(
+            HISTORY_QUERY, (booking_id,)).fetchall()]
+        # Each move records the slot it released: the original one, then the slot of the move before it
+        assert sorted([*history, _start_ts(db_path, booking_id)]) == sorted(
+            [original_ts, *(db_utils.to_timestamp(start.astimezone(pytz.utc)) for start in starts)])
+
+
+def test_cancelled_booking_not_rescheduled(db_path):
+    booking_id = db_utils.add_booking(_next_monday(9).isoformat(), 'Alice', '6475550101', db_path=db_path)
+    assert db_utils.cancel_booking(booking_id, db_path=db_path)
+
+    assert db_utils.reschedule_booking(booking_id, _next_monday(11).isoformat(), '6475550101', db_path=db_path) is None
+    assert db_utils.get_active_booking_by_id(booking_id, db_path=db_path) is None
+    assert get_connection_pool(db_path).connection().execute(HISTORY_QUERY, (booking_id,)).fetchall() == []
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from agents.booking_agent.database import shards
+from agents.booking_agent.database.connection import close_connection_pools, get_connection_pool
+from agents.booking_agent.database.create_sqlite_db import DEFAULT_STYLIST_ID
+
+OPENING_HOURS = {0: (8, 16), 2: (12, 20)}
+STYLIST_HOURS_QUERY = "SELECT weekday, open_minute, close_minute FROM StylistHours WHERE stylist = ? ORDER BY weekday"
+
+
+@pytest.fixture
+def router(tmp_path):
+    yield shards.ShardRouter(str(tmp_path / 'shards'))
+    close_connection_pools()
+
+
+def _stylist_hours(db_path: str) -> list[tuple]:
+    return get_connection_pool(db_path).connection().execute(STYLIST_HOURS_QUERY, (DEFAULT_STYLIST_ID,)).fetchall()
+
+
+def test_new_shard_with_its_opening_hours(router):
+    db_path = router.open('salon-1', opening_hours=OPENING_HOURS)
+
+    assert _stylist_hours(db_path) == [(0, 480, 960), (2, 720, 1200)]
+    # Built at a temporary path (`salon-1.sqlite.<random>`), removed once linked into place
+    assert [name for name in os.listdir(router.data_dir) if name.startswith('salon-1.sqlite.')] == []
+
+
+def test_failed_creation_leaves_no_database(router, monkeypatch):
+    def fail(db_path, opening_hours):
+        raise RuntimeError('Crashed before the opening hours were written')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(shards, '_set_default_stylist_hours', fail)
+        with pytest.raises(RuntimeError):
+            router.open('salon-1', opening_hours=OPENING_HOURS)
+    assert os.listdir(router.data_dir) == []
+
+    # Created again on the next open, not migrated with the default hours
+    assert _stylist_hours(router.open('salon-1', opening_hours=OPENING_HOURS)) == [(0, 480, 960), (2, 720, 1200)]
@@ -0,0 +1,52 @@
+import asyncio
+import importlib.metadata
+import inspect
+import pathlib
+import re
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langgraph.constants import CONFIG_KEY_STORE
+from langgraph.prebuilt import ToolNode
+
+from agents.booking_agent.tool_node import PREBUILT_VERSION, ParallelToolNode
+
+REQUIREMENTS = pathlib.Path(__file__).parents[1] / 'backend_service_requirements.txt'
+# Parameters of the private `ToolNode` methods overridden or called by `ParallelToolNode`
+PRIVATE_SIGNATURES = {
+    '_func': ['self', 'input', 'config', 'store'],
+    '_afunc': ['self', 'input', 'config', 'store'],
+    '_parse_input': ['self', 'input', 'store'],
+    '_run_one': ['self', 'call', 'input_type', 'config'],
+    '_arun_one': ['self', 'call', 'input_type', 'config'],
+    '_combine_tool_outputs': ['self', 'outputs', 'input_type'],
+}
+
+
+@tool
+def echo(text: str) -> str:
+    """Returns the text."""
+    return text
+
+
+def test_prebuilt_pinned_to_the_overridden_version():
+    pins = re.findall(r'^langgraph-prebuilt==(\S+)$', REQUIREMENTS.read_text(), flags=re.MULTILINE)
+    assert pins == [PREBUILT_VERSION]
+    assert importlib.metadata.version('langgraph-prebuilt') == PREBUILT_VERSION
+
+
+def test_private_tool_node_signatures():
+    for name, parameters in PRIVATE_SIGNATURES.items():
+        assert [*inspect.signature(getattr(ToolNode, name)).parameters] == parameters, name
+
+
+def test_same_messages_as_the_tool_node():
+    calls = [{'name': 'echo', 'args': {'text': f'message {idx}'}, 'id': f'call_{idx}'} for idx in range(5)]
+    state = {'messages': [AIMessage(content='', tool_calls=calls)]}
+    # Outside of a graph, the store of the run is given in the config
+    config = {'configurable': {CONFIG_KEY_STORE: None}}
+    expected = ToolNode([echo]).invoke(state, config)
+    node = ParallelToolNode([echo], max_workers=2)
+
+    assert node.invoke(state, config) == expected
+    assert asyncio.run(node.ainvoke(state, config)) == expected